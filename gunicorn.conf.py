@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration for the preload-then-fork serving mode.
+
+    SERVER_MODE=prefork python main.py
+    # or directly:
+    gunicorn -c gunicorn.conf.py "src.api.app:create_app()"
+
+The master builds the app (vector store, BM25 indexes, metadata database)
+once; workers are forked from it and share that memory copy-on-write.
+See src/api/prefork.py.
+"""
+import os
+import sys
+
+# Allow the Gemini gRPC clients created during preload to survive the fork
+os.environ.setdefault('GRPC_ENABLE_FORK_SUPPORT', '1')
+os.environ.setdefault('SERVER_MODE', 'prefork')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config.settings import settings
+
+bind = f"0.0.0.0:{settings.get_port()}"
+workers = settings.PREFORK_WORKERS
+worker_class = 'gthread'
+threads = settings.PREFORK_THREADS
+timeout = settings.PREFORK_TIMEOUT
+preload_app = settings.PREFORK_PRELOAD
+
+def when_ready(server):
+    # With preload_app the app is already built here, and no worker has been forked yet
+    if preload_app:
+        from src.api.prefork import prepare_for_fork
+        prepare_for_fork()
+
+def post_fork(server, worker):
+    if preload_app:
+        from src.api.prefork import reinit_worker
+        reinit_worker()
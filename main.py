@@ -29,12 +29,19 @@ def main():
     # Ensure data directories exist
     settings.ensure_directories()
     
-    # Create the Flask application
-    app = create_app()
-    
     # Get configured port (respects PORT environment variable)
     port = settings.get_port()
     
+    if settings.SERVER_MODE == 'asgi':
+        run_asgi(port, logger)
+        return
+    if settings.SERVER_MODE == 'prefork':
+        run_prefork(logger)
+        return
+    
+    # Create the Flask application
+    app = create_app()
+    
     # Print startup information
     print("\\n" + "="*50)
     print(" AIRI CHATBOT - Modular Architecture")
@@ -62,5 +69,30 @@ def main():
         logger.error(f"Application error: {str(e)}")
         sys.exit(1)
 
+def run_asgi(port: int, logger):
+    """Serve the async app with uvicorn (SERVER_MODE=asgi)."""
+    try:
+        import uvicorn
+    except ImportError:
+        logger.error("SERVER_MODE=asgi requires uvicorn (pip install asgiref uvicorn)")
+        sys.exit(1)
+    
+    logger.info(f"Async server starting on port {port} with {settings.ASGI_WORKERS} worker(s)")
+    uvicorn.run(
+        "src.api.asgi:create_asgi_app",
+        factory=True,
+        host='0.0.0.0',
+        port=port,
+        workers=settings.ASGI_WORKERS
+    )
+
+def run_prefork(logger):
+    """Hand over to gunicorn with the preloaded app (SERVER_MODE=prefork)."""
+    config_path = Path(__file__).parent / "gunicorn.conf.py"
+    logger.info(f"Starting gunicorn with {settings.PREFORK_WORKERS} preforked worker(s)")
+    os.execvp(sys.executable, [
+        sys.executable, "-m", "gunicorn", "-c", str(config_path), "src.api.app:create_app()"
+    ])
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
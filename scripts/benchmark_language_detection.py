@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency of language detection, on-box vs. Gemini.
+
+Test set: the labelled queries of tests/e2e/language_detection/, the
+golden multilingual set and the (English) 105-prompt stakeholder set, the
+bulk of real traffic. Golden queries that mix languages (labels such as
+"mixed_en_es" or "hi_en_mixed") count as correct for any language they
+name.
+
+- local: LanguageService.detect_language_locally (script fast path and
+  n-gram profiles); the share of queries it answers on its own (at least
+  --threshold confident and not a fun/constructed language) and its
+  accuracy on them
+- with --with-model, also against Gemini (needs GEMINI_API_KEY):
+  - model: every query sent to Gemini, the detection before the local
+    detector
+  - pipeline: detect_language as deployed, local first and Gemini for the
+    rest; the number of model calls it made
+
+    python scripts/benchmark_language_detection.py
+    python scripts/benchmark_language_detection.py --with-model
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Set, Tuple
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config.settings import settings
+from src.core.services.language_service import LanguageService
+
+TEST_SETS = [
+    project_root / "tests" / "e2e" / "language_detection" / "multilingual_queries.json",
+    project_root / "tests" / "e2e" / "golden_test_set" / "multilingual.json",
+]
+STAKEHOLDER_SET = project_root / "tests" / "e2e" / "105_prompts" / "stakeholder_test_results_20250722_202329.json"
+
+# Golden labels that name a language differently from languages.json
+LABEL_CODES = {'zh-CN': 'zh', 'emoji_flags': 'es_en_fr', 'multilingual_mix': 'zh_hi_en'}
+
+Example = Tuple[str, Set[str], str]  # (query, accepted codes, source)
+
+def load_examples(service: LanguageService) -> List[Example]:
+    examples = []
+    for path in TEST_SETS:
+        with open(path) as f:
+            queries = json.load(f)['queries']
+        for query in queries:
+            label = LABEL_CODES.get(query['language'], query['language'])
+            if service.get_language_info(label):
+                accepted = {label}
+            else:
+                accepted = {part for part in label.split('_') if service.get_language_info(part)}
+            if accepted:
+                examples.append((query['query'], accepted, path.stem))
+    with open(STAKEHOLDER_SET) as f:
+        examples += [(result['query'], {'en'}, 'stakeholder_105') for result in json.load(f)['detailed_results']]
+    return examples
+
+def timed(fn: Callable[[str], object], text: str) -> Tuple[object, float]:
+    start = time.perf_counter()
+    result = fn(text)
+    return result, (time.perf_counter() - start) * 1000
+
+def summarize(name: str, correct: List[bool], latencies: List[float]) -> None:
+    ordered = sorted(latencies)
+    print(f"{name:<10} accuracy {sum(correct) / len(correct):6.3f}   p50 {ordered[len(ordered) // 2]:9.3f} ms   "
+          f"p95 {ordered[int(len(ordered) * 0.95)]:9.3f} ms   mean {statistics.mean(ordered):9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark language detection")
+    parser.add_argument('--with-model', action='store_true', help="Compare with Gemini detection (needs GEMINI_API_KEY)")
+    parser.add_argument('--threshold', type=float, default=settings.LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--rounds', type=int, default=20, help="Timing rounds of the local detector")
+    parser.add_argument('--errors', action='store_true', help="List the queries the local detector gets wrong")
+    args = parser.parse_args()
+    settings.LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD = args.threshold
+
+    service = LanguageService()
+    examples = load_examples(service)
+    start = time.perf_counter()
+    service.detect_language_locally("warm-up")
+    print(f"{len(examples)} queries; local detector built in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    detections, local_ms = [], []
+    for text, _, _ in examples:
+        latencies = [timed(service.detect_language_locally, text)[1] for _ in range(args.rounds)]
+        detections.append(service.detect_language_locally(text))
+        local_ms.append(statistics.median(latencies))
+    codes = [detection.code if detection else 'en' for detection in detections]
+    local_correct = [code in accepted for code, (_, accepted, _) in zip(codes, examples)]
+    answered = [i for i, detection in enumerate(detections)
+                if detection and detection.confidence >= args.threshold and not detection.constructed]
+
+    summarize("local", local_correct, local_ms)
+    print(f"\nAnswered locally (>= {args.threshold}, not fun/constructed): {len(answered)}/{len(examples)} "
+          f"({len(answered) / len(examples):.0%}), accuracy {sum(local_correct[i] for i in answered) / max(1, len(answered)):.3f}")
+    for source in sorted({source for _, _, source in examples}):
+        rows = [i for i, example in enumerate(examples) if example[2] == source]
+        print(f"  {source:<24} {len(rows):>4} queries   accuracy {sum(local_correct[i] for i in rows) / len(rows):.3f}   "
+              f"answered locally {sum(i in answered for i in rows) / len(rows):.0%}")
+
+    if args.errors:
+        print()
+        for i, (text, accepted, _) in enumerate(examples):
+            if not local_correct[i]:
+                detection = detections[i]
+                print(f"  {'/'.join(sorted(accepted)):>10} -> {codes[i]:<8} "
+                      f"{detection.confidence if detection else 0:.2f}  {text}")
+
+    if not args.with_model:
+        return
+    if not settings.GEMINI_API_KEY:
+        print("\nGEMINI_API_KEY is not set; skipping the model comparison")
+        return
+
+    from src.core.models.gemini import GeminiModel
+    service.gemini_model = GeminiModel(api_key=settings.GEMINI_API_KEY, model_name=settings.GEMINI_MODEL_NAME)
+
+    model_correct, model_ms = [], []
+    for text, accepted, _ in examples:
+        result, elapsed = timed(service._detect_language_with_model, text)
+        model_correct.append(result['code'] in accepted)
+        model_ms.append(elapsed)
+
+    pipeline_correct, pipeline_ms, model_calls = [], [], 0
+    for text, accepted, _ in examples:
+        result, elapsed = timed(service.detect_language, text)
+        pipeline_correct.append(result['code'] in accepted)
+        pipeline_ms.append(elapsed)
+        model_calls += result.get('detection_method') in ('model', 'default')
+
+    print()
+    summarize("model", model_correct, model_ms)
+    summarize("pipeline", pipeline_correct, pipeline_ms)
+    print(f"\nModel calls: {len(examples)} -> {model_calls}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-query timing of the rule-based pattern checks over the 105-prompt test set.
+
+Times every check that scans a query for keyword/regex sets:
+
+- IntentClassifier: _check_security_patterns, _check_taxonomy_patterns,
+  contains_taxonomy_concepts, _keyword_taxonomy_relevance
+- Monitor._rule_based_classification (skipped if the Gemini SDK is missing)
+- QueryRefiner._assess_complexity
+- DomainClassifier.classify_domain_with_confidence
+- ResponseFormatter._detect_query_type
+
+Each check is timed cold (scan caches cleared before every call), and all
+checks together per query ("pipeline"), which is how a request runs them.
+Run it on two checkouts to compare implementations:
+
+    python scripts/benchmark_patterns.py --rounds 200
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config.domains import domain_classifier
+from src.core.metadata.response_formatter import ResponseFormatter
+from src.core.query.intent_classifier import IntentClassifier
+from src.core.query.refinement import QueryRefiner
+
+DEFAULT_PROMPTS = project_root / "tests" / "e2e" / "105_prompts" / "stakeholder_test_results_20250722_202329.json"
+
+def load_prompts(path: Path) -> List[str]:
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [result['query'] for result in data['detailed_results']]
+
+def build_checks() -> Dict[str, Callable[[str], object]]:
+    intent_classifier = IntentClassifier(use_gemini=False)
+    query_refiner = QueryRefiner()
+    response_formatter = ResponseFormatter()
+    checks = {
+        'intent.security': intent_classifier._check_security_patterns,
+        'intent.taxonomy': intent_classifier._check_taxonomy_patterns,
+        'intent.concepts': intent_classifier.contains_taxonomy_concepts,
+        'intent.relevance': intent_classifier._keyword_taxonomy_relevance,
+        'refiner.complexity': query_refiner._assess_complexity,
+        'domain.classify': domain_classifier.classify_domain_with_confidence,
+        'formatter.query_type': response_formatter._detect_query_type,
+    }
+    try:
+        from src.core.query.monitor import Monitor
+        # The rule-based path only needs the pattern matcher and domain classifier
+        from src.config.patterns import pattern_matcher
+        monitor = types.SimpleNamespace(pattern_matcher=pattern_matcher, domain_classifier=domain_classifier)
+        checks['monitor.rules'] = lambda query: Monitor._rule_based_classification(monitor, query)
+    except ImportError as e:
+        print(f"Skipping monitor.rules: {e}")
+
+    engines = [getattr(intent_classifier, '_pattern_engine', None), getattr(query_refiner, '_pattern_engine', None),
+               getattr(domain_classifier, '_pattern_engine', None), response_formatter._query_patterns]
+    try:
+        from src.config.patterns import pattern_matcher
+        engines.append(pattern_matcher._compiled_patterns)
+    except ImportError:
+        pass
+    checks['_clear'] = lambda _: [engine.clear_cache() for engine in engines if hasattr(engine, 'clear_cache')]
+    return checks
+
+def time_calls(fn: Callable[[str], object], queries: List[str], rounds: int, clear: Callable[[str], object]) -> List[float]:
+    """Per-query mean time in microseconds over rounds, caches cleared before each call."""
+    per_query = []
+    for query in queries:
+        total = 0.0
+        for _ in range(rounds):
+            clear(query)
+            start = time.perf_counter()
+            fn(query)
+            total += time.perf_counter() - start
+        per_query.append(total / rounds * 1e6)
+    return per_query
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    ordered = sorted(times)
+    return {
+        'mean_us': round(statistics.mean(ordered), 2),
+        'p50_us': round(ordered[len(ordered) // 2], 2),
+        'p95_us': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max_us': round(ordered[-1], 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query timing of the rule-based pattern checks")
+    parser.add_argument('--prompts', type=Path, default=DEFAULT_PROMPTS)
+    parser.add_argument('--rounds', type=int, default=100, help="Timed calls per query and check")
+    parser.add_argument('--output', type=Path, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    queries = load_prompts(args.prompts)
+    checks = build_checks()
+    clear = checks.pop('_clear')
+    print(f"{len(queries)} prompts, {args.rounds} rounds per prompt\n")
+
+    results = {}
+    for name, fn in checks.items():
+        results[name] = summarize(time_calls(fn, queries, args.rounds, clear))
+
+    def pipeline(query: str) -> None:
+        for fn in checks.values():
+            fn(query)
+    results['pipeline (all checks)'] = summarize(time_calls(pipeline, queries, args.rounds, clear))
+
+    print(f"{'check':<24} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}   (us per query)")
+    for name, row in results.items():
+        print(f"{name:<24} {row['mean_us']:>9} {row['p50_us']:>9} {row['p95_us']:>9} {row['max_us']:>9}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cost of response validation, per response.
+
+Replays the responses of the 105-prompt stakeholder run. Each response gets
+--docs source documents: one per RID it cites, filled up with passages of
+the repository preprint (data/info_files/preprint_full.txt), so the claim
+support and citation checks see realistic source text.
+
+- checks: ResponseValidator.validate_response on the responses of at least
+  --min-length characters (the long answers)
+- similarity: the revision cycle check (_calculate_response_similarity) of
+  each long response against an edited copy of itself
+- sync vs async: in sync mode validate_and_improve is on the critical path;
+  in async mode only the validate_async submit is, and the time until the
+  background result is ready is reported separately
+
+Run it on two checkouts to compare implementations:
+
+    python scripts/benchmark_validation.py --rounds 5
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain.docstore.document import Document
+
+from src.core.validation.response_validator import SelfValidationChain
+
+DEFAULT_PROMPTS = project_root / "tests" / "e2e" / "105_prompts" / "stakeholder_test_results_20250722_202329.json"
+SOURCE_TEXT = project_root / "data" / "info_files" / "preprint_full.txt"
+
+Sample = Tuple[str, str, List[Document]]  # (response, query, documents)
+
+def load_samples(path: Path, n_docs: int, passage_length: int = 1500) -> List[Sample]:
+    with open(path, 'r') as f:
+        results = json.load(f)['detailed_results']
+    source = SOURCE_TEXT.read_text(encoding='utf-8', errors='ignore') if SOURCE_TEXT.exists() else ''
+    samples = []
+    for number, result in enumerate(results):
+        response, query = result.get('response') or '', result['query']
+        rids = sorted(set(re.findall(r'RID-\d{5}', response)))[:n_docs]
+        rids += [f"RID-{90000 + i:05d}" for i in range(n_docs - len(rids))]
+        documents = []
+        for i, rid in enumerate(rids):
+            start = (number * 7919 + i * 15013) % max(1, len(source) - passage_length)
+            passage = source[start:start + passage_length] or query
+            documents.append(Document(page_content=passage, metadata={'rid': rid, 'title': rid}))
+        samples.append((response, query, documents))
+    return samples
+
+def time_per_call(fn: Callable[[], object], rounds: int) -> List[float]:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def summarize(name: str, values: List[float]) -> None:
+    ordered = sorted(values)
+    print(f"{name:<28} p50 {ordered[len(ordered) // 2]:9.3f} ms   p95 {ordered[int(len(ordered) * 0.95)]:9.3f} ms   "
+          f"max {ordered[-1]:9.3f} ms   mean {statistics.mean(ordered):9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response validation")
+    parser.add_argument('--prompts', type=Path, default=DEFAULT_PROMPTS)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--docs', type=int, default=10, help="Source documents per response")
+    parser.add_argument('--min-length', type=int, default=2000, help="Characters for a response to count as long")
+    parser.add_argument('--similarity-length', type=int, default=1500,
+                        help="Characters of each response compared by the cycle check")
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    samples = load_samples(args.prompts, args.docs)
+    long_samples = [sample for sample in samples if len(sample[0]) >= args.min_length]
+    chain = SelfValidationChain(enable_validation=True)
+    validator = chain.validator
+    print(f"{len(samples)} responses ({len(long_samples)} of >= {args.min_length} chars), "
+          f"{args.docs} source docs each, {args.rounds} rounds\n")
+
+    checks_ms = []
+    for response, query, documents in long_samples:
+        checks_ms += time_per_call(lambda: validator.validate_response(response, query, documents, 'safety'), args.rounds)
+    summarize("checks (long responses)", checks_ms)
+
+    similarity_ms = []
+    for response, _, _ in long_samples:
+        text = chain._normalize_response_for_comparison(response)[:args.similarity_length]
+        edited = text[:len(text) // 3] + " additionally, " + text[len(text) // 3 + 40:] + " see RID-XXX."
+        similarity_ms += time_per_call(lambda: chain._calculate_response_similarity(edited, text), 1)
+    summarize("cycle similarity", similarity_ms)
+
+    if not hasattr(chain, 'validate_async'):
+        return
+    chain = SelfValidationChain(enable_validation=True, workers=args.workers)
+    sync_ms = []
+    for response, query, documents in samples:
+        sync_ms += time_per_call(lambda: chain.validate_and_improve(response, query, documents), args.rounds)
+
+    submit_ms, completion_ms = [], []
+    for _ in range(args.rounds):
+        for response, query, documents in samples:
+            start = time.perf_counter()
+            future = chain.validate_async(response, query, documents)
+            submit_ms.append((time.perf_counter() - start) * 1000)
+            future.result()
+            completion_ms.append((time.perf_counter() - start) * 1000)
+
+    print()
+    summarize("sync (critical path)", sync_ms)
+    summarize("async (critical path)", submit_ms)
+    summarize("async (result ready)", completion_ms)
+    print(f"\nHistory kept: {len(chain.validation_history)} (ring buffer of {chain.validation_history.maxlen})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migrate a snippet database to content-addressed storage.
+
+SnippetDatabase migrates on first use; this script does it ahead of a deploy,
+reports the deduplication and reclaims the freed pages with VACUUM.
+
+    python scripts/data_migration/migrate_snippet_db.py [--db data/snippets.db]
+"""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.append('.')
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the snippet database to content-addressed storage")
+    parser.add_argument('--db', type=Path, default=Path('data/snippets.db'))
+    parser.add_argument('--no-vacuum', action='store_true', help="Skip reclaiming the freed space")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        print(f"❌ No snippet database at {args.db}")
+        return 1
+
+    size_before = args.db.stat().st_size
+    with sqlite3.connect(args.db) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    from src.core.storage.snippet_database import SCHEMA_VERSION, SnippetDatabase
+
+    if version >= SCHEMA_VERSION:
+        print(f"✅ {args.db} is already at schema {version}")
+    else:
+        print(f"🚀 Migrating {args.db} from schema {version} to {SCHEMA_VERSION}...")
+    stats = SnippetDatabase(args.db).get_storage_stats()
+
+    if not args.no_vacuum:
+        with sqlite3.connect(args.db) as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    print(f"- Sessions: {stats['sessions']}")
+    print(f"- Session references: {stats['references']}")
+    print(f"- Stored snippets: {stats['snippets']}")
+    print(f"- Size: {size_before / 1024:.0f} KB -> {args.db.stat().st_size / 1024:.0f} KB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
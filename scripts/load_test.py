@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Load test for the streaming chat endpoint: concurrent-stream capacity per worker.
+
+Opens N simultaneous /api/v1/stream requests at each concurrency level and
+reports completed streams, errors, time to first frame, end-to-end latency and
+throughput. Run it once against a server in each mode to compare them:
+
+    SERVER_MODE=wsgi python main.py   # then:
+    python scripts/load_test.py --url http://localhost:8090 --label wsgi
+
+    SERVER_MODE=asgi python main.py   # then:
+    python scripts/load_test.py --url http://localhost:8090 --label asgi
+
+Results are printed as a table and optionally appended to a JSON file
+(--output) so runs from both modes can be compared side by side.
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+DEFAULT_MESSAGES = [
+    "What are the main risks of AI in employment?",
+    "How does AI affect privacy?",
+    "What are bias risks in AI systems?",
+    "What governance approaches exist for AI safety?",
+]
+
+def run_stream(url: str, message: str, session_id: str, timeout: float) -> Dict[str, Any]:
+    """Run one streaming request and time its first frame and completion."""
+    body = json.dumps({"message": message, "session_id": session_id}).encode('utf-8')
+    request = urllib.request.Request(
+        f"{url}/api/v1/stream", data=body, headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    start = time.perf_counter()
+    first_frame = None
+    frames = 0
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                if first_frame is None:
+                    first_frame = time.perf_counter() - start
+                frames += 1
+        return {'ok': True, 'first_frame_s': first_frame, 'total_s': time.perf_counter() - start, 'frames': frames}
+    except Exception as e:
+        return {'ok': False, 'error': str(e), 'total_s': time.perf_counter() - start}
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_level(url: str, concurrency: int, messages: List[str], timeout: float) -> Dict[str, Any]:
+    """Fire `concurrency` streams at once and summarize them."""
+    barrier = threading.Barrier(concurrency)
+
+    def worker(index: int) -> Dict[str, Any]:
+        barrier.wait()  # All streams start together
+        return run_stream(url, messages[index % len(messages)], f"load_test_{concurrency}_{index}", timeout)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    wall_s = time.perf_counter() - wall_start
+
+    completed = [r for r in results if r['ok']]
+    first_frames = [r['first_frame_s'] for r in completed if r['first_frame_s'] is not None]
+    totals = [r['total_s'] for r in completed]
+    return {
+        'concurrency': concurrency,
+        'completed': len(completed),
+        'errors': len(results) - len(completed),
+        'wall_s': round(wall_s, 2),
+        'streams_per_s': round(len(completed) / wall_s, 2) if wall_s else 0.0,
+        'first_frame_p50_s': round(statistics.median(first_frames), 3) if first_frames else None,
+        'first_frame_p95_s': round(_percentile(first_frames, 95), 3) if first_frames else None,
+        'latency_p50_s': round(statistics.median(totals), 3) if totals else None,
+        'latency_p95_s': round(_percentile(totals, 95), 3) if totals else None,
+        'sample_error': next((r['error'] for r in results if not r['ok']), None)
+    }
+
+def print_table(label: str, rows: List[Dict[str, Any]]) -> None:
+    print(f"\n=== {label} ===")
+    print(f"{'streams':>8} {'done':>6} {'errors':>7} {'wall s':>8} {'streams/s':>10} "
+          f"{'TTFF p50':>9} {'TTFF p95':>9} {'lat p50':>8} {'lat p95':>8}")
+    for row in rows:
+        print(f"{row['concurrency']:>8} {row['completed']:>6} {row['errors']:>7} {row['wall_s']:>8} "
+              f"{row['streams_per_s']:>10} {str(row['first_frame_p50_s']):>9} {str(row['first_frame_p95_s']):>9} "
+              f"{str(row['latency_p50_s']):>8} {str(row['latency_p95_s']):>8}")
+        if row['sample_error']:
+            print(f"         e.g. {row['sample_error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-stream load test for the chat API")
+    parser.add_argument('--url', default="http://localhost:8090", help="Server base URL")
+    parser.add_argument('--label', default=None, help="Name of this run (e.g. wsgi or asgi)")
+    parser.add_argument('--levels', default="1,4,16,32,64", help="Comma-separated concurrency levels")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument('--output', type=Path, default=None, help="Append results to this JSON file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+    label = args.label or args.url
+    rows = []
+    for concurrency in levels:
+        print(f"Running {concurrency} concurrent streams against {args.url}...", flush=True)
+        rows.append(run_level(args.url, concurrency, DEFAULT_MESSAGES, args.timeout))
+    print_table(label, rows)
+
+    if args.output:
+        runs = json.loads(args.output.read_text()) if args.output.exists() else {}
+        runs[label] = rows
+        args.output.write_text(json.dumps(runs, indent=2))
+        if len(runs) > 1:
+            for run_label, run_rows in runs.items():
+                if run_label != label:
+                    print_table(run_label, run_rows)
+    return 0 if all(row['errors'] == 0 for row in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Resident memory per worker in the preload-then-fork serving mode.
+
+Starts gunicorn (gunicorn.conf.py) with 1, 4 and 8 workers, waits for the
+health check, sends a few warm-up queries so workers touch the retrieval
+structures like real traffic would, then reads /proc/<pid>/smaps_rollup for
+the master and every worker:
+
+- RSS:     resident pages, counting shared pages in full in every process
+- PSS:     shared pages divided between the processes that map them; the sum
+           over all processes is the real total footprint
+- private: pages only this process has (what each extra worker really costs)
+
+Run it with --no-preload as well to get the baseline where every worker
+builds its own copy of the corpus:
+
+    python scripts/memory_report.py --workers 1,4,8
+    python scripts/memory_report.py --workers 1,4,8 --no-preload
+
+Linux only (smaps_rollup).
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.api.prefork import read_process_memory
+
+WARMUP_QUERIES = [
+    "What are the main risks of AI in employment?",
+    "How does AI affect privacy?",
+    "What are bias risks in AI systems?",
+]
+
+def worker_pids(master_pid: int) -> List[int]:
+    children = Path(f"/proc/{master_pid}/task/{master_pid}/children")
+    try:
+        return [int(pid) for pid in children.read_text().split()]
+    except OSError:
+        return []
+
+def wait_for_health(url: str, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/api/health", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(2)
+    return False
+
+def warm_up(url: str, rounds: int) -> None:
+    for i in range(rounds):
+        for query in WARMUP_QUERIES:
+            body = json.dumps({"message": query, "session_id": f"memory_report_{i}"}).encode('utf-8')
+            request = urllib.request.Request(
+                f"{url}/api/v1/sendMessage", data=body, headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            try:
+                urllib.request.urlopen(request, timeout=120).read()
+            except Exception as e:
+                print(f"  warm-up query failed: {e}")
+
+def measure(workers: int, port: int, preload: bool, startup_timeout: float, warmup_rounds: int) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        'SERVER_MODE': 'prefork',
+        'PREFORK_WORKERS': str(workers),
+        'PREFORK_PRELOAD': 'true' if preload else 'false',
+        'PORT': str(port)
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", str(project_root / "gunicorn.conf.py"), "src.api.app:create_app()"]
+    master = subprocess.Popen(command, cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_for_health(url, startup_timeout):
+            raise RuntimeError(f"Server with {workers} worker(s) did not become healthy")
+        # Every worker must have finished loading before it is measured
+        deadline = time.time() + startup_timeout
+        while len(worker_pids(master.pid)) < workers and time.time() < deadline:
+            time.sleep(1)
+        warm_up(url, warmup_rounds)
+
+        master_memory = read_process_memory(master.pid)
+        workers_memory = [read_process_memory(pid) for pid in worker_pids(master.pid)]
+        total_pss = master_memory.get('pss', 0) + sum(m.get('pss', 0) for m in workers_memory)
+        return {
+            'workers': workers,
+            'preload': preload,
+            'master_rss_mb': round(master_memory.get('rss', 0) / 1024, 1),
+            'worker_rss_mb': [round(m.get('rss', 0) / 1024, 1) for m in workers_memory],
+            'worker_pss_mb': [round(m.get('pss', 0) / 1024, 1) for m in workers_memory],
+            'worker_private_mb': [round(m.get('private', 0) / 1024, 1) for m in workers_memory],
+            'total_pss_mb': round(total_pss / 1024, 1)
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+def _avg(values: List[float]) -> float:
+    return round(sum(values) / len(values), 1) if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory report for SERVER_MODE=prefork")
+    parser.add_argument('--workers', default="1,4,8", help="Comma-separated worker counts")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--no-preload', action='store_true', help="Baseline: every worker builds its own corpus")
+    parser.add_argument('--startup-timeout', type=float, default=600.0)
+    parser.add_argument('--warmup-rounds', type=int, default=1)
+    parser.add_argument('--output', type=Path, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        print(f"Measuring {workers} worker(s), preload={not args.no_preload}...", flush=True)
+        results.append(measure(workers, args.port, not args.no_preload, args.startup_timeout, args.warmup_rounds))
+
+    print(f"\n{'workers':>8} {'master RSS':>11} {'avg worker RSS':>15} {'avg worker PSS':>15} "
+          f"{'avg private':>12} {'total PSS':>10}   (MB)")
+    for row in results:
+        print(f"{row['workers']:>8} {row['master_rss_mb']:>11} {_avg(row['worker_rss_mb']):>15} "
+              f"{_avg(row['worker_pss_mb']):>15} {_avg(row['worker_private_mb']):>12} {row['total_pss_mb']:>10}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
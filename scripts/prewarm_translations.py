@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Pre-warm the translation memory for the most used languages.
+
+Translates the static English templates ChatService would otherwise translate
+on the first request of each language:
+
+- taxonomy:     every precomputed taxonomy response
+- out_of_scope: the intent classifier's fixed responses (greetings, junk, ...)
+- error:        the static error messages
+
+into the top --languages languages of the languages database (or --codes).
+Translations already stored are skipped, so rerunning it only translates what
+is new, e.g. after a prompt version bump. Refinement suggestions depend on the
+query and are stored on first use instead.
+
+    python scripts/prewarm_translations.py
+    python scripts/prewarm_translations.py --codes es,fr,zh --kinds taxonomy
+    python scripts/prewarm_translations.py --dry-run
+
+Needs GEMINI_API_KEY (except with --dry-run).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config.settings import settings
+from src.core.services.language_service import language_service
+from src.core.services.template_translator import TemplateTranslator, TRANSLATION_PROMPTS
+from src.core.storage.translation_memory import translation_memory
+
+def load_templates(kinds: List[str]) -> Dict[str, List[str]]:
+    templates = {}
+    if 'taxonomy' in kinds:
+        from src.core.taxonomy.taxonomy_handler import taxonomy_handler
+        templates['taxonomy'] = taxonomy_handler.get_precomputed_contents()
+    if 'out_of_scope' in kinds:
+        from src.core.query.intent_classifier import SUGGESTED_RESPONSES
+        templates['out_of_scope'] = SUGGESTED_RESPONSES
+    if 'error' in kinds:
+        from src.core.services.chat_service import ERROR_MESSAGES
+        templates['error'] = list(ERROR_MESSAGES)
+    return templates
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the translation memory")
+    parser.add_argument('--languages', type=int, default=settings.TRANSLATION_PREWARM_LANGUAGES,
+                        help="Number of top languages of the languages database")
+    parser.add_argument('--codes', help="Comma-separated language codes instead of the top languages")
+    parser.add_argument('--kinds', default='taxonomy,out_of_scope,error', help="Comma-separated template kinds")
+    parser.add_argument('--dry-run', action='store_true', help="Only count what would be translated")
+    args = parser.parse_args()
+
+    if args.codes:
+        languages = [language_service.get_language_info(code) for code in args.codes.split(',')]
+        unknown = [code for code, info in zip(args.codes.split(','), languages) if not info]
+        if unknown:
+            parser.error(f"Unknown language codes: {', '.join(unknown)}")
+    else:
+        languages = language_service.get_top_languages(args.languages)
+    templates = load_templates(args.kinds.split(','))
+
+    print(f"Languages: {', '.join(language['code'] for language in languages)}")
+    for kind, texts in templates.items():
+        prompt_version, _ = TRANSLATION_PROMPTS[kind]
+        missing = sum(not translation_memory.contains(text, language['code'], prompt_version)
+                      for language in languages for text in dict.fromkeys(texts))
+        print(f"  {kind:<13} {len(set(texts)):>3} templates ({prompt_version}), {missing} translations missing")
+
+    if args.dry_run:
+        return
+    if not settings.GEMINI_API_KEY:
+        print("GEMINI_API_KEY is not set")
+        sys.exit(1)
+
+    from src.core.models.gemini import GeminiModel
+    translator = TemplateTranslator(GeminiModel(api_key=settings.GEMINI_API_KEY, model_name=settings.GEMINI_MODEL_NAME))
+    start = time.perf_counter()
+    counts = translator.prewarm(templates, languages)
+    print(f"\nStored already: {counts['stored']}, translated: {counts['translated']}, failed: {counts['failed']} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Train and evaluate the local intent model (src/core/query/intent_model.py).
+
+Training data:
+
+- IntentClassifier.category_references (the texts the embedding centroids
+  are built from), labelled with their category
+- the 105-prompt stakeholder test set and the golden test sets, labelled by
+  set (AI-risk questions are repository_related, unrelated out-of-scope
+  questions general_knowledge)
+- logged production queries from the metrics database (--metrics-db)
+- wherever the rule-based stages (security/junk, taxonomy patterns) fire,
+  their label takes precedence, so the model agrees with the fast paths
+
+Evaluation is stratified k-fold cross-validation. For each held-out query
+the model's prediction is compared with the current pipeline's: by default
+the offline part of it (rules, then the keyword fallback that runs when
+embeddings are unavailable); --with-network runs the full classify_intent
+with embeddings and Gemini. The report gives accuracy per data source, the
+share of queries the model answers above the confidence threshold (the ones
+that skip the network) and its accuracy on those, calibration per
+confidence bin, and model latency.
+
+The final model is fitted on all data, calibrated on the out-of-fold
+predictions and saved to settings.INTENT_MODEL_PATH (or --output):
+
+    python scripts/train_intent_model.py
+    python scripts/train_intent_model.py --metrics-db data/metrics.db --with-network
+"""
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config.settings import settings
+from src.core.query.intent_classifier import IntentCategory, IntentClassifier
+from src.core.query.intent_model import LocalIntentModel
+
+STAKEHOLDER_SET = project_root / "tests" / "e2e" / "105_prompts" / "stakeholder_test_results_20250722_202329.json"
+GOLDEN_SET_DIR = project_root / "tests" / "e2e" / "golden_test_set"
+
+# Out-of-scope golden queries that are not about AI at all; the rest are AI questions
+UNRELATED_BEHAVIORS = {'decline_unrelated', 'decline_off_topic', 'decline_absurd', 'decline_financial_advice'}
+
+Example = Tuple[str, str, str]  # (text, label, source)
+
+def rule_label(classifier: IntentClassifier, query: str) -> Optional[str]:
+    """Label from the rule-based stages of classify_intent, if one fires."""
+    result = classifier._check_security_patterns(query) or classifier._check_taxonomy_patterns(query)
+    return result.category.value if result else None
+
+def load_examples(classifier: IntentClassifier, metrics_db: Optional[Path]) -> List[Example]:
+    examples: List[Example] = []
+    for category, texts in classifier.category_references.items():
+        examples += [(text, category.value, 'references') for text in texts]
+
+    with open(STAKEHOLDER_SET) as f:
+        for result in json.load(f)['detailed_results']:
+            examples.append((result['query'], IntentCategory.REPOSITORY_RELATED.value, 'stakeholder_105'))
+
+    for path in sorted(GOLDEN_SET_DIR.glob('*.json')):
+        try:
+            with open(path) as f:
+                queries = json.load(f)['queries']
+        except (ValueError, KeyError):
+            continue
+        for query in queries:
+            text = query.get('query', '')
+            if not text.strip():
+                continue
+            if path.stem == 'out_of_scope' and query.get('expected_behavior') in UNRELATED_BEHAVIORS:
+                label = IntentCategory.GENERAL_KNOWLEDGE.value
+            elif path.stem == 'edge_cases':
+                label = rule_label(classifier, text)  # only the ones the rules decide
+                if label is None:
+                    continue
+            else:
+                label = IntentCategory.REPOSITORY_RELATED.value
+            examples.append((text, label, f"golden_{path.stem}"))
+
+    if metrics_db:
+        with sqlite3.connect(str(metrics_db)) as connection:
+            logged = [row[0] for row in connection.execute("SELECT DISTINCT query FROM metrics")]
+        for text in logged:
+            # Logged queries carry no intent label: keep the ones the offline pipeline is sure about
+            label = rule_label(classifier, text)
+            if label is None:
+                fallback = classifier._fallback_classification(text)
+                if fallback.confidence < 0.75:
+                    continue
+                label = fallback.category.value
+            examples.append((text, label, 'logged'))
+
+    # Rule-based stages run before the model, so their labels win
+    labelled = []
+    seen = set()
+    for text, label, source in examples:
+        if text in seen:
+            continue
+        seen.add(text)
+        labelled.append((text, rule_label(classifier, text) or label, source))
+    return labelled
+
+def stratified_folds(labels: List[str], k: int, seed: int) -> List[int]:
+    by_label: Dict[str, List[int]] = defaultdict(list)
+    for i, label in enumerate(labels):
+        by_label[label].append(i)
+    fold = [0] * len(labels)
+    rng = random.Random(seed)
+    for indices in by_label.values():
+        rng.shuffle(indices)
+        for position, i in enumerate(indices):
+            fold[i] = position % k
+    return fold
+
+def pipeline_label(classifier: IntentClassifier, query: str, with_network: bool) -> str:
+    if with_network:
+        return classifier.classify_intent(query).category.value
+    result = (classifier._check_security_patterns(query) or classifier._check_taxonomy_patterns(query)
+              or classifier._fallback_classification(query))
+    return result.category.value
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the local intent model")
+    parser.add_argument('--metrics-db', type=Path, default=None, help="Also train on logged queries")
+    parser.add_argument('--with-network', action='store_true', help="Compare with the full embedding/Gemini pipeline")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--buckets', type=int, default=1 << 14)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--threshold', type=float, default=settings.INTENT_MODEL_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--seed', type=int, default=13)
+    parser.add_argument('--output', type=Path, default=settings.INTENT_MODEL_PATH)
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    classifier = IntentClassifier(use_gemini=args.with_network)
+    # The classifier under test must not consult an already trained model
+    classifier._local_model_loaded = True
+    examples = load_examples(classifier, args.metrics_db)
+    texts = [text for text, _, _ in examples]
+    labels = [label for _, label, _ in examples]
+    sources = [source for _, _, source in examples]
+    print(f"{len(examples)} examples: {dict(Counter(labels))}")
+
+    # Out-of-fold predictions
+    folds = stratified_folds(labels, args.folds, args.seed)
+    classes = sorted(set(labels))
+    out_of_fold_logits = np.zeros((len(texts), len(classes)))
+    for fold in range(args.folds):
+        train = [i for i in range(len(texts)) if folds[i] != fold]
+        model = LocalIntentModel.train([texts[i] for i in train], [labels[i] for i in train],
+                                       n_buckets=args.buckets, epochs=args.epochs)
+        for i in range(len(texts)):
+            if folds[i] == fold:
+                logits = model.logits(texts[i])
+                # Classes missing from this fold's training data get no probability
+                out_of_fold_logits[i] = [logits[model.classes.index(c)] if c in model.classes else -1e9 for c in classes]
+
+    final_model = LocalIntentModel.train(texts, labels, n_buckets=args.buckets, epochs=args.epochs)
+    temperature = final_model.calibrate(out_of_fold_logits, labels)
+    shifted = out_of_fold_logits / temperature
+    probabilities = np.exp(shifted - shifted.max(axis=1, keepdims=True))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    predicted = [classes[i] for i in probabilities.argmax(axis=1)]
+    confidence = probabilities.max(axis=1)
+
+    if args.with_network:
+        print("Running the current pipeline (embeddings + Gemini)...")
+    baseline = [pipeline_label(classifier, text, args.with_network) for text in texts]
+
+    print(f"\nTemperature: {temperature:.3f}   threshold: {args.threshold}")
+    print(f"\n{'source':<26} {'n':>5} {'model acc':>10} {'pipeline acc':>13} {'>= thr':>8} {'acc >= thr':>11}")
+    for source in sorted(set(sources)) + ['ALL']:
+        rows = [i for i in range(len(texts)) if source in ('ALL', sources[i])]
+        confident = [i for i in rows if confidence[i] >= args.threshold]
+        model_acc = sum(predicted[i] == labels[i] for i in rows) / len(rows)
+        pipeline_acc = sum(baseline[i] == labels[i] for i in rows) / len(rows)
+        confident_acc = (sum(predicted[i] == labels[i] for i in confident) / len(confident)) if confident else 0.0
+        print(f"{source:<26} {len(rows):>5} {model_acc:>10.3f} {pipeline_acc:>13.3f} "
+              f"{len(confident) / len(rows):>8.2f} {confident_acc:>11.3f}")
+
+    print(f"\n{'confidence':<12} {'n':>5} {'mean conf':>10} {'accuracy':>9}")
+    for low, high in [(0.0, 0.5), (0.5, 0.7), (0.7, 0.8), (0.8, 0.9), (0.9, 1.01)]:
+        rows = [i for i in range(len(texts)) if low <= confidence[i] < high]
+        if rows:
+            print(f"{low:.1f}-{min(high, 1.0):.1f}      {len(rows):>5} {statistics.mean(confidence[i] for i in rows):>10.3f} "
+                  f"{sum(predicted[i] == labels[i] for i in rows) / len(rows):>9.3f}")
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        final_model.predict(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"\nModel latency: p50 {latencies[len(latencies) // 2]:.3f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.3f} ms, max {latencies[-1]:.3f} ms")
+
+    if not args.no_save:
+        final_model.save(args.output)
+        print(f"\nSaved model to {args.output}")
+
+if __name__ == '__main__':
+    main()
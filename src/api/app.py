@@ -16,9 +16,10 @@ from .routes.features import features_bp, init_features_routes
 from .routes.metrics import metrics_bp
 from .routes.session import session_bp
 from .routes.document_preview import document_preview_bp, init_preview_routes
-from .routes.excel_viewer import excel_viewer_bp, init_excel_routes
-from .routes.word_viewer import word_viewer_bp, init_word_routes
+from .routes.excel_viewer import excel_viewer_bp, init_excel_routes, prerender_excel
+from .routes.word_viewer import word_viewer_bp, init_word_routes, prerender_word
 from .routes.gallery import gallery_bp
+from .response_layer import init_response_layer
 from ..core.services.chat_service import ChatService
 from ..core.models.gemini import GeminiModel
 from ..core.storage.vector_store import VectorStore
@@ -44,22 +45,18 @@ def create_app(config=None):
     
     # Enable CORS with production settings + Webflow integration
     CORS(app, 
-         origins=[
-             "*",  # Allow all origins for testing
-             "https://futuretech.mit.edu",  # Production Webflow site
-             "https://futuretech.webflow.io",  # Webflow staging
-             "https://*.webflow.io",  # Webflow preview domains
-             "https://davidturturean.github.io",  # GitHub Pages hosting
-             "https://*.github.io"  # Any GitHub Pages domain
-         ],
+         origins=settings.CORS_ORIGINS,
          methods=["GET", "POST", "OPTIONS"],
          allow_headers=["Content-Type", "Authorization"],
-         supports_credentials=True)
+         supports_credentials=settings.CORS_SUPPORTS_CREDENTIALS)
     
     # Apply configuration
     if config:
         app.config.update(config)
     
+    # Fast JSON, ETag/304 and compression for all API responses
+    init_response_layer(app)
+    
     # Initialize services
     chat_service = _initialize_services(logger)
     
@@ -93,6 +90,10 @@ def create_app(config=None):
     # Add error handlers
     _add_error_handlers(app, logger)
     
+    # Pre-render the repository documents in the background
+    if settings.RENDER_CACHE_WARMUP:
+        _start_render_cache_warmup(logger)
+    
     logger.info("Flask application created successfully")
     return app
 
@@ -172,6 +173,31 @@ def _initialize_services(logger):
         # Return a minimal chat service even if initialization fails
         return ChatService()
 
+def _start_render_cache_warmup(logger):
+    """Pre-render the repository workbook and preprint in a background thread."""
+    import threading
+    
+    renderers = {'.xlsx': prerender_excel, '.xls': prerender_excel, '.docx': prerender_word}
+    
+    def warm_up():
+        for file_path in settings.RENDER_CACHE_WARMUP_FILES:
+            renderer = renderers.get(file_path.suffix.lower())
+            if not renderer or not file_path.exists():
+                logger.info(f"Render cache warm-up: skipping {file_path.name}")
+                continue
+            try:
+                renderer(file_path)
+                logger.info(f"Render cache warm-up: {file_path.name} ready")
+            except Exception as e:
+                logger.warning(f"Render cache warm-up failed for {file_path.name}: {str(e)}")
+    
+    if settings.SERVER_MODE == 'prefork':
+        # The master must not fork mid-render; warming up first also shares the renders with every worker
+        warm_up()
+        return
+    
+    threading.Thread(target=warm_up, name="render-cache-warmup", daemon=True).start()
+
 def _validate_system_readiness(chat_service) -> Dict[str, str]:
     """
     Validate system component readiness with deep checks and log status.
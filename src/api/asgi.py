@@ -0,0 +1,275 @@
+"""
+Optional async serving mode (SERVER_MODE=asgi).
+
+The chat endpoints get asyncio-native handlers: each request is a coroutine
+that awaits the model call instead of holding a worker thread for its whole
+duration, so one worker can keep many concurrent streams open. Every other
+route is the unchanged Flask app, mounted through asgiref's WSGI adapter.
+
+The native handlers bypass Flask, so they add what flask_cors and the response
+layer add to Flask responses themselves: the CORS headers for the configured
+origins (settings.CORS_ORIGINS), gzip/brotli compression of large JSON bodies
+and the per-route payload metrics.
+
+Run with:
+    uvicorn "src.api.asgi:create_asgi_app" --factory --port 8090
+"""
+import asyncio
+import fnmatch
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+
+logger = get_logger(__name__)
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    ASGI_AVAILABLE = True
+except ImportError:
+    ASGI_AVAILABLE = False
+
+STREAM_CHUNK_SIZE = 100  # Characters per streamed chunk (same as the WSGI stream)
+
+async def _read_json(receive) -> Dict[str, Any]:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return json.loads(body or b'{}')
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin-1')
+    return ''
+
+def _origin_allowed(origin: str) -> bool:
+    origin = origin.lower()
+    return any(pattern == '*' or fnmatch.fnmatchcase(origin, pattern.lower()) for pattern in settings.CORS_ORIGINS)
+
+def cors_headers(scope) -> List[Tuple[bytes, bytes]]:
+    """CORS headers for a native response, matching what flask_cors adds to the Flask routes."""
+    origin = _header(scope, b'origin')
+    if not origin or not _origin_allowed(origin):
+        return []
+    if '*' in settings.CORS_ORIGINS and not settings.CORS_SUPPORTS_CREDENTIALS:
+        return [(b'access-control-allow-origin', b'*')]
+    # With credentials the browser requires the request origin itself, never '*'
+    headers = [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    if settings.CORS_SUPPORTS_CREDENTIALS:
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+async def _send_json(send, scope, payload: Any, status: int = 200) -> None:
+    from werkzeug.http import parse_accept_header
+    from .response_layer import _compress, _negotiate_encoding, response_metrics
+
+    start = time.perf_counter()
+    body = json.dumps(payload).encode('utf-8')
+    serialize_ms = (time.perf_counter() - start) * 1000
+    raw_bytes = len(body)
+    headers = [(b'content-type', b'application/json'), *cors_headers(scope)]
+
+    compress_ms = 0.0
+    if (settings.RESPONSE_COMPRESSION_ENABLED and status == 200
+            and raw_bytes >= settings.RESPONSE_COMPRESSION_MIN_BYTES):
+        headers.append((b'vary', b'Accept-Encoding'))
+        encoding = _negotiate_encoding(parse_accept_header(_header(scope, b'accept-encoding')))
+        if encoding:
+            compress_start = time.perf_counter()
+            body = _compress(body, encoding)
+            compress_ms = (time.perf_counter() - compress_start) * 1000
+            headers.append((b'content-encoding', encoding.encode()))
+
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+    response_metrics.record(scope.get('path', ''), raw_bytes, len(body), serialize_ms, compress_ms, not_modified=False)
+
+class AsyncChatApp:
+    """ASGI app serving the chat endpoints natively and delegating the rest to Flask."""
+
+    def __init__(self, flask_app, chat_routes=None):
+        """
+        Args:
+            flask_app: Flask app serving every other route
+            chat_routes: Module providing chat_service and the payload helpers
+                (defaults to src.api.routes.chat)
+        """
+        if chat_routes is None:
+            from .routes import chat as chat_routes
+        self._chat_routes = chat_routes
+        self._wsgi = WsgiToAsgi(flask_app)
+        self._handlers = {
+            '/api/v1/sendMessage': self._send_message,
+            '/api/v1/stream': self._stream_message,
+        }
+
+    async def __call__(self, scope, receive, send):
+        handler = self._handlers.get(scope.get('path')) if scope['type'] == 'http' else None
+        if handler is None or scope.get('method') != 'POST':
+            return await self._wsgi(scope, receive, send)
+        return await handler(scope, receive, send)
+
+    def _request_info(self, scope, data: Dict[str, Any]) -> Dict[str, Any]:
+        client = scope.get('client') or ('', 0)
+        return {
+            'message': data.get('message', ''),
+            'conversation_id': data.get('conversationId', 'default'),
+            'session_id': data.get('session_id') or _header(scope, b'x-session-id') or 'default',
+            'language_code': data.get('language_code'),
+            'user_ip': client[0],
+            'user_agent': _header(scope, b'user-agent')
+        }
+
+    async def _run_query(self, info: Dict[str, Any]):
+        chat_service = self._chat_routes.chat_service
+        result = await chat_service.process_query_async(
+            info['message'], info['conversation_id'], info['session_id'], info['language_code']
+        )
+        # Handle both old (2-tuple) and new (3-tuple) return formats
+        if len(result) == 3:
+            return result
+        return result[0], result[1], None
+
+    def _log_query(self, info: Dict[str, Any], start_time: float, usage, response_text: str = "",
+                   docs=None, language_info=None, intent: str = 'general', error: Exception = None):
+        from ..core.services.metrics_service import metrics_service
+        latency_ms = int((time.time() - start_time) * 1000)
+        if error is not None:
+            metrics_service.log_query(
+                session_id=info['session_id'], query=info['message'], response="",
+                latency_ms=latency_ms, error=error, user_ip=info['user_ip'],
+                user_agent=info['user_agent'], usage=usage
+            )
+            return latency_ms, None
+        query_metrics = metrics_service.log_query(
+            session_id=info['session_id'],
+            query=info['message'],
+            response=response_text,
+            latency_ms=latency_ms,
+            docs_retrieved=docs or [],
+            intent=intent,
+            language=info['language_code'] or (language_info.get('code') if language_info else 'en'),
+            user_ip=info['user_ip'],
+            user_agent=info['user_agent'],
+            usage=usage
+        )
+        return latency_ms, query_metrics
+
+    def _metrics_payload(self, session_id: str, latency_ms: int, query_metrics) -> Dict[str, Any]:
+        from ..core.services.metrics_service import metrics_service
+        return {
+            "latency_ms": latency_ms,
+            "citations_count": query_metrics.citations_count,
+            "query_number": len(metrics_service.session_metrics.get(session_id, {}).get("queries", []))
+        }
+
+    async def _send_message(self, scope, receive, send):
+        """Async counterpart of chat.send_message."""
+        from ..core.models.usage import track_request_usage
+        start_time = time.time()
+        data = await _read_json(receive)
+        info = self._request_info(scope, data)
+        if not info['message']:
+            return await _send_json(send, scope, {"error": "Message is required"}, 400)
+
+        usage = None
+        try:
+            with track_request_usage() as usage:
+                response_text, docs, language_info = await self._run_query(info)
+            latency_ms, query_metrics = await asyncio.to_thread(
+                self._log_query, info, start_time, usage, response_text, docs, language_info, data.get('intent', 'general')
+            )
+            response_data = {
+                "id": info['conversation_id'],
+                "response": response_text,
+                "status": "complete",
+                "metrics": self._metrics_payload(info['session_id'], latency_ms, query_metrics)
+            }
+            if language_info:
+                response_data["language"] = self._chat_routes.language_payload(language_info)
+            await _send_json(send, scope, response_data)
+        except Exception as e:
+            logger.error(f"Error in async send_message: {str(e)}")
+            await asyncio.to_thread(self._log_query, info, start_time, usage, error=e)
+            await _send_json(send, scope, {"error": f"Internal server error: {str(e)}"}, 500)
+
+    async def _stream_message(self, scope, receive, send):
+        """Async counterpart of chat.stream_message (same NDJSON frames)."""
+        from ..core.models.usage import track_request_usage
+        from ..core.validation.response_validator import track_pending_validation
+        start_time = time.time()
+        data = await _read_json(receive)
+        info = self._request_info(scope, data)
+        if not info['message']:
+            return await _send_json(send, scope, {"error": "Message is required"}, 400)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *cors_headers(scope)
+            ]
+        })
+
+        async def emit(payload: Any) -> None:
+            await send({'type': 'http.response.body', 'body': (json.dumps(payload) + '\n').encode('utf-8'), 'more_body': True})
+
+        usage = None
+        try:
+            await emit({"status": "Initializing query processing...", "type": "status", "stage": "init"})
+            await emit({"status": "Searching the AI Risk Repository...", "type": "status", "stage": "retrieval"})
+
+            with track_request_usage() as usage, track_pending_validation() as pending_validation:
+                response_text, docs, language_info = await self._run_query(info)
+
+            await emit({"status": "Generating response...", "type": "status", "stage": "generation"})
+            for i in range(0, len(response_text), STREAM_CHUNK_SIZE):
+                await emit(response_text[i:i + STREAM_CHUNK_SIZE])
+                await asyncio.sleep(settings.ASGI_STREAM_CHUNK_DELAY)
+
+            # Related documents may write metadata snippets to the database
+            related_docs = await asyncio.to_thread(self._chat_routes.format_related_documents, docs, info['session_id'])
+            if related_docs:
+                await emit({"related_documents": related_docs})
+            if language_info:
+                await emit({"language": self._chat_routes.language_payload(language_info)})
+            revision = await asyncio.to_thread(pending_validation.revision, settings.VALIDATION_REVISION_WAIT)
+            if revision:
+                response_text, validation = revision
+                await emit({"revision": response_text, "validation": validation.to_dict()})
+
+            latency_ms, query_metrics = await asyncio.to_thread(
+                self._log_query, info, start_time, usage, response_text, docs, language_info
+            )
+            await emit({"metrics": self._metrics_payload(info['session_id'], latency_ms, query_metrics)})
+        except Exception as e:
+            logger.error(f"Error in async streaming handler: {str(e)}")
+            await asyncio.to_thread(self._log_query, info, start_time, usage, error=e)
+            await emit(f"An error occurred: {str(e)}")
+        finally:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+def create_asgi_app(config=None):
+    """
+    Application factory for the async serving mode.
+
+    Raises:
+        RuntimeError: If asgiref is not installed
+    """
+    if not ASGI_AVAILABLE:
+        raise RuntimeError("SERVER_MODE=asgi requires the asgiref package (pip install asgiref uvicorn)")
+
+    from .app import create_app
+    flask_app = create_app(config)
+    logger.info("Async serving mode: chat endpoints native, other routes via WSGI adapter")
+    return AsyncChatApp(flask_app)
@@ -0,0 +1,107 @@
+"""
+Preload-then-fork serving mode (SERVER_MODE=prefork, see gunicorn.conf.py).
+
+The gunicorn master imports the app once (preload_app), which builds every
+read-only retrieval structure: the corpus documents, BM25 and field-aware
+indexes, the multi-strategy retriever and the metadata database. Workers are
+forked from it and share those pages copy-on-write instead of each building
+its own copy, so adding a worker costs its private state, not another corpus.
+
+Pages only stay shared while nothing writes to them:
+- prepare_for_fork() runs gc.freeze() in the master, moving every preloaded
+  object into a permanent generation the workers' collectors never traverse
+- the large indexes are flat arrays (CompactBM25) rather than per-document
+  dicts, so scoring a query does not touch thousands of refcounts
+
+State that is mutable per request or not fork-safe is recreated in each
+worker by reinit_worker(): the Chroma client, the vector store query cache
+and the DuckDB connections.
+"""
+import gc
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+
+logger = get_logger(__name__)
+
+_SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+def read_process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """
+    Resident memory of a process in kB, from /proc/<pid>/smaps_rollup (Linux).
+
+    Rss counts shared pages in full for every process; Pss divides each shared
+    page between the processes mapping it, so summing Pss over the master and
+    workers gives their real combined footprint.
+    """
+    path = Path(f"/proc/{pid or os.getpid()}/smaps_rollup")
+    memory = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in _SMAPS_FIELDS:
+                    memory[name.lower()] = int(rest.split()[0])
+    except OSError:
+        return {}
+    memory['private'] = memory.get('private_clean', 0) + memory.get('private_dirty', 0)
+    memory['shared'] = memory.get('shared_clean', 0) + memory.get('shared_dirty', 0)
+    return memory
+
+def _chat_service():
+    from .routes import chat as chat_routes
+    return chat_routes.chat_service
+
+def prepare_for_fork() -> None:
+    """Finish building shared state in the master and freeze it (gunicorn when_ready)."""
+    start = time.time()
+
+    if settings.SESSION_BACKEND == 'memory' and settings.PREFORK_WORKERS > 1:
+        logger.warning("SESSION_BACKEND=memory keeps sessions per worker; use sqlite or redis with SERVER_MODE=prefork")
+
+    # The metadata database is otherwise built lazily on the first query, once per worker
+    if settings.PREFORK_SHARE_METADATA:
+        try:
+            from ..core.metadata import metadata_service
+            metadata_service.share_with_workers(settings.METADATA_SHARED_DB_PATH)
+        except Exception as e:
+            logger.warning(f"Metadata database not shared, workers will load their own: {str(e)}")
+
+    # Drop garbage first so the frozen generation holds only live objects
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Preloaded state frozen for fork in {time.time() - start:.2f}s: "
+        f"{gc.get_freeze_count()} objects, master {read_process_memory().get('rss', 0) / 1024:.0f} MB RSS"
+    )
+
+def reinit_worker() -> None:
+    """Recreate per-worker and fork-unsafe state in a freshly forked worker (gunicorn post_fork)."""
+    chat_service = _chat_service()
+    vector_store = getattr(chat_service, 'vector_store', None)
+    if vector_store is not None:
+        vector_store.reopen_after_fork()
+
+    try:
+        from ..core.metadata import metadata_service
+        metadata_service.reopen_after_fork()
+    except Exception as e:
+        logger.warning(f"Metadata service not reopened in worker {os.getpid()}: {str(e)}")
+
+    from ..core.storage.excel_query import excel_query_engine
+    excel_query_engine.reset()
+
+    logger.info(f"Worker {os.getpid()} ready")
+
+def get_memory_report() -> Dict[str, Any]:
+    """Memory of this process, for /api/metrics/memory."""
+    return {
+        'pid': os.getpid(),
+        'server_mode': settings.SERVER_MODE,
+        'frozen_objects': gc.get_freeze_count(),
+        'memory_kb': read_process_memory()
+    }
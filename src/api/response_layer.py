@@ -0,0 +1,184 @@
+"""
+Response layer for large API payloads: fast JSON, conditional requests and compression.
+
+- JSON is serialized with orjson when it is installed (stdlib encoder otherwise),
+  through Flask's JSON provider, so every jsonify() call benefits
+- GET responses get a weak ETag over their body; a matching If-None-Match
+  returns 304 without sending the payload again
+- Bodies above a size threshold are compressed with brotli (when installed and
+  accepted) or gzip, negotiated from Accept-Encoding
+- Per-route payload sizes, serialization and compression times are recorded
+  for /api/metrics/responses
+"""
+import gzip
+import hashlib
+import threading
+import time
+from typing import Any, Dict
+
+from flask import Flask, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from ..config.logging import get_logger
+from ..config.settings import settings
+
+logger = get_logger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/javascript', 'text/html', 'text/plain',
+    'text/css', 'text/csv', 'image/svg+xml'
+)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes with orjson, falling back to the stdlib encoder."""
+
+    # Datetimes go through the stdlib provider's default() so they keep Flask's HTTP-date format
+    _orjson_options = (
+        (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME)
+        if ORJSON_AVAILABLE else 0
+    )
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        start = time.perf_counter()
+        try:
+            # jsonify() asks for compact separators, or indent=2 in debug mode
+            option = self._orjson_options
+            # Keys are sorted like the stdlib provider does (app.json.sort_keys), so ETags stay stable
+            if self.sort_keys and ORJSON_AVAILABLE:
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get('indent') == 2:
+                option |= orjson.OPT_INDENT_2 if ORJSON_AVAILABLE else 0
+            orjson_compatible = set(kwargs) <= {'indent', 'separators'} and kwargs.get('indent') in (None, 2)
+            if ORJSON_AVAILABLE and orjson_compatible:
+                try:
+                    return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+                except TypeError:
+                    pass  # e.g. integers beyond 64 bits; the stdlib encoder handles them
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context():
+                g.json_serialize_ms = g.get('json_serialize_ms', 0.0) + (time.perf_counter() - start) * 1000
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not serialize natively (same as the stdlib provider)."""
+    return DefaultJSONProvider.default(obj)
+
+class ResponseMetrics:
+    """Payload size and serialization/compression time per route."""
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, raw_bytes: int, sent_bytes: int, serialize_ms: float,
+               compress_ms: float, not_modified: bool) -> None:
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                'responses': 0, 'not_modified': 0, 'raw_bytes': 0, 'sent_bytes': 0,
+                'max_raw_bytes': 0, 'serialize_ms_total': 0.0, 'compress_ms_total': 0.0
+            })
+            stats['responses'] += 1
+            stats['not_modified'] += int(not_modified)
+            stats['raw_bytes'] += raw_bytes
+            stats['sent_bytes'] += sent_bytes
+            stats['max_raw_bytes'] = max(stats['max_raw_bytes'], raw_bytes)
+            stats['serialize_ms_total'] += serialize_ms
+            stats['compress_ms_total'] += compress_ms
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            summary = {}
+            for route, stats in self._routes.items():
+                count = stats['responses']
+                summary[route] = {
+                    **stats,
+                    'serialize_ms_total': round(stats['serialize_ms_total'], 2),
+                    'compress_ms_total': round(stats['compress_ms_total'], 2),
+                    'avg_raw_bytes': round(stats['raw_bytes'] / count),
+                    'avg_sent_bytes': round(stats['sent_bytes'] / count),
+                    'avg_serialize_ms': round(stats['serialize_ms_total'] / count, 3),
+                    'compression_ratio': round(stats['sent_bytes'] / stats['raw_bytes'], 3) if stats['raw_bytes'] else 1.0
+                }
+            return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+# Global response metrics instance
+response_metrics = ResponseMetrics()
+
+def _negotiate_encoding(accepted=None) -> str:
+    """Pick brotli or gzip from Accept-Encoding (the current request's by default), or '' for none."""
+    if accepted is None:
+        accepted = request.accept_encodings
+    if BROTLI_AVAILABLE and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return ''
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+def _process_response(response):
+    """ETag/304 handling, compression and metrics for buffered responses."""
+    # Streamed and file responses (send_file) manage their own headers
+    if response.direct_passthrough or response.is_streamed:
+        return response
+
+    data = response.get_data()
+    raw_bytes = len(data)
+    compress_ms = 0.0
+
+    if settings.RESPONSE_ETAG_ENABLED and request.method in ('GET', 'HEAD') and response.status_code == 200:
+        if 'ETag' not in response.headers:
+            # Weak: the same tag stays valid across content encodings of this body
+            response.set_etag(hashlib.blake2b(data, digest_size=16).hexdigest(), weak=True)
+        response.make_conditional(request)
+
+    if (settings.RESPONSE_COMPRESSION_ENABLED
+            and response.status_code == 200
+            and raw_bytes >= settings.RESPONSE_COMPRESSION_MIN_BYTES
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in response.headers):
+        response.vary.add('Accept-Encoding')
+        encoding = _negotiate_encoding()
+        if encoding:
+            compress_start = time.perf_counter()
+            response.set_data(_compress(data, encoding))
+            compress_ms = (time.perf_counter() - compress_start) * 1000
+            response.headers['Content-Encoding'] = encoding
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    sent_bytes = 0 if response.status_code == 304 else response.content_length or 0
+    response_metrics.record(
+        route, raw_bytes, sent_bytes, g.get('json_serialize_ms', 0.0), compress_ms,
+        not_modified=response.status_code == 304
+    )
+    return response
+
+def init_response_layer(app: Flask) -> None:
+    """Install the fast JSON provider and the ETag/compression/metrics hook on an app."""
+    app.json = FastJSONProvider(app)
+    app.after_request(_process_response)
+    logger.info(
+        f"Response layer: json={'orjson' if ORJSON_AVAILABLE else 'stdlib'}, "
+        f"compression={'br+gzip' if BROTLI_AVAILABLE else 'gzip'} "
+        f"(enabled={settings.RESPONSE_COMPRESSION_ENABLED}, min={settings.RESPONSE_COMPRESSION_MIN_BYTES}B), "
+        f"etag={settings.RESPONSE_ETAG_ENABLED}"
+    )
@@ -4,10 +4,12 @@ Chat routes for the AIRI chatbot API.
 import json
 import time
 import os
+from typing import Any, Dict, List
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 
 from ...core.services.chat_service import ChatService
 from ...core.services.metrics_service import metrics_service
+from ...core.models.usage import track_request_usage
 from ...config.logging import get_logger
 
 logger = get_logger(__name__)
@@ -23,10 +25,110 @@ def init_chat_routes(chat_service_instance: ChatService):
     global chat_service
     chat_service = chat_service_instance
 
+def language_payload(language_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Language fields sent to the frontend."""
+    return {
+        "code": language_info.get('code'),
+        "native_name": language_info.get('native_name'),
+        "english_name": language_info.get('english_name'),
+        "category": language_info.get('category', 'major')
+    }
+
+def format_related_documents(docs: List[Any], session_id: str) -> List[Dict[str, str]]:
+    """Format the documents behind a response for the Related Documents tab."""
+    # Check what type of results we got
+    is_metadata_query = isinstance(docs, list) and docs and isinstance(docs[0], dict)
+    is_technical_query = hasattr(docs, '__iter__') and docs and hasattr(docs[0], 'title') and hasattr(docs[0], 'url')
+    
+    related_docs = []
+    
+    if is_metadata_query:
+        from ...core.storage.snippet_database import snippet_db
+        from datetime import datetime
+    
+        # Convert metadata results to document format and save as snippets
+        snippets = {}
+        for i, result in enumerate(docs[:10]):  # Limit to 10 documents
+            # Generate a special RID for metadata results
+            meta_rid = f"META-{i:05d}"
+    
+            # Try to extract meaningful title
+            title = "Metadata Result"
+            if 'risk_id' in result:
+                title = f"Risk {result['risk_id']}"
+            elif 'domain' in result:
+                title = f"Domain: {result['domain']}"
+            elif 'category' in result:
+                title = f"Category: {result['category']}"
+            elif 'category_level' in result:
+                title = f"{result['category_level']}"
+    
+            # Add first non-null field value as subtitle
+            for key, value in result.items():
+                if value and key not in ['risk_id', 'domain', 'category', 'category_level']:
+                    title += f" - {str(value)[:50]}"
+                    break
+    
+            # Create snippet data for metadata result
+            snippet_data = {
+                "rid": meta_rid,
+                "title": title,
+                "content": json.dumps(result, indent=2),
+                "metadata": {
+                    "type": "metadata_query_result",
+                    "domain": result.get('domain', ''),
+                    "category": result.get('category', ''),
+                    "risk_id": result.get('risk_id', ''),
+                    "source_file": "Metadata Query Result",
+                },
+                "highlights": [],
+                "created_at": datetime.now().isoformat()
+            }
+    
+            snippets[meta_rid] = snippet_data
+    
+            # Use RID-based URL
+            url = f"local-file://snippet/{meta_rid}"
+            related_docs.append({"title": title, "url": url})
+    
+        # Save to database in one transaction
+        snippet_db.save_snippets(session_id, snippets)
+    
+    elif is_technical_query:
+        # Convert technical sources to document format
+        for source in docs:
+            related_docs.append({
+                "title": source.title,
+                "url": source.url
+            })
+    
+    elif docs and hasattr(docs[0], 'metadata'):
+        # Regular documents from vector store
+        for doc in docs:
+            rid = doc.metadata.get("rid")
+            if rid:
+                # Use RID-based URL that the frontend expects
+                url = f"local-file://snippet/{rid}"
+                title = doc.metadata.get("title", f"Document {rid}")
+            else:
+                # Fallback to original behavior
+                url = doc.metadata.get("url", "#")
+                if os.path.exists(url):
+                    url = f"local-file://{url}"
+                title = doc.metadata.get("title", "Unknown Title")
+    
+            related_docs.append({
+                "title": title, 
+                "url": url
+            })
+    
+    return related_docs
+
 @chat_bp.route('/api/v1/sendMessage', methods=['POST'])
 def send_message():
     """Non-streaming chat endpoint with metrics logging."""
     start_time = time.time()
+    session_id, message, usage = 'error', 'unknown', None
     
     try:
         data = request.json
@@ -47,8 +149,9 @@ def send_message():
         user_ip = request.remote_addr
         user_agent = request.headers.get('User-Agent')
         
-        # Process the query
-        result = chat_service.process_query(message, conversation_id, session_id, language_code)
+        # Process the query, capturing token usage of every model call it makes
+        with track_request_usage() as usage:
+            result = chat_service.process_query(message, conversation_id, session_id, language_code)
         
         # Handle both old (2-tuple) and new (3-tuple) return formats
         if len(result) == 3:
@@ -70,7 +173,8 @@ def send_message():
             intent=data.get('intent', 'general'),
             language=language_code or (language_info.get('code') if language_info else 'en'),
             user_ip=user_ip,
-            user_agent=user_agent
+            user_agent=user_agent,
+            usage=usage
         )
         
         response_data = {
@@ -86,12 +190,7 @@ def send_message():
         
         # Add language info if available
         if language_info:
-            response_data["language"] = {
-                "code": language_info.get('code'),
-                "native_name": language_info.get('native_name'),
-                "english_name": language_info.get('english_name'),
-                "category": language_info.get('category', 'major')
-            }
+            response_data["language"] = language_payload(language_info)
         
         return jsonify(response_data)
         
@@ -101,13 +200,14 @@ def send_message():
         # Log error metrics
         latency_ms = int((time.time() - start_time) * 1000)
         metrics_service.log_query(
-            session_id=session_id if 'session_id' in locals() else 'error',
-            query=message if 'message' in locals() else 'unknown',
+            session_id=session_id,
+            query=message,
             response="",
             latency_ms=latency_ms,
             error=e,
             user_ip=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
+            user_agent=request.headers.get('User-Agent'),
+            usage=usage
         )
         
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
@@ -136,6 +236,7 @@ def stream_message():
         
         # Define a streaming response generator
         def generate():
+            usage = None
             try:
                 # Initialize variables
                 query_type = "general"
@@ -177,7 +278,9 @@ def stream_message():
                 yield send_status("Searching the AI Risk Repository...", "retrieval")
                 time.sleep(0.1)
                 
-                result = chat_service.process_query(message, conversation_id, session_id, language_code)
+                from ...core.validation.response_validator import track_pending_validation
+                with track_request_usage() as usage, track_pending_validation() as pending_validation:
+                    result = chat_service.process_query(message, conversation_id, session_id, language_code)
                 
                 # After processing, indicate we're formatting the response
                 yield send_status("Generating response...", "generation")
@@ -190,10 +293,6 @@ def stream_message():
                     response_text, docs = result
                     language_info = None
                 
-                # Check what type of results we got
-                is_metadata_query = isinstance(docs, list) and docs and isinstance(docs[0], dict)
-                is_technical_query = hasattr(docs, '__iter__') and docs and hasattr(docs[0], 'title') and hasattr(docs[0], 'url')
-                
                 # Stream the response while preserving paragraph formatting
                 # Use character-based chunking instead of word-based to preserve newlines
                 chunk_size = 100  # Send 100 characters at a time
@@ -203,85 +302,7 @@ def stream_message():
                     time.sleep(0.05)  # Slightly faster streaming
                 
                 # Format documents for Related Documents tab
-                related_docs = []
-                
-                if is_metadata_query:
-                    # Import snippet_db at the top of generate function if not already imported
-                    from ...core.storage.snippet_database import snippet_db
-                    from datetime import datetime
-                    
-                    # Convert metadata results to document format and save as snippets
-                    for i, result in enumerate(docs[:10]):  # Limit to 10 documents
-                        # Generate a special RID for metadata results
-                        meta_rid = f"META-{i:05d}"
-                        
-                        # Try to extract meaningful title
-                        title = "Metadata Result"
-                        if 'risk_id' in result:
-                            title = f"Risk {result['risk_id']}"
-                        elif 'domain' in result:
-                            title = f"Domain: {result['domain']}"
-                        elif 'category' in result:
-                            title = f"Category: {result['category']}"
-                        elif 'category_level' in result:
-                            title = f"{result['category_level']}"
-                        
-                        # Add first non-null field value as subtitle
-                        for key, value in result.items():
-                            if value and key not in ['risk_id', 'domain', 'category', 'category_level']:
-                                title += f" - {str(value)[:50]}"
-                                break
-                        
-                        # Create snippet data for metadata result
-                        snippet_data = {
-                            "rid": meta_rid,
-                            "title": title,
-                            "content": json.dumps(result, indent=2),
-                            "metadata": {
-                                "type": "metadata_query_result",
-                                "domain": result.get('domain', ''),
-                                "category": result.get('category', ''),
-                                "risk_id": result.get('risk_id', ''),
-                                "source_file": "Metadata Query Result",
-                            },
-                            "highlights": [],
-                            "created_at": datetime.now().isoformat()
-                        }
-                        
-                        # Save to database
-                        snippet_db.save_snippet(session_id, meta_rid, snippet_data)
-                        
-                        # Use RID-based URL
-                        url = f"local-file://snippet/{meta_rid}"
-                        related_docs.append({"title": title, "url": url})
-                
-                elif is_technical_query:
-                    # Convert technical sources to document format
-                    for source in docs:
-                        related_docs.append({
-                            "title": source.title,
-                            "url": source.url
-                        })
-                
-                elif docs and hasattr(docs[0], 'metadata'):
-                    # Regular documents from vector store
-                    for doc in docs:
-                        rid = doc.metadata.get("rid")
-                        if rid:
-                            # Use RID-based URL that the frontend expects
-                            url = f"local-file://snippet/{rid}"
-                            title = doc.metadata.get("title", f"Document {rid}")
-                        else:
-                            # Fallback to original behavior
-                            url = doc.metadata.get("url", "#")
-                            if os.path.exists(url):
-                                url = f"local-file://{url}"
-                            title = doc.metadata.get("title", "Unknown Title")
-                        
-                        related_docs.append({
-                            "title": title, 
-                            "url": url
-                        })
+                related_docs = format_related_documents(docs, session_id)
                 
                 # Send the related documents
                 if related_docs:
@@ -289,12 +310,13 @@ def stream_message():
                 
                 # Send language info if available
                 if language_info:
-                    yield json.dumps({"language": {
-                        "code": language_info.get('code'),
-                        "native_name": language_info.get('native_name'),
-                        "english_name": language_info.get('english_name'),
-                        "category": language_info.get('category', 'major')
-                    }}) + '\n'
+                    yield json.dumps({"language": language_payload(language_info)}) + '\n'
+                
+                # In async validation mode a revised answer follows as its own event
+                revision = pending_validation.revision(settings.VALIDATION_REVISION_WAIT)
+                if revision:
+                    response_text, validation = revision
+                    yield json.dumps({"revision": response_text, "validation": validation.to_dict()}) + '\n'
                 
                 # Calculate and log metrics after streaming completes
                 latency_ms = int((time.time() - start_time) * 1000)
@@ -303,13 +325,14 @@ def stream_message():
                 query_metrics = metrics_service.log_query(
                     session_id=session_id,
                     query=message,
-                    response=response_text if 'response_text' in locals() else "",
+                    response=response_text,
                     latency_ms=latency_ms,
-                    docs_retrieved=docs if 'docs' in locals() else [],
+                    docs_retrieved=docs,
                     intent=query_type,
                     language=language_code or (language_info.get('code') if language_info else 'en'),
                     user_ip=user_ip,
-                    user_agent=user_agent
+                    user_agent=user_agent,
+                    usage=usage
                 )
                 
                 # Send metrics as final message
@@ -331,7 +354,8 @@ def stream_message():
                     latency_ms=latency_ms,
                     error=e,
                     user_ip=user_ip,
-                    user_agent=user_agent
+                    user_agent=user_agent,
+                    usage=usage
                 )
                 
                 yield json.dumps(f"An error occurred: {str(e)}") + '\n'
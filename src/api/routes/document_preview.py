@@ -4,9 +4,9 @@ Provides lightweight preview data for hover cards and panels.
 Performance target: <200ms response time
 """
 from flask import Blueprint, jsonify, request
-import os
 from datetime import datetime
 from ...core.storage.snippet_database import snippet_db
+from ...core.storage.snippet_records import preview_type as snippet_preview_type
 from ...config.logging import get_logger
 
 logger = get_logger(__name__)
@@ -116,8 +116,8 @@ def _convert_snippet_to_preview(snippet_data):
     """Convert snippet database format to preview format."""
     metadata = snippet_data.get('metadata', {})
 
-    # Determine preview type from file type or content
-    preview_type = _determine_preview_type(metadata, snippet_data.get('content', ''))
+    # Precomputed for snippets stored from a snippet record
+    preview_type = snippet_data.get('preview_type') or snippet_preview_type(metadata)
 
     preview = {
         "rid": snippet_data.get('rid', ''),
@@ -155,7 +155,7 @@ def _create_preview_from_snippet(rid, snippet):
             title = line.replace('Title:', '').strip()
             break
 
-    preview_type = _determine_preview_type(metadata, content)
+    preview_type = snippet_preview_type(metadata)
 
     return {
         "rid": rid,
@@ -178,33 +178,6 @@ def _create_preview_from_snippet(rid, snippet):
         "thumbnail": None
     }
 
-def _determine_preview_type(metadata, content):
-    """Determine the preview type based on metadata and content."""
-    # Check file extension from source_file
-    source_file = metadata.get('source_file', metadata.get('url', ''))
-
-    if source_file:
-        ext = os.path.splitext(source_file)[1].lower()
-
-        if ext in ['.xlsx', '.xls', '.csv']:
-            return 'excel'
-        elif ext in ['.docx', '.doc']:
-            return 'word'
-        elif ext in ['.pdf']:
-            return 'pdf'
-        elif ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            return 'image'
-
-    # Check metadata type
-    if metadata.get('type') == 'metadata_query_result':
-        return 'excel'  # Metadata results are typically tabular
-
-    # Default to text
-    return 'text'
-
 def _determine_document_type(snippet_data):
     """Determine document type from snippet data."""
-    metadata = snippet_data.get('metadata', {})
-    content = snippet_data.get('content', '')
-
-    return _determine_preview_type(metadata, content)
+    return snippet_data.get('preview_type') or snippet_preview_type(snippet_data.get('metadata', {}))
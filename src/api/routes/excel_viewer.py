@@ -4,14 +4,15 @@ Parses Excel files and returns interactive data for the frontend viewer.
 Performance target: <500ms for typical Excel files
 """
 from flask import Blueprint, jsonify, request
-import pandas as pd
-import openpyxl
-import re
 from datetime import datetime
+import json
 from pathlib import Path
-from cachetools import TTLCache
 from concurrent.futures import ThreadPoolExecutor
 from ...core.storage.snippet_database import snippet_db
+from ...core.storage.excel_sidecar import excel_sidecar_cache, SheetSidecar
+from ...core.storage.excel_style_index import excel_style_index_cache
+from ...core.storage.excel_query import excel_query_engine, SheetQuery, ExcelQueryError
+from ...core.storage.render_cache import render_cache
 from ...config.logging import get_logger
 from ...config.settings import settings
 
@@ -20,12 +21,6 @@ logger = get_logger(__name__)
 # Create blueprint
 excel_viewer_bp = Blueprint('excel_viewer', __name__)
 
-# Session-scoped Excel data cache
-# Cache key format: "{session_id}:{rid}:{file_mtime}"
-# TTL: 1 hour (3600 seconds)
-# Max size: 100 entries
-excel_cache = TTLCache(maxsize=100, ttl=3600)
-
 # Excel column width conversion multiplier
 # This constant controls how Excel character-unit widths are converted to pixels
 # Default: 8.43 (empirically determined to match Excel/Google Drive display)
@@ -49,27 +44,22 @@ def init_excel_routes(chat_service_instance):
     global chat_service
     chat_service = chat_service_instance
 
-def _get_cache_key(session_id: str, rid: str, file_path: Path, sheet_name: str = None, max_rows: int = 1000, offset: int = 0) -> str:
-    """
-    Generate cache key based on session, RID, file modification time, and query params.
-    Format: "{session_id}:{rid}:{mtime}:{sheet}:{max_rows}:{offset}"
-    """
-    try:
-        mtime = file_path.stat().st_mtime
-        # Include sheet_name, max_rows, and offset to handle different views of the same file
-        sheet_key = sheet_name or 'default'
-        return f"{session_id}:{rid}:{mtime}:{sheet_key}:{max_rows}:{offset}"
-    except Exception as e:
-        logger.warning(f"Failed to get file mtime for cache key: {e}")
-        # Fallback to timestamp-based key (won't cache across requests, but won't break)
-        return f"{session_id}:{rid}:nocache:{datetime.now().timestamp()}"
-
 @excel_viewer_bp.route('/api/document/<rid>/excel', methods=['GET'])
 def get_excel_data(rid):
     """
     Parse and return Excel file data for interactive viewing.
-    With session-scoped TTL caching for performance optimization.
+    Rendered pages come from the shared render cache (keyed by file version and
+    view params, not by session), so every visitor after the first is a cache hit.
     Performance target: <500ms first load, <100ms cached load
+
+    Optional server-side query params (one sheet; the first if none is given):
+      - sort: JSON list, e.g. [{"column": "Domain", "direction": "DESC"}]
+      - filters: JSON object by column, e.g. {"Domain": "privacy", "Year": {"op": "gte", "value": 2020}}
+        (a bare value is a case-insensitive "contains"; ops: contains, eq, ne, gt, gte, lt, lte, in,
+        is_null, not_null)
+      - search: text matched case-insensitively against every cell
+    With any of these, offset/max_rows page through the matching rows and the
+    sheet reports total_matching.
     """
     global cache_stats
     try:
@@ -85,6 +75,14 @@ def get_excel_data(rid):
         max_rows = int(request.args.get('max_rows', 1000))
         offset = int(request.args.get('offset', 0))
         include_formatting = request.args.get('include_formatting', 'false').lower() == 'true'
+        try:
+            query = SheetQuery.from_params(
+                sort=_json_param('sort'),
+                filters=_json_param('filters'),
+                search=request.args.get('search')
+            )
+        except ExcelQueryError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Get document metadata
         snippet_data = snippet_db.get_snippet(session_id, rid)
@@ -101,36 +99,42 @@ def get_excel_data(rid):
         if not file_path or not file_path.exists():
             return jsonify({"error": f"File not found: {source_file}"}), 404
 
-        # Generate cache key
-        cache_key = _get_cache_key(session_id, rid, file_path, sheet_name, max_rows, offset)
-
         # Update stats
         cache_stats['total_requests'] += 1
 
-        # Check cache
-        if cache_key in excel_cache:
-            cache_stats['hits'] += 1
-            cached_data = excel_cache[cache_key]
+        # Render (or reuse) this view of the file; the session check above still applies
+        if query.is_empty:
+            rendered, cached = render_cache.get_or_render(
+                'excel', file_path,
+                lambda: _parse_excel_file(file_path, sheet_name, max_rows, offset, include_formatting),
+                params=_render_params(sheet_name, max_rows, offset, include_formatting)
+            )
+        else:
+            try:
+                rendered, cached = render_cache.get_or_render(
+                    'excel_query', file_path,
+                    lambda: _query_excel_sheet(file_path, sheet_name, query, max_rows, offset, include_formatting),
+                    params={**_render_params(sheet_name, max_rows, offset, include_formatting), **query.to_params()}
+                )
+            except ExcelQueryError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # Add metadata (copy: the rendered page is shared across requests)
+        excel_data = {
+            **rendered,
+            'rid': rid,
+            'title': snippet_data.get('title', file_path.name),
+            'metadata': snippet_data.get('metadata', {})
+        }
 
+        if cached:
+            cache_stats['hits'] += 1
             duration_ms = (datetime.now() - start_time).total_seconds() * 1000
             hit_rate = (cache_stats['hits'] / cache_stats['total_requests']) * 100
             logger.info(f"Excel cache HIT for {rid} ({duration_ms:.2f}ms) - Hit rate: {hit_rate:.1f}%")
+            return jsonify(excel_data)
 
-            return jsonify(cached_data)
-
-        # Cache miss - parse Excel file
         cache_stats['misses'] += 1
-        logger.info(f"Excel cache MISS for {rid} - Parsing file... (include_formatting={include_formatting})")
-
-        excel_data = _parse_excel_file(file_path, sheet_name, max_rows, offset, include_formatting)
-
-        # Add metadata
-        excel_data['rid'] = rid
-        excel_data['title'] = snippet_data.get('title', file_path.name)
-        excel_data['metadata'] = snippet_data.get('metadata', {})
-
-        # Store in cache
-        excel_cache[cache_key] = excel_data
 
         # Calculate performance
         duration_ms = (datetime.now() - start_time).total_seconds() * 1000
@@ -171,16 +175,15 @@ def get_excel_sheets(rid):
         if not file_path or not file_path.exists():
             return jsonify({"error": "File not found"}), 404
 
-        # Get sheet names
-        workbook = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
+        # Get sheet names from the parsed sidecar (built on first access)
+        workbook = excel_sidecar_cache.get(file_path)
         sheets = [
             {
                 'sheet_name': name,
-                'total_rows': workbook[name].max_row
+                'total_rows': workbook.sheet(name).total_rows
             }
-            for name in workbook.sheetnames
+            for name in workbook.sheet_names
         ]
-        workbook.close()
 
         return jsonify({
             'rid': rid,
@@ -256,8 +259,7 @@ def get_formatting_chunk(rid):
         if not file_path or not file_path.exists():
             return jsonify({"error": f"File not found: {source_file}"}), 404
 
-        # Extract formatting for this chunk
-        # _extract_cell_formatting already supports offset and max_rows parameters
+        # Slice the precomputed style index for this chunk (built once per file version)
         formatting = _extract_cell_formatting(
             file_path,
             sheet_name,
@@ -298,16 +300,49 @@ def get_cache_stats():
     if cache_stats['total_requests'] > 0:
         hit_rate = (cache_stats['hits'] / cache_stats['total_requests']) * 100
 
+    render_stats = render_cache.get_stats()
     return jsonify({
         'hits': cache_stats['hits'],
         'misses': cache_stats['misses'],
         'total_requests': cache_stats['total_requests'],
         'hit_rate_percent': round(hit_rate, 2),
-        'cache_size': len(excel_cache),
-        'cache_max_size': excel_cache.maxsize,
-        'cache_ttl_seconds': excel_cache.ttl
+        'cache_size': render_stats['entries'],
+        'cache_bytes': render_stats['bytes'],
+        'cache_max_bytes': render_stats['max_bytes'],
+        'render_cache': render_stats,
+        'sidecar': excel_sidecar_cache.get_stats(),
+        'style_index': excel_style_index_cache.get_stats(),
+        'query_engine': excel_query_engine.get_stats()
     })
 
+def _json_param(name: str):
+    """Decode a JSON-encoded query parameter (None if absent)."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise ExcelQueryError(f"{name} must be valid JSON")
+
+def _render_params(sheet_name: str = None, max_rows: int = 1000, offset: int = 0, include_formatting: bool = False) -> dict:
+    """View parameters that, with the file version, identify a rendered page."""
+    return {
+        'sheet': sheet_name,
+        'max_rows': max_rows,
+        'offset': offset,
+        'include_formatting': include_formatting
+    }
+
+def prerender_excel(file_path: Path) -> None:
+    """Render the default first page (with and without formatting) into the render cache."""
+    for include_formatting in (False, True):
+        render_cache.get_or_render(
+            'excel', file_path,
+            lambda: _parse_excel_file(file_path, None, 1000, 0, include_formatting),
+            params=_render_params(include_formatting=include_formatting)
+        )
+
 def _resolve_file_path(source_file: str) -> Path:
     """Resolve file path from source file reference."""
     # Try direct path
@@ -335,7 +370,9 @@ def _parse_excel_file(file_path: Path, sheet_name: str = None, max_rows: int = 1
     """
     Parse Excel file and return structured data for the viewer.
     Supports multiple sheets, pagination, type inference, and cell formatting.
-    PERFORMANCE OPTIMIZED: Parallel sheet processing for multi-sheet files.
+    PERFORMANCE OPTIMIZED: Values and dimensions come from the memory-mapped sidecar,
+    which is built once per file version, so any page is a slice rather than a re-parse.
+    Formatting extraction runs in parallel for multi-sheet files.
 
     Args:
         file_path: Path to Excel file
@@ -346,11 +383,11 @@ def _parse_excel_file(file_path: Path, sheet_name: str = None, max_rows: int = 1
     """
     overall_start = datetime.now()
 
-    # Read Excel file
-    excel_file = pd.ExcelFile(str(file_path))
+    # Parsed workbook for this file version (parses the file only on first access)
+    workbook = excel_sidecar_cache.get(file_path)
 
     # Determine which sheets to parse
-    sheet_names = [sheet_name] if sheet_name and sheet_name in excel_file.sheet_names else excel_file.sheet_names
+    sheet_names = [sheet_name] if sheet_name and sheet_name in workbook.sheets else workbook.sheet_names
 
     logger.info(f"Parsing {len(sheet_names)} sheet(s) from {file_path.name} (formatting={'ON' if include_formatting else 'OFF'})")
 
@@ -370,8 +407,7 @@ def _parse_excel_file(file_path: Path, sheet_name: str = None, max_rows: int = 1
             futures = [
                 executor.submit(
                     _parse_single_sheet,
-                    excel_file,
-                    name,
+                    workbook.sheet(name),
                     file_path,
                     offset,
                     max_rows,
@@ -393,8 +429,7 @@ def _parse_excel_file(file_path: Path, sheet_name: str = None, max_rows: int = 1
         # Single sheet - parse directly (no parallel overhead)
         try:
             sheet_data = _parse_single_sheet(
-                excel_file,
-                sheet_names[0],
+                workbook.sheet(sheet_names[0]),
                 file_path,
                 offset,
                 max_rows,
@@ -418,47 +453,126 @@ def _parse_excel_file(file_path: Path, sheet_name: str = None, max_rows: int = 1
         'active_sheet': sheet_names[0] if sheet_names else None
     }
 
-def _parse_single_sheet(excel_file, current_sheet: str, file_path: Path, offset: int, max_rows: int, include_formatting: bool):
+def _parse_single_sheet(sheet: SheetSidecar, file_path: Path, offset: int, max_rows: int, include_formatting: bool):
     """
-    Parse a single sheet from Excel file.
+    Build viewer data for one page of a sheet from its sidecar.
     This function is called in parallel for multi-sheet files.
 
     Args:
-        excel_file: pandas ExcelFile object
-        current_sheet: Sheet name to parse
+        sheet: Parsed sheet from the sidecar cache
         file_path: Path to Excel file (for formatting extraction)
         offset: Row offset for pagination
         max_rows: Maximum rows to return
         include_formatting: Whether to extract cell formatting
     """
     sheet_start = datetime.now()
+    current_sheet = sheet.name
 
-    # Read sheet with pagination
-    df = pd.read_excel(
-        excel_file,
-        sheet_name=current_sheet,
-        skiprows=offset,
-        nrows=max_rows
-    )
+    # Slice the page; rows are already JSON-typed and carry their __row_id__
+    records = sheet.get_rows(offset, max_rows)
+    total_rows = sheet.total_rows
+
+    columns = _build_columns(sheet)
+
+    # Row heights were extracted once when the sidecar was built
+    excel_row_heights = sheet.get_row_heights(offset)
+
+    # Ensure total_rows is valid (handle None from failed row count)
+    total_rows = total_rows or len(records)
+
+    sheet_data = {
+        'sheet_name': current_sheet,
+        'columns': columns,
+        'rows': records,
+        'total_rows': total_rows,
+        'has_more': offset + len(records) < total_rows,
+        'row_heights': excel_row_heights  # Add row heights to sheet data
+    }
+
+    # Extract cell formatting ONLY if requested (this is the slow part!)
+    if include_formatting:
+        formatting_start = datetime.now()
+        formatting = _extract_cell_formatting(file_path, current_sheet, offset, max_rows)
+        formatting_time = (datetime.now() - formatting_start).total_seconds() * 1000
+        logger.info(f"Cell formatting extraction took {formatting_time:.2f}ms for sheet '{current_sheet}'")
 
-    # Convert DataFrame to records
-    total_rows = _get_sheet_row_count(file_path, current_sheet)
+        # ALWAYS add formatting key, even if empty, so frontend knows formatting was attempted
+        sheet_data['formatting'] = formatting
+        logger.info(f"Sheet '{current_sheet}' has {len(formatting)} formatted cells (offset={offset}, max_rows={max_rows})")
 
-    # Clean column names
-    df.columns = [str(col).strip() for col in df.columns]
+    sheet_time = (datetime.now() - sheet_start).total_seconds() * 1000
+    logger.info(f"Sheet '{current_sheet}' parsed in {sheet_time:.2f}ms ({len(records)} rows)")
 
-    # Convert DataFrame to records with proper type handling
-    # This is the CORRECT way: pandas handles all type conversions
-    import json
+    return sheet_data
+
+def _query_excel_sheet(file_path: Path, sheet_name: str, query: SheetQuery, max_rows: int = 1000, offset: int = 0,
+                       include_formatting: bool = False):
+    """
+    Build viewer data for one page of the rows of a sheet matching a query.
 
-    # Convert to JSON string then parse back - this handles ALL numpy types automatically
-    records_json = df.to_json(orient='records', date_format='iso')
-    records = json.loads(records_json)
+    DuckDB sorts and filters the sheet and returns the page's __row_id__s; the
+    rows come from the sidecar, so they are identical to unfiltered pages.
+    Formatting stays keyed by __row_id__ like unfiltered pages; row heights
+    are keyed by position in the page.
+    """
+    query_start = datetime.now()
 
-    # Add row IDs for DataGrid (do this AFTER type conversion)
-    for idx, record in enumerate(records):
-        record['__row_id__'] = offset + idx
+    workbook = excel_sidecar_cache.get(file_path)
+    if not workbook.sheet_names:
+        raise Exception("Failed to parse Excel file. The workbook has no sheets.")
+    name = sheet_name if sheet_name in workbook.sheets else workbook.sheet_names[0]
+
+    sheet, row_ids, total_matching = excel_query_engine.query(file_path, name, query, offset, max_rows)
+    records = sheet.get_rows_by_id(row_ids)
+
+    sheet_data = {
+        'sheet_name': name,
+        'columns': _build_columns(sheet),
+        'rows': records,
+        'total_rows': sheet.total_rows or sheet.data_rows,
+        'total_matching': total_matching,
+        'has_more': offset + len(records) < total_matching,
+        # Excel row of __row_id__ r is r + 2 (row 1 is the header)
+        'row_heights': {
+            position: sheet.row_heights[row_id + 2]
+            for position, row_id in enumerate(row_ids)
+            if row_id + 2 in sheet.row_heights
+        }
+    }
+
+    if include_formatting:
+        sheet_data['formatting'] = _extract_row_formatting(file_path, name, row_ids[:100])
 
+    query_time = (datetime.now() - query_start).total_seconds() * 1000
+    logger.info(
+        f"Sheet '{name}' query matched {total_matching} rows, returned {len(records)} in {query_time:.2f}ms"
+    )
+
+    return {
+        'sheets': [sheet_data],
+        'active_sheet': name,
+        'query': query.to_params()
+    }
+
+def _extract_row_formatting(file_path: Path, sheet_name: str, row_ids: list) -> dict:
+    """Formatting for arbitrary rows, sliced from the style index one run of consecutive rows at a time."""
+    formatting = {}
+    try:
+        style_index = excel_style_index_cache.get(file_path).sheet(sheet_name)
+        run_start = previous = None
+        for row_id in sorted(row_ids) + [None]:
+            if run_start is not None and row_id != previous + 1:
+                formatting.update(style_index.get_formatting(run_start, previous - run_start + 1))
+                run_start = None
+            if run_start is None:
+                run_start = row_id
+            previous = row_id
+    except Exception as e:
+        logger.warning(f"Could not extract cell formatting from {file_path}, sheet '{sheet_name}': {str(e)}")
+    return formatting
+
+def _build_columns(sheet: SheetSidecar) -> list:
+    """Column definitions for a sheet: the row-number column plus one per sheet column."""
     # Generate column definitions
     columns = [
         {
@@ -471,15 +585,11 @@ def _parse_single_sheet(excel_file, current_sheet: str, file_path: Path, offset:
         }
     ]
 
-    # Extract actual column widths and row heights from Excel in a SINGLE workbook open
-    # PERFORMANCE OPTIMIZATION: This reduces file I/O by 50% (was 2 opens, now 1 open)
-    excel_column_widths, excel_row_heights = _extract_excel_dimensions(
-        file_path, current_sheet, offset, include_row_heights=True
-    )
+    # Column widths were extracted once when the sidecar was built
+    excel_column_widths = sheet.column_widths
 
-    for col_idx, col in enumerate(df.columns):
-        # Infer column type for better rendering
-        dtype = df[col].dtype
+    for col_idx, column in enumerate(sheet.columns):
+        col = column['key']
 
         # Try to get actual Excel column width first, fall back to estimated width
         # col_idx + 1 because Excel columns are 1-indexed, and we skip the __row_id__ column
@@ -514,7 +624,7 @@ def _parse_single_sheet(excel_file, current_sheet: str, file_path: Path, offset:
                 )
         else:
             # Fall back to content-based estimation
-            width = _estimate_column_width(col, df[col])
+            width = _estimate_column_width(col, column['sample_max_length'])
             if col_idx < 5:
                 logger.info(f"Column '{col}' (#{col_idx + 1}): Using estimated width={width}px (no Excel width)")
 
@@ -535,561 +645,49 @@ def _parse_single_sheet(excel_file, current_sheet: str, file_path: Path, offset:
             'filterable': True
         })
 
-    # Ensure total_rows is valid (handle None from failed row count)
-    total_rows = total_rows or len(records)
-
-    sheet_data = {
-        'sheet_name': current_sheet,
-        'columns': columns,
-        'rows': records,
-        'total_rows': total_rows,
-        'has_more': offset + len(records) < total_rows,
-        'row_heights': excel_row_heights  # Add row heights to sheet data
-    }
-
-    # Extract cell formatting ONLY if requested (this is the slow part!)
-    if include_formatting:
-        formatting_start = datetime.now()
-        formatting = _extract_cell_formatting(file_path, current_sheet, offset, max_rows)
-        formatting_time = (datetime.now() - formatting_start).total_seconds() * 1000
-        logger.info(f"Cell formatting extraction took {formatting_time:.2f}ms for sheet '{current_sheet}'")
-
-        # ALWAYS add formatting key, even if empty, so frontend knows formatting was attempted
-        sheet_data['formatting'] = formatting
-        logger.info(f"Sheet '{current_sheet}' has {len(formatting)} formatted cells (offset={offset}, max_rows={max_rows})")
+    return columns
 
-    sheet_time = (datetime.now() - sheet_start).total_seconds() * 1000
-    logger.info(f"Sheet '{current_sheet}' parsed in {sheet_time:.2f}ms ({len(records)} rows)")
-
-    return sheet_data
-
-def _get_sheet_row_count(file_path: Path, sheet_name: str) -> int:
-    """Get total row count for a sheet efficiently."""
-    try:
-        workbook = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
-        sheet = workbook[sheet_name]
-        row_count = sheet.max_row
-        workbook.close()
-        return row_count
-    except:
-        return 0
-
-def _extract_excel_dimensions(file_path: Path, sheet_name: str, offset: int = 0, include_row_heights: bool = True) -> tuple:
-    """
-    Extract both column widths AND row heights in a single workbook open.
-    This is a critical performance optimization that reduces file I/O by 50%.
-
-    PERFORMANCE OPTIMIZATION:
-    - Opens workbook ONCE instead of twice (column widths + row heights)
-    - Uses read_only=False only when needed (for row_dimensions access)
-    - For files without custom row heights, could use read_only=True for faster loading
-
-    Returns: (column_widths_dict, row_heights_dict)
-
-    Args:
-        file_path: Path to Excel file
-        sheet_name: Name of sheet to extract from
-        offset: Row offset for pagination (affects row height mapping)
-        include_row_heights: Whether to extract row heights (can disable for faster loads)
-
-    Returns:
-        tuple: (column_widths, row_heights)
-            - column_widths: dict mapping column index (1-indexed) to width in Excel units
-            - row_heights: dict mapping DataGrid row index (0-indexed) to height in pixels
-    """
-    dimension_start = datetime.now()
-
-    try:
-        # Open workbook ONCE with read_only=False (needed for row_dimensions)
-        # NOTE: read_only=False is significantly slower but required for dimension access
-        workbook = openpyxl.load_workbook(str(file_path), read_only=False, data_only=True)
-        sheet = workbook[sheet_name]
-
-        # ===== EXTRACT COLUMN WIDTHS =====
-        column_widths = {}
-        total_columns = 0
-        columns_with_custom_width = 0
-
-        # sheet.column_dimensions is a dict with keys like 'A', 'B', 'C', etc.
-        for col_letter, dimension in sheet.column_dimensions.items():
-            total_columns += 1
-            if dimension.width:
-                # Convert column letter to index (A=1, B=2, etc.)
-                col_idx = openpyxl.utils.column_index_from_string(col_letter)
-                column_widths[col_idx] = dimension.width
-                columns_with_custom_width += 1
-
-        # ===== EXTRACT ROW HEIGHTS (if enabled) =====
-        row_heights = {}
-        rows_with_custom_height = 0
-
-        if include_row_heights:
-            # Excel rows are 1-indexed
-            # Row 1 is consumed as header by pandas (not in DataFrame)
-            # Row 2 onwards become DataGrid rows 0, 1, 2, ...
-            # With offset, we skip 'offset' rows at the top, then use next row as header
-            # So: DataGrid row 0 = Excel row (offset + 2)
-
-            start_excel_row = offset + 2
-            max_row = sheet.max_row if sheet.max_row is not None else 1000
-
-            for excel_row_num in range(start_excel_row, max_row + 1):
-                dim = sheet.row_dimensions.get(excel_row_num)
-                if dim and dim.height:
-                    # Convert from points to pixels
-                    # 1 point = 1/72 inch, 96 DPI screen: pixels = points * 96/72
-                    height_points = dim.height
-                    height_pixels = int(height_points * 96 / 72)
-
-                    # Map Excel row to DataGrid row index
-                    datagrid_row = excel_row_num - start_excel_row
-                    row_heights[datagrid_row] = height_pixels
-                    rows_with_custom_height += 1
-
-        workbook.close()
-
-        # Calculate extraction time
-        dimension_time = (datetime.now() - dimension_start).total_seconds() * 1000
-
-        # Performance warning if dimension extraction is slow
-        if dimension_time > 1000:
-            logger.warning(
-                f"⚠️ Dimension extraction slow ({dimension_time:.0f}ms) for sheet '{sheet_name}'. "
-                f"Consider disabling row heights for faster loads."
-            )
-
-        # Log results
-        if column_widths:
-            logger.info(
-                f"📏 Extracted {len(column_widths)} custom column widths from sheet '{sheet_name}' "
-                f"({columns_with_custom_width}/{total_columns} columns have explicit widths) "
-                f"in {dimension_time:.0f}ms"
-            )
-            # Log first few widths as examples
-            sample_widths = list(column_widths.items())[:3]
-            for col_idx, width in sample_widths:
-                logger.info(f"   Column {col_idx}: {width:.2f} Excel units")
-        else:
-            logger.info(f"📏 No custom column widths found in sheet '{sheet_name}' (using default/estimated widths)")
-
-        if include_row_heights:
-            if row_heights:
-                logger.info(
-                    f"📐 Extracted {len(row_heights)} custom row heights from sheet '{sheet_name}' "
-                    f"({rows_with_custom_height} rows have explicit heights, offset={offset})"
-                )
-                # Log first few heights as examples
-                sample_heights = list(row_heights.items())[:5]
-                for row_idx, height in sample_heights:
-                    excel_row = row_idx + start_excel_row
-                    logger.info(f"   Excel row {excel_row} → DataGrid row {row_idx}: {height}px")
-            else:
-                logger.info(f"📐 No custom row heights found in sheet '{sheet_name}' (using default height)")
-
-        return (column_widths, row_heights)
-
-    except Exception as e:
-        logger.warning(f"Could not extract dimensions from {file_path}, sheet '{sheet_name}': {str(e)}")
-        return ({}, {})
-
-def _estimate_column_width(column_name: str, series: pd.Series, max_width: int = 300) -> int:
+def _estimate_column_width(column_name: str, max_content_length: int = None, max_width: int = 300) -> int:
     """
     Estimate appropriate column width based on content.
-    Safely handles None/NaN values to prevent comparison errors.
+    max_content_length is the longest non-null value among the first 100 rows
+    (None when they are all None/NaN), as recorded in the sidecar.
     """
     # Base width on column name
     name_width = len(column_name) * 8 + 20
 
-    # Sample first 100 rows for content width, filtering out None/NaN values
-    sample = series.head(100)
-
-    # Filter out None/NaN values before calculating lengths
-    valid_values = sample[pd.notna(sample)]
-
-    if len(valid_values) > 0:
-        # Convert to string and calculate lengths safely
-        lengths = valid_values.astype(str).str.len()
-        max_content_length = int(lengths.max())  # Convert numpy int64 to Python int
+    if max_content_length is not None:
         content_width = min(max_content_length * 8 + 20, max_width)
     else:
         # Column is all None/NaN - use minimal width
         content_width = 100
 
     # Return the larger of name width and content width, with minimum of 100px
-    # Ensure return value is Python int, not numpy int64
     return int(max(name_width, content_width, 100))
 
 def _extract_cell_formatting(file_path: Path, sheet_name: str, offset: int = 0, max_rows: int = 1000):
     """
-    Extract cell formatting information from Excel cells using openpyxl.
+    Get cell formatting for a row range from the precomputed style index.
     Returns dict mapping cell coordinates to formatting properties.
 
     PERFORMANCE OPTIMIZED:
-    - Uses iter_rows() batch access (3-5x faster than individual cell() calls)
-    - Limits to first 50 visible rows by default (95% faster for large sheets)
-    - Smart column detection to skip empty columns
+    - Formatting is extracted once per file version (style table + int32 style-id array,
+      merged-range interval index and hyperlink map), so any chunk is an array slice
+    - Limits to first 100 visible rows per call; the frontend lazy-loads the rest
 
     FEATURES:
-    - Extracts merged cell ranges and propagates formatting
-    - Extracts hyperlinks from cells
+    - Merged cell ranges propagate the anchor's formatting
+    - Hyperlinks from cells and HYPERLINK formulas
     """
     try:
-        # Open in non-read-only mode to access merged_cells and hyperlinks
-        workbook = openpyxl.load_workbook(str(file_path), data_only=False, read_only=False)
-        sheet = workbook[sheet_name]
-
-        formatting = {}
-
-        # Extract merged cell ranges
-        # merged_cells returns ranges like "A1:C1", "D5:F10", etc.
-        merged_ranges = {}
-        for merged_range in sheet.merged_cells.ranges:
-            # Get the anchor cell (top-left) coordinates
-            min_col = merged_range.min_col
-            min_row = merged_range.min_row
-            max_col = merged_range.max_col
-            max_row = merged_range.max_row
-
-            # Store all cells in this merged range
-            for row in range(min_row, max_row + 1):
-                for col in range(min_col, max_col + 1):
-                    merged_ranges[(row, col)] = (min_row, min_col)
-
-        logger.info(f"Found {len(sheet.merged_cells.ranges)} merged cell ranges")
-
-        # Extract hyperlinks
-        # Strategy: Check each cell's hyperlink attribute directly
-        # This is more reliable than sheet._hyperlinks which may not be populated
-        hyperlinks = {}
-        hyperlink_count = 0
-
-        # First, try to get hyperlinks from sheet._hyperlinks (for backward compatibility)
-        if hasattr(sheet, '_hyperlinks') and sheet._hyperlinks:
-            for hyperlink in sheet._hyperlinks:
-                if hyperlink.ref and hyperlink.target:
-                    # hyperlink.ref is like "A5"
-                    try:
-                        cell_coord = openpyxl.utils.cell.coordinate_to_tuple(hyperlink.ref)
-                        hyperlinks[cell_coord] = hyperlink.target
-                        hyperlink_count += 1
-                        logger.info(f"Found hyperlink from sheet._hyperlinks: {hyperlink.ref} -> {hyperlink.target}")
-                    except Exception as e:
-                        logger.warning(f"Failed to parse hyperlink ref {hyperlink.ref}: {e}")
-                        continue
-
-        logger.info(f"Found {hyperlink_count} hyperlinks from sheet._hyperlinks")
-
-        # Additionally, scan all cells for hyperlinks (more reliable method)
-        # This catches hyperlinks that may not be in sheet._hyperlinks
-        for row in sheet.iter_rows():
-            for cell in row:
-                if cell.hyperlink:
-                    # cell.row and cell.column are already 1-indexed (Excel coordinates)
-                    cell_coord = (cell.row, cell.column)
-                    # Get the hyperlink target URL
-                    hyperlink_url = cell.hyperlink.target if hasattr(cell.hyperlink, 'target') else str(cell.hyperlink)
-                    if hyperlink_url and cell_coord not in hyperlinks:
-                        hyperlinks[cell_coord] = hyperlink_url
-                        hyperlink_count += 1
-                        logger.info(f"Found hyperlink from cell.hyperlink: {cell.coordinate} -> {hyperlink_url}")
-
-        logger.info(f"Total hyperlinks found: {len(hyperlinks)} (from both methods)")
-
-        # OPTIMIZATION 2: Extract formatting for visible rows
-        # Users only see first ~20 rows on screen initially
-        # Formatting extraction is the slowest operation - limit to what's immediately visible
-        # However, we increase to 100 rows to capture more header/merged cells
-        # IMPLEMENTED: Lazy-load formatting via /api/document/<rid>/excel/formatting-chunk endpoint
         # Initial load limited to 100 rows, additional chunks loaded in background by frontend
+        # via /api/document/<rid>/excel/formatting-chunk
         visible_rows = min(max_rows, 100)
 
-        # CRITICAL FIX: Account for pandas header row consumption
-        # When pandas reads Excel with pd.read_excel(skiprows=offset), it:
-        # 1. Skips 'offset' rows at the top
-        # 2. Uses the NEXT row as column headers (this row is NOT in the DataFrame data)
-        # 3. Remaining rows become DataFrame data (index 0, 1, 2, ...)
-        #
-        # Example with offset=0:
-        #   Excel Row 1 → Used as column headers (not in DataFrame)
-        #   Excel Row 2 → DataFrame index 0, DataGrid __row_id__ = 0
-        #   Excel Row 3 → DataFrame index 1, DataGrid __row_id__ = 1
-        #
-        # Therefore, when extracting formatting:
-        # - start_row should be offset + 2 (skip offset rows + header row)
-        # - Excel Row (offset + 2) maps to DataGrid row 0
-        # - Excel Row (offset + 3) maps to DataGrid row 1
-        #
-        # The key formula: DataGrid row = Excel row - (offset + 2)
-        #
-        start_row = offset + 2  # First Excel DATA row (skip offset + header row)
-
-        logger.info(f"Extracting formatting from Excel rows {start_row} to {start_row + visible_rows - 1} (offset={offset}, visible_rows={visible_rows})")
-        logger.info(f"  Mapping: Excel row {start_row} → DataGrid row 0, Excel row {start_row + 1} → DataGrid row 1, ...")
-
-        # Handle None values from sheet.max_row and sheet.max_column
-        max_row = sheet.max_row if sheet.max_row is not None else 1000
-        max_col = sheet.max_column if sheet.max_column is not None else 100
-
-        end_row = min(start_row + visible_rows, max_row + 1)
-
-        # OPTIMIZATION 3: Smart column detection - skip empty columns
-        # Many spreadsheets define 100 columns but only use 10-20
-        # Quick scan of first 10 rows to detect which columns have data
-        used_columns = set()
-        sample_rows = min(10, end_row - start_row)
-        for row in sheet.iter_rows(min_row=start_row, max_row=start_row + sample_rows, max_col=min(max_col, 100)):
-            for idx, cell in enumerate(row, start=1):
-                if cell.value is not None or (cell.fill and cell.fill.start_color and cell.fill.start_color.rgb):
-                    used_columns.add(idx)
-
-        # If no columns detected, fall back to first 50 columns
-        if not used_columns:
-            used_columns = set(range(1, min(max_col + 1, 51)))
-
-        cols_to_scan = min(len(used_columns), 50)  # Limit to 50 columns max
-        logger.info(f"Formatting extraction: {visible_rows} rows × {cols_to_scan} columns (was: {max_rows} × {min(max_col, 100)})")
-
-        # OPTIMIZATION 4: Use iter_rows() batch access - MUCH FASTER than cell() calls
-        # iter_rows() reads cells in batches from the underlying XML
-        # This is 3-5x faster than calling sheet.cell(row, col) for each cell individually
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=start_row, max_row=end_row - 1, max_col=max(used_columns) if used_columns else 50), start=0):
-            for col_idx, cell in enumerate(row, start=1):
-                # Skip columns not in used_columns (optimization)
-                if col_idx not in used_columns:
-                    continue
-
-                try:
-                    # Extract formatting if cell has any
-                    fmt = {}
-
-                    # Background color - extract only if it's a solid fill with valid RGB
-                    # openpyxl tries to resolve theme/indexed colors to RGB
-                    # We filter out defaults and unresolved references
-                    if cell.fill and cell.fill.fill_type == 'solid':
-                        start_color = cell.fill.start_color
-
-                        # Check if we have a valid RGB value (not theme/index reference)
-                        if start_color and hasattr(start_color, 'rgb') and start_color.rgb:
-                            rgb = start_color.rgb
-
-                            # Verify it's a string RGB value (openpyxl resolved it)
-                            if isinstance(rgb, str) and len(rgb) >= 6:
-                                rgb_upper = rgb.upper()
-
-                                # Skip Excel default "no fill" values
-                                skip_colors = {
-                                    '00000000',  # Transparent
-                                    'FFFFFFFF',  # White (theme background)
-                                    'FFFFFF',    # White
-                                }
-
-                                if rgb_upper not in skip_colors:
-                                    # Convert ARGB to RGB hex
-                                    if len(rgb) == 8:  # ARGB format
-                                        alpha = rgb[:2].upper()
-                                        # Skip transparent colors (alpha < 6)
-                                        if alpha not in ('00', '01', '02', '03', '04', '05'):
-                                            fmt['bgColor'] = f"#{rgb[2:]}"
-                                    else:  # RGB format
-                                        fmt['bgColor'] = f"#{rgb}" if not rgb.startswith('#') else rgb
-
-                    # Font formatting
-                    if cell.font:
-                        # Font color - extract only if RGB is available
-                        if cell.font.color and hasattr(cell.font.color, 'rgb') and cell.font.color.rgb:
-                            rgb = cell.font.color.rgb
-                            if isinstance(rgb, str) and len(rgb) >= 6:
-                                rgb_upper = rgb.upper()
-
-                                # Skip "auto" or default text colors
-                                # Note: We do NOT skip 000000 (black) if explicitly set
-                                # Only skip if it's the "auto" color indicator
-                                skip_font_colors = {
-                                    '00000000',  # Transparent
-                                    # Don't skip black - users might explicitly want black text
-                                }
-
-                                if rgb_upper not in skip_font_colors:
-                                    if len(rgb) == 8:  # ARGB format
-                                        alpha = rgb[:2].upper()
-                                        if alpha not in ('00', '01', '02', '03', '04', '05'):
-                                            fmt['fontColor'] = f"#{rgb[2:]}"
-                                    else:  # RGB format
-                                        fmt['fontColor'] = f"#{rgb}" if not rgb.startswith('#') else rgb
-
-                        if cell.font.bold:
-                            fmt['bold'] = True
-                        if cell.font.italic:
-                            fmt['italic'] = True
-                        if cell.font.underline:
-                            fmt['underline'] = True
-                        if cell.font.size:
-                            fmt['fontSize'] = cell.font.size
-
-                    # Border formatting - extract actual Excel borders
-                    if cell.border:
-                        borders = {}
-
-                        # Helper to extract border info
-                        def get_border_info(border_side):
-                            if border_side and border_side.style:
-                                info = {'style': border_side.style}
-                                if border_side.color and border_side.color.rgb:
-                                    rgb = border_side.color.rgb
-                                    if isinstance(rgb, str) and len(rgb) >= 6:
-                                        if len(rgb) == 8:  # ARGB
-                                            info['color'] = f"#{rgb[2:]}"
-                                        else:  # RGB
-                                            info['color'] = f"#{rgb}" if not rgb.startswith('#') else rgb
-                                return info
-                            return None
-
-                        if cell.border.top:
-                            top_info = get_border_info(cell.border.top)
-                            if top_info:
-                                borders['top'] = top_info
-
-                        if cell.border.bottom:
-                            bottom_info = get_border_info(cell.border.bottom)
-                            if bottom_info:
-                                borders['bottom'] = bottom_info
-
-                        if cell.border.left:
-                            left_info = get_border_info(cell.border.left)
-                            if left_info:
-                                borders['left'] = left_info
-
-                        if cell.border.right:
-                            right_info = get_border_info(cell.border.right)
-                            if right_info:
-                                borders['right'] = right_info
-
-                        if borders:
-                            fmt['borders'] = borders
-
-                    # Text wrapping - extract wrap_text property
-                    if cell.alignment and cell.alignment.wrap_text:
-                        fmt['wrapText'] = True
-
-                    # Check if this cell has a hyperlink
-                    excel_row = start_row + row_idx
-                    excel_col = col_idx
-
-                    # Check for hyperlinks from extracted hyperlinks dict
-                    # (which includes both sheet._hyperlinks and cell.hyperlink sources)
-                    if (excel_row, excel_col) in hyperlinks:
-                        hyperlink_url = hyperlinks[(excel_row, excel_col)]
-                        fmt['hyperlink'] = hyperlink_url
-                        logger.info(f"Adding hyperlink to cell {excel_row},{excel_col}: {hyperlink_url}")
-                    # Also check for HYPERLINK formula (formula-based hyperlinks)
-                    elif cell.value and isinstance(cell.value, str) and cell.value.startswith('=HYPERLINK'):
-                        # Parse HYPERLINK formula: =HYPERLINK("url", "display text")
-                        # Use regex to extract URL from the formula
-                        match = re.search(r'=HYPERLINK\s*\(\s*"([^"]+)"', cell.value)
-                        if match:
-                            hyperlink_url = match.group(1)
-                            fmt['hyperlink'] = hyperlink_url
-                            logger.info(f"Adding HYPERLINK formula to cell {excel_row},{excel_col}: {hyperlink_url}")
-
-                    # Check if this cell is part of a merged range
-                    if (excel_row, excel_col) in merged_ranges:
-                        anchor_row, anchor_col = merged_ranges[(excel_row, excel_col)]
-
-                        # If this is NOT the anchor cell, copy formatting from anchor
-                        if (excel_row, excel_col) != (anchor_row, anchor_col):
-                            # Calculate anchor's DataGrid coordinates
-                            # anchor_row is 1-indexed Excel row, start_row is 1-indexed Excel row
-                            # We need to convert to 0-indexed DataGrid row by subtracting start_row and adding offset
-                            anchor_datagrid_row = (anchor_row - start_row) + offset
-                            anchor_key = f"{anchor_datagrid_row}_{anchor_col}"
-
-                            # If we've already processed the anchor, copy its formatting
-                            if anchor_key in formatting:
-                                fmt = formatting[anchor_key].copy()
-                            else:
-                                # Anchor cell hasn't been processed yet (might be outside visible range or before current row)
-                                # Extract ALL formatting from anchor cell directly
-                                anchor_cell = sheet.cell(row=anchor_row, column=anchor_col)
-
-                                # Background color
-                                if anchor_cell.fill and anchor_cell.fill.fill_type == 'solid':
-                                    start_color = anchor_cell.fill.start_color
-                                    if start_color and hasattr(start_color, 'rgb') and start_color.rgb:
-                                        rgb = start_color.rgb
-                                        if isinstance(rgb, str) and len(rgb) >= 6:
-                                            rgb_upper = rgb.upper()
-                                            skip_colors = {'00000000', 'FFFFFFFF', 'FFFFFF'}
-                                            if rgb_upper not in skip_colors:
-                                                if len(rgb) == 8:
-                                                    alpha = rgb[:2].upper()
-                                                    if alpha not in ('00', '01', '02', '03', '04', '05'):
-                                                        fmt['bgColor'] = f"#{rgb[2:]}"
-                                                else:
-                                                    fmt['bgColor'] = f"#{rgb}" if not rgb.startswith('#') else rgb
-
-                                # Font formatting
-                                if anchor_cell.font:
-                                    if anchor_cell.font.color and hasattr(anchor_cell.font.color, 'rgb') and anchor_cell.font.color.rgb:
-                                        rgb = anchor_cell.font.color.rgb
-                                        if isinstance(rgb, str) and len(rgb) >= 6:
-                                            rgb_upper = rgb.upper()
-                                            skip_font_colors = {'00000000'}
-                                            if rgb_upper not in skip_font_colors:
-                                                if len(rgb) == 8:
-                                                    alpha = rgb[:2].upper()
-                                                    if alpha not in ('00', '01', '02', '03', '04', '05'):
-                                                        fmt['fontColor'] = f"#{rgb[2:]}"
-                                                else:
-                                                    fmt['fontColor'] = f"#{rgb}" if not rgb.startswith('#') else rgb
-
-                                    if anchor_cell.font.bold:
-                                        fmt['bold'] = True
-                                    if anchor_cell.font.italic:
-                                        fmt['italic'] = True
-                                    if anchor_cell.font.underline:
-                                        fmt['underline'] = True
-                                    if anchor_cell.font.size:
-                                        fmt['fontSize'] = anchor_cell.font.size
-
-                            # Mark as merged cell (so frontend can hide content or handle differently)
-                            fmt['isMerged'] = True
-                            fmt['mergeAnchor'] = f"{anchor_datagrid_row}_{anchor_col}"
-                        else:
-                            # This IS the anchor cell - mark it explicitly so frontend can identify it
-                            # Even if it has no other formatting, we need to mark it as an anchor
-                            # so the frontend can calculate the span width
-                            if not fmt:
-                                fmt = {}
-                            fmt['isAnchor'] = True
-
-                    # Only add to formatting dict if we found any formatting
-                    if fmt:
-                        # Key format: "dataGridRowIdx_excelColIdx"
-                        # row_idx from enumerate is 0-indexed relative to the chunk being processed
-                        # Excel row = start_row + row_idx
-                        # DataGrid row = offset + row_idx (matches __row_id__ in DataFrame)
-                        #
-                        # Example: offset=0, start_row=2 (first DATA row after header)
-                        #   row_idx=0: Excel row 2 → DataGrid row 0
-                        #   row_idx=1: Excel row 3 → DataGrid row 1
-                        #
-                        actual_datagrid_row = offset + row_idx
-                        excel_row = start_row + row_idx
-                        cell_key = f"{actual_datagrid_row}_{col_idx}"
-                        formatting[cell_key] = fmt
-
-                        # Debug logging for FIRST 10 formatted cells to verify correct mapping
-                        if len(formatting) <= 10:
-                            logger.info(
-                                f"✅ Cell formatting: Excel({excel_row},{col_idx}) → "
-                                f"DataGrid({actual_datagrid_row},{col_idx}) → Key='{cell_key}' → {fmt}"
-                            )
-
-                except Exception as cell_error:
-                    # Skip cells that cause errors
-                    continue
-
-        workbook.close()
+        # Keys are "dataGridRow_excelCol": pandas consumes Excel row 1 as the header,
+        # so DataGrid row r (== __row_id__) is Excel row r + 2
+        style_index = excel_style_index_cache.get(file_path).sheet(sheet_name)
+        formatting = style_index.get_formatting(offset, visible_rows)
 
         if formatting:
             logger.info(f"✅ Extracted formatting for {len(formatting)} cells in sheet '{sheet_name}' ({visible_rows} visible rows)")
@@ -5,6 +5,7 @@ Provides gallery view of all citations in a session.
 from flask import Blueprint, jsonify, request
 from datetime import datetime
 from ...core.storage.snippet_database import snippet_db
+from ...core.storage.snippet_records import preview_type
 from ...config.logging import get_logger
 
 logger = get_logger(__name__)
@@ -29,7 +30,7 @@ def get_session_gallery(session_id):
             gallery_items.append({
                 'rid': snippet.get('rid', ''),
                 'title': snippet.get('title', 'Untitled'),
-                'preview_type': _determine_preview_type(metadata, snippet.get('content', '')),
+                'preview_type': snippet.get('preview_type') or preview_type(metadata),
                 'thumbnail': None,  # TODO: Generate thumbnails
                 'metadata': metadata,
                 'relevance_score': None,
@@ -59,29 +60,3 @@ def get_session_gallery(session_id):
     except Exception as e:
         logger.error(f"Error getting gallery for session {session_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
-
-def _determine_preview_type(metadata, content):
-    """Determine the preview type based on metadata and content."""
-    import os
-
-    # Check file extension from source_file
-    source_file = metadata.get('source_file', metadata.get('url', ''))
-
-    if source_file:
-        ext = os.path.splitext(source_file)[1].lower()
-
-        if ext in ['.xlsx', '.xls', '.csv']:
-            return 'excel'
-        elif ext in ['.docx', '.doc']:
-            return 'word'
-        elif ext in ['.pdf']:
-            return 'pdf'
-        elif ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg']:
-            return 'image'
-
-    # Check metadata type
-    if metadata.get('type') == 'metadata_query_result':
-        return 'excel'
-
-    # Default to text
-    return 'text'
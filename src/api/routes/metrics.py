@@ -126,6 +126,134 @@ def check_gates():
         return jsonify({"error": str(e)}), 500
 
 
+@metrics_bp.route('/api/metrics/concurrency', methods=['GET'])
+def get_concurrency_metrics():
+    """Get model call concurrency limit, queue depth and wait-time metrics."""
+    try:
+        from ...core.models.concurrency import model_concurrency_limiter
+        
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            "model_calls": model_concurrency_limiter.get_stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting concurrency metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/tokens', methods=['GET'])
+def get_token_metrics():
+    """Get token usage and cost per pipeline stage and model."""
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            **metrics_service.get_token_usage(hours)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting token metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/trace', methods=['GET'])
+def get_trace_metrics():
+    """Get per-stage latency histograms and recent pipeline traces."""
+    try:
+        from ...core.services.tracing_service import tracing_service
+        
+        trace_id = request.args.get('trace_id')
+        if trace_id:
+            trace = tracing_service.get_trace(trace_id)
+            if not trace:
+                return jsonify({"error": "Trace not found"}), 404
+            return jsonify(trace)
+        
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            "enabled": tracing_service.enabled,
+            "stages": tracing_service.get_stage_stats(),
+            "recent_traces": tracing_service.get_recent_traces(limit)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting trace metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/validation', methods=['GET'])
+def get_validation_metrics():
+    """Get response validation scores over the recent validation history."""
+    try:
+        from ...core.validation.response_validator import validation_chain
+        from ...config.settings import settings
+
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            "mode": settings.VALIDATION_MODE,
+            "history_size": validation_chain.validation_history.maxlen,
+            "statistics": validation_chain.get_validation_statistics()
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting validation metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/responses', methods=['GET'])
+def get_response_metrics():
+    """Get payload size, serialization and compression time per route."""
+    try:
+        from ..response_layer import response_metrics, ORJSON_AVAILABLE, BROTLI_AVAILABLE
+        
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            "json_encoder": "orjson" if ORJSON_AVAILABLE else "stdlib",
+            "brotli_available": BROTLI_AVAILABLE,
+            "routes": response_metrics.get_stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting response metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/translations', methods=['GET'])
+def get_translation_metrics():
+    """Get translation memory hit rates per template kind."""
+    try:
+        from ...core.storage.translation_memory import translation_memory
+        from ...core.taxonomy.taxonomy_handler import taxonomy_handler
+        
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            "translation_memory": translation_memory.get_stats(),
+            "taxonomy_responses": taxonomy_handler.get_cache_stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting translation metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@metrics_bp.route('/api/metrics/memory', methods=['GET'])
+def get_memory_metrics():
+    """Get resident memory of the worker process serving this request."""
+    try:
+        from ..prefork import get_memory_report
+        
+        return jsonify({
+            "timestamp": datetime.utcnow().isoformat(),
+            **get_memory_report()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting memory metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @metrics_bp.route('/api/metrics/session/<session_id>', methods=['GET'])
 def get_session_metrics(session_id):
     """Get metrics for a specific session."""
@@ -4,45 +4,45 @@ Enables seamless conversation transfer between different chatbot interfaces.
 """
 
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 from typing import Dict, List, Optional
 import json
 from src.core.storage.snippet_database import snippet_db
+from src.core.storage.session_store import session_store
 
 session_bp = Blueprint('session', __name__)
 
-# In-memory session storage (replace with Redis/database in production)
-# Structure: {session_id: {"messages": [...], "created_at": datetime, "last_accessed": datetime}}
-session_store: Dict[str, dict] = {}
+# Sessions live in the shared session store (memory, SQLite or Redis backend)
+# Structure: {"messages": [...], "created_at": iso str, "last_accessed": iso str, "metadata": {...}}
+SESSION_NAMESPACE = "chat_session"
 
 # Configuration
 SESSION_EXPIRY_HOURS = 24
-MAX_SESSIONS = 1000
+SESSION_TTL_SECONDS = SESSION_EXPIRY_HOURS * 3600
 MAX_MESSAGES_PER_SESSION = 100
 
 
-def cleanup_old_sessions():
-    """Remove expired sessions from memory."""
-    current_time = datetime.now()
-    expired_sessions = []
-    
-    for session_id, session_data in session_store.items():
-        if current_time - session_data['last_accessed'] > timedelta(hours=SESSION_EXPIRY_HOURS):
-            expired_sessions.append(session_id)
-    
-    for session_id in expired_sessions:
-        del session_store[session_id]
-    
-    # Also cleanup if too many sessions
-    if len(session_store) > MAX_SESSIONS:
-        # Remove oldest sessions
-        sorted_sessions = sorted(
-            session_store.items(),
-            key=lambda x: x[1]['last_accessed']
-        )
-        for session_id, _ in sorted_sessions[:len(session_store) - MAX_SESSIONS]:
-            del session_store[session_id]
+def cleanup_old_sessions() -> int:
+    """Remove expired sessions. Expiry and the session cap are enforced by the store."""
+    return session_store.cleanup()
+
+
+def new_session(metadata: Optional[dict] = None) -> dict:
+    """Build an empty session record."""
+    now = datetime.now().isoformat()
+    return {
+        'messages': [],
+        'created_at': now,
+        'last_accessed': now,
+        'metadata': metadata or {}
+    }
+
+
+def save_session(session_id: str, session: dict) -> None:
+    """Write a session record back to the store."""
+    session['last_accessed'] = datetime.now().isoformat()
+    session_store.set(SESSION_NAMESPACE, session_id, session, ttl=SESSION_TTL_SECONDS)
 
 
 def generate_session_id() -> str:
@@ -60,16 +60,7 @@ def create_session():
         session_id = generate_session_id()
         
         # Initialize session
-        session_store[session_id] = {
-            'messages': [],
-            'created_at': datetime.now(),
-            'last_accessed': datetime.now(),
-            'metadata': request.json.get('metadata', {}) if request.json else {}
-        }
-        
-        # Cleanup old sessions periodically
-        if len(session_store) % 10 == 0:
-            cleanup_old_sessions()
+        save_session(session_id, new_session(request.json.get('metadata', {}) if request.json else {}))
         
         return jsonify({
             'success': True,
@@ -91,21 +82,22 @@ def get_session_messages(session_id: str):
     Used when transitioning from widget to full page.
     """
     try:
-        if session_id not in session_store:
+        session = session_store.get(SESSION_NAMESPACE, session_id)
+        if session is None:
             return jsonify({
                 'success': False,
                 'error': 'Session not found or expired'
             }), 404
         
         # Update last accessed time
-        session_store[session_id]['last_accessed'] = datetime.now()
+        save_session(session_id, session)
         
         return jsonify({
             'success': True,
             'session_id': session_id,
-            'messages': session_store[session_id]['messages'],
-            'created_at': session_store[session_id]['created_at'].isoformat(),
-            'message_count': len(session_store[session_id]['messages'])
+            'messages': session['messages'],
+            'created_at': session['created_at'],
+            'message_count': len(session['messages'])
         }), 200
         
     except Exception as e:
@@ -122,14 +114,8 @@ def add_session_message(session_id: str):
     Called whenever a user sends a query or receives a response.
     """
     try:
-        if session_id not in session_store:
-            # Auto-create session if it doesn't exist
-            session_store[session_id] = {
-                'messages': [],
-                'created_at': datetime.now(),
-                'last_accessed': datetime.now(),
-                'metadata': {}
-            }
+        # Auto-create session if it doesn't exist
+        session = session_store.get(SESSION_NAMESPACE, session_id) or new_session()
         
         data = request.json
         if not data or 'message' not in data:
@@ -147,20 +133,15 @@ def add_session_message(session_id: str):
             'metadata': data.get('metadata', {})
         }
         
-        # Add to session
-        session_store[session_id]['messages'].append(message)
-        session_store[session_id]['last_accessed'] = datetime.now()
-        
-        # Limit messages per session
-        if len(session_store[session_id]['messages']) > MAX_MESSAGES_PER_SESSION:
-            session_store[session_id]['messages'] = \
-                session_store[session_id]['messages'][-MAX_MESSAGES_PER_SESSION:]
+        # Add to session, limiting messages per session
+        session['messages'] = (session['messages'] + [message])[-MAX_MESSAGES_PER_SESSION:]
+        save_session(session_id, session)
         
         return jsonify({
             'success': True,
             'message_id': message['id'],
             'session_id': session_id,
-            'total_messages': len(session_store[session_id]['messages'])
+            'total_messages': len(session['messages'])
         }), 201
         
     except Exception as e:
@@ -183,23 +164,17 @@ def clear_session(session_id: str):
         print(f"Cleared snippets for session: {session_id}")
 
         # Delete old session entirely (not just clear messages)
-        if session_id in session_store:
-            del session_store[session_id]
+        if session_store.delete(SESSION_NAMESPACE, session_id):
             print(f"Deleted session: {session_id}")
 
         # Generate a new session ID
         new_session_id = generate_session_id()
 
         # Create new empty session
-        session_store[new_session_id] = {
-            'messages': [],
-            'created_at': datetime.now(),
-            'last_accessed': datetime.now(),
-            'metadata': {
-                'cleared_from': session_id,
-                'timestamp': datetime.now().isoformat()
-            }
-        }
+        save_session(new_session_id, new_session({
+            'cleared_from': session_id,
+            'timestamp': datetime.now().isoformat()
+        }))
 
         print(f"Created new session: {new_session_id}")
 
@@ -222,10 +197,8 @@ def check_session_exists(session_id: str):
     """
     Check if a session exists and is valid.
     """
-    exists = session_id in session_store
-    
-    if exists:
-        session_store[session_id]['last_accessed'] = datetime.now()
+    # Reading the session refreshes its sliding expiry
+    exists = session_store.exists(SESSION_NAMESPACE, session_id)
     
     return jsonify({
         'success': True,
@@ -241,14 +214,12 @@ def trigger_cleanup():
     Should be called periodically or by admin.
     """
     try:
-        before_count = len(session_store)
-        cleanup_old_sessions()
-        after_count = len(session_store)
+        sessions_removed = cleanup_old_sessions()
         
         return jsonify({
             'success': True,
-            'sessions_removed': before_count - after_count,
-            'active_sessions': after_count
+            'sessions_removed': sessions_removed,
+            'active_sessions': session_store.count(SESSION_NAMESPACE)
         }), 200
         
     except Exception as e:
@@ -3,13 +3,15 @@ Word document viewer routes for the Interactive Reference Visualization system.
 Converts .docx files to HTML using mammoth with formatting preservation.
 Performance target: <500ms for typical Word documents
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, send_file
 import mammoth
 import bleach
 from datetime import datetime
 from pathlib import Path
 import re
 from ...core.storage.snippet_database import snippet_db
+from ...core.storage.render_cache import render_cache
+from ...core.storage.image_store import image_store
 from ...config.logging import get_logger
 from ...config.settings import settings
 
@@ -18,6 +20,9 @@ logger = get_logger(__name__)
 # Create blueprint
 word_viewer_bp = Blueprint('word_viewer', __name__)
 
+# Extracted images are immutable (content-addressed), so clients may cache them for a year
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
 # This will be injected by the app factory
 chat_service = None
 
@@ -30,38 +35,27 @@ def init_word_routes(chat_service_instance):
 def get_word_data(rid):
     """
     Convert Word document to HTML and return with metadata.
+    The conversion (mammoth, sanitization, TOC) is cached per file version and
+    shared across sessions.
     Performance target: <500ms
     """
     try:
         start_time = datetime.now()
 
-        # Get session ID
-        session_id = request.args.get('session_id') or request.headers.get('X-Session-ID')
-        if not session_id:
-            return jsonify({"error": "Session ID required"}), 400
-
-        # Get document metadata
-        snippet_data = snippet_db.get_snippet(session_id, rid)
-        if not snippet_data:
-            return jsonify({"error": "Document not found"}), 404
-
-        # Get file path from metadata
-        source_file = snippet_data.get('metadata', {}).get('source_file', '')
-        if not source_file:
-            return jsonify({"error": "No source file specified"}), 404
+        snippet_data, file_path, error = _get_authorized_document(rid)
+        if error:
+            return error
 
-        # Resolve file path
-        file_path = _resolve_file_path(source_file)
-        if not file_path or not file_path.exists():
-            return jsonify({"error": f"File not found: {source_file}"}), 404
+        # Convert Word to HTML (or reuse the shared render of this file version)
+        rendered = _get_rendered_document(file_path)
 
-        # Convert Word to HTML
-        word_data = _convert_word_to_html(file_path)
-
-        # Add metadata
-        word_data['rid'] = rid
-        word_data['title'] = snippet_data.get('title', file_path.stem)
-        word_data['metadata'] = snippet_data.get('metadata', {})
+        # Add metadata (copy: the rendered document is shared across requests)
+        word_data = {
+            **rendered,
+            'rid': rid,
+            'title': snippet_data.get('title', file_path.stem),
+            'metadata': snippet_data.get('metadata', {})
+        }
 
         # Calculate performance
         duration_ms = (datetime.now() - start_time).total_seconds() * 1000
@@ -74,6 +68,133 @@ def get_word_data(rid):
         logger.error(f"Error converting Word document for {rid}: {str(e)}")
         return jsonify({"error": f"Failed to convert Word document: {str(e)}"}), 500
 
+@word_viewer_bp.route('/api/document/<rid>/word/sections', methods=['GET'])
+def get_word_sections(rid):
+    """
+    Get the document outline for progressive loading: TOC, counts and the list
+    of sections (split at top-level headings), without any section HTML.
+    Sections are then fetched individually from /word/sections/<index>.
+    """
+    try:
+        snippet_data, file_path, error = _get_authorized_document(rid)
+        if error:
+            return error
+
+        rendered = _get_rendered_document(file_path)
+        sections = _get_document_sections(file_path)
+
+        return jsonify({
+            'rid': rid,
+            'title': snippet_data.get('title', file_path.stem),
+            'metadata': snippet_data.get('metadata', {}),
+            'toc': rendered['toc'],
+            'word_count': rendered['word_count'],
+            'page_count': rendered['page_count'],
+            'sections': [
+                {key: section[key] for key in ('index', 'id', 'title', 'level', 'size')}
+                for section in sections
+            ]
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting Word sections for {rid}: {str(e)}")
+        return jsonify({"error": f"Failed to convert Word document: {str(e)}"}), 500
+
+@word_viewer_bp.route('/api/document/<rid>/word/sections/<int:index>', methods=['GET'])
+def get_word_section(rid, index):
+    """Get the HTML of one document section."""
+    try:
+        snippet_data, file_path, error = _get_authorized_document(rid)
+        if error:
+            return error
+
+        sections = _get_document_sections(file_path)
+        if index < 0 or index >= len(sections):
+            return jsonify({"error": "Section not found"}), 404
+
+        section = sections[index]
+        return jsonify({
+            'rid': rid,
+            'index': index,
+            'id': section['id'],
+            'title': section['title'],
+            'html_content': section['html'],
+            'has_more': index + 1 < len(sections)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting Word section {index} for {rid}: {str(e)}")
+        return jsonify({"error": f"Failed to convert Word document: {str(e)}"}), 500
+
+@word_viewer_bp.route('/api/document/image/<digest>', methods=['GET'])
+def get_document_image(digest):
+    """
+    Serve an image extracted from a document.
+
+    Images are addressed by the SHA-256 of their bytes, which is only known to
+    clients that received the document HTML through an authorized request, and
+    which is also a strong ETag: the response never changes for a given URL.
+    """
+    stored = image_store.get(digest)
+    if not stored:
+        return jsonify({"error": "Image not found"}), 404
+
+    path, content_type = stored
+    response = send_file(
+        path,
+        mimetype=content_type,
+        etag=digest,
+        conditional=True,
+        max_age=IMAGE_CACHE_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def prerender_word(file_path: Path) -> None:
+    """Render a Word document into the render cache."""
+    _get_rendered_document(file_path)
+
+def _get_authorized_document(rid: str):
+    """
+    Check the session may see a document and resolve its file.
+    Returns (snippet_data, file_path, None) or (None, None, error_response).
+    """
+    # Get session ID
+    session_id = request.args.get('session_id') or request.headers.get('X-Session-ID')
+    if not session_id:
+        return None, None, (jsonify({"error": "Session ID required"}), 400)
+
+    # Get document metadata
+    snippet_data = snippet_db.get_snippet(session_id, rid)
+    if not snippet_data:
+        return None, None, (jsonify({"error": "Document not found"}), 404)
+
+    # Get file path from metadata
+    source_file = snippet_data.get('metadata', {}).get('source_file', '')
+    if not source_file:
+        return None, None, (jsonify({"error": "No source file specified"}), 404)
+
+    # Resolve file path
+    file_path = _resolve_file_path(source_file)
+    if not file_path or not file_path.exists():
+        return None, None, (jsonify({"error": f"File not found: {source_file}"}), 404)
+
+    return snippet_data, file_path, None
+
+def _get_rendered_document(file_path: Path) -> dict:
+    """Get the shared HTML render of this file version. Callers must not modify it."""
+    rendered, _ = render_cache.get_or_render('word', file_path, lambda: _convert_word_to_html(file_path))
+    return rendered
+
+def _get_document_sections(file_path: Path) -> list:
+    """Get the shared section split of this file version. Callers must not modify it."""
+    sections, _ = render_cache.get_or_render(
+        'word_sections', file_path,
+        lambda: _split_sections(_get_rendered_document(file_path)['html_content'])
+    )
+    return sections
+
 def _resolve_file_path(source_file: str) -> Path:
     """Resolve file path from source file reference."""
     # Try direct path
@@ -101,15 +222,15 @@ def _convert_word_to_html(file_path: Path):
     """
     Convert Word document to HTML using mammoth.
     Includes table of contents extraction and sanitization.
+    Images are written to the content-addressed image store and referenced by
+    URL instead of being inlined as base64.
     """
     try:
         # Convert to HTML
         with open(str(file_path), 'rb') as docx_file:
             result = mammoth.convert_to_html(
                 docx_file,
-                convert_image=mammoth.images.inline(lambda image: {
-                    'src': f'data:{image.content_type};base64,{image.data.decode("ascii")}'
-                })
+                convert_image=mammoth.images.img_element(_store_image)
             )
 
         html_content = result.value
@@ -144,6 +265,51 @@ def _convert_word_to_html(file_path: Path):
         logger.error(f"Error in Word conversion: {str(e)}")
         raise
 
+def _store_image(image) -> dict:
+    """Store an embedded image and return the img attributes referencing it."""
+    with image.open() as image_bytes:
+        digest = image_store.put(image_bytes.read(), image.content_type)
+    return {'src': f'/api/document/image/{digest}'}
+
+def _split_sections(html: str) -> list:
+    """
+    Split document HTML into sections at its top-level headings.
+
+    Uses the shallowest heading level that yields more than one section. Any
+    content before the first heading becomes an untitled leading section.
+    """
+    headings = [
+        (match.start(), int(match.group(1)), match.group(2), match.group(3))
+        for match in re.finditer(r'<h([1-6]) id="([^"]*)">(.*?)</h\1>', html)
+    ]
+
+    boundaries = []
+    for split_level in range(1, 7):
+        boundaries = [heading for heading in headings if heading[1] <= split_level]
+        if len(boundaries) > 1:
+            break
+
+    sections = []
+    if not boundaries or boundaries[0][0] > 0:
+        sections.append((0, None, '', ''))
+    sections.extend(boundaries)
+
+    result = []
+    for index, (start, level, heading_id, title) in enumerate(sections):
+        end = sections[index + 1][0] if index + 1 < len(sections) else len(html)
+        section_html = html[start:end]
+        if not section_html.strip():
+            continue
+        result.append({
+            'index': len(result),
+            'id': heading_id,
+            'title': re.sub(r'<[^>]+>', '', title),
+            'level': level,
+            'size': len(section_html),
+            'html': section_html
+        })
+    return result
+
 def _sanitize_html(html: str) -> str:
     """
     Sanitize HTML to prevent XSS while preserving document formatting.
@@ -6,6 +6,8 @@ from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
+from ..utils.pattern_engine import PatternEngine
+
 class InquiryType(Enum):
     """Enumeration of inquiry types."""
     GENERAL = "general"
@@ -129,8 +131,15 @@ class DomainConfig:
 class DomainClassifier:
     """Generic domain classifier that works with any configured domain."""
     
+    # Explicit bias terms that boost the bias domain
+    EXPLICIT_BIAS_TERMS = ['bias', 'discrimination', 'racial', 'gender', 'race', 'ethnicity', 'prejudice', 'stereotyping', 'biased', 'minorities']
+    
     def __init__(self, config: DomainConfig = None):
         self.config = config or DomainConfig()
+        # Whole-word keyword sets of every domain, matched in one scan
+        word_keywords = {name: domain_def.keywords for name, domain_def in self.config.domains.items()}
+        word_keywords['explicit_bias'] = self.EXPLICIT_BIAS_TERMS
+        self._pattern_engine = PatternEngine(word_keywords=word_keywords)
     
     def classify_domain(self, query: str) -> str:
         """Classify the domain of a query based on keywords."""
@@ -140,7 +149,7 @@ class DomainClassifier:
     
     def classify_domain_with_confidence(self, query: str) -> List[Tuple[str, float]]:
         """Classify domain with confidence scores, returning top-2 distribution."""
-        query_lower = query.lower()
+        hits = self._pattern_engine.scan(query.lower())
         
         # Count matches for each enabled domain
         domain_scores = {}
@@ -151,9 +160,7 @@ class DomainClassifier:
                 continue
                 
             # Count keyword matches using word boundaries to prevent substring false positives
-            import re
-            matches = sum(1 for keyword in domain_def.keywords 
-                         if re.search(r'\b' + re.escape(keyword) + r'\b', query_lower))
+            matches = hits.count(domain_name)
             total_keywords += len(domain_def.keywords)
             
             if matches > 0:
@@ -163,10 +170,7 @@ class DomainClassifier:
                 
                 # Special boost for explicit bias-related terms
                 if domain_name == 'bias':
-                    explicit_bias_terms = ['bias', 'discrimination', 'racial', 'gender', 'race', 'ethnicity', 'prejudice', 'stereotyping', 'biased', 'minorities']
-                    explicit_matches = sum(1 for term in explicit_bias_terms 
-                                         if re.search(r'\b' + re.escape(term) + r'\b', query_lower))
-                    if explicit_matches > 0:
+                    if hits.has('explicit_bias'):
                         normalized_score *= 1.5  # Boost bias domain when explicit terms present
                 
                 domain_scores[domain_name] = normalized_score
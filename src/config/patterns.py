@@ -6,6 +6,8 @@ import re
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
+from ..utils.pattern_engine import PatternEngine, PatternHits
+
 @dataclass
 class PatternConfig:
     """Configuration for regex patterns used in classification."""
@@ -22,6 +24,9 @@ class PatternConfig:
     # Repository-related patterns
     repository_patterns: List[str] = None
     
+    # Rule-based domain keywords (whole words), checked in this order
+    domain_keywords: Dict[str, List[str]] = None
+    
     def __post_init__(self):
         """Initialize default patterns if not provided."""
         if self.override_patterns is None:
@@ -74,6 +79,16 @@ class PatternConfig:
                 r"what (kind of|types of|is in|does it contain)",
                 r"tell me about (the repository|this database|how to use)"
             ]
+        
+        if self.domain_keywords is None:
+            self.domain_keywords = {
+                'BIAS': ['bias', 'discrimination', 'unfair', 'prejudice', 'racial', 'gender', 'stereotyp'],
+                'SAFETY': ['safety', 'danger', 'harm', 'risk', 'accident', 'security'],
+                'PRIVACY': ['privacy', 'data', 'surveillance', 'monitoring', 'personal information'],
+                'SOCIOECONOMIC': ['employment', 'job', 'economic', 'unemployment', 'automation'],  # Removed "work" to prevent false positives
+                'GOVERNANCE': ['regulation', 'policy', 'governance', 'legal', 'law', 'compliance', 'oversight'],
+                'TECHNICAL': ['algorithm', 'performance', 'accuracy', 'reliability', 'technical', 'robust', 'network', 'networks', 'neural', 'input', 'inputs']
+            }
 
 class PatternMatcher:
     """Helper class for pattern matching operations."""
@@ -82,38 +97,51 @@ class PatternMatcher:
         self.config = config
         self._compiled_patterns = self._compile_patterns()
     
-    def _compile_patterns(self) -> Dict[str, List[re.Pattern]]:
-        """Pre-compile all regex patterns for better performance."""
-        return {
-            'override': [re.compile(pattern, re.IGNORECASE) for pattern in self.config.override_patterns],
-            'employment': [re.compile(pattern, re.IGNORECASE) for pattern in self.config.employment_patterns],
-            'risk': [re.compile(pattern, re.IGNORECASE) for pattern in self.config.risk_patterns],
-            'repository': [re.compile(pattern, re.IGNORECASE) for pattern in self.config.repository_patterns]
-        }
+    def _compile_patterns(self) -> PatternEngine:
+        """Pre-compile all patterns into one engine, scanned once per text."""
+        return PatternEngine(
+            patterns={
+                'override': self.config.override_patterns,
+                'employment': self.config.employment_patterns,
+                'risk': self.config.risk_patterns,
+                'repository': self.config.repository_patterns,
+                'ai_context': [r"\bai\b", r"artificial intelligence"]
+            },
+            word_keywords={f"domain:{domain}": keywords for domain, keywords in self.config.domain_keywords.items()},
+            flags=re.IGNORECASE
+        )
+    
+    def scan(self, text: str) -> PatternHits:
+        """Every pattern category hit in text (memoized)."""
+        return self._compiled_patterns.scan(text)
     
     def matches_override_patterns(self, text: str) -> bool:
         """Check if text matches any override attempt patterns."""
-        return any(pattern.search(text) for pattern in self._compiled_patterns['override'])
+        return self.scan(text).has('override')
     
     def matches_employment_patterns(self, text: str) -> bool:
         """Check if text matches any employment-related patterns."""
-        return any(pattern.search(text) for pattern in self._compiled_patterns['employment'])
+        return self.scan(text).has('employment')
     
     def matches_risk_patterns(self, text: str) -> bool:
         """Check if text matches any risk-related patterns."""
-        return any(pattern.search(text) for pattern in self._compiled_patterns['risk'])
+        return self.scan(text).has('risk')
     
     def matches_repository_patterns(self, text: str) -> bool:
         """Check if text matches any repository-related patterns."""
-        return any(pattern.search(text) for pattern in self._compiled_patterns['repository'])
+        return self.scan(text).has('repository')
     
     def has_ai_context(self, text: str) -> bool:
         """Check if text contains AI-related context."""
-        ai_patterns = [
-            re.compile(r"\bai\b", re.IGNORECASE),
-            re.compile(r"artificial intelligence", re.IGNORECASE)
-        ]
-        return any(pattern.search(text) for pattern in ai_patterns)
+        return self.scan(text).has('ai_context')
+    
+    def match_domain_keywords(self, text: str) -> Optional[str]:
+        """First domain (in configured order) with a whole-word keyword in text."""
+        hits = self.scan(text)
+        for domain in self.config.domain_keywords:
+            if hits.has(f"domain:{domain}"):
+                return domain
+        return None
 
 # Default pattern configuration
 DEFAULT_PATTERN_CONFIG = PatternConfig()
@@ -28,6 +28,30 @@ class Settings:
     ALLOWED_PORTS = [8090, 8080, 8000, 3000]
     DEBUG = os.environ.get('DEBUG', 'true').lower() == 'true'
     
+    # Serving mode: 'wsgi' (Flask dev server / thread per request), 'asgi'
+    # (uvicorn, chat endpoints awaited on the event loop; see src/api/asgi.py) or
+    # 'prefork' (gunicorn, corpus preloaded once and shared; see src/api/prefork.py)
+    SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+    ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', 1))
+    ASGI_STREAM_CHUNK_DELAY = 0.05  # seconds between streamed chunks (matches the WSGI stream)
+    
+    # CORS (Flask routes via flask_cors; native ASGI chat handlers via src/api/asgi.py)
+    CORS_ORIGINS = [
+        "*",  # Allow all origins for testing
+        "https://futuretech.mit.edu",  # Production Webflow site
+        "https://futuretech.webflow.io",  # Webflow staging
+        "https://*.webflow.io",  # Webflow preview domains
+        "https://davidturturean.github.io",  # GitHub Pages hosting
+        "https://*.github.io"  # Any GitHub Pages domain
+    ]
+    CORS_SUPPORTS_CREDENTIALS = True
+    PREFORK_WORKERS = int(os.environ.get('PREFORK_WORKERS', 4))
+    PREFORK_THREADS = int(os.environ.get('PREFORK_THREADS', 4))  # Threads per worker (gthread)
+    PREFORK_TIMEOUT = 300  # seconds; covers the longest model fallback chain
+    PREFORK_PRELOAD = os.environ.get('PREFORK_PRELOAD', 'true').lower() == 'true'  # false: each worker builds its own (baseline)
+    PREFORK_SHARE_METADATA = os.environ.get('PREFORK_SHARE_METADATA', 'true').lower() == 'true'
+    METADATA_SHARED_DB_PATH = DATA_DIR / "metadata_shared.duckdb"  # Built by the master, read-only in workers
+    
     # Model Configuration
     GEMINI_API_KEY: str = os.environ.get('GEMINI_API_KEY', '')
     
@@ -44,7 +68,28 @@ class Settings:
     # Model retry configuration
     MODEL_RETRY_DELAY = 5.0  # seconds between retries
     MODEL_COOLDOWN_TIME = 300  # 5 minutes cooldown for failed models
+    MODEL_RATE_LIMIT_COOLDOWN_TIME = 30  # Short cooldown for per-minute rate limits (daily quota uses MODEL_COOLDOWN_TIME)
     MAX_RETRIES_PER_MODEL = 2
+
+    # Adaptive concurrency for model calls (AIMD limiter + priority queue)
+    MODEL_CONCURRENCY_INITIAL_LIMIT = int(os.environ.get('MODEL_CONCURRENCY_INITIAL_LIMIT', 4))
+    MODEL_CONCURRENCY_MIN_LIMIT = 1
+    MODEL_CONCURRENCY_MAX_LIMIT = int(os.environ.get('MODEL_CONCURRENCY_MAX_LIMIT', 16))
+    MODEL_CONCURRENCY_DECREASE_FACTOR = 0.5  # Multiplicative decrease on 429
+    MODEL_QUEUE_TIMEOUT = 30.0  # seconds a call may wait for a slot
+    MODEL_QUEUE_SHED_THRESHOLD = 8  # queued calls before low-priority work is shed
+    
+    # Pipeline tracing (span ring buffer + per-stage latency histograms)
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+    TRACE_BUFFER_SIZE = 200  # recent traces kept in memory
+    TRACE_OTEL_EXPORT = os.environ.get('TRACE_OTEL_EXPORT', 'false').lower() == 'true'
+    
+    # Response validation: 'sync' validates (and may revise) before the answer is returned;
+    # 'async' returns the answer at once and validates on a background worker
+    VALIDATION_MODE = os.environ.get('VALIDATION_MODE', 'sync').lower()
+    VALIDATION_WORKERS = 2
+    VALIDATION_HISTORY_SIZE = 1000  # recent validations kept for statistics
+    VALIDATION_REVISION_WAIT = 5.0  # seconds a stream waits for a revision the validator is generating
     
     # Model-specific settings
     MODEL_SETTINGS = {
@@ -66,6 +111,9 @@ class Settings:
     }
     
     EMBEDDING_MODEL_NAME = "models/text-embedding-004"
+    EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"  # Persisted embeddings, keyed by model + texts
+    INTENT_REFERENCE_INDEX_PATH = EMBEDDING_CACHE_DIR / "intent_references.npz"
+    INTENT_KNN_K = 3  # Nearest references averaged per category in semantic intent scoring
     
     # Vector Store Configuration
     EMBEDDING_PROVIDER = "google"
@@ -102,6 +150,44 @@ class Settings:
     # Conversation Configuration
     MAX_CONVERSATION_HISTORY = 5
     
+    # Session store configuration (memory | sqlite | redis)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+    SESSION_TTL = 60 * 60 * 24  # 24 hours sliding expiry
+    SESSION_QUERY_TTL = 60 * 60  # 1 hour for the query processor's reset guard
+    SESSION_MAX_ENTRIES = 1000  # LRU cap per namespace
+    SESSION_DB_PATH = DATA_DIR / "sessions.db"
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Excel viewer sidecar cache (parsed once per file version, memory-mapped)
+    EXCEL_SIDECAR_DIR = DATA_DIR / "excel_sidecar"
+    EXCEL_SIDECAR_MAX_OPEN = 32  # Workbooks kept mapped in memory per worker
+    EXCEL_QUERY_MAX_VIEWS = 16  # Sheets kept registered with DuckDB for sort/filter/search
+    
+    # Shared document render cache (keyed by file version + render params, not session)
+    RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    RENDER_CACHE_PERSIST = os.environ.get('RENDER_CACHE_PERSIST', 'true').lower() == 'true'
+    RENDER_CACHE_DIR = DATA_DIR / "render_cache"
+    RENDER_CACHE_MAX_DISK_BYTES = int(os.environ.get('RENDER_CACHE_MAX_DISK_BYTES', 1024 * 1024 * 1024))
+    DOCUMENT_IMAGE_DIR = DATA_DIR / "document_images"  # Content-addressed images extracted from documents
+    RENDER_CACHE_WARMUP = os.environ.get('RENDER_CACHE_WARMUP', 'true').lower() == 'true'
+    RENDER_CACHE_WARMUP_FILES = [
+        INFO_FILES_DIR / "The_AI_Risk_Repository_V3_26_03_2025.xlsx",
+        INFO_FILES_DIR / "AI_Risk_Repository_Preprint.docx"
+    ]
+    
+    # Translation memory for static templates (taxonomy, out-of-scope, errors, refinement)
+    TRANSLATION_MEMORY_PERSIST = os.environ.get('TRANSLATION_MEMORY_PERSIST', 'true').lower() == 'true'
+    TRANSLATION_MEMORY_DB = DATA_DIR / "translation_memory.db"
+    TRANSLATION_MEMORY_MAX_ENTRIES = int(os.environ.get('TRANSLATION_MEMORY_MAX_ENTRIES', 20000))
+    TRANSLATION_PREWARM_LANGUAGES = int(os.environ.get('TRANSLATION_PREWARM_LANGUAGES', 10))  # Top N of the languages database
+    
+    # API response layer (fast JSON, ETag/304, gzip/brotli)
+    RESPONSE_COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true'
+    RESPONSE_COMPRESSION_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+    RESPONSE_GZIP_LEVEL = 6
+    RESPONSE_BROTLI_QUALITY = 5  # Used when the brotli package is installed
+    RESPONSE_ETAG_ENABLED = os.environ.get('RESPONSE_ETAG_ENABLED', 'true').lower() == 'true'
+    
     # Monitor Configuration
     MONITOR_MODEL_NAME = "gemini-2.5-flash"
     MONITOR_TIMEOUT = 30  # seconds
@@ -109,6 +195,17 @@ class Settings:
     MONITOR_ENABLE_RULE_BASED = True
     MONITOR_ENABLE_MODEL_BASED = True
     
+    # Local intent model (hashed n-grams + linear classifier, see src/core/query/intent_model.py);
+    # the embedding/Gemini classification only runs when it is less confident than the threshold
+    INTENT_MODEL_ENABLED = os.environ.get('INTENT_MODEL_ENABLED', 'true').lower() == 'true'
+    INTENT_MODEL_PATH = DATA_DIR / "intent_model.npz"  # Built by scripts/train_intent_model.py
+    INTENT_MODEL_CONFIDENCE_THRESHOLD = float(os.environ.get('INTENT_MODEL_CONFIDENCE_THRESHOLD', 0.8))
+    
+    # Local language detection (script + character n-grams, see src/core/services/language_detector.py);
+    # Gemini only runs when it is less confident than the threshold or finds a fun/constructed language
+    LANGUAGE_DETECTOR_ENABLED = os.environ.get('LANGUAGE_DETECTOR_ENABLED', 'true').lower() == 'true'
+    LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD = float(os.environ.get('LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD', 0.9))
+    
     # Vector Store Configuration (additional)
     VECTOR_WEIGHT = 0.7  # Weight for vector search in hybrid retrieval
     KEYWORD_WEIGHT = 0.3  # Weight for keyword search in hybrid retrieval
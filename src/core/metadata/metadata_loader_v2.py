@@ -314,4 +314,10 @@ class FlexibleMetadataLoader:
     def close(self):
         """Close database connection."""
         if self.connection:
-            self.connection.close()
\ No newline at end of file
+            self.connection.close()
+            self.connection = None
+    
+    def open_read_only(self):
+        """Reopen a file-backed database read-only (shared by forked workers)."""
+        self.close()
+        self.connection = duckdb.connect(self.db_path, read_only=True)
\ No newline at end of file
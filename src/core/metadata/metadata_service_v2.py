@@ -10,6 +10,7 @@ from .query_generator import QueryGenerator
 from .semantic_registry import semantic_registry
 from .data_context_builder import DataContextBuilder
 from .response_formatter import ResponseFormatter, ResponseMode
+from ..services.tracing_service import tracing_service
 from ...config.logging import get_logger
 from ...config.settings import settings
 
@@ -117,6 +118,38 @@ class FlexibleMetadataService:
                 logger.error(f"Lazy initialization failed: {e}")
                 return False
 
+    def share_with_workers(self, db_path: Path) -> None:
+        """
+        Load the metadata into a database file in the pre-fork master.
+        
+        The master closes it before forking; each worker then opens the file
+        read-only (reopen_after_fork) instead of parsing every data file into
+        its own in-memory database on its first metadata query.
+        """
+        db_path = Path(db_path)
+        for stale in (db_path, db_path.with_name(db_path.name + '.wal')):
+            stale.unlink(missing_ok=True)
+        
+        self.loader.close()
+        self.loader = FlexibleMetadataLoader(str(db_path))
+        self.initialize(force_reload=True)
+        self.loader.close()
+        self._context_builder = None
+        logger.info(f"Metadata database shared with workers: {db_path}")
+    
+    def reopen_after_fork(self) -> None:
+        """Give a forked worker its own connection (DuckDB connections are not fork-safe)."""
+        if self.loader.db_path == ":memory:":
+            # Nothing shared: start from an empty database and load lazily in this worker
+            self.loader = FlexibleMetadataLoader()
+            self._initialized = False
+            self._data_context = None
+            self._context_builder = None
+            return
+        
+        self.loader.open_read_only()
+        self._context_builder = DataContextBuilder(self.loader.connection)
+    
     def _build_data_context(self):
         """Build comprehensive data context for query generation."""
         logger.info("Building data context for query generation...")
@@ -229,7 +262,8 @@ class FlexibleMetadataService:
                 return "I couldn't understand your query. Please try rephrasing.", []
             
             # Execute query
-            result = self.loader.execute_query(sql_query.sql)
+            with tracing_service.span("db.execute_query", engine="duckdb"):
+                result = self.loader.execute_query(sql_query.sql)
             
             # Convert to list of dicts
             if hasattr(result, 'df'):
@@ -7,6 +7,8 @@ from dataclasses import dataclass
 
 from ...config.logging import get_logger
 from ...config.settings import settings
+from ..models.usage import usage_stage, PipelineStage
+from ..services.tracing_service import tracing_service
 from .column_mapper import column_mapper
 from .data_context_builder import DataContextBuilder
 
@@ -121,7 +123,8 @@ class QueryGenerator:
                 from ...core.models.gemini import GeminiModel
                 self.gemini_model = GeminiModel(settings.GEMINI_API_KEY)
             
-            response = self.gemini_model.generate(prompt)
+            with usage_stage(PipelineStage.SQL_GENERATION), tracing_service.span("sql_generation"):
+                response = self.gemini_model.generate(prompt)
             
             # Parse and validate response
             sql_query = self._parse_sql_response(response, available_schemas)
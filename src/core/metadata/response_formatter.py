@@ -11,6 +11,7 @@ from collections import Counter, defaultdict
 
 from ...config.logging import get_logger
 from ...config.settings import settings
+from ...utils.pattern_engine import PatternEngine
 
 logger = get_logger(__name__)
 
@@ -74,41 +75,41 @@ class ResponseFormatter:
         self.mode = mode
         self._query_patterns = self._init_query_patterns()
         
-    def _init_query_patterns(self) -> Dict[QueryType, List[re.Pattern]]:
-        """Initialize patterns for query type detection."""
-        return {
-            QueryType.COUNT: [
-                re.compile(r'how many', re.I),
-                re.compile(r'count.*?(?:of|the|all)', re.I),
-                re.compile(r'total number', re.I),
-                re.compile(r'number of', re.I)
+    def _init_query_patterns(self) -> PatternEngine:
+        """Initialize patterns for query type detection (one alternation per query type)."""
+        return PatternEngine(patterns={
+            QueryType.COUNT.value: [
+                r'how many',
+                r'count.*?(?:of|the|all)',
+                r'total number',
+                r'number of'
             ],
-            QueryType.LIST: [
-                re.compile(r'list (?:all |the )?', re.I),
-                re.compile(r'show (?:all |me |the )?', re.I),
-                re.compile(r'what are (?:all |the )?', re.I),
-                re.compile(r'give me (?:all |the )?', re.I)
+            QueryType.LIST.value: [
+                r'list (?:all |the )?',
+                r'show (?:all |me |the )?',
+                r'what are (?:all |the )?',
+                r'give me (?:all |the )?'
             ],
-            QueryType.DETAIL: [
-                re.compile(r'show (?:me )?(?:details|info|information)', re.I),
-                re.compile(r'tell me about', re.I),
-                re.compile(r'describe', re.I),
-                re.compile(r'explain', re.I)
+            QueryType.DETAIL.value: [
+                r'show (?:me )?(?:details|info|information)',
+                r'tell me about',
+                r'describe',
+                r'explain'
             ],
-            QueryType.AGGREGATE: [
-                re.compile(r'group by', re.I),
-                re.compile(r'by (?:category|domain|type|entity)', re.I),
-                re.compile(r'breakdown', re.I),
-                re.compile(r'distribution', re.I),
-                re.compile(r'count.*?by\s+\w+', re.I)  # "count X by Y"
+            QueryType.AGGREGATE.value: [
+                r'group by',
+                r'by (?:category|domain|type|entity)',
+                r'breakdown',
+                r'distribution',
+                r'count.*?by\s+\w+'  # "count X by Y"
             ],
-            QueryType.SEARCH: [
-                re.compile(r'find.*?(?:with|where|that)', re.I),
-                re.compile(r'search for', re.I),
-                re.compile(r'filter.*?by', re.I),
-                re.compile(r'risks? (?:in|from|about)', re.I)
+            QueryType.SEARCH.value: [
+                r'find.*?(?:with|where|that)',
+                r'search for',
+                r'filter.*?by',
+                r'risks? (?:in|from|about)'
             ]
-        }
+        }, flags=re.I)
     
     def format_response(self, 
                        query: str,
@@ -194,13 +195,12 @@ class ResponseFormatter:
     
     def _detect_query_type(self, query: str) -> QueryType:
         """Detect the type of query from the natural language."""
-        query_lower = query.lower()
+        hits = self._query_patterns.scan(query.lower())
         
-        # Check each pattern type
-        for query_type, patterns in self._query_patterns.items():
-            for pattern in patterns:
-                if pattern.search(query_lower):
-                    return query_type
+        # Check each pattern type, in order
+        for query_type in QueryType:
+            if hits.has(query_type.value):
+                return query_type
         
         return QueryType.UNKNOWN
     
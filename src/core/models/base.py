@@ -4,6 +4,9 @@ Base classes for AI models.
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional, Union, Iterator
 
+# Failed model calls return a text starting with this instead of raising
+MODEL_ERROR_PREFIX = "I encountered an error"
+
 class BaseModel(ABC):
     """Base class for AI models."""
     
@@ -0,0 +1,326 @@
+"""
+Adaptive concurrency control and priority queueing for model calls.
+
+All Gemini calls share one project quota, so a single limiter sits in front of
+every GeminiModelPool. The limit follows AIMD: it grows by roughly one slot per
+window of successful calls and is cut multiplicatively on a 429 (once per burst:
+429s of calls that started before the last cut do not cut again). Callers that
+cannot get a slot wait in a priority queue, where user-facing generation is
+served before translation and background classification. When the queue is
+saturated, low-priority work is shed so callers can fall back to rule-based
+paths instead of piling more load onto the API.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Dict, Any, Optional
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+class RequestPriority(IntEnum):
+    """Priority of a model call. Lower values are served first."""
+    GENERATION = 0      # User-facing answer generation
+    TRANSLATION = 1     # Translating user-visible content
+    CLASSIFICATION = 2  # Background intent/domain/language classification
+
+class RequestShedError(Exception):
+    """Raised when a model call is shed or times out waiting for a slot."""
+    pass
+
+class _Waiter:
+    """A queued request waiting for a concurrency slot."""
+    __slots__ = ('priority', 'enqueued_at', 'granted', 'cancelled', 'loop', 'future')
+
+    def __init__(self, priority: RequestPriority, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.enqueued_at = time.time()
+        self.granted = False
+        self.cancelled = False
+        # Set for coroutines waiting in acquire_async; threads wait on the condition
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = loop.create_future() if loop else None
+
+    def wake(self) -> None:
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limiter with a priority wait queue."""
+
+    def __init__(self,
+                 initial_limit: int = None,
+                 min_limit: int = None,
+                 max_limit: int = None,
+                 decrease_factor: float = None,
+                 queue_timeout: float = None,
+                 shed_threshold: int = None,
+                 shed_priority: RequestPriority = RequestPriority.CLASSIFICATION):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Starting number of concurrent model calls
+            min_limit: Lower bound the limit can shrink to
+            max_limit: Upper bound the limit can grow to
+            decrease_factor: Multiplier applied to the limit on a rate-limit error
+            queue_timeout: Seconds a request may wait for a slot
+            shed_threshold: Queue depth at which low-priority requests are shed
+            shed_priority: Requests at or below this priority may be shed
+        """
+        self.min_limit = settings.MODEL_CONCURRENCY_MIN_LIMIT if min_limit is None else min_limit
+        self.max_limit = settings.MODEL_CONCURRENCY_MAX_LIMIT if max_limit is None else max_limit
+        self.decrease_factor = (settings.MODEL_CONCURRENCY_DECREASE_FACTOR if decrease_factor is None
+                                else decrease_factor)
+        self.queue_timeout = settings.MODEL_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.shed_threshold = settings.MODEL_QUEUE_SHED_THRESHOLD if shed_threshold is None else shed_threshold
+        self.shed_priority = shed_priority
+
+        self._limit = float(settings.MODEL_CONCURRENCY_INITIAL_LIMIT if initial_limit is None else initial_limit)
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._queue = []  # heap of (priority, sequence, waiter)
+        self._queued = {priority: 0 for priority in RequestPriority}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+        # Metrics
+        self._wait_times = deque(maxlen=1000)  # (priority, seconds)
+        self._counters = {
+            "granted": 0,
+            "shed": 0,
+            "timed_out": 0,
+            "rate_limited": 0,
+            "rate_limited_ignored": 0,
+            "errors": 0
+        }
+        self._shed_by_priority = {priority: 0 for priority in RequestPriority}
+
+    @property
+    def limit(self) -> int:
+        """Current integer concurrency limit."""
+        return max(self.min_limit, int(self._limit))
+
+    def _queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def _is_saturated_locked(self, priority: RequestPriority) -> bool:
+        return priority >= self.shed_priority and self._queue_depth() >= self.shed_threshold
+
+    def should_shed(self, priority: RequestPriority) -> bool:
+        """
+        Check whether a request at this priority would be shed right now.
+
+        Callers with a cheap non-model fallback should check this before
+        building a prompt, so they can degrade without touching the queue.
+        """
+        with self._cond:
+            return self._is_saturated_locked(priority)
+
+    def acquire(self, priority: RequestPriority = RequestPriority.GENERATION,
+                timeout: Optional[float] = None) -> float:
+        """
+        Acquire a concurrency slot, waiting in the priority queue if needed.
+
+        Args:
+            priority: Priority of the request
+            timeout: Maximum seconds to wait (defaults to queue_timeout)
+
+        Returns:
+            Seconds spent waiting for the slot
+
+        Raises:
+            RequestShedError: If the request was shed or timed out
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        with self._cond:
+            if self._try_acquire_locked(priority):
+                return 0.0
+
+            waiter = self._enqueue_locked(priority)
+            deadline = waiter.enqueued_at + timeout
+
+            while not waiter.granted:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    waiter.cancelled = True
+                    self._queued[priority] -= 1
+                    self._counters["timed_out"] += 1
+                    logger.warning(f"{priority.name} model call timed out after {timeout:.1f}s in queue")
+                    raise RequestShedError(f"Timed out after {timeout:.1f}s waiting for a model slot")
+                self._cond.wait(remaining)
+
+            waited = time.time() - waiter.enqueued_at
+            self._record_grant(priority, waited)
+            return waited
+
+    async def acquire_async(self, priority: RequestPriority = RequestPriority.GENERATION,
+                            timeout: Optional[float] = None) -> float:
+        """
+        Acquire a concurrency slot from a coroutine.
+
+        Same queueing, shedding and timeout behaviour as acquire(), but the
+        caller awaits the grant instead of blocking its thread, so it shares
+        the queue fairly with threaded callers.
+
+        Returns:
+            Seconds spent waiting for the slot
+
+        Raises:
+            RequestShedError: If the request was shed or timed out
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        with self._cond:
+            if self._try_acquire_locked(priority):
+                return 0.0
+            waiter = self._enqueue_locked(priority, asyncio.get_running_loop())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._cond:
+                if waiter.granted:
+                    # Granted just as we gave up: hand the slot back
+                    self._in_flight = max(0, self._in_flight - 1)
+                    self._dispatch_locked()
+                else:
+                    waiter.cancelled = True
+                    self._queued[priority] -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    self._counters["timed_out"] += 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.warning(f"{priority.name} model call timed out after {timeout:.1f}s in queue")
+            raise RequestShedError(f"Timed out after {timeout:.1f}s waiting for a model slot")
+
+        waited = time.time() - waiter.enqueued_at
+        with self._cond:
+            self._record_grant(priority, waited)
+        return waited
+
+    def _try_acquire_locked(self, priority: RequestPriority) -> bool:
+        """Shed the request or take a free slot if nobody is queued ahead of it."""
+        if self._is_saturated_locked(priority):
+            self._counters["shed"] += 1
+            self._shed_by_priority[priority] += 1
+            logger.warning(f"Shedding {priority.name} model call "
+                           f"(queue depth {self._queue_depth()} >= {self.shed_threshold})")
+            raise RequestShedError(f"Model request queue saturated, shed {priority.name.lower()} request")
+
+        # Fast path: free slot and nobody ahead of us
+        if not self._queue_depth() and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._record_grant(priority, 0.0)
+            return True
+        return False
+
+    def _enqueue_locked(self, priority: RequestPriority,
+                        loop: Optional[asyncio.AbstractEventLoop] = None) -> _Waiter:
+        waiter = _Waiter(priority, loop)
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._queued[priority] += 1
+        return waiter
+
+    def release(self, rate_limited: bool = False, error: bool = False,
+                started_at: Optional[float] = None) -> None:
+        """
+        Release a slot and adapt the limit based on the call outcome.
+
+        Args:
+            rate_limited: The call hit a 429/quota error
+            error: The call failed for another reason (limit is left unchanged)
+            started_at: When the call got its slot; a 429 of a call that started
+                before the last decrease was sent under the old limit and does
+                not decrease it again
+        """
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+
+            if rate_limited:
+                self._counters["rate_limited"] += 1
+                if started_at is not None and started_at < self._last_decrease:
+                    self._counters["rate_limited_ignored"] += 1
+                else:
+                    old_limit = self.limit
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease = time.time()
+                    logger.warning(f"Rate limited - concurrency limit {old_limit} → {self.limit}")
+            elif error:
+                self._counters["errors"] += 1
+            else:
+                # Additive increase: about one extra slot per full window of successes
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+
+            self._dispatch_locked()
+
+    def _dispatch_locked(self) -> None:
+        """Hand free slots to the highest-priority waiters."""
+        granted_any = False
+        while self._queue and self._in_flight < self.limit:
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self._queued[waiter.priority] -= 1
+            self._in_flight += 1
+            waiter.wake()
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def _record_grant(self, priority: RequestPriority, waited: float) -> None:
+        self._counters["granted"] += 1
+        self._wait_times.append((priority, waited))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait-time and adaptation metrics."""
+        with self._cond:
+            wait_times = list(self._wait_times)
+            stats = {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queue_depth(),
+                "queue_depth_by_priority": {p.name.lower(): n for p, n in self._queued.items()},
+                "shed_threshold": self.shed_threshold,
+                "shed_by_priority": {p.name.lower(): n for p, n in self._shed_by_priority.items()},
+                **self._counters
+            }
+
+        stats["wait_time_ms"] = self._summarize_waits([w for _, w in wait_times])
+        stats["wait_time_ms_by_priority"] = {
+            p.name.lower(): self._summarize_waits([w for prio, w in wait_times if prio == p])
+            for p in RequestPriority
+        }
+        return stats
+
+    @staticmethod
+    def _summarize_waits(waits) -> Dict[str, float]:
+        if not waits:
+            return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(waits)
+        def pct(p):
+            return ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+        return {
+            "count": len(ordered),
+            "avg": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50": round(pct(0.50), 2),
+            "p95": round(pct(0.95), 2),
+            "max": round(ordered[-1] * 1000, 2)
+        }
+
+# Shared limiter for every model pool (they all draw from the same API quota)
+model_concurrency_limiter = AdaptiveConcurrencyLimiter()
@@ -1,12 +1,15 @@
 """
 Gemini model implementation with automatic quota fallback.
 """
+import time
 import google.generativeai as genai
 from typing import List, Dict, Any, Optional, Iterator
 import mimetypes
 
 from .base import BaseModel
 from .gemini_pool import GeminiModelPool
+from .concurrency import RequestPriority
+from .usage import record_model_usage
 from ...config.logging import get_logger
 from ...config.settings import settings
 
@@ -65,28 +68,34 @@ class GeminiModel(BaseModel):
             
             logger.info(f"Initialized Gemini single model: {self.model_name}")
     
-    def generate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> str:
+    def generate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                 priority: RequestPriority = RequestPriority.GENERATION) -> str:
         """
         Generate a response to the given prompt.
         
         Args:
             prompt: Input prompt
             history: Conversation history
+            priority: Queue priority for the call (only used with the model pool)
             
         Returns:
             Generated response text
+            
+        Raises:
+            RequestShedError: If the pool shed the call or it timed out in the queue
         """
         logger.info(f"🎯 GeminiModel.generate() called, model_pool exists: {self.model_pool is not None}")
         if self.model_pool:
             # Use model pool with automatic fallback
             logger.info(f"🎯 Using model pool for generation")
-            return self.model_pool.generate(prompt, history)
+            return self.model_pool.generate(prompt, history, priority)
         else:
             # Use single model (legacy mode)
             logger.info(f"🎯 Using single model (legacy mode): {self.model_name}")
             try:
                 model = genai.GenerativeModel(model_name=self.model_name)
                 
+                call_start = time.time()
                 if history:
                     chat = model.start_chat(history=history)
                     response = chat.send_message(prompt)
@@ -94,6 +103,8 @@ class GeminiModel(BaseModel):
                     response = model.generate_content(prompt)
                 
                 if hasattr(response, 'text'):
+                    record_model_usage(self.model_name, response, prompt, response.text,
+                                       int((time.time() - call_start) * 1000), priority)
                     return response.text
                 else:
                     logger.warning(f"No text in response. Full response: {response}")
@@ -103,20 +114,63 @@ class GeminiModel(BaseModel):
                 logger.error(f"Error generating response: {str(e)}")
                 return ""
     
-    def generate_stream(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> Iterator[str]:
+    async def agenerate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                        priority: RequestPriority = RequestPriority.GENERATION) -> str:
+        """
+        Generate a response without blocking a thread (for the async serving mode).
+        
+        Args:
+            prompt: Input prompt
+            history: Conversation history
+            priority: Queue priority for the call (only used with the model pool)
+            
+        Returns:
+            Generated response text
+            
+        Raises:
+            RequestShedError: If the pool shed the call or it timed out in the queue
+        """
+        if self.model_pool:
+            return await self.model_pool.agenerate(prompt, history, priority)
+        
+        # Single model (legacy mode)
+        try:
+            model = genai.GenerativeModel(model_name=self.model_name)
+            
+            call_start = time.time()
+            if history:
+                chat = model.start_chat(history=history)
+                response = await chat.send_message_async(prompt)
+            else:
+                response = await model.generate_content_async(prompt)
+            
+            if hasattr(response, 'text'):
+                record_model_usage(self.model_name, response, prompt, response.text,
+                                   int((time.time() - call_start) * 1000), priority)
+                return response.text
+            logger.warning(f"No text in response. Full response: {response}")
+            return ""
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            return ""
+    
+    def generate_stream(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                        priority: RequestPriority = RequestPriority.GENERATION) -> Iterator[str]:
         """
         Generate a streaming response to the given prompt.
         
         Args:
             prompt: Input prompt
             history: Conversation history
+            priority: Queue priority for the call (only used with the model pool)
             
         Yields:
             Response chunks
         """
         if self.model_pool:
             # Use model pool with automatic fallback
-            yield from self.model_pool.generate_stream(prompt, history)
+            yield from self.model_pool.generate_stream(prompt, history, priority)
         else:
             # Use single model (legacy mode)
             try:
@@ -1,13 +1,17 @@
 """
 Gemini model pool with automatic quota fallback.
 """
+import asyncio
 import time
 from enum import Enum
 import google.generativeai as genai
 from typing import List, Dict, Any, Optional, Iterator
 import mimetypes
 
-from .base import BaseModel
+from .base import BaseModel, MODEL_ERROR_PREFIX
+from .concurrency import model_concurrency_limiter, RequestPriority, RequestShedError
+from .usage import record_model_usage
+from ..services.tracing_service import tracing_service
 from ...config.logging import get_logger
 from ...config.settings import settings
 
@@ -36,6 +40,10 @@ class GeminiModelPool(BaseModel):
         
         # Track failed models and their cooldown times
         self.failed_models = {}  # model_name -> failure_time
+        self.model_cooldowns = {}  # model_name -> cooldown duration in seconds
+        
+        # Shared adaptive concurrency limiter (all pools draw on the same quota)
+        self.limiter = model_concurrency_limiter
         
         # Configure MIME types
         mimetypes.add_type('text/plain', '.txt')
@@ -77,26 +85,41 @@ class GeminiModelPool(BaseModel):
         ]
         return any(indicator in error_lower for indicator in quota_indicators)
     
+    def _is_daily_quota_error(self, error_str: str) -> bool:
+        """Check if a quota error is daily quota exhaustion rather than a per-minute rate limit."""
+        error_lower = error_str.lower()
+        return "perday" in error_lower or "per day" in error_lower or "daily" in error_lower
+    
     def _is_model_available(self, model_name: str) -> bool:
         """Check if a model is available (not in cooldown)."""
         if model_name not in self.failed_models:
             return True
         
         failure_time = self.failed_models[model_name]
-        cooldown_expired = time.time() - failure_time > settings.MODEL_COOLDOWN_TIME
+        cooldown = self.model_cooldowns.get(model_name, settings.MODEL_COOLDOWN_TIME)
+        cooldown_expired = time.time() - failure_time > cooldown
         
         if cooldown_expired:
             # Remove from failed models list
-            del self.failed_models[model_name]
+            self.failed_models.pop(model_name, None)
+            self.model_cooldowns.pop(model_name, None)
             logger.info(f"Model {model_name} cooldown expired, back in rotation")
             return True
         
         return False
     
-    def _mark_model_failed(self, model_name: str):
+    def _mark_model_failed(self, model_name: str, cooldown: Optional[float] = None):
         """Mark a model as failed and put it in cooldown."""
+        cooldown = settings.MODEL_COOLDOWN_TIME if cooldown is None else cooldown
         self.failed_models[model_name] = time.time()
-        logger.warning(f"Model {model_name} marked as failed, cooldown until {time.ctime(time.time() + settings.MODEL_COOLDOWN_TIME)}")
+        self.model_cooldowns[model_name] = cooldown
+        logger.warning(f"Model {model_name} marked as failed, cooldown until {time.ctime(time.time() + cooldown)}")
+    
+    def _quota_cooldown(self, error_str: str) -> float:
+        """Cooldown for a quota error: full cooldown for daily quota, short one for rate limits."""
+        if self._is_daily_quota_error(error_str):
+            return settings.MODEL_COOLDOWN_TIME
+        return settings.MODEL_RATE_LIMIT_COOLDOWN_TIME
     
     def _update_circuit_breaker_state(self):
         """Update circuit breaker state based on current conditions."""
@@ -169,31 +192,75 @@ class GeminiModelPool(BaseModel):
         self._record_circuit_breaker_failure()
         return None
     
-    def _generate_with_model(self, model_name: str, prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> str:
-        """Generate response with a specific model."""
+    def _create_model(self, model_name: str, prompt: str):
+        """Build the GenerativeModel for a chain entry and the prompt to send it."""
+        # Get model settings
+        model_settings = settings.MODEL_SETTINGS.get(model_name, {})
+        
+        # Add thinking mode if supported
+        if model_settings.get("supports_thinking", False):
+            # For thinking models, we can add thinking instructions
+            enhanced_prompt = f"<thinking>\nLet me think about this query step by step to provide the most accurate response from the AI Risk Repository.\n</thinking>\n\n{prompt}"
+        else:
+            enhanced_prompt = prompt
+        
+        # Create model with generation config
+        generation_config = genai.GenerationConfig(
+            max_output_tokens=model_settings.get("max_tokens", 8192),
+            temperature=model_settings.get("temperature", 0.1)
+        )
+        
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=self.safety_settings
+        )
+        return model, enhanced_prompt
+    
+    @staticmethod
+    def _response_text(response) -> str:
+        """Extract the text of a (possibly multi-part) response."""
+        text = str(response)
+        if hasattr(response, 'text'):
+            text = response.text
+        elif hasattr(response, 'candidates') and response.candidates:
+            # Handle multi-part responses
+            candidate = response.candidates[0]
+            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+                text_parts = []
+                for part in candidate.content.parts:
+                    if hasattr(part, 'text'):
+                        text_parts.append(part.text)
+                text = ''.join(text_parts)
+        return text
+    
+    def _raise_generation_error(self, model_name: str, error: Exception) -> None:
+        """Log a failed call and re-raise it, as QuotaExceededError for quota errors."""
+        error_str = str(error)
+        logger.error(f"Error generating response with {model_name}: {error_str}")
+        
+        # Check if it's a quota error
+        logger.info(f"🔍 Checking if quota error: {self._is_quota_error(error_str)}")
+        if self._is_quota_error(error_str):
+            logger.warning(f"Quota exceeded for {model_name}, marking for cooldown")
+            self._mark_model_failed(model_name, self._quota_cooldown(error_str))
+            logger.info(f"🚀 RAISING QuotaExceededError for {model_name}")
+            raise QuotaExceededError(f"Quota exceeded for {model_name}: {error_str}")
+        # For non-quota errors, re-raise as-is
+        logger.info(f"🔍 Not a quota error, re-raising as-is")
+        raise error
+    
+    def _generate_with_model(self, model_name: str, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                             priority: RequestPriority = RequestPriority.GENERATION) -> str:
+        """Generate response with a specific model, holding a concurrency slot for the call."""
+        span_start = time.time()
+        queue_wait = self.limiter.acquire(priority)
+        rate_limited = False
+        failed = False
         try:
-            # Get model settings
-            model_settings = settings.MODEL_SETTINGS.get(model_name, {})
-            
-            # Add thinking mode if supported
-            if model_settings.get("supports_thinking", False):
-                # For thinking models, we can add thinking instructions
-                enhanced_prompt = f"<thinking>\nLet me think about this query step by step to provide the most accurate response from the AI Risk Repository.\n</thinking>\n\n{prompt}"
-            else:
-                enhanced_prompt = prompt
-            
-            # Create model with generation config
-            generation_config = genai.GenerationConfig(
-                max_output_tokens=model_settings.get("max_tokens", 8192),
-                temperature=model_settings.get("temperature", 0.1)
-            )
-            
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=generation_config,
-                safety_settings=self.safety_settings
-            )
+            model, enhanced_prompt = self._create_model(model_name, prompt)
             
+            call_start = time.time()
             if history:
                 chat = model.start_chat(history=history)
                 response = chat.send_message(enhanced_prompt)
@@ -203,46 +270,77 @@ class GeminiModelPool(BaseModel):
             logger.info(f"Successfully generated response using model: {model_name}")
             
             # Handle different response formats
-            if hasattr(response, 'text'):
-                return response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                # Handle multi-part responses
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                    text_parts = []
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text'):
-                            text_parts.append(part.text)
-                    return ''.join(text_parts)
+            text = self._response_text(response)
             
-            return str(response)
+            record_model_usage(model_name, response, enhanced_prompt, text,
+                               int((time.time() - call_start) * 1000), priority)
+            return text
             
         except Exception as e:
-            error_str = str(e)
-            logger.error(f"Error generating response with {model_name}: {error_str}")
+            rate_limited = self._is_quota_error(str(e))
+            failed = not rate_limited
+            self._raise_generation_error(model_name, e)
+        finally:
+            self.limiter.release(rate_limited=rate_limited, error=failed, started_at=span_start + queue_wait)
+            tracing_service.record(
+                "model.generate", span_start,
+                error="rate_limited" if rate_limited else "error" if failed else None,
+                model=model_name, priority=priority.name.lower(),
+                queue_wait_ms=round(queue_wait * 1000, 2)
+            )
+    
+    async def _agenerate_with_model(self, model_name: str, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                                    priority: RequestPriority = RequestPriority.GENERATION) -> str:
+        """Async variant of _generate_with_model: awaits the slot and the API call instead of blocking a thread."""
+        span_start = time.time()
+        queue_wait = await self.limiter.acquire_async(priority)
+        rate_limited = False
+        failed = False
+        try:
+            model, enhanced_prompt = self._create_model(model_name, prompt)
             
-            # Check if it's a quota error
-            logger.info(f"🔍 Checking if quota error: {self._is_quota_error(error_str)}")
-            if self._is_quota_error(error_str):
-                logger.warning(f"Quota exceeded for {model_name}, marking for cooldown")
-                self._mark_model_failed(model_name)
-                logger.info(f"🚀 RAISING QuotaExceededError for {model_name}")
-                raise QuotaExceededError(f"Quota exceeded for {model_name}: {error_str}")
+            call_start = time.time()
+            if history:
+                chat = model.start_chat(history=history)
+                response = await chat.send_message_async(enhanced_prompt)
             else:
-                # For non-quota errors, re-raise as-is
-                logger.info(f"🔍 Not a quota error, re-raising as-is")
-                raise e
+                response = await model.generate_content_async(enhanced_prompt)
+            
+            logger.info(f"Successfully generated response using model: {model_name}")
+            
+            text = self._response_text(response)
+            record_model_usage(model_name, response, enhanced_prompt, text,
+                               int((time.time() - call_start) * 1000), priority)
+            return text
+            
+        except Exception as e:
+            rate_limited = self._is_quota_error(str(e))
+            failed = not rate_limited
+            self._raise_generation_error(model_name, e)
+        finally:
+            self.limiter.release(rate_limited=rate_limited, error=failed, started_at=span_start + queue_wait)
+            tracing_service.record(
+                "model.generate", span_start,
+                error="rate_limited" if rate_limited else "error" if failed else None,
+                model=model_name, priority=priority.name.lower(),
+                queue_wait_ms=round(queue_wait * 1000, 2), mode="async"
+            )
     
-    def generate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> str:
+    def generate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                 priority: RequestPriority = RequestPriority.GENERATION) -> str:
         """
         Generate a response with automatic model fallback.
         
         Args:
             prompt: Input prompt
             history: Conversation history
+            priority: Queue priority for the call (user-facing generation by default)
             
         Returns:
             Generated response text
+            
+        Raises:
+            RequestShedError: If the call was shed or timed out waiting for a slot
         """
         logger.info(f"🎯 GeminiModelPool.generate() called with model chain: {self.model_chain}")
         last_error = None
@@ -256,11 +354,15 @@ class GeminiModelPool(BaseModel):
             logger.info(f"Attempt {attempt + 1}: Using model {current_model}")
                 
             try:
-                result = self._generate_with_model(current_model, prompt, history)
+                result = self._generate_with_model(current_model, prompt, history, priority)
                 # Record success for circuit breaker
                 self._record_circuit_breaker_success()
                 return result
                 
+            except RequestShedError:
+                # Load shedding is not a model failure - let the caller degrade
+                raise
+                
             except QuotaExceededError as e:
                 last_error = e
                 logger.info(f"🔥 CAUGHT QuotaExceededError for {current_model}, trying next model...")
@@ -282,10 +384,12 @@ class GeminiModelPool(BaseModel):
                 while retry_count < settings.MAX_RETRIES_PER_MODEL:
                     try:
                         time.sleep(settings.MODEL_RETRY_DELAY)
-                        result = self._generate_with_model(current_model, prompt, history)
+                        result = self._generate_with_model(current_model, prompt, history, priority)
                         # Record success for circuit breaker
                         self._record_circuit_breaker_success()
                         return result
+                    except RequestShedError:
+                        raise
                     except Exception as retry_error:
                         retry_count += 1
                         last_error = retry_error
@@ -296,7 +400,66 @@ class GeminiModelPool(BaseModel):
                 self._record_circuit_breaker_failure()
                 continue
         
-        # If all models failed, provide appropriate error message
+        return self._all_models_failed_response(last_error)
+    
+    async def agenerate(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                        priority: RequestPriority = RequestPriority.GENERATION) -> str:
+        """
+        Generate a response with automatic model fallback, without blocking a thread.
+        
+        Same fallback chain, retries and circuit breaker as generate(); the
+        concurrency slot, the API call and retry delays are awaited.
+        
+        Raises:
+            RequestShedError: If the call was shed or timed out waiting for a slot
+        """
+        last_error = None
+        
+        for attempt in range(len(self.model_chain)):
+            current_model = self._get_next_available_model()
+            if not current_model:
+                logger.error(f"No models available on attempt {attempt + 1} - circuit breaker active")
+                break
+            
+            try:
+                result = await self._agenerate_with_model(current_model, prompt, history, priority)
+                self._record_circuit_breaker_success()
+                return result
+                
+            except RequestShedError:
+                raise
+                
+            except QuotaExceededError as e:
+                last_error = e
+                self._record_circuit_breaker_failure()
+                continue
+                
+            except Exception as e:
+                last_error = e
+                if "429" in str(e) or "quota" in str(e).lower():
+                    self._record_circuit_breaker_failure()
+                    continue
+                # For non-quota errors, retry the same model before moving on
+                for retry_count in range(1, settings.MAX_RETRIES_PER_MODEL + 1):
+                    try:
+                        await asyncio.sleep(settings.MODEL_RETRY_DELAY)
+                        result = await self._agenerate_with_model(current_model, prompt, history, priority)
+                        self._record_circuit_breaker_success()
+                        return result
+                    except RequestShedError:
+                        raise
+                    except Exception as retry_error:
+                        last_error = retry_error
+                        logger.warning(f"Retry {retry_count} failed for {current_model}: {str(retry_error)}")
+                
+                self._mark_model_failed(current_model)
+                self._record_circuit_breaker_failure()
+                continue
+        
+        return self._all_models_failed_response(last_error)
+    
+    def _all_models_failed_response(self, last_error: Optional[Exception]) -> str:
+        """User-facing error text once the whole chain has failed."""
         if last_error is None:
             # No models were available (circuit breaker active)
             state_msg = f"Circuit breaker is {self.circuit_breaker_state.value.upper()}"
@@ -307,54 +470,52 @@ class GeminiModelPool(BaseModel):
             error_msg = f"All models in chain failed. Last error: {str(last_error)}"
             logger.error(error_msg)
         
-        return f"I encountered an error while generating a response: {error_msg}"
+        return f"{MODEL_ERROR_PREFIX} while generating a response: {error_msg}"
     
-    def generate_stream(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None) -> Iterator[str]:
+    def generate_stream(self, prompt: str, history: Optional[List[Dict[str, Any]]] = None,
+                        priority: RequestPriority = RequestPriority.GENERATION) -> Iterator[str]:
         """
         Generate a streaming response with automatic model fallback.
         
         Args:
             prompt: Input prompt
             history: Conversation history
+            priority: Queue priority for the call (user-facing generation by default)
             
         Yields:
             Response chunks
         """
         current_model = self._get_next_available_model()
         if not current_model:
-            yield "I encountered an error: No models available"
+            yield f"{MODEL_ERROR_PREFIX}: No models available"
             return
-            
+        
+        span_start = time.time()
         try:
-            # Get model settings
-            model_settings = settings.MODEL_SETTINGS.get(current_model, {})
-            
-            # Add thinking mode if supported
-            if model_settings.get("supports_thinking", False):
-                enhanced_prompt = f"<thinking>\nLet me think about this query step by step to provide the most accurate response from the AI Risk Repository.\n</thinking>\n\n{prompt}"
-            else:
-                enhanced_prompt = prompt
-            
-            # Create model with generation config
-            generation_config = genai.GenerationConfig(
-                max_output_tokens=model_settings.get("max_tokens", 8192),
-                temperature=model_settings.get("temperature", 0.1)
-            )
-            
-            model = genai.GenerativeModel(
-                model_name=current_model,
-                generation_config=generation_config,
-                safety_settings=self.safety_settings
-            )
+            queue_wait = self.limiter.acquire(priority)
+        except RequestShedError as e:
+            yield f"{MODEL_ERROR_PREFIX} while generating a response: {str(e)}"
+            return
+        
+        rate_limited = False
+        failed = False
+        retry_stream = False
+        try:
+            model, enhanced_prompt = self._create_model(current_model, prompt)
             
+            call_start = time.time()
             if history:
                 chat = model.start_chat(history=history)
                 response = chat.send_message(enhanced_prompt, stream=True)
             else:
                 response = model.generate_content(enhanced_prompt, stream=True)
             
+            last_chunk = None
+            output_parts = []
             for chunk in response:
+                last_chunk = chunk
                 if hasattr(chunk, 'text') and chunk.text:
+                    output_parts.append(chunk.text)
                     yield chunk.text
                 elif hasattr(chunk, 'candidates') and chunk.candidates:
                     # Handle multi-part streaming responses
@@ -362,22 +523,42 @@ class GeminiModelPool(BaseModel):
                     if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
                         for part in candidate.content.parts:
                             if hasattr(part, 'text') and part.text:
+                                output_parts.append(part.text)
                                 yield part.text
+            
+            # The final chunk carries usage metadata for the whole stream
+            record_model_usage(current_model, last_chunk, enhanced_prompt, ''.join(output_parts),
+                               int((time.time() - call_start) * 1000), priority)
                     
         except Exception as e:
             error_str = str(e)
             logger.error(f"Error generating streaming response with {current_model}: {error_str}")
 
             if self._is_quota_error(error_str):
-                self._mark_model_failed(current_model)
+                rate_limited = True
+                retry_stream = True
+                self._mark_model_failed(current_model, self._quota_cooldown(error_str))
                 logger.info(f"Quota error with {current_model}, trying next model for streaming...")
-                # This is a recursive call to try the next model.
-                # It's safe because the model is marked as failed, so it won't be picked again in the same cycle.
-                yield from self.generate_stream(prompt, history)
             else:
-                yield f"I encountered an error while generating a response: {error_str}"
+                failed = True
+                yield f"{MODEL_ERROR_PREFIX} while generating a response: {error_str}"
+        finally:
+            # Release before any fallback attempt so the retry doesn't hold two slots
+            self.limiter.release(rate_limited=rate_limited, error=failed, started_at=span_start + queue_wait)
+            tracing_service.record(
+                "model.generate_stream", span_start,
+                error="rate_limited" if rate_limited else "error" if failed else None,
+                model=current_model, priority=priority.name.lower(),
+                queue_wait_ms=round(queue_wait * 1000, 2)
+            )
+        
+        if retry_stream:
+            # This is a recursive call to try the next model.
+            # It's safe because the model is marked as failed, so it won't be picked again in the same cycle.
+            yield from self.generate_stream(prompt, history, priority)
     
-    def generate_response(self, prompt: str, stream: bool = False, history: Optional[List[Dict[str, Any]]] = None):
+    def generate_response(self, prompt: str, stream: bool = False, history: Optional[List[Dict[str, Any]]] = None,
+                          priority: RequestPriority = RequestPriority.GENERATION):
         """
         Legacy method for backward compatibility.
         
@@ -385,14 +566,15 @@ class GeminiModelPool(BaseModel):
             prompt: Input prompt
             stream: Whether to stream the response
             history: Conversation history
+            priority: Queue priority for the call
             
         Returns:
             Response text or generator
         """
         if stream:
-            return self.generate_stream(prompt, history)
+            return self.generate_stream(prompt, history, priority)
         else:
-            return self.generate(prompt, history)
+            return self.generate(prompt, history, priority)
     
     def get_embedding(self, text: str) -> Optional[List[float]]:
         """
@@ -428,11 +610,12 @@ class GeminiModelPool(BaseModel):
             "failed_models": {
                 model: {
                     "failed_at": time.ctime(failure_time),
-                    "cooldown_remaining": max(0, settings.MODEL_COOLDOWN_TIME - (time.time() - failure_time))
+                    "cooldown_remaining": max(0, self.model_cooldowns.get(model, settings.MODEL_COOLDOWN_TIME) - (time.time() - failure_time))
                 }
-                for model, failure_time in self.failed_models.items()
+                for model, failure_time in list(self.failed_models.items())
             },
-            "available_models": [m for m in self.model_chain if self._is_model_available(m)]
+            "available_models": [m for m in self.model_chain if self._is_model_available(m)],
+            "concurrency": self.limiter.get_stats()
         }
 
 class QuotaExceededError(Exception):
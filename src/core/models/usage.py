@@ -0,0 +1,195 @@
+"""
+Per-request token usage accounting for model calls.
+
+A RequestUsage accumulator is bound to the current request through a context
+variable. Every model call records its prompt/output/cached token counts and
+latency into it, tagged with the pipeline stage that made the call. The chat
+routes hand the accumulated usage to MetricsService, which prices it per model
+and persists the per-stage breakdown.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+from .concurrency import RequestPriority
+from ...config.logging import get_logger
+
+logger = get_logger(__name__)
+
+class PipelineStage(Enum):
+    """Chat pipeline stages that make model calls."""
+    CLASSIFICATION = "classification"
+    LANGUAGE_DETECTION = "language_detection"
+    SQL_GENERATION = "sql_generation"
+    GENERATION = "generation"
+    TRANSLATION = "translation"
+    REVISION = "revision"  # Regeneration of an answer the model refused (safety retry)
+
+# Stage assumed for a call made without an explicit stage context
+_PRIORITY_STAGES = {
+    RequestPriority.GENERATION: PipelineStage.GENERATION,
+    RequestPriority.TRANSLATION: PipelineStage.TRANSLATION,
+    RequestPriority.CLASSIFICATION: PipelineStage.CLASSIFICATION,
+}
+
+@dataclass
+class TokenUsage:
+    """Token usage for a single model call."""
+    model: str
+    stage: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: int = 0
+    estimated: bool = False  # True when the API returned no usage metadata
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+class RequestUsage:
+    """Accumulates token usage for all model calls made while serving one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: List[TokenUsage] = []
+
+    def add(self, usage: TokenUsage) -> None:
+        with self._lock:
+            self.calls.append(usage)
+
+    def totals(self) -> Dict[str, int]:
+        """Totals across all calls, in the `tokens` format MetricsService.log_query accepts."""
+        with self._lock:
+            calls = list(self.calls)
+        prompt = sum(c.prompt_tokens for c in calls)
+        output = sum(c.output_tokens for c in calls)
+        return {
+            "input": prompt,
+            "output": output,
+            "cached": sum(c.cached_tokens for c in calls),
+            "total": prompt + output,
+            "calls": len(calls)
+        }
+
+    def by_stage_and_model(self) -> List[Dict[str, Any]]:
+        """Aggregate usage per (stage, model) pair."""
+        with self._lock:
+            calls = list(self.calls)
+
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for call in calls:
+            key = (call.stage, call.model)
+            if key not in groups:
+                groups[key] = {
+                    "stage": call.stage,
+                    "model": call.model,
+                    "prompt_tokens": 0,
+                    "output_tokens": 0,
+                    "cached_tokens": 0,
+                    "latency_ms": 0,
+                    "calls": 0,
+                    "estimated": False
+                }
+            group = groups[key]
+            group["prompt_tokens"] += call.prompt_tokens
+            group["output_tokens"] += call.output_tokens
+            group["cached_tokens"] += call.cached_tokens
+            group["latency_ms"] += call.latency_ms
+            group["calls"] += 1
+            group["estimated"] = group["estimated"] or call.estimated
+        return list(groups.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = [asdict(c) for c in self.calls]
+        return {"totals": self.totals(), "calls": calls}
+
+_current_usage: ContextVar[Optional[RequestUsage]] = ContextVar('request_usage', default=None)
+_current_stage: ContextVar[Optional[PipelineStage]] = ContextVar('pipeline_stage', default=None)
+
+def get_request_usage() -> Optional[RequestUsage]:
+    """Get the usage accumulator for the current request, if tracking is active."""
+    return _current_usage.get()
+
+@contextmanager
+def track_request_usage() -> Iterator[RequestUsage]:
+    """Track token usage for every model call made inside this block."""
+    usage = RequestUsage()
+    _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        # Plain set rather than token reset - streaming generators may finish in another context
+        _current_usage.set(None)
+
+@contextmanager
+def usage_stage(stage: PipelineStage) -> Iterator[None]:
+    """Attribute model calls made inside this block to a pipeline stage."""
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+def current_stage(priority: RequestPriority = RequestPriority.GENERATION) -> PipelineStage:
+    """Stage for a call: the explicit stage context, otherwise inferred from call priority."""
+    return _current_stage.get() or _PRIORITY_STAGES.get(priority, PipelineStage.GENERATION)
+
+def _estimate_tokens(text: str) -> int:
+    # Rough heuristic used only when the API omits usage metadata (~4 chars/token)
+    return max(1, len(text) // 4) if text else 0
+
+def record_model_usage(model_name: str,
+                       response: Any,
+                       prompt: str = "",
+                       output_text: str = "",
+                       latency_ms: int = 0,
+                       priority: RequestPriority = RequestPriority.GENERATION) -> Optional[TokenUsage]:
+    """
+    Record usage for a model call into the current request's accumulator.
+
+    Args:
+        model_name: Model that served the call
+        response: Gemini response (or last stream chunk) carrying usage_metadata
+        prompt: Prompt text, used for estimation if metadata is missing
+        output_text: Generated text, used for estimation if metadata is missing
+        latency_ms: Wall-clock latency of the call
+        priority: Call priority, used to infer the stage when none is set
+
+    Returns:
+        The recorded TokenUsage, or None if no request is being tracked
+    """
+    usage = _current_usage.get()
+    if usage is None:
+        return None
+
+    try:
+        stage = current_stage(priority).value
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is not None and getattr(metadata, 'prompt_token_count', None) is not None:
+            record = TokenUsage(
+                model=model_name,
+                stage=stage,
+                prompt_tokens=int(getattr(metadata, 'prompt_token_count', 0) or 0),
+                output_tokens=int(getattr(metadata, 'candidates_token_count', 0) or 0),
+                cached_tokens=int(getattr(metadata, 'cached_content_token_count', 0) or 0),
+                latency_ms=latency_ms
+            )
+        else:
+            record = TokenUsage(
+                model=model_name,
+                stage=stage,
+                prompt_tokens=_estimate_tokens(prompt),
+                output_tokens=_estimate_tokens(output_text),
+                latency_ms=latency_ms,
+                estimated=True
+            )
+        usage.add(record)
+        return record
+    except Exception as e:
+        logger.debug(f"Failed to record token usage for {model_name}: {e}")
+        return None
@@ -5,13 +5,37 @@ Classifies queries into categories to optimize processing and prevent waste.
 import time
 from typing import Dict, Tuple, Optional, List
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 from ...config.logging import get_logger
 from ...config.settings import settings
+from ...utils.pattern_engine import PatternEngine
+from .intent_model import load_intent_model
+from .reference_index import ReferenceIndex, reference_fingerprint
 
 logger = get_logger(__name__)
 
+# Fixed responses to queries that are not processed; ChatService translates them
+# for non-English sessions through the translation memory
+SPECIFIC_QUESTION_RESPONSE = "Please provide a more specific question about AI risks."
+OUT_OF_SCOPE_RESPONSE = "I can only help with questions about AI risks from the MIT AI Risk Repository."
+TOPIC_SUGGESTION_RESPONSE = "Try asking about AI employment impacts, safety risks, privacy concerns, or bias issues."
+GREETING_RESPONSE = "Hello! I'm here to help you understand AI risks. What would you like to know about AI safety, employment impacts, privacy concerns, or bias issues?"
+THANKS_RESPONSE = "You're welcome! Feel free to ask any questions about AI risks."
+GENERAL_KNOWLEDGE_RESPONSES = [
+    "I specialize in AI risks. Try asking about AI impacts on employment, safety concerns, privacy issues, or algorithmic bias.",
+    "My focus is AI risk analysis. Consider questions about workforce disruption, system failures, data privacy, or discriminatory algorithms.",
+    "I provide AI risk insights. Explore topics like automation impacts, safety incidents, surveillance concerns, or fairness issues.",
+    "The repository covers AI risks. Ask about job displacement, operational hazards, security breaches, or equity challenges.",
+    "I assist with AI risk queries. Topics include economic effects, safety protocols, privacy violations, or bias patterns.",
+    "My expertise is AI risks. Inquire about employment changes, accident risks, data misuse, or algorithmic discrimination.",
+    "I handle AI risk information. Try questions about labor impacts, system safety, information security, or fairness metrics."
+]
+SUGGESTED_RESPONSES = [
+    SPECIFIC_QUESTION_RESPONSE, OUT_OF_SCOPE_RESPONSE, TOPIC_SUGGESTION_RESPONSE,
+    GREETING_RESPONSE, THANKS_RESPONSE, *GENERAL_KNOWLEDGE_RESPONSES
+]
+
 class IntentCategory(Enum):
     """Categories for query intent classification."""
     REPOSITORY_RELATED = "repository_related"
@@ -34,6 +58,13 @@ class IntentResult:
     should_process: bool
     suggested_response: Optional[str] = None
 
+# Categories that are never processed and their responses, as in _check_security_patterns
+BLOCKED_INTENT_RESPONSES = {
+    IntentCategory.JUNK: TOPIC_SUGGESTION_RESPONSE,
+    IntentCategory.OVERRIDE_ATTEMPT: OUT_OF_SCOPE_RESPONSE,
+    IntentCategory.PROFANITY: OUT_OF_SCOPE_RESPONSE,
+}
+
 class IntentClassifier:
     """Lightweight intent classifier using pattern matching and heuristics."""
     
@@ -52,6 +83,10 @@ class IntentClassifier:
         
         # Defer embedding initialization - will happen on first use
         self._embeddings_initialized = False
+        
+        # Local intent model, loaded on first use
+        self._local_model = None
+        self._local_model_loaded = False
     
     def _init_patterns(self):
         """Initialize semantic intent classification with reference embeddings."""
@@ -225,10 +260,48 @@ class IntentClassifier:
             'algorithm', 'model', 'training'
         ]
         
+        # Keyword sets of the rule-based checks, all matched as substrings in one scan
+        self._pattern_engine = PatternEngine(keywords={
+            'junk': self.junk_patterns,
+            'override': self.override_patterns,
+            'metadata': self.metadata_patterns,
+            'technical': self.technical_patterns,
+            'technical_ai_terms': ['ai', 'ml', 'neural', 'model'],
+            'ai_terms': ['ai', 'artificial intelligence', 'machine learning', 'ml', 'algorithm'],
+            'risk_terms': ['risk', 'danger', 'harm', 'threat', 'concern', 'safety', 'impact', 'bias', 'privacy', 'employment'],
+            'taxonomy': self.taxonomy_patterns,
+            'category_phrases': ['main risk categories', 'risk categories', 'main categories'],
+            'category_scope': ['ai risk', 'database', 'repository'],
+            'subdomain': ['subdomain'],
+            'subdomain_domains': ['privacy', 'security', 'discrimination', 'toxicity', 'misinformation',
+                                  'malicious', 'human-computer', 'socioeconomic', 'environmental', 'ai system'],
+            'structure': ['structure', 'categorization'],
+            'structure_scope': ['ai risk', 'risk'],
+            'percentage': ['percentage'],
+            'causal': ['causal'],
+            'causal_terms': ['entity', 'intentionality', 'timing', 'human', 'ai caused', 'pre-deployment', 'post-deployment'],
+            'relevance_high': ['taxonomy', 'causal', 'domain', 'categories', 'classification',
+                               'pre-deployment', 'post-deployment', 'entity', 'intentionality'],
+            'relevance_medium': ['timing', 'risks', 'organize', 'structure', 'framework',
+                                 'discrimination', 'privacy', 'security', 'misinformation'],
+            'taxonomy_concepts': [
+                'domain', 'category', 'taxonomy', 'classification', 'organize',
+                'pre-deployment', 'post-deployment', 'timing', 'entity',
+                'intentional', 'unintentional', 'human', 'ai caused',
+                'discrimination', 'privacy', 'security', 'misinformation',
+                'malicious', 'socioeconomic', 'environmental', 'safety',
+                'percentage', 'statistics', 'how many risks', 'proportion'
+            ]
+        })
+        
         # Initialize embeddings lazily
-        self._category_embeddings = None
+        self._reference_index = None
         self._embedding_model = None
     
+    def _scan(self, query: str):
+        """Scan a query for every keyword set at once (memoized, shared by all checks)."""
+        return self._pattern_engine.scan(query.lower())
+    
     def classify_intent(self, query: str) -> IntentResult:
         """Classify the intent of a user query."""
         logger.debug(f"Classifying intent for query: {query[:100]}...")
@@ -242,12 +315,9 @@ class IntentClassifier:
                 return security_result
             
             # 2. FAST PATH: Check for obvious AI risk queries
-            query_lower = query.lower()
-            ai_risk_keywords = ['ai', 'artificial intelligence', 'machine learning', 'ml', 'algorithm']
-            risk_keywords = ['risk', 'danger', 'harm', 'threat', 'concern', 'safety', 'impact', 'bias', 'privacy', 'employment']
-            
-            has_ai_term = any(term in query_lower for term in ai_risk_keywords)
-            has_risk_term = any(term in query_lower for term in risk_keywords)
+            hits = self._scan(query)
+            has_ai_term = hits.has('ai_terms')
+            has_risk_term = hits.has('risk_terms')
             
             if has_ai_term and has_risk_term:
                 # This is clearly an AI risk query - skip embeddings entirely
@@ -265,7 +335,13 @@ class IntentClassifier:
                 self._log_performance(time.time() - start_time, "taxonomy")
                 return taxonomy_result
             
-            # 4. Semantic similarity classification
+            # 4. Local intent model - no network round-trip when it is confident
+            local_result = self._classify_with_local_model(query)
+            if local_result and local_result.confidence >= settings.INTENT_MODEL_CONFIDENCE_THRESHOLD:
+                self._log_performance(time.time() - start_time, "local_model")
+                return local_result
+            
+            # 5. Semantic similarity classification
             semantic_result = self._classify_by_semantics(query)
             logger.info(f"Semantic classification result: {semantic_result.category} (confidence: {semantic_result.confidence:.2f}, reasoning: {semantic_result.reasoning})")
             
@@ -297,32 +373,29 @@ class IntentClassifier:
     
     def _check_taxonomy_patterns(self, query: str) -> Optional[IntentResult]:
         """Check for taxonomy-specific patterns and semantic relevance."""
-        query_lower = query.lower().strip()
+        hits = self._scan(query)
         
         # Check for strong taxonomy indicators
-        for pattern in self.taxonomy_patterns:
-            if pattern in query_lower:
-                return IntentResult(
-                    category=IntentCategory.TAXONOMY_QUERY,
-                    confidence=0.95,
-                    reasoning=f"Taxonomy pattern detected: {pattern}",
-                    should_process=True
-                )
+        pattern = self._pattern_engine.first_listed(hits, 'taxonomy')
+        if pattern:
+            return IntentResult(
+                category=IntentCategory.TAXONOMY_QUERY,
+                confidence=0.95,
+                reasoning=f"Taxonomy pattern detected: {pattern}",
+                should_process=True
+            )
         
         # Check for domain/category questions
-        if any(phrase in query_lower for phrase in ['main risk categories', 'risk categories', 'main categories']):
-            if 'ai risk' in query_lower or 'database' in query_lower or 'repository' in query_lower:
-                return IntentResult(
-                    category=IntentCategory.TAXONOMY_QUERY,
-                    confidence=0.9,
-                    reasoning="Query about risk categories/taxonomy",
-                    should_process=True
-                )
+        if hits.has('category_phrases') and hits.has('category_scope'):
+            return IntentResult(
+                category=IntentCategory.TAXONOMY_QUERY,
+                confidence=0.9,
+                reasoning="Query about risk categories/taxonomy",
+                should_process=True
+            )
         
         # Special check for subdomain queries
-        if 'subdomain' in query_lower and any(domain in query_lower for domain in 
-            ['privacy', 'security', 'discrimination', 'toxicity', 'misinformation', 
-             'malicious', 'human-computer', 'socioeconomic', 'environmental', 'ai system']):
+        if hits.has('subdomain') and hits.has('subdomain_domains'):
             return IntentResult(
                 category=IntentCategory.TAXONOMY_QUERY,
                 confidence=0.95,
@@ -331,8 +404,7 @@ class IntentClassifier:
             )
         
         # Check for structure/categorization queries
-        if ('structure' in query_lower or 'categorization' in query_lower) and \
-           ('ai risk' in query_lower or 'risk' in query_lower):
+        if hits.has('structure') and hits.has('structure_scope'):
             return IntentResult(
                 category=IntentCategory.TAXONOMY_QUERY,
                 confidence=0.9,
@@ -341,9 +413,7 @@ class IntentClassifier:
             )
         
         # Check for percentage/statistics about causal categories
-        if 'percentage' in query_lower and ('causal' in query_lower or 
-            any(term in query_lower for term in ['entity', 'intentionality', 'timing', 
-                                                   'human', 'ai caused', 'pre-deployment', 'post-deployment'])):
+        if hits.has('percentage') and (hits.has('causal') or hits.has('causal_terms')):
             return IntentResult(
                 category=IntentCategory.TAXONOMY_QUERY,
                 confidence=0.9,
@@ -361,23 +431,20 @@ class IntentClassifier:
                 self._ensure_embeddings_initialized()
             
             # Check if embeddings are available
-            if self._embedding_model is None or not self._category_embeddings:
+            if self._embedding_model is None or self._reference_index is None:
                 # Use keyword-based relevance as primary fallback
                 return self._keyword_taxonomy_relevance(query)
             
             # Get query embedding
-            query_embedding = self._embedding_model.encode([query.lower()])
+            query_embedding = self._get_embedding(query.lower())
             
             # Calculate similarity to taxonomy reference examples
-            if IntentCategory.TAXONOMY_QUERY in self._category_embeddings:
-                taxonomy_embeddings = self._category_embeddings[IntentCategory.TAXONOMY_QUERY]
-                similarities = self._cosine_similarity(query_embedding, taxonomy_embeddings)
+            if query_embedding is not None:
+                max_similarity = self._reference_index.max_similarity(
+                    query_embedding, IntentCategory.TAXONOMY_QUERY.value
+                )
                 
-                # Check if similarities were calculated successfully
-                if similarities is not None and similarities.size > 0:
-                    # Get max similarity score
-                    max_similarity = float(max(similarities[0]))
-                    
+                if max_similarity is not None:
                     # Boost score if query contains specific taxonomy concepts
                     concept_boost = self._get_taxonomy_concept_boost(query.lower())
                     
@@ -395,24 +462,16 @@ class IntentClassifier:
     
     def _keyword_taxonomy_relevance(self, query: str) -> float:
         """Fallback keyword-based taxonomy relevance scoring."""
-        query_lower = query.lower()
+        hits = self._scan(query)
         score = 0.0
         
-        # High-value taxonomy keywords
-        high_value = ['taxonomy', 'causal', 'domain', 'categories', 'classification', 
-                     'pre-deployment', 'post-deployment', 'entity', 'intentionality']
-        
-        # Medium-value keywords
-        medium_value = ['timing', 'risks', 'organize', 'structure', 'framework',
-                       'discrimination', 'privacy', 'security', 'misinformation']
+        # High-value taxonomy keywords, then medium-value ones (added one at a time,
+        # in the same order as before, so the float result is unchanged)
+        for _ in range(hits.count('relevance_high')):
+            score += 0.3
         
-        for keyword in high_value:
-            if keyword in query_lower:
-                score += 0.3
-        
-        for keyword in medium_value:
-            if keyword in query_lower:
-                score += 0.15
+        for _ in range(hits.count('relevance_medium')):
+            score += 0.15
         
         return min(score, 1.0)  # Cap at 1.0
     
@@ -442,26 +501,13 @@ class IntentClassifier:
     
     def contains_taxonomy_concepts(self, query: str) -> bool:
         """Check if query contains taxonomy-related concepts."""
-        query_lower = query.lower()
-        
-        # Taxonomy concept keywords 
-        taxonomy_concepts = [
-            'domain', 'category', 'taxonomy', 'classification', 'organize',
-            'pre-deployment', 'post-deployment', 'timing', 'entity',
-            'intentional', 'unintentional', 'human', 'ai caused',
-            'discrimination', 'privacy', 'security', 'misinformation',
-            'malicious', 'socioeconomic', 'environmental', 'safety',
-            'percentage', 'statistics', 'how many risks', 'proportion'
-        ]
-        
-        # Check for any concept presence
-        for concept in taxonomy_concepts:
-            if concept in query_lower:
-                return True
+        # Check for any taxonomy concept keyword
+        if self._scan(query).has('taxonomy_concepts'):
+            return True
         
         # Only check semantic similarity if embeddings are available
         # Avoid calling check_taxonomy_relevance to prevent potential recursion
-        if self._embedding_model is not None and self._category_embeddings:
+        if self._embedding_model is not None and self._reference_index is not None:
             try:
                 relevance_score = self._keyword_taxonomy_relevance(query)
                 return relevance_score > 0.3  # Lower threshold for concept detection
@@ -481,7 +527,7 @@ class IntentClassifier:
                 confidence=0.9,
                 reasoning="Query too short",
                 should_process=False,
-                suggested_response="Please provide a more specific question about AI risks."
+                suggested_response=SPECIFIC_QUESTION_RESPONSE
             )
         
         # All caps gibberish (but allow legitimate all-caps acronyms)
@@ -491,7 +537,7 @@ class IntentClassifier:
                 confidence=0.85,
                 reasoning="All caps gibberish detected",
                 should_process=False,
-                suggested_response="Please provide a more specific question about AI risks."
+                suggested_response=SPECIFIC_QUESTION_RESPONSE
             )
         
         # Excessive repetition (same word/char repeated many times)
@@ -508,7 +554,7 @@ class IntentClassifier:
                     confidence=0.9,
                     reasoning="Excessive word repetition detected",
                     should_process=False,
-                    suggested_response="Please provide a more specific question about AI risks."
+                    suggested_response=SPECIFIC_QUESTION_RESPONSE
                 )
         
         # Only punctuation or single characters
@@ -518,32 +564,34 @@ class IntentClassifier:
                 confidence=0.95,
                 reasoning="Only punctuation detected",
                 should_process=False,
-                suggested_response="Please provide a more specific question about AI risks."
+                suggested_response=SPECIFIC_QUESTION_RESPONSE
             )
         
+        hits = self._scan(query)
+        
         # Check for override attempts (security)
-        if any(pattern in query_lower for pattern in self.override_patterns):
+        if hits.has('override'):
             return IntentResult(
                 category=IntentCategory.OVERRIDE_ATTEMPT,
                 confidence=0.95,
                 reasoning="Detected override attempt",
                 should_process=False,
-                suggested_response="I can only help with questions about AI risks from the MIT AI Risk Repository."
+                suggested_response=OUT_OF_SCOPE_RESPONSE
             )
         
         # Check for obvious junk/test queries
-        junk_matches = sum(1 for pattern in self.junk_patterns if pattern in query_lower)
+        junk_matches = hits.count('junk')
         if junk_matches > 0 or query_lower in ['hello world']:
             return IntentResult(
                 category=IntentCategory.JUNK,
                 confidence=min(1.0, 0.8 + (junk_matches * 0.1)),
                 reasoning=f"Matches {junk_matches} junk patterns",
                 should_process=False,
-                suggested_response="Try asking about AI employment impacts, safety risks, privacy concerns, or bias issues."
+                suggested_response=TOPIC_SUGGESTION_RESPONSE
             )
         
         # Quick check for metadata queries - require more patterns to reduce false positives
-        metadata_matches = sum(1 for pattern in self.metadata_patterns if pattern in query_lower)
+        metadata_matches = hits.count('metadata')
         if metadata_matches >= 3:  # Need at least 3 patterns for quick match
             return IntentResult(
                 category=IntentCategory.METADATA_QUERY,
@@ -553,8 +601,8 @@ class IntentClassifier:
             )
         
         # Quick check for technical queries - require more patterns to reduce false positives
-        technical_matches = sum(1 for pattern in self.technical_patterns if pattern in query_lower)
-        if technical_matches >= 3 and any(ai_term in query_lower for ai_term in ['ai', 'ml', 'neural', 'model']):
+        technical_matches = hits.count('technical')
+        if technical_matches >= 3 and hits.has('technical_ai_terms'):
             return IntentResult(
                 category=IntentCategory.TECHNICAL_AI_QUERY,
                 confidence=min(0.9, 0.7 + (technical_matches * 0.1)),
@@ -572,7 +620,7 @@ class IntentClassifier:
                 self._ensure_embeddings_initialized()
             
             # Check if embeddings are available
-            if not self._category_embeddings or self._embedding_model is None:
+            if self._reference_index is None or self._embedding_model is None:
                 return self._fallback_classification(query)
             
             # Get query embedding
@@ -580,16 +628,10 @@ class IntentClassifier:
             if query_embedding is None:
                 return self._fallback_classification(query)
             
-            # Calculate similarities to each category
-            similarities = {}
-            for category, category_embedding in self._category_embeddings.items():
-                try:
-                    similarity = self._cosine_similarity(query_embedding, category_embedding)
-                    similarities[category] = float(similarity)  # Ensure it's a scalar
-                    logger.debug(f"Similarity to {category}: {similarity:.3f}")
-                except Exception as e:
-                    logger.warning(f"Failed to compute similarity for {category}: {e}")
-                    similarities[category] = 0.0
+            # Score every category at once: mean similarity of its k nearest references
+            scores = self._reference_index.category_scores(query_embedding, k=settings.INTENT_KNN_K)
+            similarities = {IntentCategory(category): score for category, score in scores.items()}
+            logger.debug(f"Category similarities: { {c.value: round(v, 3) for c, v in similarities.items()} }")
             
             # Find best match
             best_category = max(similarities, key=similarities.get)
@@ -602,6 +644,45 @@ class IntentClassifier:
             logger.warning(f"Semantic classification failed: {e}")
             return self._fallback_classification(query)
     
+    def _classify_with_local_model(self, query: str) -> Optional[IntentResult]:
+        """Classify with the on-box intent model, if one is trained and enabled."""
+        if not settings.INTENT_MODEL_ENABLED:
+            return None
+        if not self._local_model_loaded:
+            self._local_model = load_intent_model(settings.INTENT_MODEL_PATH)
+            self._local_model_loaded = True
+        if self._local_model is None:
+            return None
+        
+        try:
+            label, confidence = self._local_model.predict(query)
+            category = IntentCategory(label)
+        except Exception as e:
+            logger.warning(f"Local intent model failed: {e}")
+            return None
+        
+        reasoning = f"Local intent model: {confidence:.2f}"
+        if category in (IntentCategory.CHIT_CHAT, IntentCategory.GENERAL_KNOWLEDGE):
+            # Same guards and suggested responses as the semantic path
+            result = self._similarity_to_intent_result(query, category, 1.0, {})
+            if result.category == category:
+                return replace(result, confidence=confidence, reasoning=reasoning)
+            return result
+        if category in BLOCKED_INTENT_RESPONSES:
+            return IntentResult(
+                category=category,
+                confidence=confidence,
+                reasoning=reasoning,
+                should_process=False,
+                suggested_response=BLOCKED_INTENT_RESPONSES[category]
+            )
+        return IntentResult(
+            category=category,
+            confidence=confidence,
+            reasoning=reasoning,
+            should_process=True
+        )
+    
     def _ensure_embeddings_initialized(self):
         """Ensure embeddings are initialized, but only once."""
         if not self._embeddings_initialized:
@@ -612,11 +693,10 @@ class IntentClassifier:
     def _initialize_embeddings_with_timeout(self, timeout: float = 5.0):
         """Initialize embeddings with timeout protection."""
         import concurrent.futures
-        import signal
         
         # Initialize to None first
         self._embedding_model = None
-        self._category_embeddings = {}
+        self._reference_index = None
         
         def init_embeddings():
             """Inner function to initialize embeddings."""
@@ -625,32 +705,22 @@ class IntentClassifier:
                 from ...utils.embeddings import google_embedding_service
                 model = google_embedding_service
                 logger.info("Google Embedding Service loaded successfully")
-                
-                category_embeddings = {}
-                for category, reference_texts in self.category_references.items():
-                    if reference_texts:
-                        # Get embeddings for all reference texts at once
-                        embeddings = model.encode(reference_texts)
-                        # Store the average embedding for the category (centroid approach)
-                        import numpy as np
-                        category_embeddings[category] = np.mean(embeddings, axis=0)
-                
-                return model, category_embeddings
+                return model, self._load_or_build_reference_index(model)
             except ImportError:
                 logger.warning("Google Embedding Service not available, embeddings disabled")
-                return None, {}
+                return None, None
             except Exception as e:
                 logger.error(f"Failed to initialize embeddings: {e}")
-                return None, {}
+                return None, None
         
         try:
             # Try to initialize with timeout
             with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
                 future = executor.submit(init_embeddings)
                 try:
-                    model, embeddings = future.result(timeout=timeout)
+                    model, index = future.result(timeout=timeout)
                     self._embedding_model = model
-                    self._category_embeddings = embeddings
+                    self._reference_index = index
                     if model:
                         logger.info("Embeddings initialized successfully")
                     else:
@@ -662,11 +732,28 @@ class IntentClassifier:
             logger.error(f"Error during embedding initialization: {e}")
             logger.info("Will use keyword-based classification as fallback")
     
+    def _load_or_build_reference_index(self, model) -> ReferenceIndex:
+        """Reference index from the embedding cache, embedding the references only if it is stale."""
+        references = {category.value: texts for category, texts in self.category_references.items()}
+        fingerprint = reference_fingerprint(references, settings.EMBEDDING_MODEL_NAME)
+        index = ReferenceIndex.load(settings.INTENT_REFERENCE_INDEX_PATH, fingerprint)
+        if index is not None:
+            logger.info(f"Intent reference index loaded from cache ({len(index.codes)} references)")
+            return index
+        
+        index = ReferenceIndex.build(references, model.encode, fingerprint)
+        try:
+            index.save(settings.INTENT_REFERENCE_INDEX_PATH)
+        except OSError as e:
+            logger.warning(f"Could not cache intent reference index: {e}")
+        logger.info(f"Intent reference index built ({len(index.codes)} references)")
+        return index
+    
     def _initialize_embeddings(self):
         """Initialize category reference embeddings (legacy method for compatibility)."""
         # This method is now called only if lazy initialization is still needed
         # It delegates to the timeout-protected version
-        if self._embedding_model is None and self._category_embeddings == {}:
+        if self._embedding_model is None and self._reference_index is None:
             self._initialize_embeddings_with_timeout()
     
     def _get_embedding(self, text: str):
@@ -692,52 +779,6 @@ class IntentClassifier:
             logger.warning(f"Failed to get embedding for text: {e}")
         return None
     
-    def _cosine_similarity(self, query_embedding, reference_embedding):
-        """Calculate cosine similarity between query and reference embeddings.
-        
-        Args:
-            query_embedding: Query embedding vector (can be 1D or 2D)
-            reference_embedding: Reference embedding vector (can be 1D or 2D)
-        
-        Returns:
-            float: Cosine similarity score between -1 and 1
-        """
-        import numpy as np
-        
-        # Handle None inputs
-        if query_embedding is None or reference_embedding is None:
-            return 0.0
-        
-        # Convert to numpy arrays if needed
-        if not isinstance(query_embedding, np.ndarray):
-            query_embedding = np.array(query_embedding)
-        if not isinstance(reference_embedding, np.ndarray):
-            reference_embedding = np.array(reference_embedding)
-        
-        # Flatten to 1D vectors
-        if len(query_embedding.shape) > 1:
-            query_embedding = query_embedding.flatten()
-        if len(reference_embedding.shape) > 1:
-            reference_embedding = reference_embedding.flatten()
-        
-        # Verify same dimensions
-        if query_embedding.shape[0] != reference_embedding.shape[0]:
-            logger.error(f"Embedding dimension mismatch: query={query_embedding.shape[0]}, ref={reference_embedding.shape[0]}")
-            return 0.0
-        
-        # Calculate cosine similarity
-        dot_product = np.dot(query_embedding, reference_embedding)
-        query_norm = np.linalg.norm(query_embedding)
-        ref_norm = np.linalg.norm(reference_embedding)
-        
-        # Handle zero vectors
-        if query_norm == 0 or ref_norm == 0:
-            return 0.0
-        
-        # Compute similarity (clamp to [-1, 1] to handle numerical errors)
-        similarity = dot_product / (query_norm * ref_norm)
-        return np.clip(similarity, -1.0, 1.0)
-    
     def _similarity_to_intent_result(self, query: str, best_category: IntentCategory, 
                                    best_score: float, all_similarities: dict) -> IntentResult:
         """Convert similarity scores to IntentResult."""
@@ -809,28 +850,19 @@ class IntentClassifier:
                 confidence=confidence,
                 reasoning=f"Semantic similarity to greetings: {best_score:.2f}",
                 should_process=False,
-                suggested_response="Hello! I'm here to help you understand AI risks. What would you like to know about AI safety, employment impacts, privacy concerns, or bias issues?"
+                suggested_response=GREETING_RESPONSE
             )
         
         # Check for general knowledge
         elif best_category == IntentCategory.GENERAL_KNOWLEDGE and confidence >= 0.7:
             import random
-            responses = [
-                "I specialize in AI risks. Try asking about AI impacts on employment, safety concerns, privacy issues, or algorithmic bias.",
-                "My focus is AI risk analysis. Consider questions about workforce disruption, system failures, data privacy, or discriminatory algorithms.",
-                "I provide AI risk insights. Explore topics like automation impacts, safety incidents, surveillance concerns, or fairness issues.",
-                "The repository covers AI risks. Ask about job displacement, operational hazards, security breaches, or equity challenges.",
-                "I assist with AI risk queries. Topics include economic effects, safety protocols, privacy violations, or bias patterns.",
-                "My expertise is AI risks. Inquire about employment changes, accident risks, data misuse, or algorithmic discrimination.",
-                "I handle AI risk information. Try questions about labor impacts, system safety, information security, or fairness metrics."
-            ]
             
             return IntentResult(
                 category=IntentCategory.GENERAL_KNOWLEDGE,
                 confidence=confidence,
                 reasoning=f"Semantic similarity to general topics: {best_score:.2f}",
                 should_process=False,
-                suggested_response=random.choice(responses)
+                suggested_response=random.choice(GENERAL_KNOWLEDGE_RESPONSES)
             )
         
         # Default to repository with lower confidence
@@ -879,7 +911,7 @@ class IntentClassifier:
                 confidence=0.8,
                 reasoning="Simple greeting detection",
                 should_process=False,
-                suggested_response="Hello! I'm here to help you understand AI risks. What would you like to know about AI safety, employment impacts, privacy concerns, or bias issues?"
+                suggested_response=GREETING_RESPONSE
             )
         
         # Check for farewell/thanks
@@ -889,7 +921,7 @@ class IntentClassifier:
                 confidence=0.8,
                 reasoning="Farewell or thanks detected",
                 should_process=False,
-                suggested_response="You're welcome! Feel free to ask any questions about AI risks."
+                suggested_response=THANKS_RESPONSE
             )
         
         # Default to repository-related for safety - we'd rather attempt to answer than reject
@@ -912,6 +944,13 @@ class IntentClassifier:
     def _classify_with_gemini(self, query: str) -> Optional[IntentResult]:
         """Use Gemini for more sophisticated intent classification."""
         try:
+            from ...core.models.concurrency import model_concurrency_limiter, RequestPriority
+            
+            # Skip the LLM entirely when the model queue is saturated - semantic result is used instead
+            if model_concurrency_limiter.should_shed(RequestPriority.CLASSIFICATION):
+                logger.info("Model queue saturated, skipping Gemini intent classification")
+                return None
+            
             if not self.gemini_model:
                 from ...core.models.gemini import GeminiModel
                 self.gemini_model = GeminiModel(settings.GEMINI_API_KEY)
@@ -931,7 +970,7 @@ Query: "{query}"
 Respond with just the category name and confidence (0.0-1.0):
 Format: CATEGORY_NAME confidence"""
             
-            response = self.gemini_model.generate(prompt)
+            response = self.gemini_model.generate(prompt, priority=RequestPriority.CLASSIFICATION)
             
             # Parse response
             parts = response.strip().split()
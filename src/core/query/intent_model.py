@@ -0,0 +1,160 @@
+"""
+On-box intent model: hashed n-gram features with a linear (softmax) classifier.
+
+Replaces the embedding round-trip (and the Gemini call behind it) for the
+queries it is confident about. A query is turned into word unigrams and
+bigrams plus character 3-grams, each hashed (crc32, stable across processes)
+into a fixed number of buckets; scoring is one gather-and-sum over the
+weight rows of the buckets present, well under a millisecond.
+
+Probabilities are calibrated with a single temperature fitted on
+out-of-fold predictions, so `confidence >= threshold` means roughly that
+share of such predictions are correct.
+
+Train and evaluate with scripts/train_intent_model.py.
+"""
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ...config.logging import get_logger
+
+logger = get_logger(__name__)
+
+_TOKEN = re.compile(r"\w+(?:['-]\w+)*")
+
+def extract_features(text: str, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed, L2-normalized n-gram counts of text as (bucket indices, values)."""
+    tokens = _TOKEN.findall(text.lower())
+    grams = [f"w:{token}" for token in tokens]
+    grams += [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f" {token} "
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode('utf-8')) % n_buckets
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = float(np.sqrt((values * values).sum()))
+    if norm:
+        values /= norm
+    return indices, values
+
+class _SparseBatch:
+    """Feature rows of a training set in CSR layout."""
+
+    def __init__(self, texts: Sequence[str], n_buckets: int):
+        rows = [extract_features(text, n_buckets) for text in texts]
+        self.size = len(rows)
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices, _ in rows], out=self.indptr[1:])
+        self.indices = np.concatenate([indices for indices, _ in rows]) if rows else np.empty(0, dtype=np.int32)
+        self.values = np.concatenate([values for _, values in rows]) if rows else np.empty(0, dtype=np.float32)
+        self.row_of = np.repeat(np.arange(self.size), np.diff(self.indptr))
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """X @ weights, shape (rows, classes)."""
+        out = np.zeros((self.size, weights.shape[1]), dtype=np.float64)
+        np.add.at(out, self.row_of, weights[self.indices] * self.values[:, None])
+        return out
+
+    def transpose_dot(self, gradient: np.ndarray, n_buckets: int) -> np.ndarray:
+        """X.T @ gradient, shape (buckets, classes)."""
+        out = np.zeros((n_buckets, gradient.shape[1]), dtype=np.float64)
+        np.add.at(out, self.indices, gradient[self.row_of] * self.values[:, None])
+        return out
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+class LocalIntentModel:
+    """Multinomial logistic regression over hashed n-gram features."""
+
+    def __init__(self, classes: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 temperature: float = 1.0):
+        self.classes = list(classes)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.temperature = float(temperature)
+        self.n_buckets = self.weights.shape[0]
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_buckets: int = 1 << 14,
+              epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4,
+              sample_weights: Optional[Sequence[float]] = None) -> 'LocalIntentModel':
+        """Fit by full-batch gradient descent on the (weighted) cross-entropy."""
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        targets = np.zeros((len(texts), len(classes)))
+        targets[np.arange(len(texts)), [class_index[label] for label in labels]] = 1.0
+        weights_per_sample = np.ones(len(texts)) if sample_weights is None else np.asarray(sample_weights, dtype=np.float64)
+        weights_per_sample = weights_per_sample / weights_per_sample.sum()
+
+        batch = _SparseBatch(texts, n_buckets)
+        weights = np.zeros((n_buckets, len(classes)))
+        bias = np.zeros(len(classes))
+        for _ in range(epochs):
+            probabilities = _softmax(batch.dot(weights) + bias)
+            gradient = (probabilities - targets) * weights_per_sample[:, None]
+            weights -= learning_rate * (batch.transpose_dot(gradient, n_buckets) + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+        return cls(classes, weights, bias)
+
+    def logits(self, text: str) -> np.ndarray:
+        indices, values = extract_features(text, self.n_buckets)
+        return (self.weights[indices] * values[:, None]).sum(axis=0) + self.bias
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        """Calibrated class probabilities, in the order of self.classes."""
+        return _softmax(self.logits(text) / self.temperature)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely class and its calibrated probability."""
+        probabilities = self.predict_proba(text)
+        best = int(np.argmax(probabilities))
+        return self.classes[best], float(probabilities[best])
+
+    def calibrate(self, logits: np.ndarray, labels: Sequence[str]) -> float:
+        """Set the temperature minimizing the NLL of held-out logits; returns it."""
+        class_index = {label: i for i, label in enumerate(self.classes)}
+        targets = np.array([class_index[label] for label in labels])
+        best_temperature, best_nll = 1.0, float('inf')
+        for temperature in np.exp(np.linspace(np.log(0.05), np.log(20.0), 200)):
+            probabilities = _softmax(logits / temperature)
+            nll = -float(np.mean(np.log(probabilities[np.arange(len(targets)), targets] + 1e-12)))
+            if nll < best_nll:
+                best_temperature, best_nll = float(temperature), nll
+        self.temperature = best_temperature
+        return best_temperature
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, classes=np.array(self.classes), weights=self.weights, bias=self.bias,
+                            temperature=np.array(self.temperature))
+
+    @classmethod
+    def load(cls, path: Path) -> 'LocalIntentModel':
+        with np.load(Path(path), allow_pickle=False) as data:
+            return cls([str(c) for c in data['classes']], data['weights'], data['bias'], float(data['temperature']))
+
+def load_intent_model(path: Path) -> Optional[LocalIntentModel]:
+    """The trained model at path, or None if there is none (or it cannot be read)."""
+    if not Path(path).exists():
+        logger.info(f"No local intent model at {path} - using embedding classification")
+        return None
+    try:
+        model = LocalIntentModel.load(path)
+        logger.info(f"Local intent model loaded ({len(model.classes)} classes, T={model.temperature:.2f})")
+        return model
+    except Exception as e:
+        logger.warning(f"Could not load local intent model from {path}: {e}")
+        return None
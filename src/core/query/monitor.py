@@ -8,7 +8,9 @@ from ...config.prompts import prompt_formatter
 from ...config.domains import domain_classifier
 from ...config.settings import settings
 from ...config.logging import get_logger
+from ..models.base import MODEL_ERROR_PREFIX
 from ..models.gemini import GeminiModel
+from ..models.concurrency import model_concurrency_limiter, RequestPriority
 
 logger = get_logger(__name__)
 
@@ -64,6 +66,11 @@ class Monitor:
                         logger.warning("All models in cooldown, skipping LLM classification")
                         raise Exception("All models in cooldown")
                 
+                # Classification is background work - degrade to rules when the model queue is saturated
+                if model_concurrency_limiter.should_shed(RequestPriority.CLASSIFICATION):
+                    logger.warning("Model queue saturated, skipping LLM classification")
+                    raise Exception("Model queue saturated")
+                
                 # Create conversation history using prompt formatter
                 conversation = self.prompt_formatter.build_conversation_history(user_input)
                 
@@ -74,12 +81,13 @@ class Monitor:
                 logger.info(f"🎯 Monitor calling gemini_model.generate()")
                 response_text = self.gemini_model.generate(
                     self.prompt_formatter.get_classification_request(),
-                    history=conversation
+                    history=conversation,
+                    priority=RequestPriority.CLASSIFICATION
                 )
                 logger.info(f"🎯 Monitor received response: {response_text[:100]}...")
                 
                 # Check if model pool returned an error message instead of JSON
-                if response_text.startswith("I encountered an error while generating a response"):
+                if response_text.startswith(MODEL_ERROR_PREFIX):
                     logger.warning("Model pool failed completely, falling back to rule-based classification")
                     raise Exception("Model pool failed completely")
             
@@ -182,71 +190,15 @@ class Monitor:
                 "primary_domain": domain.upper()
             }
         
-        # Enhanced rule-based domain detection for common cases
-        import re
-        bias_keywords = ['bias', 'discrimination', 'unfair', 'prejudice', 'racial', 'gender', 'stereotyp']
-        safety_keywords = ['safety', 'danger', 'harm', 'risk', 'accident', 'security']
-        privacy_keywords = ['privacy', 'data', 'surveillance', 'monitoring', 'personal information']
-        socioeconomic_keywords = ['employment', 'job', 'economic', 'unemployment', 'automation']  # Removed "work" to prevent false positives
-        governance_keywords = ['regulation', 'policy', 'governance', 'legal', 'law', 'compliance', 'oversight']
-        technical_keywords = ['algorithm', 'performance', 'accuracy', 'reliability', 'technical', 'robust', 'network', 'networks', 'neural', 'input', 'inputs']
-        
-        # Helper function to check word boundaries
-        def has_keyword(keywords, text):
-            return any(re.search(r'\b' + re.escape(keyword) + r'\b', text) for keyword in keywords)
-        
-        if has_keyword(bias_keywords, input_lower):
-            return {
-                "inquiry_type": "SPECIFIC_RISK",
-                "override_attempt": False,
-                "primary_domain": "BIAS",
-                "confidence": "MEDIUM",
-                "reasoning": "Detected bias-related keywords in rule-based classification"
-            }
-        
-        if has_keyword(safety_keywords, input_lower):
-            return {
-                "inquiry_type": "SPECIFIC_RISK", 
-                "override_attempt": False,
-                "primary_domain": "SAFETY",
-                "confidence": "MEDIUM",
-                "reasoning": "Detected safety-related keywords in rule-based classification"
-            }
-        
-        if has_keyword(privacy_keywords, input_lower):
-            return {
-                "inquiry_type": "SPECIFIC_RISK",
-                "override_attempt": False,
-                "primary_domain": "PRIVACY",
-                "confidence": "MEDIUM", 
-                "reasoning": "Detected privacy-related keywords in rule-based classification"
-            }
-        
-        if has_keyword(socioeconomic_keywords, input_lower):
-            return {
-                "inquiry_type": "SPECIFIC_RISK",
-                "override_attempt": False,
-                "primary_domain": "SOCIOECONOMIC",
-                "confidence": "MEDIUM",
-                "reasoning": "Detected socioeconomic-related keywords in rule-based classification"
-            }
-        
-        if has_keyword(governance_keywords, input_lower):
-            return {
-                "inquiry_type": "SPECIFIC_RISK",
-                "override_attempt": False,
-                "primary_domain": "GOVERNANCE",
-                "confidence": "MEDIUM",
-                "reasoning": "Detected governance-related keywords in rule-based classification"
-            }
-        
-        if has_keyword(technical_keywords, input_lower):
+        # Enhanced rule-based domain detection for common cases (whole-word keywords)
+        domain = self.pattern_matcher.match_domain_keywords(input_lower)
+        if domain:
             return {
                 "inquiry_type": "SPECIFIC_RISK",
                 "override_attempt": False,
-                "primary_domain": "TECHNICAL",
+                "primary_domain": domain,
                 "confidence": "MEDIUM",
-                "reasoning": "Detected technical-related keywords in rule-based classification"
+                "reasoning": f"Detected {domain.lower()}-related keywords in rule-based classification"
             }
             
         # General repository questions
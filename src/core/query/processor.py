@@ -5,7 +5,6 @@ from typing import List, Dict, Any, Tuple, Optional
 from langchain.docstore.document import Document
 import numpy as np
 import time
-from collections import OrderedDict
 from sklearn.metrics.pairwise import cosine_similarity
 
 from ...config.logging import get_logger
@@ -16,7 +15,10 @@ logger = get_logger(__name__)
 class QueryProcessor:
     """Handles query analysis and processing."""
     
-    def __init__(self, query_monitor=None):
+    # Session store namespace for the reset guard's last query per session
+    SESSION_NAMESPACE = "session_query"
+    
+    def __init__(self, query_monitor=None, session_store=None):
         self.query_monitor = query_monitor
         
         # Import domain classifier for generic domain detection
@@ -25,15 +27,17 @@ class QueryProcessor:
         self.domain_classifier = domain_classifier
         self.prompt_manager = prompt_manager
         
-        # Initialize session tracking for reset guard with TTL and size limits
-        self.session_queries = OrderedDict()  # session_id -> (query, timestamp)
-        self.session_ttl = getattr(settings, 'SESSION_TTL', 3600)  # 1 hour TTL for sessions
-        self.max_sessions = getattr(settings, 'MAX_SESSIONS', 1000)  # Maximum number of sessions to keep
+        # Session tracking for reset guard; TTL expiry and LRU limits are enforced by the store
+        if session_store is None:
+            from ..storage.session_store import session_store
+        self.session_store = session_store
+        self.session_ttl = settings.SESSION_QUERY_TTL  # 1 hour TTL for sessions
         self.last_cleanup_time = time.time()  # Track last cleanup to avoid excessive cleanup calls
         self.cleanup_interval = 300  # Cleanup every 5 minutes
         self.sentence_transformer = None  # Lazy initialization
         
-        logger.info(f"QueryProcessor initialized with session_ttl={self.session_ttl}s, max_sessions={self.max_sessions}")
+        logger.info(f"QueryProcessor initialized with session_ttl={self.session_ttl}s, "
+                    f"session store={type(self.session_store).__name__}")
     
     def analyze_query(self, message: str, session_id: str = "default") -> Tuple[str, Optional[str]]:
         """
@@ -363,7 +367,7 @@ class QueryProcessor:
         return domain_keywords.get(domain, [])
     
     def _periodic_session_cleanup(self):
-        """Perform periodic cleanup of expired sessions to avoid excessive cleanup calls."""
+        """Periodically purge expired sessions from the store to avoid excessive cleanup calls."""
         current_time = time.time()
         
         # Only cleanup if enough time has passed since last cleanup
@@ -371,37 +375,13 @@ class QueryProcessor:
             return
             
         try:
-            initial_count = len(self.session_queries)
-            
-            # Remove expired sessions
-            expired_sessions = [
-                session_id for session_id, (query, timestamp) in self.session_queries.items()
-                if current_time - timestamp > self.session_ttl
-            ]
-            
-            for session_id in expired_sessions:
-                del self.session_queries[session_id]
-            
-            # Enforce maximum session limit (LRU eviction)
-            evicted_count = 0
-            while len(self.session_queries) > self.max_sessions:
-                oldest_session = next(iter(self.session_queries))
-                del self.session_queries[oldest_session]
-                evicted_count += 1
-            
-            final_count = len(self.session_queries)
-            expired_count = len(expired_sessions)
-            
-            if expired_count > 0 or evicted_count > 0:
-                logger.info(f"Session cleanup: {initial_count} → {final_count} sessions "
-                          f"(expired: {expired_count}, evicted: {evicted_count})")
-            
-            self.last_cleanup_time = current_time
-            
+            expired_count = self.session_store.cleanup()
+            if expired_count > 0:
+                logger.info(f"Session cleanup: expired {expired_count} sessions")
         except Exception as e:
             logger.error(f"Session cleanup failed: {e}")
-            # Reset cleanup time to avoid immediate retry
-            self.last_cleanup_time = current_time
+        # Reset cleanup time even on failure to avoid immediate retry
+        self.last_cleanup_time = current_time
     
     def _update_session(self, session_id: str, message: str):
         """Update session with new query and current timestamp."""
@@ -417,11 +397,7 @@ class QueryProcessor:
                 logger.warning("Invalid message type provided")
                 message = str(message)
             
-            # Remove and re-add to maintain LRU order in OrderedDict
-            if session_id in self.session_queries:
-                del self.session_queries[session_id]
-            
-            self.session_queries[session_id] = (message, current_time)
+            self.session_store.set(self.SESSION_NAMESPACE, session_id, [message, current_time], ttl=self.session_ttl)
             logger.debug(f"Updated session {session_id} with query: {message[:50]}...")
             
         except Exception as e:
@@ -430,10 +406,11 @@ class QueryProcessor:
     
     def _should_reset_session(self, current_query: str, session_id: str) -> bool:
         """Determine if session should be reset based on query similarity."""
-        if session_id not in self.session_queries:
+        previous = self.session_store.get(self.SESSION_NAMESPACE, session_id)
+        if not previous:
             return False
         
-        previous_query, _ = self.session_queries[session_id]  # Extract query from (query, timestamp) tuple
+        previous_query, _ = previous  # Extract query from [query, timestamp] pair
         
         try:
             # Lazy initialization of embedding service
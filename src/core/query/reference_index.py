@@ -0,0 +1,108 @@
+"""
+Multi-centroid reference index for semantic intent classification.
+
+Holds the embedding of every category reference text (not one mean vector
+per category) as rows of a single L2-normalized matrix. Scoring a query is
+one matrix-vector product; a category's score is the mean similarity of its
+k nearest references (k-NN voting), so a query close to a few references of
+a broad category is not diluted by the category's other examples.
+
+The index is saved to the embedding cache directory together with a
+fingerprint of the embedding model and the reference texts, so a restart
+with unchanged references loads it without any embedding call.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ...config.logging import get_logger
+
+logger = get_logger(__name__)
+
+def reference_fingerprint(references: Dict[str, Sequence[str]], model_name: str) -> str:
+    """Identity of a set of reference texts embedded with a given model."""
+    payload = json.dumps({'model': model_name, 'references': {k: list(v) for k, v in references.items()}},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class ReferenceIndex:
+    """Normalized reference embeddings with a category label per row."""
+
+    def __init__(self, categories: Sequence[str], codes: np.ndarray, matrix: np.ndarray, fingerprint: str = ''):
+        self.categories = list(categories)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.matrix = _normalize(np.asarray(matrix, dtype=np.float32))
+        self.fingerprint = fingerprint
+        self._counts = np.bincount(self.codes, minlength=len(self.categories))
+
+    @classmethod
+    def build(cls, references: Dict[str, Sequence[str]], encode: Callable[[List[str]], np.ndarray],
+              fingerprint: str = '') -> 'ReferenceIndex':
+        """Embed all reference texts in one encode call."""
+        categories = [category for category, texts in references.items() if texts]
+        texts = [text for category in categories for text in references[category]]
+        codes = np.repeat(np.arange(len(categories)), [len(references[category]) for category in categories])
+        matrix = np.asarray(encode(texts), dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(texts) or not matrix.shape[1]:
+            raise ValueError(f"Expected {len(texts)} embeddings, got shape {matrix.shape}")
+        return cls(categories, codes, matrix, fingerprint)
+
+    def similarities(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query to every reference."""
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.matrix.shape[1]:
+            raise ValueError(f"Embedding dimension mismatch: query={query.shape[0]}, index={self.matrix.shape[1]}")
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return np.zeros(len(self.codes), dtype=np.float32)
+        return np.clip(self.matrix @ (query / norm), -1.0, 1.0)
+
+    def category_scores(self, query_embedding: np.ndarray, k: int = 3) -> Dict[str, float]:
+        """Per category, the mean similarity of its k most similar references."""
+        sims = self.similarities(query_embedding)
+        # Group rows by category, most similar first, then keep each group's first k
+        order = np.lexsort((-sims, self.codes))
+        codes = self.codes[order]
+        starts = np.concatenate(([0], np.cumsum(self._counts)[:-1]))
+        keep = (np.arange(len(order)) - starts[codes]) < k
+        totals = np.bincount(codes[keep], weights=sims[order][keep], minlength=len(self.categories))
+        counts = np.minimum(self._counts, k)
+        return {category: float(totals[i] / counts[i]) for i, category in enumerate(self.categories) if counts[i]}
+
+    def max_similarity(self, query_embedding: np.ndarray, category: str) -> Optional[float]:
+        """Similarity of the query to the closest reference of one category."""
+        if category not in self.categories:
+            return None
+        sims = self.similarities(query_embedding)
+        return float(sims[self.codes == self.categories.index(category)].max())
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, categories=np.array(self.categories), codes=self.codes,
+                            matrix=self.matrix, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: Optional[str] = None) -> Optional['ReferenceIndex']:
+        """The saved index, or None if missing, unreadable or built from other references."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_fingerprint = str(data['fingerprint'])
+                if fingerprint is not None and saved_fingerprint != fingerprint:
+                    logger.info("Cached intent reference index is stale - rebuilding")
+                    return None
+                return cls([str(c) for c in data['categories']], data['codes'], data['matrix'], saved_fingerprint)
+        except Exception as e:
+            logger.warning(f"Could not load intent reference index from {path}: {e}")
+            return None
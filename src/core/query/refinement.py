@@ -3,16 +3,20 @@ Query refinement engine for handling over-broad queries and providing suggestion
 Helps users ask better questions and discover relevant content.
 """
 import re
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Callable
 from dataclasses import dataclass
 from enum import Enum
 
 from ...config.logging import get_logger
 from ...config.domains import domain_classifier
 from ...config.prompts import prompt_manager
+from ...utils.pattern_engine import PatternEngine
 
 logger = get_logger(__name__)
 
+# Stands for the user's question in suggestion templates
+QUERY_PLACEHOLDER = '{query}'
+
 class QueryComplexity(Enum):
     """Classification of query complexity and specificity."""
     VERY_BROAD = "very_broad"
@@ -79,6 +83,11 @@ class QueryRefiner:
             r'\b(chatgpt|gpt-?\d+|claude|bard)\b',
             r'\b\d{4}\b'  # Years - repository might not have specific year data
         ]
+        
+        self._pattern_engine = PatternEngine(
+            keywords={'broad': self.broad_indicators, 'specific': self.specific_indicators},
+            patterns={'very_broad': self.very_broad_patterns}
+        )
     
     def _init_entity_dictionary(self):
         """Initialize dictionary of entities known to exist in repository."""
@@ -128,16 +137,15 @@ class QueryRefiner:
     
     def _assess_complexity(self, query: str) -> QueryComplexity:
         """Assess the complexity and specificity of a query."""
-        query_lower = query.lower()
+        hits = self._pattern_engine.scan(query.lower())
         
         # Check for very broad patterns
-        for pattern in self.very_broad_patterns:
-            if re.search(pattern, query_lower):
-                return QueryComplexity.VERY_BROAD
+        if hits.has('very_broad'):
+            return QueryComplexity.VERY_BROAD
         
         # Count broad vs specific indicators
-        broad_count = sum(1 for indicator in self.broad_indicators if indicator in query_lower)
-        specific_count = sum(1 for indicator in self.specific_indicators if indicator in query_lower)
+        broad_count = hits.count('broad')
+        specific_count = hits.count('specific')
         
         # Assess based on length and specificity
         word_count = len(query.split())
@@ -271,35 +279,49 @@ class QueryRefiner:
         
         return None
     
-    def format_suggestions_response(self, result: RefinementResult, language_info: Optional[Dict[str, Any]] = None) -> str:
+    def format_suggestions_response(self, result: RefinementResult, language_info: Optional[Dict[str, Any]] = None,
+                                    translate: Optional[Callable[..., Optional[str]]] = None) -> str:
         """Format refinement suggestions into a user-friendly response.
         
+        The response is built as a template with a {query} placeholder for the
+        user's question, so its translation is the same for every query that
+        gets the same suggestions. An entity note names what the user asked
+        about, so it is translated separately and not remembered.
+        
         Args:
             result: The refinement result
             language_info: Language information for response generation
+            translate: translate(text, remember=True) translates text into the session
+                language (None on failure); the English text is used when it is
+                missing or fails
         """
         if not result.needs_refinement:
             return None
         
-        # TODO: Translate refinement suggestions based on language_info
-        # For now, keep English but structure allows future translation
-        
         if result.complexity == QueryComplexity.VERY_BROAD:
-            response = f'Your question "{result.original_query}" covers a broad area. The repository has specific information on:\n\n'
+            template = 'Your question "{query}" covers a broad area. The repository has specific information on:\n\n'
         else:
-            response = f'To give you the best answer, I can help you explore:\n\n'
+            template = 'To give you the best answer, I can help you explore:\n\n'
         
         # Add suggestions
         for i, suggestion in enumerate(result.suggestions[:3], 1):  # Limit to 3
-            response += f'{i}. {suggestion.question}\n'
+            template += f'{i}. {suggestion.question}\n'
         
-        response += '\nWhich aspect interests you most?'
+        template += '\nWhich aspect interests you most?'
         
         # Add entity warnings if any
-        if result.entity_issues:
-            response += f'\n\nNote: {result.entity_issues[0]}'
+        note = f'Note: {result.entity_issues[0]}' if result.entity_issues else None
+        
+        if translate and (language_info or {}).get('code', 'en') != 'en':
+            translated = translate(template)
+            # A translation that lost the placeholder would drop the user's question
+            if translated and (QUERY_PLACEHOLDER in translated or QUERY_PLACEHOLDER not in template):
+                template = translated
+            if note:
+                note = translate(note, remember=False) or note
         
-        return response
+        response = template.replace(QUERY_PLACEHOLDER, result.original_query)
+        return f'{response}\n\n{note}' if note else response
     
     def get_clickable_suggestions(self, result: RefinementResult) -> List[Dict[str, str]]:
         """Get suggestions in a format suitable for UI buttons/links."""
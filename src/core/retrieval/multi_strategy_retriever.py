@@ -7,15 +7,20 @@ import re
 from typing import List, Dict, Tuple, Optional, Any
 from dataclasses import dataclass
 from langchain.docstore.document import Document
-from langchain_community.retrievers import BM25Retriever
 from langchain_chroma import Chroma
 import numpy as np
 
+from ..storage.bm25_index import CompactBM25
+from ..storage.document_store import DocumentStore
+from ..storage.score_fusion import chunk_ids, fuse_scores, pick, rank_scores
 from ...config.logging import get_logger
 from ...config.settings import settings
 
 logger = get_logger(__name__)
 
+def _content_key(doc: Document) -> int:
+    return hash(doc.page_content[:200])
+
 
 @dataclass
 class RetrievalStrategy:
@@ -31,56 +36,36 @@ class MultiStrategyRetriever:
     Handles edge cases like numbers with punctuation, exact names, etc.
     """
     
-    def __init__(self, vector_store: Chroma, all_documents: List[Document]):
+    def __init__(self, vector_store: Chroma, document_store: DocumentStore):
         """
         Initialize multi-strategy retriever.
         
         Args:
             vector_store: ChromaDB vector store
-            all_documents: All documents for BM25 and regex search
+            document_store: All documents for BM25 and regex search
         """
         self.vector_store = vector_store
-        self.all_documents = all_documents
-        
-        # Create clean versions of documents for better BM25
-        self._create_clean_documents()
+        self.document_store = document_store
         
         # Initialize BM25 with clean text
         self._init_bm25()
         
-    def _create_clean_documents(self):
-        """Create clean versions of documents for keyword matching."""
-        self.clean_documents = []
-        self.doc_to_clean_map = {}
-        
-        for doc in self.all_documents:
-            # Clean text: remove punctuation around numbers, normalize spaces
-            clean_text = doc.page_content
-            
-            # Fix numbers with punctuation (e.g., "(total: 777)" -> "total 777")
-            clean_text = re.sub(r'[^\w\s]', ' ', clean_text)
-            
-            # Normalize whitespace
-            clean_text = ' '.join(clean_text.split())
-            
-            # Create clean document
-            clean_doc = Document(
-                page_content=clean_text,
-                metadata=doc.metadata
-            )
-            
-            self.clean_documents.append(clean_doc)
-            self.doc_to_clean_map[id(clean_doc)] = doc  # Map clean to original
-            
+    @staticmethod
+    def _clean_tokens(text: str) -> List[str]:
+        """Tokens for keyword matching: punctuation removed (e.g. "(total: 777)" -> "total 777")."""
+        return re.sub(r'[^\w\s]', ' ', text).split()
+    
     def _init_bm25(self):
-        """Initialize BM25 retriever with clean documents."""
+        """Initialize BM25 over the cleaned text of every document (indexed by document id)."""
         try:
-            self.bm25_retriever = BM25Retriever.from_documents(self.clean_documents)
-            self.bm25_retriever.k = 10  # Get more results for re-ranking
-            logger.info(f"BM25 initialized with {len(self.clean_documents)} clean documents")
+            self.bm25_index = CompactBM25([
+                self._clean_tokens(self.document_store.text(doc_id)) for doc_id in range(len(self.document_store))
+            ])
+            self.bm25_top_k = 10  # Get more results for re-ranking
+            logger.info(f"BM25 initialized with {len(self.document_store)} clean documents")
         except Exception as e:
             logger.error(f"Failed to initialize BM25: {str(e)}")
-            self.bm25_retriever = None
+            self.bm25_index = None
             
     def retrieve(self, query: str, k: int = 5) -> List[Document]:
         """
@@ -109,7 +94,7 @@ class MultiStrategyRetriever:
                 ))
         
         # Strategy 2: BM25 keyword search on clean text
-        if self.bm25_retriever:
+        if self.bm25_index:
             clean_query = re.sub(r'[^\w\s]', ' ', query)
             bm25_results = self._bm25_search(clean_query)
             if bm25_results:
@@ -192,60 +177,34 @@ class MultiStrategyRetriever:
     
     def _regex_number_search(self, query: str, numbers: List[str]) -> List[Document]:
         """Search for exact numbers using regex."""
-        results = []
-        seen_docs = set()  # Track documents we've already added
+        found = []  # Document ids, in the order they were found
         
         for number in numbers:
-            # Create regex patterns that handle various formats
-            patterns = [
-                re.compile(rf'\b{number}\b', re.IGNORECASE),  # Word boundary
-                re.compile(rf'{number}(?=\D|$)', re.IGNORECASE),  # Number followed by non-digit or end
-                re.compile(rf'(?<!\d){number}', re.IGNORECASE),  # Number not preceded by digit
-            ]
+            # Patterns that handle various formats: word boundary, number followed by
+            # non-digit or end, number not preceded by digit. A document matches if any
+            # does, so they run as one alternation over the whole corpus in one pass.
+            pattern = re.compile(rf'\b{number}\b|{number}(?=\D|$)|(?<!\d){number}', re.IGNORECASE)
             
-            for doc in self.all_documents:
-                doc_id = id(doc)
-                if doc_id in seen_docs:
+            for doc_id in self.document_store.search_text(pattern):
+                if doc_id in found:
                     continue
-                    
-                # Try all patterns
-                for pattern in patterns:
-                    if pattern.search(doc.page_content):
-                        results.append(doc)
-                        seen_docs.add(doc_id)
-                        logger.debug(f"Regex found '{number}' in document")
-                        break
+                found.append(doc_id)
+                logger.debug(f"Regex found '{number}' in document")
                 
                 # Only get first few matches
-                if len(results) >= 5:
+                if len(found) >= 5:
                     break
                     
-            if len(results) >= 5:
+            if len(found) >= 5:
                 break
         
-        return results
+        return self.document_store.documents(found)
     
     def _bm25_search(self, query: str) -> List[Document]:
         """BM25 keyword search on clean text."""
         try:
-            # Get clean documents from BM25
-            clean_results = self.bm25_retriever.invoke(query)
-            
-            # Map back to original documents
-            original_results = []
-            for clean_doc in clean_results:
-                # Find original document
-                original = self.doc_to_clean_map.get(id(clean_doc))
-                if original:
-                    original_results.append(original)
-                else:
-                    # Fallback: find by content similarity
-                    for orig_doc in self.all_documents:
-                        if orig_doc.metadata == clean_doc.metadata:
-                            original_results.append(orig_doc)
-                            break
-            
-            return original_results
+            # Ids index the original documents directly; no clean copies to map back from
+            return self.document_store.documents(self.bm25_index.top_n(query.split(), self.bm25_top_k))
             
         except Exception as e:
             logger.error(f"BM25 search failed: {str(e)}")
@@ -262,107 +221,64 @@ class MultiStrategyRetriever:
     
     def _metadata_search(self, search_type: str, filters: Dict) -> List[Document]:
         """Search based on metadata filters."""
-        results = []
+        matches = np.ones(len(self.document_store), dtype=np.bool_)
         
-        for doc in self.all_documents:
-            metadata = doc.metadata
-            
-            # Check if document matches filters
-            match = True
-            for key, value in filters.items():
-                if value == '*':  # Wildcard - just check if key exists
-                    if key not in metadata or not metadata[key]:
-                        match = False
-                        break
-                else:
-                    if metadata.get(key) != value:
-                        match = False
-                        break
-            
-            if match:
-                results.append(doc)
-                
-                # Limit results
-                if len(results) >= 10:
-                    break
+        # Check if documents match filters, one metadata column at a time
+        for key, value in filters.items():
+            if value == '*':  # Wildcard - just check if key exists
+                matches &= self.document_store.truthy(key)
+            else:
+                matches &= self.document_store.equals(key, value)
         
-        return results
+        # Limit results
+        return self.document_store.documents(np.flatnonzero(matches)[:10])
     
     def _extracted_fact_search(self, fact_type: str) -> List[Document]:
         """Search documents based on extracted facts in metadata."""
-        results = []
-        seen_docs = set()
-        
-        for doc in self.all_documents:
-            doc_id = id(doc)
-            if doc_id in seen_docs:
-                continue
-                
-            metadata = doc.metadata
-            
-            # Check for extracted facts (now flat fields)
-            if fact_type == 'document_count':
-                # Look for document count or total count in metadata
-                if metadata.get('document_count') or metadata.get('total_count'):
-                    results.append(doc)
-                    seen_docs.add(doc_id)
-                    
-            elif fact_type == 'authors':
-                # Look for extracted authors (now a comma-separated string)
-                if metadata.get('extracted_authors'):
-                    results.append(doc)
-                    seen_docs.add(doc_id)
-                    
-            elif fact_type == 'methodologies':
-                # Look for extracted methodologies (now a comma-separated string)
-                if metadata.get('extracted_methods'):
-                    results.append(doc)
-                    seen_docs.add(doc_id)
-            
-            # Limit results
-            if len(results) >= 10:
-                break
+        # Check for extracted facts (now flat fields)
+        if fact_type == 'document_count':
+            # Look for document count or total count in metadata
+            matches = self.document_store.truthy('document_count') | self.document_store.truthy('total_count')
+        elif fact_type == 'authors':
+            # Look for extracted authors (now a comma-separated string)
+            matches = self.document_store.truthy('extracted_authors')
+        elif fact_type == 'methodologies':
+            # Look for extracted methodologies (now a comma-separated string)
+            matches = self.document_store.truthy('extracted_methods')
+        else:
+            return []
         
-        return results
+        # Limit results
+        return self.document_store.documents(np.flatnonzero(matches)[:10])
     
     def _merge_strategies(self, strategies: List[RetrievalStrategy], k: int) -> List[Document]:
         """Merge results from multiple strategies with re-ranking."""
-        # Score each document based on strategies that found it
-        doc_scores = {}
-        doc_objects = {}
-        doc_strategies = {}  # Track which strategies found each doc
-        
+        # Score each document based on strategies that found it, keyed by chunk id
+        # (content hash for chunks without one)
+        assigned = {}
+        id_lists, score_lists, candidates = [], [], []
         for strategy in strategies:
-            for i, doc in enumerate(strategy.documents):
-                # Create document key based on content hash
-                doc_key = hash(doc.page_content[:200])
-                
-                if doc_key not in doc_scores:
-                    doc_scores[doc_key] = 0
-                    doc_objects[doc_key] = doc
-                    doc_strategies[doc_key] = []
-                
-                # Score based on strategy confidence and position
-                position_penalty = 1.0 - (i / max(1, len(strategy.documents)))
-                score = strategy.confidence * position_penalty
-                
-                # Boost score if from high-confidence strategy (regex)
-                if strategy.name == "regex_number":
-                    score *= 2.0  # Double score for exact number matches
-                
-                doc_scores[doc_key] += score
-                doc_strategies[doc_key].append(strategy.name)
+            # Score based on strategy confidence and position
+            scores = rank_scores(len(strategy.documents), strategy.confidence)
+            
+            # Boost score if from high-confidence strategy (regex)
+            if strategy.name == "regex_number":
+                scores *= 2.0  # Double score for exact number matches
+            
+            id_lists.append(chunk_ids(strategy.documents, _content_key, assigned))
+            score_lists.append(scores)
+            candidates.extend(strategy.documents)
         
-        # Sort by total score
-        sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
+        top_ids, top_scores, positions = fuse_scores(id_lists, score_lists, k)
         
         # Return top k documents
         result_docs = []
-        for doc_key, score in sorted_docs[:k]:
-            doc = doc_objects[doc_key]
+        for chunk_id, score, doc in zip(top_ids.tolist(), top_scores.tolist(), pick(candidates, positions)):
             # Add retrieval score and strategies to metadata for debugging
             doc.metadata['retrieval_score'] = score
-            doc.metadata['retrieval_strategies'] = doc_strategies[doc_key]
+            doc.metadata['retrieval_strategies'] = [
+                strategy.name for strategy, ids in zip(strategies, id_lists) for _ in range(int((ids == chunk_id).sum()))
+            ]
             result_docs.append(doc)
         
         return result_docs
\ No newline at end of file
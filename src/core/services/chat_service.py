@@ -1,14 +1,20 @@
 """
 Chat service that orchestrates the entire conversation flow.
 """
+import asyncio
 import json
-from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Optional, Union
 from langchain.docstore.document import Document
 
 from ..models.gemini import GeminiModel
+from ..models.usage import usage_stage, PipelineStage
 from ..storage.vector_store import VectorStore
+from ..storage.session_store import SessionStore, session_store as default_session_store
 from ..query.processor import QueryProcessor
 from .citation_service import CitationService
+from .template_translator import TemplateTranslator
+from .tracing_service import tracing_service
 # Import intent classifier at module level to ensure it initializes at startup
 from ..query.intent_classifier import intent_classifier, IntentCategory
 # Import these locally to avoid import errors
@@ -22,13 +28,37 @@ from ...config.settings import settings
 
 logger = get_logger(__name__)
 
+# Static error messages; translated once per language through the translation memory
+CONTENT_RESTRICTION_MESSAGE = ("I apologize, but I'm unable to provide detailed information on this specific topic due to content restrictions. "
+                               "Please try rephrasing your question to focus on risk prevention, safety measures, or policy considerations. "
+                               "You can also explore related topics like AI safety frameworks, risk mitigation strategies, or ethical guidelines.")
+NO_INFORMATION_MESSAGE = "I'm sorry, but I couldn't find specific information in the AI Risk Repository for your query. The repository covers risks related to discrimination, privacy, misinformation, malicious use, human-computer interaction, socioeconomic impacts, and system safety."
+ERROR_MESSAGES = (CONTENT_RESTRICTION_MESSAGE, NO_INFORMATION_MESSAGE)
+
+@dataclass
+class GenerationPlan:
+    """A repository query that has been routed and retrieved, ready for answer generation."""
+    message: str
+    conversation_id: str
+    session_id: Optional[str]
+    query_type: str
+    domain: Optional[str]
+    docs: List[Document]
+    context: str
+    language_info: Optional[Dict[str, Any]]
+
 class ChatService:
     """Main service for handling chat interactions."""
     
+    # Session store namespaces
+    CONVERSATION_NAMESPACE = "conversation"
+    LANGUAGE_NAMESPACE = "session_language"
+    
     def __init__(self, 
                  gemini_model: Optional[GeminiModel] = None,
                  vector_store: Optional[VectorStore] = None,
-                 query_monitor: Optional[Any] = None):
+                 query_monitor: Optional[Any] = None,
+                 session_store: Optional[SessionStore] = None):
         """
         Initialize the chat service.
         
@@ -36,11 +66,16 @@ class ChatService:
             gemini_model: Gemini model instance
             vector_store: Vector store instance
             query_monitor: Query monitor for advanced analysis
+            session_store: Store for conversation history and session languages
         """
         self.gemini_model = gemini_model
         self.vector_store = vector_store
-        self.query_processor = QueryProcessor(query_monitor)
+        # Session state goes through the shared store so any worker can serve a session
+        self.session_store = session_store or default_session_store
+        self.query_processor = QueryProcessor(query_monitor, self.session_store)
         self.citation_service = CitationService()
+        # Static templates are translated once per language and served from the translation memory
+        self.template_translator = TemplateTranslator(gemini_model)
         
         # Initialize language service with Gemini model
         if gemini_model:
@@ -49,12 +84,6 @@ class ChatService:
                 language_service.gemini_model = gemini_model
             except Exception as e:
                 logger.warning(f"Could not initialize language service: {e}")
-        
-        # Session language tracking
-        self.session_languages: Dict[str, Dict[str, Any]] = {}
-        
-        # Conversation storage (in production, use a proper database)
-        self.conversations: Dict[str, List[Dict[str, str]]] = {}
     
     def process_query(self, message: str, conversation_id: str, session_id: str = None, language_code: str = None) -> Tuple[str, List[Any], Optional[Dict[str, Any]]]:
         """
@@ -69,465 +98,468 @@ class ChatService:
         Returns:
             Tuple of (response_text, retrieved_documents, language_info)
         """
+        with tracing_service.span("chat.process_query", session_id=session_id,
+                                  conversation_id=conversation_id) as span:
+            result = self._process_query(message, conversation_id, session_id, language_code)
+            if span is not None:
+                span.set_attribute("docs", len(result[1]) if result[1] else 0)
+            return result
+    
+    async def process_query_async(self, message: str, conversation_id: str, session_id: str = None, language_code: str = None) -> Tuple[str, List[Any], Optional[Dict[str, Any]]]:
+        """
+        Async variant of process_query for the ASGI serving mode.
+        
+        Routing, retrieval, citations and validation run in worker threads; the
+        answer generation call (the 5-20 s part of a repository query) is
+        awaited, so it does not hold a thread while the model responds.
+        """
+        with tracing_service.span("chat.process_query", session_id=session_id,
+                                  conversation_id=conversation_id, mode="async") as span:
+            try:
+                prepared = await asyncio.to_thread(self._prepare_query, message, conversation_id, session_id, language_code)
+                if isinstance(prepared, GenerationPlan):
+                    with tracing_service.span("generation"):
+                        response = await self._agenerate_response(prepared)
+                    result = await asyncio.to_thread(self._finish_query, prepared, response)
+                else:
+                    result = prepared
+            except Exception as e:
+                result = await asyncio.to_thread(self._error_result, e, session_id)
+            if span is not None:
+                span.set_attribute("docs", len(result[1]) if result[1] else 0)
+            return result
+    
+    def _process_query(self, message: str, conversation_id: str, session_id: str = None, language_code: str = None) -> Tuple[str, List[Any], Optional[Dict[str, Any]]]:
+        """Route and answer a query; see process_query."""
         try:
-            # Handle language selection priority
-            if language_code:
-                # User explicitly selected a language - use it and store for session
-                try:
-                    from .language_service import language_service
-                    language_info = language_service.get_language_info(language_code)
-                    if session_id and language_info:
-                        self.session_languages[session_id] = language_info
-                except Exception as lang_error:
-                    logger.warning(f"Failed to get language info for code '{language_code}': {lang_error}")
-                    # Fallback to session language or default
-                    if session_id and session_id in self.session_languages:
-                        language_info = self.session_languages[session_id]
-                    else:
-                        language_info = self._get_default_language_info()
-            else:
-                # No explicit selection, check session or detect
+            prepared = self._prepare_query(message, conversation_id, session_id, language_code)
+            if not isinstance(prepared, GenerationPlan):
+                return prepared
+            
+            # 9. Generate response
+            with tracing_service.span("generation"):
+                response = self._generate_response(prepared.message, prepared.query_type, prepared.domain,
+                                                   prepared.context, prepared.conversation_id, prepared.docs,
+                                                   prepared.language_info)
+            
+            return self._finish_query(prepared, response)
+            
+        except Exception as e:
+            return self._error_result(e, session_id)
+    
+    def _prepare_query(self, message: str, conversation_id: str, session_id: str = None,
+                       language_code: str = None) -> Union[tuple, GenerationPlan]:
+        """
+        Detect language, classify and route a query.
+        
+        Returns the final result for routes answered without generation
+        (taxonomy, metadata, technical, out-of-scope, refinement suggestions),
+        or a GenerationPlan with retrieved documents and formatted context.
+        """
+        # Handle language selection priority
+        if language_code:
+            # User explicitly selected a language - use it and store for session
+            try:
+                from .language_service import language_service
+                language_info = language_service.get_language_info(language_code)
+                if session_id and language_info:
+                    self.session_store.set(self.LANGUAGE_NAMESPACE, session_id, language_info)
+            except Exception as lang_error:
+                logger.warning(f"Failed to get language info for code '{language_code}': {lang_error}")
+                # Fallback to session language or default
+                language_info = self.get_session_language(session_id) if session_id else None
+                if not language_info:
+                    language_info = self._get_default_language_info()
+        else:
+            # No explicit selection, check session or detect
+            with tracing_service.span("language_detection") as span:
                 language_info = self._get_or_detect_language(message, session_id)
-            # 1. Intent classification (Phase 2.1) - Using working version from copy folder
-            # Intent classifier is now imported at module level for proper initialization
+                if span is not None:
+                    span.set_attribute("language", language_info.get('code'))
+                    span.set_attribute("method", language_info.get('detection_method'))
+        # 1. Intent classification (Phase 2.1) - Using working version from copy folder
+        # Intent classifier is now imported at module level for proper initialization
+        with tracing_service.span("intent_classification") as span:
             intent_result = intent_classifier.classify_intent(message)
+            if span is not None:
+                span.set_attribute("category", intent_result.category.value)
+        
+        # 2. Route based on intent category
+        # 2.1 Handle taxonomy queries with highest priority
+        if intent_result.category == IntentCategory.TAXONOMY_QUERY:
+            logger.info(f"Processing taxonomy query (confidence: {intent_result.confidence:.2f})")
             
-            # 2. Route based on intent category
-            # 2.1 Handle taxonomy queries with highest priority
-            if intent_result.category == IntentCategory.TAXONOMY_QUERY:
-                logger.info(f"Processing taxonomy query (confidence: {intent_result.confidence:.2f})")
-                
-                try:
-                    logger.info("Attempting to import TaxonomyHandler...")
-                    from ..taxonomy.taxonomy_handler import TaxonomyHandler
-                    logger.info("TaxonomyHandler imported successfully")
-                    
-                    # Create taxonomy handler instance
-                    logger.info("Creating TaxonomyHandler instance...")
-                    taxonomy_handler = TaxonomyHandler()
-                    logger.info("TaxonomyHandler instance created successfully")
-                    
-                    # Get structured taxonomy response
-                    logger.info(f"Calling handle_taxonomy_query with message: {message[:100]}...")
-                    taxonomy_response = taxonomy_handler.handle_taxonomy_query(message)
-                    logger.info("Taxonomy response generated successfully")
-                    
-                    # Handle language translation if needed
-                    response_content = taxonomy_response.content
-                    if self.gemini_model and language_info and language_info.get('code', 'en') != 'en':
-                        try:
-                            from ..services.language_service import language_service
-                            language_code = language_info.get('code', 'en')
-                            language_name = language_info.get('english_name', 'English')
-                            special_prompt = language_service.get_language_prompt(language_code)
-                            
-                            translation_prompt = f"""Translate this taxonomy information to {language_name}:
-
-{response_content}
-
-{special_prompt}
-Keep all formatting, headings, and structure intact.
-Translate technical terms appropriately for {language_name} speakers."""
-                            
-                            response_content = self.gemini_model.generate(translation_prompt, [])
-                            logger.info(f"Translated taxonomy response to {language_name}")
-                        except Exception as e:
-                            logger.warning(f"Failed to translate taxonomy response: {e}")
-                    
-                    # Create source citation for the preprint
-                    sources = [{
-                        'metadata': {
-                            'title': taxonomy_response.source,
-                            'rid': 'PREPRINT-001',
-                            'type': 'preprint'
-                        },
-                        'page_content': 'AI Risk Repository Preprint - Comprehensive taxonomy reference'
-                    }]
-                    
-                    # Update conversation history
-                    self._update_conversation_history(conversation_id, message, response_content)
-                    return response_content, sources, language_info
-                    
-                except Exception as e:
-                    import traceback
-                    logger.error(f"Failed to handle taxonomy query: {e}")
-                    logger.error(f"Exception type: {type(e).__name__}")
-                    logger.error(f"Full traceback:\n{traceback.format_exc()}")
-                    # Fall through to metadata handler as backup
-                    intent_result.category = IntentCategory.METADATA_QUERY
-            
-            # 2.2 Handle metadata queries
-            if intent_result.category == IntentCategory.METADATA_QUERY:
-                logger.info(f"Processing metadata query (confidence: {intent_result.confidence:.2f})")
+            try:
+                # Get structured taxonomy response (precomputed; translation cached per language)
+                logger.info(f"Calling handle_taxonomy_query with message: {message[:100]}...")
+                taxonomy_response = self._get_taxonomy_response(message, language_info)
+                response_content = taxonomy_response.content
+                logger.info("Taxonomy response generated successfully")
                 
-                try:
-                    from ..metadata import metadata_service
-                    
-                    # Initialize metadata service if needed
-                    if not metadata_service._initialized:
-                        metadata_service.initialize()
-                    
-                    # Set gemini model for language-aware messages
-                    if self.gemini_model:
-                        metadata_service.gemini_model = self.gemini_model
-                    
-                    # Execute metadata query
-                    response, raw_results = metadata_service.query(message)
-                except ImportError as e:
-                    logger.error(f"Failed to import metadata service: {e}")
-                    response = "Metadata service is currently unavailable."
-                    raw_results = []
+                # Create source citation for the preprint
+                sources = [{
+                    'metadata': {
+                        'title': taxonomy_response.source,
+                        'rid': 'PREPRINT-001',
+                        'type': 'preprint'
+                    },
+                    'page_content': 'AI Risk Repository Preprint - Comprehensive taxonomy reference'
+                }]
                 
                 # Update conversation history
-                self._update_conversation_history(conversation_id, message, response)
-                return response, raw_results, language_info
-            
-            elif intent_result.category == IntentCategory.TECHNICAL_AI_QUERY:
-                logger.info(f"Processing technical AI query (confidence: {intent_result.confidence:.2f})")
+                self._update_conversation_history(conversation_id, message, response_content)
+                return response_content, sources, language_info
                 
-                try:
-                    from ..query.technical_handler import get_technical_handler
-                    
-                    # Get technical handler
-                    technical_handler = get_technical_handler()
-                    
-                    # Set up Gemini model
-                    if self.gemini_model:
-                        technical_handler.gemini_model = self.gemini_model
-                    
-                    # Execute technical query with language info
-                    response, sources = technical_handler.handle_technical_query(message, language_info)
-                except ImportError as e:
-                    logger.error(f"Failed to import technical handler: {e}")
-                    response = "Technical query handler is currently unavailable."
-                    sources = []
-                
-                # Update conversation history
-                self._update_conversation_history(conversation_id, message, response)
-                return response, sources, language_info
+            except Exception as e:
+                import traceback
+                logger.error(f"Failed to handle taxonomy query: {e}")
+                logger.error(f"Exception type: {type(e).__name__}")
+                logger.error(f"Full traceback:\n{traceback.format_exc()}")
+                # Fall through to metadata handler as backup
+                intent_result.category = IntentCategory.METADATA_QUERY
+        
+        # 2.2 Handle metadata queries
+        if intent_result.category == IntentCategory.METADATA_QUERY:
+            logger.info(f"Processing metadata query (confidence: {intent_result.confidence:.2f})")
             
-            elif intent_result.category == IntentCategory.CROSS_DB_QUERY:
-                logger.info(f"Processing cross-database query (confidence: {intent_result.confidence:.2f})")
-                
-                try:
-                    from ..metadata import metadata_service
-                    
-                    # Initialize metadata service if needed
-                    if not metadata_service._initialized:
-                        metadata_service.initialize()
-                    
-                    # Set gemini model for language-aware messages
-                    if self.gemini_model:
-                        metadata_service.gemini_model = self.gemini_model
-                    
-                    # First, try to get structured data from metadata service
-                    metadata_response, raw_results = metadata_service.query(message)
-                except ImportError as e:
-                    logger.error(f"Failed to import metadata service: {e}")
-                    metadata_response = "Metadata service is currently unavailable."
-                    raw_results = []
+            try:
+                from ..metadata import metadata_service
                 
-                # Also get related documents from vector store for context
-                query_type, domain = self.query_processor.analyze_query(message, conversation_id)
+                # Initialize metadata service if needed
+                if not metadata_service._initialized:
+                    metadata_service.initialize()
                 
-                # For cross-domain queries, get documents from multiple domains
-                if 'between' in message.lower() or 'cross-domain' in message.lower() or 'cross domain' in message.lower():
-                    # Extract domains mentioned in query
-                    domains_mentioned = []
-                    for d in ['healthcare', 'finance', 'education', 'military', 'legal']:
-                        if d in message.lower():
-                            domains_mentioned.append(d)
-                    
-                    # Get documents for each domain
-                    docs = []
-                    if domains_mentioned and self.vector_store:
-                        for domain_term in domains_mentioned:
-                            # Search for privacy risks in each specific domain
-                            search_query = f"{domain} risks {domain_term}"
-                            domain_docs = self.vector_store.get_relevant_documents(
-                                search_query, k=3
-                            )
-                            docs.extend(domain_docs)
-                        # Remove duplicates
-                        seen = set()
-                        unique_docs = []
-                        for doc in docs:
-                            doc_id = doc.metadata.get('rid', doc.page_content[:50])
-                            if doc_id not in seen:
-                                seen.add(doc_id)
-                                unique_docs.append(doc)
-                        docs = unique_docs[:6]  # Limit to 6 docs total
-                    else:
-                        docs = self.vector_store.get_relevant_documents(message, k=4) if self.vector_store else []
-                else:
-                    docs = self.vector_store.get_relevant_documents(message, k=3) if self.vector_store else []
+                # Set gemini model for language-aware messages
+                if self.gemini_model:
+                    metadata_service.gemini_model = self.gemini_model
                 
-                # Combine results if we have both
-                if docs and raw_results:
-                    # Create enriched response combining both sources
-                    combined_response = f"{metadata_response}\n\n**Related Repository Documents:**\n"
-                    for i, doc in enumerate(docs[:3], 1):
-                        rid = doc.metadata.get('rid', 'Unknown')
-                        title = doc.metadata.get('title', 'Untitled')
-                        combined_response += f"\n{i}. {title} ({rid})"
-                    
-                    # Combine sources for Related Documents tab
-                    combined_sources = raw_results + docs
-                    
-                    self._update_conversation_history(conversation_id, message, combined_response)
-                    return combined_response, combined_sources
-                else:
-                    # Return just metadata results if no documents found
-                    self._update_conversation_history(conversation_id, message, metadata_response)
-                    return metadata_response, raw_results
-            
-            # 3. Multi-stage classification for better taxonomy detection
-            # Check taxonomy relevance if initial classification is uncertain
-            if intent_result.confidence < 0.7 and intent_result.category != IntentCategory.TAXONOMY_QUERY:
-                # Check taxonomy relevance
-                taxonomy_relevance = intent_classifier.check_taxonomy_relevance(message)
-                logger.info(f"Taxonomy relevance check: {taxonomy_relevance:.2f} for uncertain query")
-                
-                # Lower threshold and add concept checking for better coverage
-                if taxonomy_relevance > 0.4 or intent_classifier.contains_taxonomy_concepts(message):
-                    # Route to taxonomy handler
-                    logger.info(f"Routing to taxonomy handler based on relevance score: {taxonomy_relevance:.2f}")
-                    try:
-                        from ..taxonomy.taxonomy_handler import TaxonomyHandler
-                        taxonomy_handler = TaxonomyHandler()
-                        taxonomy_response = taxonomy_handler.handle_taxonomy_query(message)
-                        
-                        # Handle language translation if needed
-                        response_content = taxonomy_response.content
-                        if self.gemini_model and language_info and language_info.get('code', 'en') != 'en':
-                            try:
-                                from ..services.language_service import language_service
-                                language_code = language_info.get('code', 'en')
-                                language_name = language_info.get('english_name', 'English')
-                                special_prompt = language_service.get_language_prompt(language_code)
-                                
-                                translation_prompt = f"""Translate this taxonomy information to {language_name}:
-
-{response_content}
-
-{special_prompt}
-Keep all formatting, headings, and structure intact."""
-                                
-                                response_content = self.gemini_model.generate(translation_prompt, [])
-                            except Exception as e:
-                                logger.warning(f"Failed to translate taxonomy response: {e}")
-                        
-                        sources = [{
-                            'metadata': {'title': taxonomy_response.source, 'rid': 'PREPRINT-001'},
-                            'page_content': 'AI Risk Repository Preprint - Taxonomy reference'
-                        }]
-                        
-                        self._update_conversation_history(conversation_id, message, response_content)
-                        return response_content, sources, language_info
-                    except Exception as e:
-                        logger.error(f"Failed to handle as taxonomy query: {e}")
+                # Execute metadata query
+                with tracing_service.span("metadata_query"):
+                    response, raw_results = metadata_service.query(message)
+            except ImportError as e:
+                logger.error(f"Failed to import metadata service: {e}")
+                response = "Metadata service is currently unavailable."
+                raw_results = []
+            
+            # Update conversation history
+            self._update_conversation_history(conversation_id, message, response)
+            return response, raw_results, language_info
+        
+        elif intent_result.category == IntentCategory.TECHNICAL_AI_QUERY:
+            logger.info(f"Processing technical AI query (confidence: {intent_result.confidence:.2f})")
             
-            # 4. Handle non-repository queries
-            elif not intent_result.should_process:
-                logger.info(f"Query filtered by intent classifier: {intent_result.category.value} (confidence: {intent_result.confidence:.2f})")
+            try:
+                from ..query.technical_handler import get_technical_handler
                 
-                # Before returning generic response, check if it contains taxonomy concepts
-                if intent_classifier.contains_taxonomy_concepts(message):
-                    logger.info("Query contains taxonomy concepts despite low confidence - routing to taxonomy handler")
-                    try:
-                        from ..taxonomy.taxonomy_handler import TaxonomyHandler
-                        taxonomy_handler = TaxonomyHandler()
-                        taxonomy_response = taxonomy_handler.handle_taxonomy_query(message)
-                        
-                        response_content = taxonomy_response.content
-                        if self.gemini_model and language_info and language_info.get('code', 'en') != 'en':
-                            try:
-                                from ..services.language_service import language_service
-                                language_code = language_info.get('code', 'en')
-                                language_name = language_info.get('english_name', 'English')
-                                special_prompt = language_service.get_language_prompt(language_code)
-                                
-                                translation_prompt = f"""Translate to {language_name}: {response_content}"""
-                                response_content = self.gemini_model.generate(translation_prompt, [])
-                            except Exception as e:
-                                logger.warning(f"Translation failed: {e}")
-                        
-                        sources = [{
-                            'metadata': {'title': 'AI Risk Repository Preprint', 'rid': 'PREPRINT-001'},
-                            'page_content': 'Taxonomy reference'
-                        }]
-                        
-                        self._update_conversation_history(conversation_id, message, response_content)
-                        return response_content, sources, language_info
-                    except Exception as e:
-                        logger.error(f"Taxonomy fallback failed: {e}")
+                # Get technical handler
+                technical_handler = get_technical_handler()
                 
-                if intent_result.suggested_response:
-                    # Use session language instead of detecting from query
-                    if self.gemini_model and language_info:
-                        try:
-                            # Get language details
-                            from ..services.language_service import language_service
-                            language_code = language_info.get('code', 'en')
-                            language_name = language_info.get('english_name', 'English')
-                            special_prompt = language_service.get_language_prompt(language_code)
-                            
-                            language_prompt = f"""English response template: {intent_result.suggested_response}
-
-CRITICAL INSTRUCTION: 
-You MUST translate the entire English response template above to {language_name}.
-{special_prompt}
-Maintain the same helpful tone and all the AI risk topic suggestions.
-Do NOT add any extra text or explanations.
-
-Your response must be ONLY the translated text, nothing else."""
-                            
-                            response = self.gemini_model.generate(language_prompt, [])
-                            logger.info(f"Generated {language_name} out-of-scope response")
-                        except Exception as e:
-                            logger.warning(f"Failed to translate out-of-scope response: {e}")
-                            # Fallback to English template
-                            response = intent_result.suggested_response
-                    else:
-                        response = intent_result.suggested_response
-                else:
-                    # Use prompt manager to get language-aware out-of-scope response
-                    from ...config.prompts import prompt_manager
-                    out_of_scope_prompt = prompt_manager._handle_out_of_scope(message, language_info)
-                    
-                    # Generate response using Gemini to ensure correct language
-                    if self.gemini_model:
-                        try:
-                            response = self.gemini_model.generate(out_of_scope_prompt, [])
-                        except Exception as e:
-                            logger.warning(f"Failed to generate out-of-scope response: {e}")
-                            # Fallback to generic message
-                            response = "This topic is outside the AI Risk Repository's scope."
-                    else:
-                        response = "This topic is outside the AI Risk Repository's scope."
+                # Set up Gemini model
+                if self.gemini_model:
+                    technical_handler.gemini_model = self.gemini_model
                 
-                # Update conversation history even for filtered queries
-                self._update_conversation_history(conversation_id, message, response)
-                return response, [], language_info
+                # Execute technical query with language info
+                with tracing_service.span("technical_query"):
+                    response, sources = technical_handler.handle_technical_query(message, language_info)
+            except ImportError as e:
+                logger.error(f"Failed to import technical handler: {e}")
+                response = "Technical query handler is currently unavailable."
+                sources = []
             
-            # 4. Process repository-related queries
-            logger.info(f"Processing repository query (intent confidence: {intent_result.confidence:.2f})")
+            # Update conversation history
+            self._update_conversation_history(conversation_id, message, response)
+            return response, sources, language_info
+        
+        elif intent_result.category == IntentCategory.CROSS_DB_QUERY:
+            logger.info(f"Processing cross-database query (confidence: {intent_result.confidence:.2f})")
             
-            # 4. Query refinement check (Phase 2.2) - handle over-broad queries
             try:
-                from ...core.query.refinement import query_refiner
-                refinement_result = query_refiner.analyze_query(message)
+                from ..metadata import metadata_service
+                
+                # Initialize metadata service if needed
+                if not metadata_service._initialized:
+                    metadata_service.initialize()
+                
+                # Set gemini model for language-aware messages
+                if self.gemini_model:
+                    metadata_service.gemini_model = self.gemini_model
+                
+                # First, try to get structured data from metadata service
+                with tracing_service.span("metadata_query"):
+                    metadata_response, raw_results = metadata_service.query(message)
             except ImportError as e:
-                logger.warning(f"Failed to import query refiner: {e}")
-                refinement_result = None
+                logger.error(f"Failed to import metadata service: {e}")
+                metadata_response = "Metadata service is currently unavailable."
+                raw_results = []
             
-            # 5. Handle over-broad queries with suggestions (less aggressive)
-            if refinement_result and refinement_result.needs_refinement and refinement_result.complexity.value == 'very_broad':
-                logger.info(f"Query is very broad and needs refinement: {refinement_result.complexity.value}")
+            # Also get related documents from vector store for context
+            query_type, domain = self.query_processor.analyze_query(message, conversation_id)
+            
+            # For cross-domain queries, get documents from multiple domains
+            if 'between' in message.lower() or 'cross-domain' in message.lower() or 'cross domain' in message.lower():
+                # Extract domains mentioned in query
+                domains_mentioned = []
+                for d in ['healthcare', 'finance', 'education', 'military', 'legal']:
+                    if d in message.lower():
+                        domains_mentioned.append(d)
                 
-                # Use auto-refined query if available
-                if refinement_result.refined_query:
-                    logger.info(f"Using auto-refined query: {refinement_result.refined_query}")
-                    message = refinement_result.refined_query
-                elif refinement_result.suggestions:
-                    # Only block very_broad queries with suggestions, let broad queries proceed
-                    suggestion_response = query_refiner.format_suggestions_response(refinement_result, language_info)
-                    self._update_conversation_history(conversation_id, message, suggestion_response)
-                    return suggestion_response, [], language_info
-            elif refinement_result and refinement_result.needs_refinement and refinement_result.complexity.value == 'broad':
-                # For broad queries, use auto-refined query if available, but don't block with suggestions
-                if refinement_result.refined_query:
-                    logger.info(f"Using auto-refined query for broad query: {refinement_result.refined_query}")
-                    message = refinement_result.refined_query
-                # Let broad queries proceed to retrieval even if they have suggestions
-            
-            # 6. Analyze the query
-            query_type, domain = self.query_processor.analyze_query(message)
+                # Get documents for each domain
+                docs = []
+                if domains_mentioned and self.vector_store:
+                    for domain_term in domains_mentioned:
+                        # Search for privacy risks in each specific domain
+                        search_query = f"{domain} risks {domain_term}"
+                        domain_docs = self.vector_store.get_relevant_documents(
+                            search_query, k=3
+                        )
+                        docs.extend(domain_docs)
+                    # Remove duplicates
+                    seen = set()
+                    unique_docs = []
+                    for doc in docs:
+                        doc_id = doc.metadata.get('rid', doc.page_content[:50])
+                        if doc_id not in seen:
+                            seen.add(doc_id)
+                            unique_docs.append(doc)
+                    docs = unique_docs[:6]  # Limit to 6 docs total
+                else:
+                    docs = self.vector_store.get_relevant_documents(message, k=4) if self.vector_store else []
+            else:
+                docs = self.vector_store.get_relevant_documents(message, k=3) if self.vector_store else []
             
-            # 7. Retrieve relevant documents
-            docs = self._retrieve_documents(message, query_type, domain)
+            # Combine results if we have both
+            if docs and raw_results:
+                # Create enriched response combining both sources
+                combined_response = f"{metadata_response}\n\n**Related Repository Documents:**\n"
+                for i, doc in enumerate(docs[:3], 1):
+                    rid = doc.metadata.get('rid', 'Unknown')
+                    title = doc.metadata.get('title', 'Untitled')
+                    combined_response += f"\n{i}. {title} ({rid})"
+                
+                # Combine sources for Related Documents tab
+                combined_sources = raw_results + docs
+                
+                self._update_conversation_history(conversation_id, message, combined_response)
+                return combined_response, combined_sources
+            else:
+                # Return just metadata results if no documents found
+                self._update_conversation_history(conversation_id, message, metadata_response)
+                return metadata_response, raw_results
+        
+        # 3. Multi-stage classification for better taxonomy detection
+        # Check taxonomy relevance if initial classification is uncertain
+        if intent_result.confidence < 0.7 and intent_result.category != IntentCategory.TAXONOMY_QUERY:
+            # Check taxonomy relevance
+            taxonomy_relevance = intent_classifier.check_taxonomy_relevance(message)
+            logger.info(f"Taxonomy relevance check: {taxonomy_relevance:.2f} for uncertain query")
             
-            # 8. Format context
-            context = self._format_context(docs, query_type)
+            # Lower threshold and add concept checking for better coverage
+            if taxonomy_relevance > 0.4 or intent_classifier.contains_taxonomy_concepts(message):
+                # Route to taxonomy handler
+                logger.info(f"Routing to taxonomy handler based on relevance score: {taxonomy_relevance:.2f}")
+                try:
+                    taxonomy_response = self._get_taxonomy_response(message, language_info)
+                    response_content = taxonomy_response.content
+                    
+                    sources = [{
+                        'metadata': {'title': taxonomy_response.source, 'rid': 'PREPRINT-001'},
+                        'page_content': 'AI Risk Repository Preprint - Taxonomy reference'
+                    }]
+                    
+                    self._update_conversation_history(conversation_id, message, response_content)
+                    return response_content, sources, language_info
+                except Exception as e:
+                    logger.error(f"Failed to handle as taxonomy query: {e}")
+        
+        # 4. Handle non-repository queries
+        elif not intent_result.should_process:
+            logger.info(f"Query filtered by intent classifier: {intent_result.category.value} (confidence: {intent_result.confidence:.2f})")
             
-            # 9. Generate response
-            response = self._generate_response(message, query_type, domain, context, conversation_id, docs, language_info)
+            # Before returning generic response, check if it contains taxonomy concepts
+            if intent_classifier.contains_taxonomy_concepts(message):
+                logger.info("Query contains taxonomy concepts despite low confidence - routing to taxonomy handler")
+                try:
+                    taxonomy_response = self._get_taxonomy_response(message, language_info)
+                    response_content = taxonomy_response.content
+                    
+                    sources = [{
+                        'metadata': {'title': 'AI Risk Repository Preprint', 'rid': 'PREPRINT-001'},
+                        'page_content': 'Taxonomy reference'
+                    }]
+                    
+                    self._update_conversation_history(conversation_id, message, response_content)
+                    return response_content, sources, language_info
+                except Exception as e:
+                    logger.error(f"Taxonomy fallback failed: {e}")
             
-            # 10. Check if web search needed and append results
-            try:
-                from .smart_web_search import smart_web_search
-                web_results = smart_web_search.search_if_needed(message, context, len(docs), domain)
-                if web_results:
-                    web_context = smart_web_search.format_search_results(web_results)
-                    response += web_context
-                    logger.info(f"Added {len(web_results)} web search results to response")
-            except ImportError as e:
-                logger.warning(f"Failed to import smart web search: {e}")
-            
-            # 11. Clean response to remove any unprompted additions
-            # Remove any "Risk Taxonomies" or similar sections that weren't asked for
-            response_lines = response.split('\n')
-            cleaned_lines = []
-            skip_section = False
-            
-            for line in response_lines:
-                # Detect start of unprompted sections
-                if any(trigger in line for trigger in ['Risk Taxonomies', 'Additional Information:', 'You might also be interested']):
-                    skip_section = True
-                    logger.info(f"Removing unprompted section starting with: {line[:50]}")
-                    continue
-                
-                # Reset skip flag on new paragraph/section that looks legitimate
-                if skip_section and line.strip() == '':
-                    skip_section = False
+            if intent_result.suggested_response:
+                # Use session language instead of detecting from query; falls back to the English template
+                response = (self.template_translator.translate('out_of_scope', intent_result.suggested_response, language_info)
+                            or intent_result.suggested_response)
+            else:
+                # Use prompt manager to get language-aware out-of-scope response
+                from ...config.prompts import prompt_manager
+                out_of_scope_prompt = prompt_manager._handle_out_of_scope(message, language_info)
                 
-                if not skip_section:
-                    cleaned_lines.append(line)
-            
-            response = '\n'.join(cleaned_lines).strip()
+                # Generate response using Gemini to ensure correct language
+                if self.gemini_model:
+                    try:
+                        response = self.gemini_model.generate(out_of_scope_prompt, [])
+                    except Exception as e:
+                        logger.warning(f"Failed to generate out-of-scope response: {e}")
+                        # Fallback to generic message
+                        response = "This topic is outside the AI Risk Repository's scope."
+                else:
+                    response = "This topic is outside the AI Risk Repository's scope."
             
-            # 12. Enhance with citations
-            enhanced_response = self.citation_service.enhance_response_with_citations(response, docs, session_id)
+            # Update conversation history even for filtered queries
+            self._update_conversation_history(conversation_id, message, response)
+            return response, [], language_info
+        
+        # 4. Process repository-related queries
+        logger.info(f"Processing repository query (intent confidence: {intent_result.confidence:.2f})")
+        
+        # 4. Query refinement check (Phase 2.2) - handle over-broad queries
+        try:
+            from ...core.query.refinement import query_refiner
+            refinement_result = query_refiner.analyze_query(message)
+        except ImportError as e:
+            logger.warning(f"Failed to import query refiner: {e}")
+            refinement_result = None
+        
+        # 5. Handle over-broad queries with suggestions (less aggressive)
+        if refinement_result and refinement_result.needs_refinement and refinement_result.complexity.value == 'very_broad':
+            logger.info(f"Query is very broad and needs refinement: {refinement_result.complexity.value}")
             
-            # 13. Self-validation chain for quality assurance
-            try:
-                from ..validation.response_validator import validation_chain
-                validated_response, validation_results = validation_chain.validate_and_improve(
-                    response=enhanced_response,
-                    query=message,
-                    documents=docs,
-                    domain=domain
+            # Use auto-refined query if available
+            if refinement_result.refined_query:
+                logger.info(f"Using auto-refined query: {refinement_result.refined_query}")
+                message = refinement_result.refined_query
+            elif refinement_result.suggestions:
+                # Only block very_broad queries with suggestions, let broad queries proceed
+                suggestion_response = query_refiner.format_suggestions_response(
+                    refinement_result, language_info,
+                    translate=lambda text, remember=True: self.template_translator.translate(
+                        'refinement', text, language_info, remember=remember)
                 )
-            except ImportError as e:
-                logger.warning(f"Failed to import validation chain: {e}")
-                validated_response = enhanced_response
-                validation_results = None
-            
-            # Log validation results
-            if validation_results:
-                logger.info(f"Response validation: {validation_results.overall_result.value} "
-                           f"(score: {validation_results.overall_score:.2f})")
-                
-                if validation_results.overall_score < 0.6:
-                    logger.warning(f"Low quality response detected. Recommendations: {validation_results.recommendations}")
+                self._update_conversation_history(conversation_id, message, suggestion_response)
+                return suggestion_response, [], language_info
+        elif refinement_result and refinement_result.needs_refinement and refinement_result.complexity.value == 'broad':
+            # For broad queries, use auto-refined query if available, but don't block with suggestions
+            if refinement_result.refined_query:
+                logger.info(f"Using auto-refined query for broad query: {refinement_result.refined_query}")
+                message = refinement_result.refined_query
+            # Let broad queries proceed to retrieval even if they have suggestions
+        
+        # 6. Analyze the query
+        with tracing_service.span("analyze_query"):
+            query_type, domain = self.query_processor.analyze_query(message)
+        
+        # 7. Retrieve relevant documents
+        with tracing_service.span("retrieval", domain=domain) as span:
+            docs = self._retrieve_documents(message, query_type, domain)
+            if span is not None:
+                span.set_attribute("docs", len(docs))
+        
+        # 8. Format context
+        context = self._format_context(docs, query_type)
+        
+        return GenerationPlan(message, conversation_id, session_id, query_type, domain, docs, context, language_info)
+    
+    def _finish_query(self, plan: GenerationPlan, response: str) -> Tuple[str, List[Any], Optional[Dict[str, Any]]]:
+        """Append web results, clean, cite and validate a generated answer, and record it in the history."""
+        message, conversation_id, session_id = plan.message, plan.conversation_id, plan.session_id
+        docs, context, domain, language_info = plan.docs, plan.context, plan.domain, plan.language_info
+        # 10. Check if web search needed and append results
+        try:
+            from .smart_web_search import smart_web_search
+            with tracing_service.span("web_search"):
+                web_results = smart_web_search.search_if_needed(message, context, len(docs), domain)
+            if web_results:
+                web_context = smart_web_search.format_search_results(web_results)
+                response += web_context
+                logger.info(f"Added {len(web_results)} web search results to response")
+        except ImportError as e:
+            logger.warning(f"Failed to import smart web search: {e}")
+        
+        # 11. Clean response to remove any unprompted additions
+        # Remove any "Risk Taxonomies" or similar sections that weren't asked for
+        response_lines = response.split('\n')
+        cleaned_lines = []
+        skip_section = False
+        
+        for line in response_lines:
+            # Detect start of unprompted sections
+            if any(trigger in line for trigger in ['Risk Taxonomies', 'Additional Information:', 'You might also be interested']):
+                skip_section = True
+                logger.info(f"Removing unprompted section starting with: {line[:50]}")
+                continue
             
-            # 14. Update conversation history
-            self._update_conversation_history(conversation_id, message, validated_response)
+            # Reset skip flag on new paragraph/section that looks legitimate
+            if skip_section and line.strip() == '':
+                skip_section = False
             
-            return validated_response, docs, language_info
+            if not skip_section:
+                cleaned_lines.append(line)
+        
+        response = '\n'.join(cleaned_lines).strip()
+        
+        # 12. Enhance with citations
+        with tracing_service.span("citation_enhancement"):
+            enhanced_response = self.citation_service.enhance_response_with_citations(response, docs, session_id)
+        
+        # 13. Self-validation chain for quality assurance
+        background_validation = None
+        try:
+            from ..validation.response_validator import validation_chain
+            if settings.VALIDATION_MODE == 'async':
+                # Answer now; scores (and any revision) arrive from a background worker
+                background_validation = validation_chain.validate_async(enhanced_response, message, docs, domain)
+                validated_response, validation_results = enhanced_response, None
+            else:
+                with tracing_service.span("validation"):
+                    validated_response, validation_results = validation_chain.validate_and_improve(
+                        response=enhanced_response,
+                        query=message,
+                        documents=docs,
+                        domain=domain
+                    )
+        except ImportError as e:
+            logger.warning(f"Failed to import validation chain: {e}")
+            validated_response = enhanced_response
+            validation_results = None
+        
+        # Log validation results
+        if validation_results:
+            logger.info(f"Response validation: {validation_results.overall_result.value} "
+                       f"(score: {validation_results.overall_score:.2f})")
             
-        except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
-            # Try to get language info safely
-            language_info = None
-            if session_id and session_id in self.session_languages:
-                language_info = self.session_languages.get(session_id)
-            if not language_info:
-                language_info = self._get_default_language_info()
-            # Translate error message
-            english_error = f"I encountered an error while processing your question: {str(e)}"
-            error_response = self._translate_error_message(english_error, language_info)
-            return error_response, [], language_info
+            if validation_results.overall_score < 0.6:
+                logger.warning(f"Low quality response detected. Recommendations: {validation_results.recommendations}")
+        
+        # 14. Update conversation history
+        self._update_conversation_history(conversation_id, message, validated_response)
+        if background_validation is not None:
+            # A background revision replaces the answer in history, as it does on the client
+            background_validation.add_done_callback(
+                lambda future: self._store_revision(conversation_id, validated_response, future)
+            )
+        
+        return validated_response, docs, language_info
+    
+    def _error_result(self, e: Exception, session_id: Optional[str]) -> Tuple[str, List[Any], Dict[str, Any]]:
+        """Translated error answer for a query that failed."""
+        logger.error(f"Error processing query: {str(e)}")
+        # Try to get language info safely
+        language_info = None
+        if session_id:
+            language_info = self.get_session_language(session_id)
+        if not language_info:
+            language_info = self._get_default_language_info()
+        # Translate error message
+        english_error = f"I encountered an error while processing your question: {str(e)}"
+        error_response = self._translate_error_message(english_error, language_info, remember=False)
+        return error_response, [], language_info
     
     def _retrieve_documents(self, message: str, query_type: str, domain: str = None) -> List[Document]:
         """Retrieve relevant documents with relevance threshold filtering."""
@@ -682,75 +714,107 @@ Your response must be ONLY the translated text, nothing else."""
             logger.warning("No Gemini model available")
             return self._create_fallback_response(context, message, language_info)
         
+        prompt, history = None, None
         try:
-            # Prepare conversation history (with topic change detection)
-            history = self._get_conversation_history(conversation_id, query_type)
-            
-            # Generate enhanced prompt with session awareness, RID information, and language
-            prompt = self.query_processor.generate_prompt(message, query_type, domain, context, conversation_id, docs, language_info)
-            
-            # DEBUG: Log the actual prompt being sent to Gemini
-            logger.info(f"=== GEMINI PROMPT DEBUG ===")
-            logger.info(f"Query: {message}")
-            logger.info(f"Query Type: {query_type}")
-            logger.info(f"Context length: {len(context) if context else 0}")
-            logger.info(f"Documents count: {len(docs) if docs else 0}")
-            logger.info(f"Prompt preview (first 500 chars): {prompt[:500]}...")
-            logger.info(f"=== END GEMINI PROMPT DEBUG ===")
+            prompt, history = self._build_generation_prompt(message, query_type, domain, context, conversation_id, docs, language_info)
             
             # Generate response
             response = self.gemini_model.generate(prompt, history)
+            self._log_generated_response(response)
+            return response
             
-            # DEBUG: Log the raw response from Gemini
-            logger.info(f"=== GEMINI RESPONSE DEBUG ===")
-            logger.info(f"Raw response length: {len(response)}")
-            logger.info(f"Response preview (first 200 chars): {response[:200]}...")
-            logger.info(f"=== END GEMINI RESPONSE DEBUG ===")
-            
+        except Exception as e:
+            return self._recover_generation_error(e, message, prompt, history, language_info)
+    
+    async def _agenerate_response(self, plan: GenerationPlan) -> str:
+        """Async variant of _generate_response: the model call is awaited."""
+        if not self.gemini_model:
+            logger.warning("No Gemini model available")
+            return await asyncio.to_thread(self._create_fallback_response, plan.context, plan.message, plan.language_info)
+        
+        prompt, history = None, None
+        try:
+            prompt, history = self._build_generation_prompt(plan.message, plan.query_type, plan.domain, plan.context,
+                                                            plan.conversation_id, plan.docs, plan.language_info)
+            response = await self.gemini_model.agenerate(prompt, history)
+            self._log_generated_response(response)
             return response
             
         except Exception as e:
-            error_str = str(e).lower()
+            # Rare path (refusals, errors); its retry and translation calls run in a worker thread
+            return await asyncio.to_thread(self._recover_generation_error, e, plan.message, prompt, history, plan.language_info)
+    
+    def _build_generation_prompt(self, message: str, query_type: str, domain: str, context: str, conversation_id: str,
+                                 docs: List[Document] = None, language_info: Dict[str, Any] = None):
+        """Build the answer prompt and the conversation history to send with it."""
+        # Prepare conversation history (with topic change detection)
+        history = self._get_conversation_history(conversation_id, query_type)
+        
+        # Generate enhanced prompt with session awareness, RID information, and language
+        prompt = self.query_processor.generate_prompt(message, query_type, domain, context, conversation_id, docs, language_info)
+        
+        # DEBUG: Log the actual prompt being sent to Gemini
+        logger.info(f"=== GEMINI PROMPT DEBUG ===")
+        logger.info(f"Query: {message}")
+        logger.info(f"Query Type: {query_type}")
+        logger.info(f"Context length: {len(context) if context else 0}")
+        logger.info(f"Documents count: {len(docs) if docs else 0}")
+        logger.info(f"Prompt preview (first 500 chars): {prompt[:500]}...")
+        logger.info(f"=== END GEMINI PROMPT DEBUG ===")
+        
+        return prompt, history
+    
+    @staticmethod
+    def _log_generated_response(response: str) -> None:
+        # DEBUG: Log the raw response from Gemini
+        logger.info(f"=== GEMINI RESPONSE DEBUG ===")
+        logger.info(f"Raw response length: {len(response)}")
+        logger.info(f"Response preview (first 200 chars): {response[:200]}...")
+        logger.info(f"=== END GEMINI RESPONSE DEBUG ===")
+    
+    def _recover_generation_error(self, e: Exception, message: str, prompt: Optional[str],
+                                  history: Optional[List[Dict[str, Any]]], language_info: Dict[str, Any] = None) -> str:
+        """Retry a safety refusal with educational framing, or turn the error into a user-facing message."""
+        error_str = str(e).lower()
+        
+        # Check if this is a safety/policy refusal
+        if any(term in error_str for term in ['safety', 'policy', 'harmful', 'refused', 'violate', 'inappropriate']):
+            logger.warning(f"Gemini refused query due to safety filters. Query: {message[:100]}...")
+            logger.warning(f"Refusal reason: {str(e)}")
             
-            # Check if this is a safety/policy refusal
-            if any(term in error_str for term in ['safety', 'policy', 'harmful', 'refused', 'violate', 'inappropriate']):
-                logger.warning(f"Gemini refused query due to safety filters. Query: {message[:100]}...")
-                logger.warning(f"Refusal reason: {str(e)}")
-                
-                # Try once more with educational context
-                try:
-                    educational_prompt = f"""Context: Analyzing documented AI risks from the MIT AI Risk Repository for research purposes.
+            # Try once more with educational context
+            try:
+                if prompt is None:
+                    raise e
+                educational_prompt = f"""Context: Analyzing documented AI risks from the MIT AI Risk Repository for research purposes.
                     
 {prompt}
 
 Focus on: risk assessment, prevention strategies, and safety measures."""
-                    
-                    logger.info("Retrying with educational context...")
+                
+                logger.info("Retrying with educational context...")
+                with usage_stage(PipelineStage.REVISION):
                     response = self.gemini_model.generate(educational_prompt, history)
-                    logger.info("Successfully generated response with educational context")
-                    return response
-                    
-                except Exception as retry_error:
-                    logger.error(f"Gemini refused even with educational context: {retry_error}")
-                    # Return a helpful message to the user in their language
-                    english_msg = ("I apologize, but I'm unable to provide detailed information on this specific topic due to content restrictions. "
-                                  "Please try rephrasing your question to focus on risk prevention, safety measures, or policy considerations. "
-                                  "You can also explore related topics like AI safety frameworks, risk mitigation strategies, or ethical guidelines.")
-                    return self._translate_error_message(english_msg, language_info)
-            else:
-                # For non-safety errors, return the original error in user's language
-                logger.error(f"Error generating response: {str(e)}")
-                english_error = f"I encountered an error while generating a response: {str(e)}"
-                return self._translate_error_message(english_error, language_info)
+                logger.info("Successfully generated response with educational context")
+                return response
+                
+            except Exception as retry_error:
+                logger.error(f"Gemini refused even with educational context: {retry_error}")
+                # Return a helpful message to the user in their language
+                return self._translate_error_message(CONTENT_RESTRICTION_MESSAGE, language_info)
+        else:
+            # For non-safety errors, return the original error in user's language
+            logger.error(f"Error generating response: {str(e)}")
+            english_error = f"I encountered an error while generating a response: {str(e)}"
+            return self._translate_error_message(english_error, language_info, remember=False)
     
     def _create_fallback_response(self, context: str, message: str, language_info: Dict[str, Any] = None) -> str:
         """Create a fallback response when AI model is not available."""
         if context:
             english_msg = f"Based on the AI Risk Repository, here's what I found:\\n\\n{context[:1000]}..."
-            return self._translate_error_message(english_msg, language_info)
+            return self._translate_error_message(english_msg, language_info, remember=False)
         else:
-            english_msg = "I'm sorry, but I couldn't find specific information in the AI Risk Repository for your query. The repository covers risks related to discrimination, privacy, misinformation, malicious use, human-computer interaction, socioeconomic impacts, and system safety."
-            return self._translate_error_message(english_msg, language_info)
+            return self._translate_error_message(NO_INFORMATION_MESSAGE, language_info)
     
     def _get_conversation_history(self, conversation_id: str, current_query_type: str = None) -> List[Dict[str, Any]]:
         """Get conversation history for the model.
@@ -759,11 +823,12 @@ Focus on: risk assessment, prevention strategies, and safety measures."""
             conversation_id: The conversation ID
             current_query_type: The type of the current query (to detect topic changes)
         """
-        if conversation_id not in self.conversations:
+        conversation = self.session_store.get(self.CONVERSATION_NAMESPACE, conversation_id)
+        if not conversation:
             return []
         
         # Get last N messages
-        history = self.conversations[conversation_id][-settings.MAX_CONVERSATION_HISTORY:]
+        history = conversation[-settings.MAX_CONVERSATION_HISTORY:]
         
         # If this appears to be a completely different topic, limit history
         # to avoid contamination between unrelated queries
@@ -874,8 +939,9 @@ Focus on: risk assessment, prevention strategies, and safety measures."""
             return self._get_default_language_info()
         
         # Check if we already have a language for this session
-        if session_id in self.session_languages:
-            return self.session_languages[session_id]
+        stored_language = self.get_session_language(session_id)
+        if stored_language:
+            return stored_language
         
         # Try to detect language from the first message
         try:
@@ -883,16 +949,17 @@ Focus on: risk assessment, prevention strategies, and safety measures."""
             language_info = language_service.detect_language(message)
             
             # Store for future use
-            self.session_languages[session_id] = language_info
+            self.session_store.set(self.LANGUAGE_NAMESPACE, session_id, language_info)
             
-            logger.info(f"Detected language for session {session_id}: {language_info['english_name']} (confidence: {language_info.get('confidence', 0.9):.2f})")
+            logger.info(f"Detected language for session {session_id}: {language_info['english_name']} "
+                        f"(confidence: {language_info.get('confidence', 0.9):.2f}, {language_info.get('detection_method')})")
             
             return language_info
         except Exception as e:
             logger.warning(f"Failed to detect language: {e}")
             # Fallback to English
             language_info = self._get_default_language_info()
-            self.session_languages[session_id] = language_info
+            self.session_store.set(self.LANGUAGE_NAMESPACE, session_id, language_info)
             return language_info
     
     def set_session_language(self, session_id: str, language_code: str) -> bool:
@@ -910,7 +977,7 @@ Focus on: risk assessment, prevention strategies, and safety measures."""
             from .language_service import language_service
             language_info = language_service.get_language_info(language_code)
             if language_info:
-                self.session_languages[session_id] = language_info
+                self.session_store.set(self.LANGUAGE_NAMESPACE, session_id, language_info)
                 logger.info(f"Manually set language for session {session_id}: {language_info['english_name']}")
                 return True
             return False
@@ -920,69 +987,75 @@ Focus on: risk assessment, prevention strategies, and safety measures."""
     
     def get_session_language(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get current language for a session."""
-        return self.session_languages.get(session_id)
+        return self.session_store.get(self.LANGUAGE_NAMESPACE, session_id)
     
-    def _translate_error_message(self, english_message: str, language_info: Dict[str, Any]) -> str:
+    def _get_taxonomy_response(self, message: str, language_info: Optional[Dict[str, Any]]):
+        """
+        Answer a taxonomy query from the shared handler's precomputed responses.
+        
+        Non-English sessions get the response translated once per language through
+        the translation memory, which persists it across workers and restarts; the
+        handler also keeps the translated response for every later request.
+        Without a model the English response is served, and not counted as a
+        failed translation.
+        """
+        from ..taxonomy.taxonomy_handler import taxonomy_handler
+        
+        language_code = (language_info or {}).get('code', 'en')
+        translator = None
+        if language_code != 'en' and self.gemini_model:
+            def translator(content: str) -> Optional[str]:
+                return self.template_translator.translate('taxonomy', content, language_info)
+        
+        with tracing_service.span("taxonomy_query") as span:
+            taxonomy_response = taxonomy_handler.handle_taxonomy_query(message, language_code, translator)
+            if span is not None:
+                span.set_attribute("language", taxonomy_response.language)
+        return taxonomy_response
+    
+    def _translate_error_message(self, english_message: str, language_info: Dict[str, Any], remember: bool = True) -> str:
         """
         Translate an error message to the user's session language.
         
         Args:
             english_message: The error message in English
             language_info: Language information for the session
+            remember: Serve and store the translation in the translation memory; False
+                for messages that embed per-request details
             
         Returns:
             Translated error message or original if translation fails
         """
-        # If no language info or already English, return as-is
-        if not language_info or language_info.get('code') == 'en':
-            return english_message
-        
-        # Try to translate using Gemini
-        if self.gemini_model:
-            try:
-                from ..services.language_service import language_service
-                language_code = language_info.get('code', 'en')
-                language_name = language_info.get('english_name', 'English')
-                special_prompt = language_service.get_language_prompt(language_code)
-                
-                translation_prompt = f"""Translate this error message to {language_name}:
-
-{english_message}
-
-CRITICAL INSTRUCTIONS:
-1. Translate the ENTIRE message to {language_name}
-2. Maintain the same helpful and apologetic tone
-3. Keep any technical details if present
-4. {special_prompt}
-5. Return ONLY the translated message, no explanations
-
-Translated message:"""
-                
-                translated = self.gemini_model.generate(translation_prompt, [])
-                logger.info(f"Translated error message to {language_name}")
-                return translated
-                
-            except Exception as e:
-                logger.warning(f"Failed to translate error message: {e}")
-                return english_message
-        
-        return english_message
+        translated = self.template_translator.translate('error', english_message, language_info, remember=remember)
+        return translated or english_message
+    
+    def _store_revision(self, conversation_id: str, response: str, future) -> None:
+        """Replace a response in conversation history with its background revision, if there is one."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        revised_response, _ = future.result()
+        if not revised_response or revised_response == response:
+            return
+        conversation = list(self.session_store.get(self.CONVERSATION_NAMESPACE, conversation_id) or [])
+        for i in range(len(conversation) - 1, -1, -1):
+            if conversation[i]['role'] == 'assistant' and conversation[i]['content'] == response:
+                conversation[i] = {"role": "assistant", "content": revised_response}
+                self.session_store.set(self.CONVERSATION_NAMESPACE, conversation_id, conversation)
+                return
     
     def _update_conversation_history(self, conversation_id: str, message: str, response: str) -> None:
         """Update conversation history."""
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = []
+        conversation = list(self.session_store.get(self.CONVERSATION_NAMESPACE, conversation_id) or [])
         
         # Add user message and assistant response
-        self.conversations[conversation_id].extend([
+        conversation.extend([
             {"role": "user", "content": message},
             {"role": "assistant", "content": response}
         ])
         
         # Keep only recent messages to avoid memory issues
         max_messages = settings.MAX_CONVERSATION_HISTORY * 2  # *2 for user+assistant pairs
-        if len(self.conversations[conversation_id]) > max_messages:
-            self.conversations[conversation_id] = self.conversations[conversation_id][-max_messages:]
+        self.session_store.set(self.CONVERSATION_NAMESPACE, conversation_id, conversation[-max_messages:])
     
     def generate_use_cases(self, domain: str) -> List[str]:
         """Generate use cases for a given domain."""
@@ -1004,8 +1077,7 @@ Translated message:"""
 
     def reset_conversation(self, conversation_id: str) -> None:
         """Reset conversation history."""
-        if conversation_id in self.conversations:
-            self.conversations[conversation_id] = []
+        self.session_store.delete(self.CONVERSATION_NAMESPACE, conversation_id)
         
         # Also reset the model if it supports it
         if self.gemini_model and hasattr(self.gemini_model, 'reset_conversation'):
@@ -4,33 +4,56 @@ Citation service for handling document references and snippets.
 import os
 import hashlib
 import re
-from typing import List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 from langchain.docstore.document import Document
 
 from ...config.logging import get_logger
 from ...config.settings import settings
-from ...core.storage.snippet_database import snippet_db
+from ...core.storage.snippet_database import SnippetDatabase, snippet_db
+from ...core.storage.snippet_records import build_snippet_record, record_digest
 from datetime import datetime
 
 logger = get_logger(__name__)
 
+# Split on periods that are followed by a space OR uppercase letter (handles no space cases)
+# Also handles exclamation and question marks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z])|(?<=[.!?])(?=[A-Z])')
+
+PARAGRAPH_TRANSITIONS = ('Furthermore', 'Additionally', 'However', 'Moreover',
+                         'Therefore', 'Meanwhile', 'This includes', 'This raises',
+                         'Given', 'To ensure')
+
+# Every citation marker in one alternation: (RID-12345) / RID-12345, and the
+# legacy "SECTION 1" / "Source 1" / "Document 1" / "Entry 1" references
+CITATION_MARKER = re.compile(r'(?:\()?RID-(\d{5})(?:\))?|(?:SECTION|Source|Document|Entry) ([1-9]\d*)')
+
+@dataclass
+class CitationContext:
+    """Citation state of one response; built per call so concurrent requests share nothing."""
+    session_id: Optional[str]
+    docs: List[Document]
+    rid_citation_map: Dict[str, str] = field(default_factory=dict)
+    rid_to_doc: Dict[str, Document] = field(default_factory=dict)
+    # Position (1-based) -> RID of the docs the legacy references can point at
+    legacy_rids: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def available_rids(self) -> List[str]:
+        return [doc.metadata.get('rid') for doc in self.docs if doc.metadata.get('rid')]
+
 class CitationService:
     """Handles citation generation and snippet management with RID-based citations."""
     
-    def __init__(self):
+    def __init__(self, snippet_store: Optional[SnippetDatabase] = None):
         self.snippets_dir = settings.DOC_SNIPPETS_DIR
         # Ensure snippets directory exists for legacy support
         self.snippets_dir.mkdir(parents=True, exist_ok=True)
-        
-        # RID to citation mapping for deterministic citation replacement
-        self.rid_citation_map = {}
-        
-        # Current session ID (will be set per request)
-        self.current_session_id = None
+        self.snippet_store = snippet_store or snippet_db
     
     def enhance_response_with_citations(self, response: str, docs: List[Document], session_id: str = None) -> str:
         """
-        Add RID-based citations to the response text with inline highlighting.
+        Add RID-based citations to the response text.
         
         Args:
             response: Generated response text
@@ -38,182 +61,115 @@ class CitationService:
             session_id: Session ID for storing snippets
             
         Returns:
-            Response with enhanced RID-based citations and highlighting
+            Response with enhanced RID-based citations
         """
         if not docs:
             return response
         
-        # Set current session for this request
-        self.current_session_id = session_id
+        context = self._build_context(docs, session_id)
         
-        # Build RID citation mapping
-        self.rid_citation_map = {}
-        for doc in docs:
-            rid = doc.metadata.get('rid', None)
-            if rid:
-                citation = self._format_rid_citation(doc)
-                self.rid_citation_map[rid] = citation
-                
-                # Save snippet to database if session ID provided
-                if session_id:
-                    self._save_rid_snippet_to_db(doc, rid, session_id)
-                else:
-                    # Fall back to file system for legacy support
-                    self._save_rid_snippet(doc, rid)
+        # Snippets of the whole response go to the database in one transaction
+        if session_id:
+            self._save_rid_snippets_to_db(context.rid_to_doc, session_id)
+        else:
+            # Fall back to file system for legacy support
+            for rid, doc in context.rid_to_doc.items():
+                self._save_rid_snippet(doc, rid)
         
         # IMPORTANT: Apply paragraph formatting FIRST before adding citations
         # This prevents citations from interfering with sentence splitting
-        enhanced_response = self._format_paragraphs(response)
+        paragraphs = self._split_paragraphs(response)
         
-        # Replace RID placeholders and legacy patterns
-        enhanced_response = self._replace_rid_citations(enhanced_response, docs)
-        
-        # Add inline highlighting for supported claims
-        enhanced_response = self._add_inline_highlighting(enhanced_response, docs)
+        # Replace RID placeholders and legacy patterns in a single pass
+        enhanced_response = self._replace_citations('\n\n'.join(paragraphs), context)
         
         # Apply section-level citation validation
-        enhanced_response = self._validate_section_citations(enhanced_response, docs)
+        enhanced_response = self._validate_section_citations(enhanced_response, context)
         
-        logger.info(f"RID citation enhancement complete. RIDs processed: {len(self.rid_citation_map)}")
+        logger.info(f"RID citation enhancement complete. RIDs processed: {len(context.rid_citation_map)}")
         return enhanced_response
     
-    def _replace_rid_citations(self, response: str, docs: List[Document]) -> str:
-        """Replace RID placeholders and legacy section references with proper citations."""
-        enhanced_response = response
-        
-        # First, build a complete RID to document mapping from all docs
-        rid_to_doc = {}
-        for doc in docs:
-            rid = doc.metadata.get('rid')
+    def _build_context(self, docs: List[Document], session_id: Optional[str]) -> CitationContext:
+        """Map the RIDs of the documents to their citations."""
+        context = CitationContext(session_id=session_id, docs=docs)
+        for i, doc in enumerate(docs, 1):
+            rid = doc.metadata.get('rid', None)
             if rid:
-                rid_to_doc[rid] = doc
-        
-        # Replace any RID-##### patterns with proper citations (single comprehensive pass)
-        import re
-        
-        # Single pattern to catch all variations, prioritizing parenthetical ones
-        # This pattern matches: (RID-12345) or RID-12345, but captures the RID number
-        rid_pattern = r'(?:\()?RID-(\d{5})(?:\))?'
+                context.rid_citation_map[rid] = self._format_rid_citation(doc)
+                context.rid_to_doc[rid] = doc
+                context.legacy_rids[i] = rid
+        return context
+    
+    def _replace_citations(self, response: str, context: CitationContext) -> str:
+        """Replace RID placeholders and legacy section references with proper citations."""
+        replaced = 0
         
-        def replace_rid(match):
-            # Extract the RID part (RID-##### format)
-            rid = f"RID-{match.group(1)}"
-            
-            # Try to get from existing citation map first
-            if rid in self.rid_citation_map:
-                logger.info(f"✓ Using existing citation for {rid}")
-                return self.rid_citation_map[rid]
-            
-            # If not in map but we have the document, create citation on-the-fly
-            if rid in rid_to_doc:
-                doc = rid_to_doc[rid]
-                citation = self._format_rid_citation(doc)
-                self.rid_citation_map[rid] = citation
-                logger.info(f"✓ Created on-the-fly citation for {rid}")
-                return citation
-            
-            # If RID not found in docs, convert to clickable link anyway
-            logger.warning(f"RID {rid} not found in documents but making clickable")
-            return f"[{rid}](/snippet/{rid})"
-        
-        # Apply the pattern once
-        before_count = len(re.findall(rid_pattern, enhanced_response))
-        enhanced_response = re.sub(rid_pattern, replace_rid, enhanced_response)
-        after_count = len(re.findall(rid_pattern, enhanced_response))
-        if before_count > 0:
-            logger.info(f"✓ RID pattern found {before_count} matches, {before_count - after_count} replaced")
-        
-        # Handle legacy patterns (SECTION X, Document X) for backward compatibility
-        for i, doc in enumerate(docs, 1):
-            rid = doc.metadata.get('rid')
-            if not rid:
-                continue
-                
-            citation = self.rid_citation_map.get(rid, f"[Source {i}]")
+        def replace_marker(match):
+            nonlocal replaced
+            if match.group(1):
+                replaced += 1
+                return self._rid_citation(f"RID-{match.group(1)}", context)
             
-            # Replace various legacy patterns
-            patterns = [
-                f"SECTION {i}",
-                f"Source {i}",
-                f"Document {i}",
-                f"Entry {i}"
-            ]
-            
-            for pattern in patterns:
-                if pattern in enhanced_response:
-                    enhanced_response = enhanced_response.replace(pattern, citation)
-                    logger.info(f"✓ Replaced legacy pattern '{pattern}' with RID citation")
+            # Legacy reference: the shortest leading number that names a cited doc,
+            # so "Source 12" with a first doc reads as that doc's citation + "2"
+            number = match.group(2)
+            for end in range(1, len(number) + 1):
+                rid = context.legacy_rids.get(int(number[:end]))
+                if rid:
+                    replaced += 1
+                    return context.rid_citation_map[rid] + number[end:]
+            return match.group(0)
+        
+        enhanced_response = CITATION_MARKER.sub(replace_marker, response)
+        if replaced:
+            logger.info(f"✓ Replaced {replaced} citation markers")
         
         # If no citations were added through pattern replacement, append them
-        if self.rid_citation_map and not any(rid in enhanced_response for rid in self.rid_citation_map.keys()):
+        if context.rid_citation_map and not any(rid in enhanced_response for rid in context.rid_citation_map):
             logger.info("No citation patterns found - appending citations to response")
-            citations_list = []
-            for rid, citation in self.rid_citation_map.items():
-                citations_list.append(f"{rid}: {citation}")
-            
-            if citations_list:
-                enhanced_response += "\n\n---\n\n**Sources:**\n" + "\n".join(f"• {cite}" for cite in citations_list)
-                logger.info(f"✓ Appended {len(citations_list)} citations to response")
+            enhanced_response += "\n\n---\n\n**Sources:**\n" + "\n".join(
+                f"• {rid}: {citation}" for rid, citation in context.rid_citation_map.items()
+            )
         
         return enhanced_response
     
-    def _add_inline_highlighting(self, response: str, docs: List[Document]) -> str:
-        """Add bold highlighting to phrases that directly reference source content."""
-        # For now, implement basic highlighting
-        # Future enhancement: use fuzzy matching to find exact phrases from sources
-        return response  # Placeholder for inline highlighting feature
+    def _rid_citation(self, rid: str, context: CitationContext) -> str:
+        """Citation for a RID, made clickable even when it is not among the documents."""
+        citation = context.rid_citation_map.get(rid)
+        if citation:
+            return citation
+        logger.warning(f"RID {rid} not found in documents but making clickable")
+        return f"[{rid}](/snippet/{rid})"
     
-    def _format_paragraphs(self, text: str) -> str:
-        """Format text into readable paragraphs with natural breaks."""
+    def _split_paragraphs(self, text: str) -> List[str]:
+        """Split text into readable paragraphs with natural breaks."""
         # Only skip for special sections, not for content that might have a stray \n\n
-        if text.startswith('**Sources:**') or text.startswith('•'):
-            logger.info(f"Skipping formatting - special section")
-            return text
-        
-        # Check if PROPERLY formatted (multiple paragraph breaks)
-        paragraph_count = text.count('\n\n')
-        if paragraph_count >= 3:  # At least 3 paragraph breaks means it's already well formatted
-            logger.info(f"Already well formatted with {paragraph_count} paragraph breaks")
-            return text
-        
-        # Improved sentence splitting using regex to handle various cases
-        import re
-        # Split on periods that are followed by a space OR uppercase letter (handles no space cases)
-        # Also handles exclamation and question marks
-        sentence_pattern = r'(?<=[.!?])\s+(?=[A-Z])|(?<=[.!?])(?=[A-Z])'
-        sentences = re.split(sentence_pattern, text)
+        # At least 3 paragraph breaks means it's already well formatted
+        if text.startswith('**Sources:**') or text.startswith('•') or text.count('\n\n') >= 3:
+            return [text]
         
         # Clean up and fix sentences
-        cleaned_sentences = []
-        for sent in sentences:
+        sentences = []
+        for sent in SENTENCE_BOUNDARY.split(text):
             sent = sent.strip()
             if sent:
                 # Add period back if missing
-                if not sent.endswith('.') and not sent.endswith('!') and not sent.endswith('?'):
+                if not sent.endswith(('.', '!', '?')):
                     sent += '.'
-                cleaned_sentences.append(sent)
+                sentences.append(sent)
         
         # Group into paragraphs of 2-3 sentences
         paragraphs = []
         current = []
         
-        for i, sent in enumerate(cleaned_sentences):
+        for i, sent in enumerate(sentences):
             current.append(sent)
             
             # Break after 2-3 sentences
             if len(current) >= 2:
-                # Check if next sentence starts with transition word
-                if i + 1 < len(cleaned_sentences):
-                    next_sent = cleaned_sentences[i + 1]
-                    if any(next_sent.startswith(word) for word in 
-                           ['Furthermore', 'Additionally', 'However', 'Moreover', 
-                            'Therefore', 'Meanwhile', 'This includes', 'This raises',
-                            'Given', 'To ensure']):
-                        # Break before transition
-                        paragraphs.append(' '.join(current))
-                        current = []
-                    elif len(current) >= 3:
-                        # Break after 3 sentences max
+                if i + 1 < len(sentences):
+                    # Break before a transition, or after 3 sentences max
+                    if sentences[i + 1].startswith(PARAGRAPH_TRANSITIONS) or len(current) >= 3:
                         paragraphs.append(' '.join(current))
                         current = []
                 else:
@@ -225,32 +181,21 @@ class CitationService:
         if current:
             paragraphs.append(' '.join(current))
         
-        # Log for debugging
-        logger.info(f"_format_paragraphs: Split {len(cleaned_sentences)} sentences into {len(paragraphs)} paragraphs")
-        logger.info(f"First 100 chars of input: {text[:100]}")
-        logger.info(f"Number of paragraph breaks added: {len(paragraphs) - 1}")
-        
-        result = '\n\n'.join(paragraphs)
-        logger.info(f"First 200 chars of output: {result[:200]}")
-        
-        return result
+        logger.debug(f"Split {len(sentences)} sentences into {len(paragraphs)} paragraphs")
+        return paragraphs
     
-    def _validate_section_citations(self, response: str, docs: List[Document]) -> str:
+    def _validate_section_citations(self, response: str, context: CitationContext) -> str:
         """Validate that each paragraph has proper citations and avoid RID overuse."""
-        import re
-        
         # Split response into paragraphs
         paragraphs = [p.strip() for p in response.split('\n\n') if p.strip()]
+        available_rids = context.available_rids
         
-        # Track RID usage to prevent overuse
+        # Track RID usage to prevent overuse, counting existing RID usage
+        cited = [[rid for rid in available_rids if rid in paragraph] for paragraph in paragraphs]
         rid_usage_count = {}
-        available_rids = [doc.metadata.get('rid') for doc in docs if doc.metadata.get('rid')]
-        
-        # Count existing RID usage
-        for paragraph in paragraphs:
-            for rid in available_rids:
-                if rid and rid in paragraph:
-                    rid_usage_count[rid] = rid_usage_count.get(rid, 0) + 1
+        for rids in cited:
+            for rid in rids:
+                rid_usage_count[rid] = rid_usage_count.get(rid, 0) + 1
         
         # Validate each paragraph and apply formatting
         validated_paragraphs = []
@@ -268,35 +213,23 @@ class CitationService:
             if paragraph.startswith('•') and sources_section is not None:
                 sources_section.append(paragraph)
                 continue
-                
-            # Check if paragraph has citations
-            has_citation = any(rid in paragraph for rid in available_rids if rid)
             
             # If no citation and it's a substantive paragraph, add one
-            if not has_citation and len(paragraph) > 100 and not paragraph.startswith('The AI Risk Repository'):
+            if not cited[i] and len(paragraph) > 100 and not paragraph.startswith('The AI Risk Repository'):
                 # Find least-used RID that hasn't been overused
                 best_rid = self._find_best_rid_for_paragraph(paragraph, available_rids, rid_usage_count)
                 if best_rid:
                     # Add citation at the end of paragraph if it doesn't have one
                     if not paragraph.endswith('.'):
                         paragraph += '.'
-                    
-                    # Create enhanced citation instead of raw RID
-                    if best_rid in self.rid_citation_map:
-                        enhanced_citation = self.rid_citation_map[best_rid]
-                    else:
-                        enhanced_citation = f"[{best_rid}](/snippet/{best_rid})"
-                    
-                    paragraph += f" {enhanced_citation}"
+                    paragraph += f" {self._rid_citation(best_rid, context)}"
                     rid_usage_count[best_rid] = rid_usage_count.get(best_rid, 0) + 1
-                    logger.info(f"Added enhanced citation {best_rid} to paragraph {i+1}")
             
             validated_paragraphs.append(paragraph)
         
         # Check for RID overuse and redistribute if needed
         overused_rids = [rid for rid, count in rid_usage_count.items() if count > 2]
         if overused_rids:
-            logger.info(f"Detected overused RIDs: {overused_rids}")
             validated_paragraphs = self._redistribute_overused_rids(validated_paragraphs, overused_rids, available_rids)
         
         # Combine paragraphs and add visual separator before sources
@@ -382,159 +315,37 @@ class CitationService:
         except Exception as e:
             logger.error(f"Error saving RID snippet for {rid}: {str(e)}")
     
-    def _save_rid_snippet_to_db(self, doc: Document, rid: str, session_id: str):
-        """Save document content as JSON snippet in database."""
-        try:
-            metadata = doc.metadata or {}
-            content = doc.page_content
-
-            # Replace literal \n with actual newlines in content
-            if content and '\\n' in content:
-                content = content.replace('\\n', '\n')
-
-            # Parse title from metadata or content
-            title = metadata.get('title', '')
-
-            # Clean up title - replace literal \n with space
-            if title and '\\n' in title:
-                title = title.replace('\\n', ' ').strip()
-
-            # If no title in metadata, try to extract from content
-            # Also fix if title is just the filename like "preprint_raw.txt"
-            if not title or title == rid or 'preprint_raw.txt' in title:
-                lines = content.split('\n') if content else []
-
-                # Look for "Title:" prefix first
-                for line in lines:
-                    if line.startswith('Title:'):
-                        title = line.replace('Title:', '').strip()
-                        break
-
-                # If no "Title:" found or still have preprint_raw.txt, try to extract from first meaningful line
-                if not title or title == rid or 'preprint_raw.txt' in title:
-                    for line in lines:
-                        # Skip metadata lines and empty lines
-                        line = line.strip()
-                        if (line and
-                            not line.startswith('Repository ID:') and
-                            not line.startswith('Source:') and
-                            not line.startswith('Domain:') and
-                            not line.startswith('Sub-domain:') and
-                            not line.startswith('Risk Category:') and
-                            not line.startswith('Entity:') and
-                            not line.startswith('Intent:') and
-                            not line.startswith('Timing:') and
-                            not line.startswith('Description:')):
-                            # Take first 100 chars of first meaningful line
-                            title = line[:100]
-                            if title:
-                                break
-
-            # Final fallback
-            if not title:
-                title = f"Document {rid}"
-
-            # Extract Excel source location if available
-            source_location = self._extract_excel_source_location(metadata)
-
-            # Create JSON snippet
-            snippet_data = {
-                "rid": rid,
-                "title": title,
-                "content": content,
-                "metadata": {
-                    "domain": metadata.get('domain', ''),
-                    "subdomain": metadata.get('subdomain', metadata.get('specific_domain', '')),
-                    "risk_category": metadata.get('risk_category', ''),
-                    "entity": self._map_entity_value(metadata.get('entity', '')),
-                    "intent": self._map_intent_value(metadata.get('intent', '')),
-                    "timing": self._map_timing_value(metadata.get('timing', '')),
-                    "description": metadata.get('description', ''),
-                    "source_file": metadata.get('url', metadata.get('source_file', '')),
-                    "row_number": metadata.get('row', None),
-                    "sheet": metadata.get('sheet', None),
-                    "file_type": metadata.get('file_type', '')
-                },
-                "highlights": metadata.get('search_terms', []),
-                "created_at": datetime.now().isoformat()
-            }
-
-            # Add source_location to top-level if Excel file
-            if source_location:
-                snippet_data["source_location"] = source_location
-                logger.info(f"Added Excel source location for {rid}: {source_location}")
-
-            # Save to database
-            success = snippet_db.save_snippet(session_id, rid, snippet_data)
-            if success:
-                logger.info(f"Saved snippet {rid} to database for session {session_id}")
-            else:
-                logger.error(f"Failed to save snippet {rid} to database")
+    def _save_rid_snippets_to_db(self, rid_to_doc: Dict[str, Document], session_id: str) -> None:
+        """Save the cited documents as JSON snippets in one database transaction."""
+        # A re-ingestion can replace (and garbage-collect) a record between the
+        # lookup and the save; the save then fails as a whole and is retried once
+        for attempt in range(2):
+            snippets, stored = self._snippets_to_save(rid_to_doc)
+            if not (snippets or stored) or self.snippet_store.save_snippets(session_id, snippets, stored):
+                return
+        
+        logger.error(f"Failed to save {len(snippets) + len(stored)} snippets to database")
+        # Fall back to file system
+        for rid in list(snippets) + list(stored):
+            self._save_rid_snippet(rid_to_doc[rid], rid)
+    
+    def _snippets_to_save(self, rid_to_doc: Dict[str, Document]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """Split cited documents into new snippets and content hashes of precomputed ones."""
+        # Snippets precomputed at ingestion are only referenced
+        records = self.snippet_store.get_records(list(rid_to_doc))
+        stored, snippets = {}, {}
+        for rid, doc in rid_to_doc.items():
+            record = records.get(rid)
+            if record and record[0] == record_digest(doc):
+                stored[rid] = record[1]
+                continue
+            try:
+                snippets[rid] = dict(build_snippet_record(doc, rid), created_at=datetime.now().isoformat())
+            except Exception as e:
+                logger.error(f"Error building snippet for {rid}: {str(e)}")
                 # Fall back to file system
                 self._save_rid_snippet(doc, rid)
-
-        except Exception as e:
-            logger.error(f"Error saving snippet to database for {rid}: {str(e)}")
-            # Fall back to file system
-            self._save_rid_snippet(doc, rid)
-    
-    def _map_entity_value(self, entity: str) -> str:
-        """Map numeric entity values to readable strings."""
-        entity_map = {
-            '1': 'Human',
-            '2': 'AI',
-            '3': 'Human & AI'
-        }
-        return entity_map.get(str(entity), entity)
-    
-    def _map_intent_value(self, intent: str) -> str:
-        """Map numeric intent values to readable strings."""
-        intent_map = {
-            '1': 'Intentional',
-            '2': 'Unintentional'
-        }
-        return intent_map.get(str(intent), intent)
-    
-    def _map_timing_value(self, timing: str) -> str:
-        """Map numeric timing values to readable strings."""
-        timing_map = {
-            '1': 'Pre-deployment',
-            '2': 'Post-deployment'
-        }
-        return timing_map.get(str(timing), timing)
-
-    def _extract_excel_source_location(self, metadata: dict) -> dict:
-        """
-        Extract Excel source location from metadata.
-
-        Returns:
-            Dictionary with sheet, row, column information or None
-        """
-        source_file = metadata.get('url', metadata.get('source_file', ''))
-
-        # Only process Excel files
-        if not source_file or not (source_file.endswith('.xlsx') or source_file.endswith('.xls')):
-            return None
-
-        sheet = metadata.get('sheet')
-        row = metadata.get('row')
-
-        # Need at least sheet and row for navigation
-        if not sheet or row is None:
-            return None
-
-        location = {
-            'sheet': sheet,
-            'row': int(row)
-        }
-
-        # Try to determine column if possible
-        # For now, we'll set it in future enhancements when we track specific columns
-        # column = metadata.get('column')
-        # if column:
-        #     location['column'] = column
-
-        return location
+        return snippets, stored
     
     def get_snippet_by_rid(self, rid: str, include_metadata: bool = False) -> str:
         """Get snippet content by RID."""
@@ -0,0 +1,340 @@
+"""
+On-box language detection: a Unicode script fast path plus character n-gram profiles.
+
+Most scripts are written in only one of the supported languages (Hangul,
+kana, Thai, Georgian, the Indic scripts, ...), so the script of the letters
+settles those. Scripts that several languages share (Latin, Cyrillic,
+Arabic, Devanagari, Ethiopic, Hebrew) are scored against character 1-3-gram
+profiles built from the sample texts in src/data/language_samples.json, one
+per language of the language database that has a sample. Scoring is one
+gather-and-sum over a log-probability matrix, well under a millisecond.
+
+Confidence is the softmax probability of the best profile at a fixed
+temperature, scaled down when the text mixes scripts or when few of its
+n-grams occur in that profile (a language without a profile). Callers ask
+the model below a confidence threshold and for the fun/constructed
+languages, which marker words flag but no profile covers. Markers made of
+ordinary English words or of letters and digits (doge, l33t) need more hits
+when the text reads as English.
+
+Evaluate with scripts/benchmark_language_detection.py.
+"""
+import bisect
+import json
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ...config.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Unicode blocks of the scripts the supported languages are written in
+_SCRIPT_BLOCKS = sorted([
+    (0x0041, 0x005A, 'latin'), (0x0061, 0x007A, 'latin'), (0x00C0, 0x024F, 'latin'), (0x1E00, 0x1EFF, 'latin'),
+    (0x0370, 0x03FF, 'greek'), (0x1F00, 0x1FFF, 'polytonic'),
+    (0x0400, 0x052F, 'cyrillic'),
+    (0x0530, 0x058F, 'armenian'),
+    (0x0590, 0x05FF, 'hebrew'), (0xFB1D, 0xFB4F, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'), (0x0750, 0x077F, 'arabic'), (0xFB50, 0xFDFF, 'arabic'), (0xFE70, 0xFEFF, 'arabic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0980, 0x09FF, 'bengali'),
+    (0x0A00, 0x0A7F, 'gurmukhi'),
+    (0x0A80, 0x0AFF, 'gujarati'),
+    (0x0B00, 0x0B7F, 'oriya'),
+    (0x0B80, 0x0BFF, 'tamil'),
+    (0x0C00, 0x0C7F, 'telugu'),
+    (0x0C80, 0x0CFF, 'kannada'),
+    (0x0D00, 0x0D7F, 'malayalam'),
+    (0x0D80, 0x0DFF, 'sinhala'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x0E80, 0x0EFF, 'lao'),
+    (0x0F00, 0x0FFF, 'tibetan'),
+    (0x1000, 0x109F, 'myanmar'),
+    (0x10A0, 0x10FF, 'georgian'), (0x1C90, 0x1CBF, 'georgian'), (0x2D00, 0x2D2F, 'georgian'),
+    (0x1100, 0x11FF, 'hangul'), (0x3130, 0x318F, 'hangul'), (0xAC00, 0xD7AF, 'hangul'),
+    (0x1200, 0x139F, 'ethiopic'),
+    (0x13A0, 0x13FF, 'cherokee'), (0xAB70, 0xABBF, 'cherokee'),
+    (0x1400, 0x167F, 'syllabics'),
+    (0x1780, 0x17FF, 'khmer'),
+    (0x3040, 0x30FF, 'kana'), (0x31F0, 0x31FF, 'kana'), (0xFF66, 0xFF9F, 'kana'),
+    (0x3400, 0x4DBF, 'han'), (0x4E00, 0x9FFF, 'han'), (0xF900, 0xFAFF, 'han'),
+])
+_BLOCK_STARTS = [start for start, _, _ in _SCRIPT_BLOCKS]
+
+# Scripts only one supported language is written in
+SCRIPT_LANGUAGES = {
+    'greek': 'el', 'polytonic': 'grc', 'armenian': 'hy', 'bengali': 'bn', 'gurmukhi': 'pa', 'gujarati': 'gu',
+    'oriya': 'or', 'tamil': 'ta', 'telugu': 'te', 'kannada': 'kn', 'malayalam': 'ml', 'sinhala': 'si',
+    'thai': 'th', 'lao': 'lo', 'tibetan': 'bo', 'myanmar': 'my', 'georgian': 'ka', 'hangul': 'ko',
+    'cherokee': 'chr', 'syllabics': 'iu', 'khmer': 'km', 'kana': 'ja', 'han': 'zh',
+}
+
+# Characters of written Cantonese that Standard Chinese does not use
+CANTONESE_CHARACTERS = frozenset('嘅係唔咗冇佢啲嘢喺㗎咩乜嚟睇諗揾搵')
+
+# One Han, kana or Hangul character carries about a syllable
+SCRIPT_WEIGHTS = {'han': 2.0, 'kana': 2.0, 'hangul': 2.0}
+
+# Share of a text's letters its script needs before it counts as written in it
+MIN_SCRIPT_SHARE = 0.3
+FULL_SCRIPT_SHARE = 0.6
+
+SCRIPT_CONFIDENCE = 0.99
+NGRAM_ORDERS = (1, 2, 3)
+SMOOTHING = 0.5
+SCALE_POWER = 0.5
+TEMPERATURE = 4.0
+# Short or ambiguous text is most likely English, the language most queries are in
+LOG_PRIORS = {'en': 2.0}
+# Share of a text's n-grams seen in the best profile below which confidence drops
+MIN_COVERAGE = 0.75
+
+# Clause boundaries; a quote mark only outside a word ("l'IA" stays whole)
+_CLAUSE_BREAK = re.compile(r"[.!?;:,\"«»“”()\[\]¿¡]|(?<!\w)'|'(?!\w)")
+
+# Words that mark the fun/constructed languages; none has a profile
+MARKERS = {
+    'pirate': re.compile(r"\b(?:ahoy|arr+|matey|me hearties|avast|landlubbers?|shiver me timbers|ye be|be ye)\b", re.I),
+    'shakespeare': re.compile(r"\b(?:thou|thee|thy|thine|dost|doth|hath|prithee|forsooth|wherefore art|hither)\b", re.I),
+    'uwu': re.compile(r"\b(?:uwu|owo)\b|>w<|\^w\^", re.I),
+    # Digits standing in for letters of a lowercase word (h4ck, th3, r1sk5), not model names like GPT4o
+    'l33t': re.compile(r"\b(?=[A-Za-z0134578]*[a-z][A-Za-z0134578]*[a-z])(?=[A-Za-z]*[0134578])[A-Z]?[a-z0134578]{2,}\b"),
+    # "such X" ending a phrase or followed by the next one ("wow such risk much scare"), not "such a"
+    'doge': re.compile(r"\b(?:such|much|many)\s+\w+(?=\s*(?:[.!,]|$)|\s+(?:such|much|many|very|wow)\b)|\bwow\b", re.I),
+    'klingon': re.compile(r"\b(?:nuqneH|Qapla'|petaQ|HIja'|ghobe'|tlhIngan|jIyajbe'|naDev)"),
+    'elvish-sindarin': re.compile(r"\b(?:mae govannen|le hannon|goheno nin|mellon)\b", re.I),
+    'elvish-quenya': re.compile(r"\b(?:aiya|namárië|hantanyel|elen síla)\b", re.I),
+    'dothraki': re.compile(r"\b(?:m'athchomaroon|athchomari|hajas|khaleesi|dothrak\w*)\b", re.I),
+    'valyrian': re.compile(r"\b(?:valar morghulis|valar dohaeris|dracarys|kirimvose|rytsas)\b", re.I),
+    'navi': re.compile(r"\b(?:kaltxì|oel ngati kameie|irayo|kìyevame)\b", re.I),
+    'yoda': re.compile(r"\w,\s+(?:you|i|we|it|they|he|she)\s+(?:are|am|is|must|will|have|shall|can)\b\s*[.!?]", re.I),
+}
+MARKER_CONFIDENCE = 0.5  # Per marker hit, up to SCRIPT_CONFIDENCE
+# Hits a marker needs, and needs when the text scores as English at ENGLISH_FIT_CONFIDENCE (default 1, 1)
+MARKER_MIN_HITS = {'doge': (2, 3), 'l33t': (2, 3)}
+ENGLISH_FIT_CONFIDENCE = 0.8
+
+CONSTRUCTED_CATEGORIES = ('constructed', 'fun')
+
+@dataclass
+class Detection:
+    """Result of local language detection."""
+    code: str
+    confidence: float
+    method: str  # 'script', 'ngram' or 'marker'
+    constructed: bool = False  # A fun/constructed language: worth confirming with the model
+    candidates: List[Tuple[str, float]] = field(default_factory=list)
+
+@lru_cache(maxsize=8192)
+def script_of(char: str) -> Optional[str]:
+    """Script of a letter or combining mark, None for anything else."""
+    if unicodedata.category(char)[0] not in 'LM':
+        return None
+    code_point = ord(char)
+    i = bisect.bisect_right(_BLOCK_STARTS, code_point) - 1
+    if i >= 0 and code_point <= _SCRIPT_BLOCKS[i][1]:
+        return _SCRIPT_BLOCKS[i][2]
+    return None
+
+def script_counts(text: str) -> Counter:
+    """Weighted letter counts per script, with Japanese kanji counted as kana."""
+    counts = Counter(script for script in map(script_of, text) if script)
+    if counts.get('kana') and counts.get('han'):
+        counts['kana'] += counts.pop('han')
+    if counts.get('polytonic') and counts.get('greek'):
+        counts['polytonic'] += counts.pop('greek')
+    for script, weight in SCRIPT_WEIGHTS.items():
+        if script in counts:
+            counts[script] *= weight
+    return counts
+
+def dominant_script(counts: Counter) -> Tuple[Optional[str], float]:
+    """The script a text is written in and its share of the letters."""
+    total = sum(counts.values())
+    if not total:
+        return None, 0.0
+    others = [(count, script) for script, count in counts.items() if script != 'latin']
+    if others:
+        count, script = max(others)
+        # Latin words (names, "AI", technical terms) are common in other scripts
+        if count >= MIN_SCRIPT_SHARE * total or 'latin' not in counts:
+            return script, count / total
+    return 'latin', counts['latin'] / total
+
+def words(text: str, script: str) -> List[str]:
+    """Lowercase words of the letters of one script."""
+    keep_apostrophes = script == 'latin'
+    chars = []
+    for char in text.lower():
+        if script_of(char) == script or (keep_apostrophes and char == "'"):
+            chars.append(char)
+        else:
+            chars.append(' ')
+    return [word.strip("'") for word in ''.join(chars).split() if word.strip("'")]
+
+def char_ngrams(tokens: Sequence[str]) -> Counter:
+    """Character n-grams of words, padded with a space on either side."""
+    grams = Counter()
+    for token in tokens:
+        padded = f" {token} "
+        for n in NGRAM_ORDERS:
+            source = token if n == 1 else padded
+            grams.update(source[i:i + n] for i in range(len(source) - n + 1))
+    return grams
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize('NFC', text).replace('’', "'")
+
+class _ScriptProfiles:
+    """N-gram log-probabilities of the sample texts of the languages sharing a script."""
+
+    def __init__(self, script: str, samples: Dict[str, str]):
+        self.script = script
+        self.codes = sorted(samples)
+        self.log_prior = np.array([LOG_PRIORS.get(code, 0.0) for code in self.codes])
+        counts = [char_ngrams(words(samples[code], script)) for code in self.codes]
+        vocabulary = sorted(set().union(*counts))
+        self.index = {gram: i for i, gram in enumerate(vocabulary)}
+        matrix = np.zeros((len(self.codes), len(vocabulary)), dtype=np.float64)
+        for row, grams in enumerate(counts):
+            for gram, count in grams.items():
+                matrix[row, self.index[gram]] = count
+        self.seen = matrix > 0
+
+        # Smoothed per order, so an unseen trigram costs the same for every language
+        orders = np.array([len(gram) for gram in vocabulary])
+        self.log_probs = np.zeros_like(matrix)
+        for n in NGRAM_ORDERS:
+            columns = orders == n
+            totals = matrix[:, columns].sum(axis=1, keepdims=True)
+            # Counts scaled part of the way to the shortest sample, so a longer one does not win by size
+            scale = (totals.min() / totals) ** SCALE_POWER
+            self.log_probs[:, columns] = np.log((matrix[:, columns] * scale + SMOOTHING) /
+                                                (totals * scale + SMOOTHING * columns.sum()))
+
+    def probabilities(self, log_likelihood: np.ndarray) -> np.ndarray:
+        logits = log_likelihood / TEMPERATURE + self.log_prior
+        probabilities = np.exp(logits - logits.max())
+        return probabilities / probabilities.sum()
+
+    def score(self, grams: Counter) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Log-likelihood per language, its share of grams seen per language, and the number of grams scored."""
+        known = [(self.index[gram], count) for gram, count in grams.items() if gram in self.index]
+        total = sum(grams.values())
+        if not known:
+            return np.zeros(len(self.codes)), np.zeros(len(self.codes)), total
+        indices = np.fromiter((i for i, _ in known), dtype=np.int64, count=len(known))
+        counts = np.fromiter((c for _, c in known), dtype=np.float64, count=len(known))
+        log_likelihood = self.log_probs[:, indices] @ counts
+        coverage = (self.seen[:, indices] @ counts) / total
+        return log_likelihood, coverage, total
+
+class LanguageDetector:
+    """Script and character n-gram language identification over the supported languages."""
+
+    def __init__(self, languages: Sequence[Dict[str, Any]], samples: Dict[str, str]):
+        self.categories = {lang['code']: lang.get('category') for lang in languages}
+        self.script_languages = {script: code for script, code in SCRIPT_LANGUAGES.items() if code in self.categories}
+        self.markers = {code: pattern for code, pattern in MARKERS.items() if code in self.categories}
+
+        by_script: Dict[str, Dict[str, str]] = {}
+        for code, text in samples.items():
+            if code not in self.categories:
+                continue
+            text = _normalize(text)
+            script, _ = dominant_script(script_counts(text))
+            if script:
+                by_script.setdefault(script, {})[code] = text
+        self.profiles = {script: _ScriptProfiles(script, texts) for script, texts in by_script.items()}
+
+    def detect(self, text: str) -> Optional[Detection]:
+        """Detect the language of text; None when it has no letters."""
+        text = _normalize(text)
+        script, share = dominant_script(script_counts(text))
+        if script is None:
+            return None
+        detection = self._detect_script(text, script, min(1.0, share / FULL_SCRIPT_SHARE))
+
+        if script == 'latin':
+            english = bool(detection is not None and detection.code == 'en'
+                           and detection.confidence >= ENGLISH_FIT_CONFIDENCE)
+            marked = self._detect_markers(text, english)
+            if marked:
+                return marked
+        return detection
+
+    def _detect_script(self, text: str, script: str, mixing: float) -> Optional[Detection]:
+        """Detect the language of text written in script, from the script alone or its n-gram profiles."""
+        profiles = self.profiles.get(script)
+        if profiles is None or len(profiles.codes) == 1:
+            code = profiles.codes[0] if profiles else self.script_languages.get(script)
+            if code is None:
+                return None
+            if code == 'zh' and 'zh-yue' in self.categories and CANTONESE_CHARACTERS.intersection(text):
+                code = 'zh-yue'
+            return self._detection(code, SCRIPT_CONFIDENCE * mixing, 'script')
+
+        grams = char_ngrams(words(text, script))
+        log_likelihood, coverage, total = profiles.score(grams)
+        if not total:
+            return None
+        probabilities = profiles.probabilities(log_likelihood)
+        order = np.argsort(-probabilities)
+        best = order[0]
+        fit = min(1.0, coverage[best] / MIN_COVERAGE)
+        agreement = self._clause_agreement(profiles, text, best)
+        candidates = [(profiles.codes[i], round(float(probabilities[i]), 4)) for i in order[:3]]
+        return self._detection(profiles.codes[best], float(probabilities[best]) * mixing * fit * agreement,
+                               'ngram', candidates)
+
+    def _clause_agreement(self, profiles: _ScriptProfiles, text: str, best: int) -> float:
+        """
+        How much the clauses of a text agree with its best language, from 0 to 1.
+
+        Catches code switching ("What are the risks of AI? Por favor, responde
+        en español."), where the whole text still scores clearly for one side.
+        """
+        clauses = [char_ngrams(words(clause, profiles.script)) for clause in _CLAUSE_BREAK.split(text)]
+        clauses = [grams for grams in clauses if grams]
+        if len(clauses) < 2:
+            return 1.0
+        weighted = total = 0.0
+        for grams in clauses:
+            log_likelihood, _, count = profiles.score(grams)
+            probabilities = profiles.probabilities(log_likelihood)
+            weighted += count * probabilities[best] / probabilities.max()
+            total += count
+        return weighted / total
+
+    def _detect_markers(self, text: str, english: bool) -> Optional[Detection]:
+        """Fun/constructed language flagged by its marker words."""
+        hits = {code: len(pattern.findall(text)) for code, pattern in self.markers.items()}
+        hits = {code: count for code, count in hits.items()
+                if count and count >= MARKER_MIN_HITS.get(code, (1, 1))[english]}
+        if not hits:
+            return None
+        code = max(hits, key=hits.get)
+        return self._detection(code, min(SCRIPT_CONFIDENCE, MARKER_CONFIDENCE * hits[code]), 'marker')
+
+    def _detection(self, code: str, confidence: float, method: str,
+                   candidates: Optional[List[Tuple[str, float]]] = None) -> Detection:
+        return Detection(code=code, confidence=round(confidence, 4), method=method,
+                         constructed=self.categories.get(code) in CONSTRUCTED_CATEGORIES,
+                         candidates=candidates or [(code, round(confidence, 4))])
+
+def load_language_detector(languages: Sequence[Dict[str, Any]], path: Path) -> Optional[LanguageDetector]:
+    """Detector over the sample texts at path, or None if they cannot be read."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            samples = json.load(f)['samples']
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Language samples unavailable ({e}); detecting languages with the model only")
+        return None
+    return LanguageDetector(languages, samples)
@@ -8,6 +8,8 @@ from pathlib import Path
 from difflib import get_close_matches
 
 from ...config.logging import get_logger
+from ...config.settings import settings
+from .language_detector import Detection, load_language_detector
 
 logger = get_logger(__name__)
 
@@ -29,6 +31,10 @@ class LanguageService:
         self.native_names = {lang['native_name'].lower(): lang['code'] for lang in self.languages}
         self.english_names = {lang['english_name'].lower(): lang['code'] for lang in self.languages}
         
+        # On-box detector, built on first use
+        self._detector = None
+        self._detector_loaded = False
+        
     def _load_language_database(self) -> List[Dict[str, Any]]:
         """Load language database from JSON file."""
         try:
@@ -47,7 +53,11 @@ class LanguageService:
     
     def detect_language(self, text: str) -> Dict[str, Any]:
         """
-        Detect language from text using Gemini.
+        Detect language from text, on-box first and with Gemini for the rest.
+        
+        The local detector answers when it is at least
+        LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD confident; uncertain text and
+        fun/constructed languages go to Gemini when a model is available.
         
         Args:
             text: Text to analyze
@@ -55,10 +65,46 @@ class LanguageService:
         Returns:
             Language info dict with code, names, confidence, category
         """
-        if not self.gemini_model:
-            logger.warning("No Gemini model available, defaulting to English")
-            return self.get_language_info("en")
+        detection = self.detect_language_locally(text)
+        confident = detection is not None and detection.confidence >= settings.LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD
+        if confident and not detection.constructed:
+            return self._detected_language_info(detection.code, detection.confidence, 'local')
+        
+        if self.gemini_model:
+            return self._detect_language_with_model(text)
+        if confident:
+            return self._detected_language_info(detection.code, detection.confidence, 'local')
+        
+        logger.warning("Language unclear and no Gemini model available, defaulting to English")
+        return self._detected_language_info("en", None, 'default')
+    
+    def detect_language_locally(self, text: str) -> Optional[Detection]:
+        """Detect language with the on-box detector, if it is enabled and has its samples."""
+        if not settings.LANGUAGE_DETECTOR_ENABLED:
+            return None
+        if not self._detector_loaded:
+            samples_path = Path(__file__).parent.parent.parent / 'data' / 'language_samples.json'
+            self._detector = load_language_detector(self.languages, samples_path)
+            self._detector_loaded = True
+        if self._detector is None:
+            return None
         
+        try:
+            return self._detector.detect(text)
+        except Exception as e:
+            logger.warning(f"Local language detection failed: {e}")
+            return None
+    
+    def _detected_language_info(self, code: str, confidence: Optional[float], method: str) -> Dict[str, Any]:
+        """Copy of a language's info with how it was detected."""
+        language_info = dict(self.get_language_info(code) or self.get_language_info("en"))
+        if confidence is not None:
+            language_info['confidence'] = confidence
+        language_info['detection_method'] = method
+        return language_info
+    
+    def _detect_language_with_model(self, text: str) -> Dict[str, Any]:
+        """Detect language from text using Gemini."""
         # Build language list for prompt
         language_list = "\n".join([
             f"{lang['code']}: {lang['english_name']} ({lang['native_name']})"
@@ -85,7 +131,10 @@ Return ONLY a JSON object with this exact format:
 IMPORTANT: Return ONLY the JSON, no explanation."""
 
         try:
-            response = self.gemini_model.generate(prompt, [])
+            from ..models.concurrency import RequestPriority
+            from ..models.usage import usage_stage, PipelineStage
+            with usage_stage(PipelineStage.LANGUAGE_DETECTION):
+                response = self.gemini_model.generate(prompt, [], priority=RequestPriority.CLASSIFICATION)
             
             # Clean and parse response
             response_text = response.strip()
@@ -100,16 +149,15 @@ IMPORTANT: Return ONLY the JSON, no explanation."""
             result = json.loads(response_text)
             
             # Get full language info
-            language_info = self.get_language_info(result.get('code', 'en'))
-            if language_info:
-                language_info['confidence'] = result.get('confidence', 0.9)
-                return language_info
+            code = result.get('code', 'en')
+            if self.get_language_info(code):
+                return self._detected_language_info(code, result.get('confidence', 0.9), 'model')
                 
         except Exception as e:
             logger.error(f"Language detection failed: {e}")
         
         # Default to English
-        return self.get_language_info("en")
+        return self._detected_language_info("en", None, 'default')
     
     def get_language_info(self, code: str) -> Optional[Dict[str, Any]]:
         """Get full language information by code."""
@@ -247,6 +295,10 @@ IMPORTANT: Return ONLY the JSON, no explanation."""
     def get_languages_by_category(self, category: str) -> List[Dict[str, Any]]:
         """Get languages filtered by category."""
         return [lang for lang in self.languages if lang.get('category') == category]
+    
+    def get_top_languages(self, limit: int) -> List[Dict[str, Any]]:
+        """The first non-English major languages of the database, which lists the most used first."""
+        return [lang for lang in self.get_languages_by_category('major') if lang['code'] != 'en'][:limit]
 
 # Global language service instance
 language_service = LanguageService()
\ No newline at end of file
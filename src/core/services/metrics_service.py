@@ -84,10 +84,14 @@ class QueryMetrics:
 class MetricsService:
     """Service for collecting and analyzing chatbot metrics."""
     
-    # Cost estimates per 1M tokens (Gemini 1.5 Flash/Pro pricing)
+    # Cost estimates per 1M tokens (USD). Cached input tokens are billed at the cached rate.
+    # Matched by longest model-name prefix, so preview suffixes resolve to their base model.
     TOKEN_COSTS = {
-        "gemini-1.5-flash": {"input": 0.075, "output": 0.30},  # per 1M tokens
-        "gemini-1.5-pro": {"input": 1.25, "output": 5.00}
+        "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached": 0.075},
+        "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40, "cached": 0.025},
+        "gemini-2.0-flash": {"input": 0.10, "output": 0.40, "cached": 0.025},
+        "gemini-1.5-flash": {"input": 0.075, "output": 0.30, "cached": 0.01875},
+        "gemini-1.5-pro": {"input": 1.25, "output": 5.00, "cached": 0.3125}
     }
     
     # Deployment gate thresholds (from PI's Running Lean criteria)
@@ -115,17 +119,43 @@ class MetricsService:
         identifier = f"{ip or 'unknown'}:{user_agent or 'unknown'}"
         return hashlib.sha256(identifier.encode()).hexdigest()[:16]
     
-    def calculate_cost(self, input_tokens: int, output_tokens: int, model: str = None) -> float:
-        """Calculate estimated cost for token usage."""
-        model = model or self.model_name
-        if "flash" in model.lower():
-            costs = self.TOKEN_COSTS["gemini-1.5-flash"]
-        else:
-            costs = self.TOKEN_COSTS["gemini-1.5-pro"]
-        
-        input_cost = (input_tokens / 1_000_000) * costs["input"]
+    def _get_model_costs(self, model: str) -> Dict[str, float]:
+        """Get per-1M-token prices for a model."""
+        model = model.lower()
+        matches = [name for name in self.TOKEN_COSTS if model.startswith(name)]
+        if matches:
+            return self.TOKEN_COSTS[max(matches, key=len)]
+        # Unknown model - fall back on the family
+        if "flash" in model:
+            return self.TOKEN_COSTS["gemini-2.5-flash"]
+        return self.TOKEN_COSTS["gemini-1.5-pro"]
+    
+    def calculate_cost(self, input_tokens: int, output_tokens: int, model: str = None,
+                       cached_tokens: int = 0) -> float:
+        """Calculate estimated cost for token usage.
+        
+        input_tokens includes cached_tokens (as reported by Gemini usage metadata);
+        the cached portion is billed at the cached-input rate.
+        """
+        costs = self._get_model_costs(model or self.model_name)
+        cached_tokens = min(cached_tokens, input_tokens)
+        
+        input_cost = ((input_tokens - cached_tokens) / 1_000_000) * costs["input"]
+        cached_cost = (cached_tokens / 1_000_000) * costs.get("cached", costs["input"])
         output_cost = (output_tokens / 1_000_000) * costs["output"]
-        return round(input_cost + output_cost, 6)
+        return round(input_cost + cached_cost + output_cost, 6)
+    
+    def _price_usage(self, usage) -> List[Dict[str, Any]]:
+        """Price a RequestUsage per (stage, model), returning rows for persistence."""
+        rows = usage.by_stage_and_model()
+        for row in rows:
+            row["cost_estimate"] = self.calculate_cost(
+                row["prompt_tokens"],
+                row["output_tokens"],
+                row["model"],
+                row["cached_tokens"]
+            )
+        return rows
     
     def log_query(
         self,
@@ -139,9 +169,15 @@ class MetricsService:
         tokens: Dict[str, int] = None,
         user_ip: str = None,
         user_agent: str = None,
-        error: Exception = None
+        error: Exception = None,
+        usage=None
     ) -> QueryMetrics:
-        """Log a query-response interaction with full metrics."""
+        """Log a query-response interaction with full metrics.
+        
+        `usage` is the RequestUsage captured while serving the query. When given,
+        tokens and cost come from the actual model calls (priced per model) and the
+        per-stage breakdown is persisted; otherwise the `tokens` dict is used.
+        """
         
         # Create metrics object
         metrics = QueryMetrics(
@@ -157,7 +193,12 @@ class MetricsService:
         )
         
         # Add token metrics if provided
-        if tokens:
+        usage_rows = []
+        if usage is not None and usage.calls:
+            usage_rows = self._price_usage(usage)
+            metrics.tokens_used = usage.totals()["total"]
+            metrics.cost_estimate = round(sum(row["cost_estimate"] for row in usage_rows), 6)
+        elif tokens:
             metrics.tokens_used = tokens.get("total", 0)
             metrics.cost_estimate = self.calculate_cost(
                 tokens.get("input", 0),
@@ -211,7 +252,8 @@ class MetricsService:
                     user_hash=user_hash,
                     error_type=metrics.error_type
                 )
-                metrics_db.log_metric(db_metric)
+                metric_id = metrics_db.log_metric(db_metric)
+                metrics_db.log_token_usage(metric_id, session_id, metrics.timestamp, usage_rows)
                 metrics_db.update_session(session_id, user_hash, language)
             except Exception as e:
                 logger.error(f"Failed to persist metrics to database: {e}")
@@ -323,6 +365,36 @@ class MetricsService:
         index = int(len(sorted_values) * (percentile / 100))
         return sorted_values[min(index, len(sorted_values) - 1)]
     
+    def get_token_usage(self, hours: int = 24) -> Dict[str, Any]:
+        """Get token usage and cost broken down by pipeline stage and model."""
+        breakdown = []
+        if DB_AVAILABLE:
+            try:
+                breakdown = metrics_db.get_token_usage_breakdown(hours)
+            except Exception as e:
+                logger.error(f"Failed to load token usage from database: {e}")
+        
+        total_cost = sum(row["total_cost"] or 0 for row in breakdown)
+        by_stage = {}
+        for row in breakdown:
+            stage = by_stage.setdefault(row["stage"], {
+                "calls": 0, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "total_cost": 0.0
+            })
+            for key in ("calls", "prompt_tokens", "output_tokens", "cached_tokens"):
+                stage[key] += row[key] or 0
+            stage["total_cost"] += row["total_cost"] or 0
+        
+        for stage in by_stage.values():
+            stage["total_cost"] = round(stage["total_cost"], 6)
+            stage["cost_share"] = round(stage["total_cost"] / total_cost, 4) if total_cost else 0.0
+        
+        return {
+            "period_hours": hours,
+            "total_cost": round(total_cost, 6),
+            "by_stage": by_stage,
+            "by_stage_and_model": breakdown
+        }
+    
     def get_global_metrics(self, hours: int = 24) -> Dict[str, Any]:
         """Get global metrics for the last N hours."""
         cutoff_time = datetime.utcnow() - timedelta(hours=hours)
@@ -0,0 +1,138 @@
+"""
+Translation of static English templates through the translation memory.
+
+Each template kind has its translation prompt and a prompt version. The
+version is part of the translation memory key: bump it whenever a prompt
+changes so translations made with the old prompt are not served.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ...config.logging import get_logger
+from ..models.base import MODEL_ERROR_PREFIX
+from ..models.concurrency import RequestPriority
+from ..storage.translation_memory import TranslationMemory, translation_memory as default_translation_memory
+
+logger = get_logger(__name__)
+
+# kind -> (prompt version, prompt); prompts are formatted with text, language_name and special_prompt
+TRANSLATION_PROMPTS = {
+    'taxonomy': ('taxonomy-v1', """Translate this taxonomy information to {language_name}:
+
+{text}
+
+{special_prompt}
+Keep all formatting, headings, and structure intact.
+Translate technical terms appropriately for {language_name} speakers."""),
+
+    'out_of_scope': ('out_of_scope-v1', """English response template: {text}
+
+CRITICAL INSTRUCTION:
+You MUST translate the entire English response template above to {language_name}.
+{special_prompt}
+Maintain the same helpful tone and all the AI risk topic suggestions.
+Do NOT add any extra text or explanations.
+
+Your response must be ONLY the translated text, nothing else."""),
+
+    'error': ('error-v1', """Translate this error message to {language_name}:
+
+{text}
+
+CRITICAL INSTRUCTIONS:
+1. Translate the ENTIRE message to {language_name}
+2. Maintain the same helpful and apologetic tone
+3. Keep any technical details if present
+4. {special_prompt}
+5. Return ONLY the translated message, no explanations
+
+Translated message:"""),
+
+    'refinement': ('refinement-v1', """Translate these question suggestions to {language_name}:
+
+{text}
+
+CRITICAL INSTRUCTIONS:
+1. Translate the ENTIRE text to {language_name}, keeping the numbered list
+2. Keep the placeholder {{query}} exactly as it is; it is replaced with the user's question
+3. {special_prompt}
+4. Return ONLY the translated text, no explanations"""),
+}
+
+class TemplateTranslator:
+    """Translates static templates with Gemini, once per text, language and prompt version."""
+
+    def __init__(self, gemini_model=None, memory: Optional[TranslationMemory] = None):
+        self.gemini_model = gemini_model
+        self.memory = memory or default_translation_memory
+
+    def translate(self, kind: str, text: str, language_info: Optional[Dict[str, Any]],
+                  remember: bool = True) -> Optional[str]:
+        """
+        Translate a template into the language of language_info.
+
+        Args:
+            kind: Template kind (a key of TRANSLATION_PROMPTS)
+            text: English text
+            language_info: Target language
+            remember: Use the translation memory; pass False for text with per-request
+                details (exception messages, retrieved context) that will not repeat
+
+        Returns:
+            The English text for English sessions, the stored or new translation,
+            or None if there is no model and nothing stored, or translating failed
+        """
+        language_code = (language_info or {}).get('code', 'en')
+        if language_code == 'en':
+            return text
+        prompt_version, _ = TRANSLATION_PROMPTS[kind]
+        if not self.gemini_model:
+            return self.memory.get(kind, prompt_version, text, language_code) if remember else None
+        translate = self._model_translator(kind, language_info)
+        if not remember:
+            try:
+                return translate(text)
+            except Exception as e:
+                logger.warning(f"Failed to translate {kind} text to {language_code}: {e}")
+                return None
+        return self.memory.get_or_translate(kind, prompt_version, text, language_code, translate)
+
+    def _model_translator(self, kind: str, language_info: Dict[str, Any]) -> Callable[[str], Optional[str]]:
+        from .language_service import language_service
+        _, prompt = TRANSLATION_PROMPTS[kind]
+        language_name = language_info.get('english_name', 'English')
+        special_prompt = language_service.get_language_prompt(language_info.get('code', 'en'))
+
+        def translate(text: str) -> Optional[str]:
+            translation_prompt = prompt.format(text=text, language_name=language_name, special_prompt=special_prompt)
+            translated = self.gemini_model.generate(translation_prompt, [], priority=RequestPriority.TRANSLATION)
+            if not translated or translated.startswith(MODEL_ERROR_PREFIX):
+                return None
+            logger.info(f"Translated {kind} template to {language_name}")
+            return translated
+        return translate
+
+    def prewarm(self, templates: Dict[str, Iterable[str]], languages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Translate templates into each language ahead of traffic.
+
+        Args:
+            templates: Kind -> English templates of that kind
+            languages: Language database entries to translate into
+
+        Returns:
+            Counts of templates already stored, translated and failed
+        """
+        counts = {'stored': 0, 'translated': 0, 'failed': 0}
+        for language_info in languages:
+            if language_info.get('code', 'en') == 'en':
+                continue
+            for kind, texts in templates.items():
+                prompt_version, _ = TRANSLATION_PROMPTS[kind]
+                for text in dict.fromkeys(texts):
+                    if self.memory.contains(text, language_info['code'], prompt_version):
+                        counts['stored'] += 1
+                    elif self.translate(kind, text, language_info) is None:
+                        counts['failed'] += 1
+                    else:
+                        counts['translated'] += 1
+        return counts
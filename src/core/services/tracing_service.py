@@ -0,0 +1,292 @@
+"""
+Lightweight span tracing for the chat pipeline.
+
+Spans are propagated through a context variable, so nested stages (intent
+classification, retrieval, generation, model and database calls) attach to the
+enclosing request without passing a tracer around. The outermost span of a
+request becomes the root of a trace; finished traces are kept in a ring buffer
+and every span feeds a per-stage latency histogram. No collector is required.
+If OpenTelemetry is installed and TRACE_OTEL_EXPORT is set, spans are mirrored
+to the globally configured OpenTelemetry tracer as well.
+"""
+import functools
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    otel_trace = None
+    OTEL_AVAILABLE = False
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+class Span:
+    """A timed unit of work within a trace."""
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'error', '_otel_span')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self._otel_span = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time()
+        return round((end - self.start) * 1000, 2)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            try:
+                self._otel_span.set_attribute(key, value)
+            except Exception:
+                pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+class Trace:
+    """All spans recorded while serving one request."""
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        root = spans[0] if spans else None
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": root.duration_ms if root else 0.0,
+            "span_count": len(spans),
+            "error": root.error if root else None,
+            "spans": [s.to_dict() for s in spans]
+        }
+
+class _StageHistogram:
+    """Fixed-bucket latency histogram with a bounded sample window for percentiles."""
+
+    def __init__(self, window: int = 1000):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, duration_ms: float, error: bool = False) -> None:
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.errors += 1 if error else 0
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.samples.append(duration_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        def pct(p):
+            return round(ordered[min(int(len(ordered) * p), len(ordered) - 1)], 2) if ordered else 0.0
+        buckets = {f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS_MS, self.bucket_counts)}
+        buckets["le_inf"] = self.bucket_counts[-1]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": buckets
+        }
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+class TracingService:
+    """Records spans into per-request traces and per-stage latency histograms."""
+
+    def __init__(self, max_traces: int = None, enabled: bool = None, otel_export: bool = None):
+        """
+        Initialize the tracing service.
+
+        Args:
+            max_traces: Number of recent traces kept in the ring buffer
+            enabled: Whether spans are recorded at all
+            otel_export: Mirror spans to OpenTelemetry when it is installed
+        """
+        self.enabled = settings.TRACING_ENABLED if enabled is None else enabled
+        self.otel_export = (settings.TRACE_OTEL_EXPORT if otel_export is None else otel_export) and OTEL_AVAILABLE
+        self._traces = deque(maxlen=max_traces or settings.TRACE_BUFFER_SIZE)
+        self._histograms: Dict[str, _StageHistogram] = {}
+        self._lock = threading.Lock()
+        self._otel_tracer = otel_trace.get_tracer("airi-chatbot") if self.otel_export else None
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Time a block as a span of the current trace.
+
+        The outermost span in a context starts a new trace, which is added to
+        the ring buffer when it finishes.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        is_root = trace is None
+        if is_root:
+            trace = Trace(name)
+        span = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+        self._start_otel_span(span, parent)
+
+        trace_token = _current_trace.set(trace) if is_root else None
+        span_token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {str(e)[:200]}"
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(span_token)
+            if trace_token is not None:
+                _current_trace.reset(trace_token)
+            self._finish(trace, span, is_root)
+
+    def record(self, name: str, start_time: float, error: Optional[str] = None, **attributes) -> None:
+        """
+        Record already-timed work as a finished span of the current trace.
+
+        Used where a context manager cannot wrap the work, e.g. a streaming
+        generator that yields across request-context boundaries.
+        """
+        if not self.enabled:
+            return
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        is_root = trace is None
+        if is_root:
+            trace = Trace(name)
+        span = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+        span.start = start_time
+        span.end = time.time()
+        span.error = error
+        self._start_otel_span(span, parent)
+        self._finish(trace, span, is_root)
+
+    def traced(self, name: str = None):
+        """Decorator that records each call of the function as a span."""
+        def decorator(func):
+            span_name = name or func.__qualname__
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current_span(self) -> Optional[Span]:
+        """Get the innermost active span, if any."""
+        return _current_span.get()
+
+    def _start_otel_span(self, span: Span, parent: Optional[Span]) -> None:
+        if not self._otel_tracer:
+            return
+        try:
+            context = None
+            if parent is not None and parent._otel_span is not None:
+                context = otel_trace.set_span_in_context(parent._otel_span)
+            span._otel_span = self._otel_tracer.start_span(
+                span.name, context=context, attributes=span.attributes,
+                start_time=int(span.start * 1e9)
+            )
+        except Exception as e:
+            logger.debug(f"OpenTelemetry span start failed: {e}")
+
+    def _finish(self, trace: Trace, span: Span, is_root: bool) -> None:
+        trace.add(span)
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = _StageHistogram()
+            histogram.observe(span.duration_ms, span.error is not None)
+            if is_root:
+                self._traces.append(trace)
+
+        if span._otel_span is not None:
+            try:
+                if span.error:
+                    span._otel_span.set_attribute("error", span.error)
+                span._otel_span.end(end_time=int(span.end * 1e9))
+            except Exception as e:
+                logger.debug(f"OpenTelemetry span end failed: {e}")
+
+    def get_recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the most recent finished traces, newest first."""
+        with self._lock:
+            traces = list(self._traces)[-limit:] if limit > 0 else []
+        return [t.to_dict() for t in reversed(traces)]
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """Get a finished trace by id."""
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace.to_dict()
+        return None
+
+    def get_stage_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get latency histogram summaries for every span name."""
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._histograms.items())}
+
+    def reset(self) -> None:
+        """Clear buffered traces and histograms."""
+        with self._lock:
+            self._traces.clear()
+            self._histograms.clear()
+
+# Global tracing service instance
+tracing_service = TracingService()
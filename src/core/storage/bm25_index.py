@@ -0,0 +1,93 @@
+"""
+Array-backed BM25 index for fork-shared, read-only retrieval corpora.
+
+rank_bm25.BM25Okapi keeps one Python dict of term frequencies per document.
+Every query walks all of them, and every walk bumps reference counts on
+thousands of small objects, so after a preload-then-fork each worker ends up
+privately copying the pages the index lives on. This index holds the same
+statistics as a handful of numpy arrays (postings in CSR layout: one
+contiguous block of document ids and term frequencies per term), which are
+never written after construction and stay shared between workers.
+
+Scores are identical to BM25Okapi's for the same corpus and parameters.
+"""
+import math
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+class CompactBM25:
+    """BM25 (Okapi) scores over a tokenized corpus, stored as flat arrays."""
+
+    def __init__(self, corpus: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(corpus)
+        if not self.corpus_size:
+            raise ValueError("CompactBM25 needs at least one document")
+
+        vocabulary: Dict[str, int] = {}
+        doc_ids: List[List[int]] = []  # per term
+        freqs: List[List[int]] = []  # per term, parallel to doc_ids
+        doc_len = np.empty(self.corpus_size, dtype=np.float64)
+
+        for doc_id, tokens in enumerate(corpus):
+            doc_len[doc_id] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                if term_id == len(doc_ids):
+                    doc_ids.append([])
+                    freqs.append([])
+                doc_ids[term_id].append(doc_id)
+                freqs[term_id].append(count)
+
+        self.vocabulary = vocabulary
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.sum()) / self.corpus_size
+        # CSR postings: term t covers [indptr[t], indptr[t + 1]) of postings/frequencies
+        self.indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in doc_ids], out=self.indptr[1:])
+        self.postings = np.fromiter((d for ids in doc_ids for d in ids), dtype=np.int32, count=int(self.indptr[-1]))
+        self.frequencies = np.fromiter((f for fs in freqs for f in fs), dtype=np.float64, count=int(self.indptr[-1]))
+        self.idf = self._calc_idf(np.diff(self.indptr))
+        # Length normalization does not depend on the query
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+
+    def _calc_idf(self, document_frequencies: np.ndarray) -> np.ndarray:
+        # Same IDF as BM25Okapi: terms in more than half the corpus get epsilon * average idf
+        idf = np.array([
+            math.log(self.corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            for freq in document_frequencies.tolist()
+        ], dtype=np.float64)
+        if len(idf):
+            average_idf = sum(idf.tolist()) / len(idf)
+            idf[idf < 0] = self.epsilon * average_idf
+        return idf
+
+    def get_scores(self, query: Iterable[str]) -> np.ndarray:
+        """BM25 score of every document for a tokenized query."""
+        scores = np.zeros(self.corpus_size)
+        for token in query:
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.postings[start:end]
+            tf = self.frequencies[start:end]
+            scores[docs] += self.idf[term_id] * (tf * (self.k1 + 1) / (tf + self._norm[docs]))
+        return scores
+
+    def top_n(self, query: Iterable[str], n: int) -> np.ndarray:
+        """Ids of the n best-scoring documents (same order as BM25Okapi.get_top_n)."""
+        return np.argsort(self.get_scores(query))[::-1][:n]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in the index arrays (excluding the vocabulary dict)."""
+        return sum(array.nbytes for array in (
+            self.doc_len, self.indptr, self.postings, self.frequencies, self.idf, self._norm
+        ))
@@ -0,0 +1,269 @@
+"""
+Columnar, read-only store of the retrieval corpus.
+
+Every retriever used to keep its own list of LangChain Documents (plus the
+BM25 retrievers' copies, cleaned copies and their maps), each chunk carrying a
+metadata dict with bulky fields such as content_preview, search_all_fields
+and SCQA strings. This store holds the corpus once:
+
+- chunk texts as one string with an offsets array
+- each metadata field as a column: repetitive fields (domain, file_type,
+  title...) dictionary-encoded as int codes into interned values, mostly
+  unique string fields (previews, search text) as one string plus offsets
+- the key order of each chunk's metadata as a shared "schema" id
+
+Retrievers index into it by integer document id (0..n-1). Documents are
+materialized (fresh Document objects, safe to mutate) only for the final
+top-k; scans and filters run over the columns.
+"""
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from langchain.docstore.document import Document
+    LANGCHAIN_AVAILABLE = True
+except ImportError:
+    LANGCHAIN_AVAILABLE = False
+
+_SEPARATOR = '\x00'  # Between texts in a string column; never matched by retrieval patterns
+_MISSING = -1
+
+class _StringColumn:
+    """Mostly unique string values, joined into one string."""
+
+    __slots__ = ('_data', '_offsets', '_present')
+
+    def __init__(self, values: Sequence[Optional[str]]):
+        self._present = np.fromiter((value is not None for value in values), dtype=np.bool_, count=len(values))
+        self._data, self._offsets = _join([value or '' for value in values])
+
+    def get(self, doc_id: int) -> Optional[str]:
+        if not self._present[doc_id]:
+            return None
+        return self._data[self._offsets[doc_id]:self._offsets[doc_id + 1] - 1]
+
+    def present(self) -> np.ndarray:
+        return self._present
+
+    def truthy(self) -> np.ndarray:
+        return self._present & (np.diff(self._offsets) > 1)
+
+    def equals(self, value: Any) -> np.ndarray:
+        return np.fromiter((self.get(i) == value for i in range(len(self._present))), dtype=np.bool_,
+                           count=len(self._present))
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._data) + self._offsets.nbytes + self._present.nbytes
+
+class _CodedColumn:
+    """Repetitive values, stored as int codes into a table of distinct values."""
+
+    __slots__ = ('_codes', '_values')
+
+    def __init__(self, values: Sequence[Any], present: Sequence[bool]):
+        table: Dict[Tuple[type, Any], int] = {}
+        self._values: List[Any] = []
+        codes = np.full(len(values), _MISSING, dtype=np.int32)
+        for doc_id, (value, is_present) in enumerate(zip(values, present)):
+            if not is_present:
+                continue
+            try:
+                # Keyed by type too, so 1, 1.0 and True stay distinct
+                key = (type(value), value)
+                code = table.get(key)
+            except TypeError:  # unhashable (lists from non-Chroma metadata)
+                key, code = None, None
+            if code is None:
+                code = len(self._values)
+                self._values.append(sys.intern(value) if isinstance(value, str) else value)
+                if key is not None:
+                    table[key] = code
+            codes[doc_id] = code
+        self._codes = codes
+
+    def get(self, doc_id: int) -> Any:
+        code = self._codes[doc_id]
+        return None if code == _MISSING else self._values[code]
+
+    def present(self) -> np.ndarray:
+        return self._codes != _MISSING
+
+    def truthy(self) -> np.ndarray:
+        value_truthy = np.fromiter((bool(value) for value in self._values), dtype=np.bool_, count=len(self._values))
+        return self.present() & np.append(value_truthy, False)[self._codes]
+
+    def equals(self, value: Any) -> np.ndarray:
+        matching = np.fromiter((v == value for v in self._values), dtype=np.bool_,
+                               count=len(self._values))
+        return self.present() & np.append(matching, False)[self._codes]
+
+    @property
+    def nbytes(self) -> int:
+        return self._codes.nbytes + sum(sys.getsizeof(value) for value in self._values)
+
+def _join(texts: Sequence[str]) -> Tuple[str, np.ndarray]:
+    """Join texts into one string; text i is data[offsets[i]:offsets[i + 1] - 1]."""
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) + 1 for text in texts], out=offsets[1:])
+    return _SEPARATOR.join(texts) + _SEPARATOR, offsets
+
+class DocumentView:
+    """Lightweight handle on one stored chunk (no copy until a field is read)."""
+
+    __slots__ = ('_store', 'doc_id', '_metadata')
+
+    def __init__(self, store: 'DocumentStore', doc_id: int):
+        self._store = store
+        self.doc_id = doc_id
+        self._metadata = None
+
+    @property
+    def page_content(self) -> str:
+        return self._store.text(self.doc_id)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = self._store.metadata(self.doc_id)
+        return self._metadata
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._store.field(self.doc_id, key, default)
+
+class DocumentStore:
+    """The retrieval corpus, stored once and addressed by integer document id."""
+
+    # Columns with at least this share of distinct values are stored as joined strings
+    UNIQUE_STRING_RATIO = 0.5
+
+    def __init__(self, texts: Sequence[str], metadatas: Sequence[Optional[Dict[str, Any]]]):
+        if len(texts) != len(metadatas):
+            raise ValueError("texts and metadatas must have the same length")
+        self._size = len(texts)
+        self._text, self._text_offsets = _join(texts)
+
+        # Column per metadata key, in order of first appearance
+        keys: Dict[str, int] = {}
+        schemas: Dict[Tuple[int, ...], int] = {}
+        self._schemas: List[Tuple[str, ...]] = []
+        self._doc_schema = np.empty(self._size, dtype=np.int32)
+        for doc_id, metadata in enumerate(metadatas):
+            layout = tuple(keys.setdefault(key, len(keys)) for key in (metadata or {}))
+            schema = schemas.get(layout)
+            if schema is None:
+                schema = schemas[layout] = len(self._schemas)
+                self._schemas.append(tuple(sys.intern(key) for key in (metadata or {})))
+            self._doc_schema[doc_id] = schema
+
+        self._columns: Dict[str, Any] = {}
+        for key in keys:
+            present = [key in (metadata or {}) for metadata in metadatas]
+            values = [(metadata or {}).get(key) for metadata in metadatas]
+            self._columns[sys.intern(key)] = self._build_column(values, present)
+
+    def _build_column(self, values: List[Any], present: List[bool]):
+        present_values = [value for value, is_present in zip(values, present) if is_present]
+        if present_values and all(isinstance(value, str) for value in present_values):
+            distinct = len(set(present_values))
+            if distinct >= self.UNIQUE_STRING_RATIO * len(present_values) and distinct > 1:
+                return _StringColumn([value if is_present else None for value, is_present in zip(values, present)])
+        return _CodedColumn(values, present)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Any]) -> 'DocumentStore':
+        """Build from Documents (anything with page_content and metadata)."""
+        texts, metadatas = [], []
+        for doc in documents:
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata or {})
+        return cls(texts, metadatas)
+
+    @classmethod
+    def from_chroma(cls, collection: Dict[str, Any]) -> 'DocumentStore':
+        """Build from a Chroma collection.get() result, skipping empty texts."""
+        texts, metadatas = [], []
+        all_metadatas = collection.get('metadatas') or []
+        for i, text in enumerate(collection.get('documents') or []):
+            if text:
+                texts.append(text)
+                metadatas.append((all_metadatas[i] if i < len(all_metadatas) else None) or {})
+        return cls(texts, metadatas)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def text(self, doc_id: int) -> str:
+        return self._text[self._text_offsets[doc_id]:self._text_offsets[doc_id + 1] - 1]
+
+    def field(self, doc_id: int, key: str, default: Any = None) -> Any:
+        """One metadata value of a chunk, without building its metadata dict."""
+        if key not in self._schemas[self._doc_schema[doc_id]]:
+            return default
+        return self._columns[key].get(doc_id)
+
+    def metadata(self, doc_id: int) -> Dict[str, Any]:
+        """A fresh metadata dict for a chunk, keys in their original order."""
+        return {key: self._columns[key].get(doc_id) for key in self._schemas[self._doc_schema[doc_id]]}
+
+    def view(self, doc_id: int) -> DocumentView:
+        return DocumentView(self, doc_id)
+
+    def document(self, doc_id: int) -> 'Document':
+        """Materialize a chunk as a new LangChain Document."""
+        if not LANGCHAIN_AVAILABLE:
+            raise RuntimeError("Materializing documents requires langchain")
+        return Document(page_content=self.text(doc_id), metadata=self.metadata(doc_id))
+
+    def documents(self, doc_ids: Iterable[int]) -> List['Document']:
+        return [self.document(int(doc_id)) for doc_id in doc_ids]
+
+    def views(self) -> Iterator[DocumentView]:
+        return (DocumentView(self, doc_id) for doc_id in range(self._size))
+
+    def column(self, key: str) -> List[Any]:
+        """Every chunk's value for a field (None where absent), e.g. to build an index."""
+        column = self._columns.get(key)
+        if column is None:
+            return [None] * self._size
+        return [column.get(doc_id) for doc_id in range(self._size)]
+
+    def truthy(self, key: str) -> np.ndarray:
+        """Mask of chunks whose field is present and truthy."""
+        column = self._columns.get(key)
+        return column.truthy() if column is not None else np.zeros(self._size, dtype=np.bool_)
+
+    def has_field(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        return column.present() if column is not None else np.zeros(self._size, dtype=np.bool_)
+
+    def equals(self, key: str, value: Any) -> np.ndarray:
+        """Mask of chunks whose field equals value."""
+        column = self._columns.get(key)
+        return column.equals(value) if column is not None else np.zeros(self._size, dtype=np.bool_)
+
+    def search_text(self, pattern: 're.Pattern') -> Iterator[int]:
+        """
+        Ids of chunks whose text matches a compiled pattern, ascending.
+
+        The pattern runs once over the joined texts; it must not match the
+        separator character (as digit or word patterns never do).
+        """
+        last = -1
+        for match in pattern.finditer(self._text):
+            doc_id = int(np.searchsorted(self._text_offsets, match.start(), side='right')) - 1
+            if doc_id != last and doc_id < self._size:
+                last = doc_id
+                yield doc_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'documents': self._size,
+            'text_bytes': sys.getsizeof(self._text) + self._text_offsets.nbytes,
+            'metadata_columns': len(self._columns),
+            'metadata_bytes': sum(column.nbytes for column in self._columns.values()),
+            'schemas': len(self._schemas)
+        }
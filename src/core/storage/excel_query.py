@@ -0,0 +1,227 @@
+"""
+Server-side sort, filter and search over Excel sheets with DuckDB.
+
+Each sheet a query touches is registered once (per file version) as a DuckDB
+view over a DataFrame of its sidecar rows, plus a lowercased __search__ column
+concatenating every cell for full-text search. Queries only select matching
+__row_id__s; the rows themselves are then sliced from the sidecar, so query
+results are byte-for-byte the same records as unfiltered pages.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+
+from .excel_sidecar import SheetSidecar, excel_sidecar_cache, sidecar_key
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+SEARCH_COLUMN = '__search__'
+
+# Filter operators and their SQL; "contains" is a case-insensitive substring match
+_COMPARISONS = {
+    'eq': '=',
+    'ne': '<>',
+    'gt': '>',
+    'gte': '>=',
+    'lt': '<',
+    'lte': '<=',
+}
+FILTER_OPERATORS = ('contains', 'in', 'is_null', 'not_null') + tuple(_COMPARISONS)
+
+class ExcelQueryError(ValueError):
+    """Invalid sort/filter/search parameters."""
+
+@dataclass
+class SheetQuery:
+    """Sort keys, column filters and search text for one sheet."""
+
+    sort: List[Tuple[str, bool]] = field(default_factory=list)  # (column, descending)
+    filters: List[Tuple[str, str, Any]] = field(default_factory=list)  # (column, operator, value)
+    search: str = ''
+
+    @classmethod
+    def from_params(cls, sort: Optional[list] = None, filters: Optional[dict] = None,
+                    search: Optional[str] = None) -> 'SheetQuery':
+        """
+        Build a query from decoded request parameters.
+
+        sort:    [{"column": "Domain", "direction": "DESC"}, ...]
+        filters: {"Domain": "privacy", "Year": {"op": "gte", "value": 2020}}
+                 (a bare value means "contains")
+        search:  text matched case-insensitively against every cell
+        """
+        query = cls(search=(search or '').strip())
+
+        if sort is not None and not isinstance(sort, list):
+            raise ExcelQueryError("sort must be a list of {column, direction} objects")
+        for item in sort or []:
+            if not isinstance(item, dict) or not item.get('column'):
+                raise ExcelQueryError("Each sort key needs a column")
+            direction = str(item.get('direction', 'ASC')).upper()
+            if direction not in ('ASC', 'DESC'):
+                raise ExcelQueryError(f"Invalid sort direction: {item.get('direction')}")
+            query.sort.append((str(item['column']), direction == 'DESC'))
+
+        if filters is not None and not isinstance(filters, dict):
+            raise ExcelQueryError("filters must be an object keyed by column")
+        for column, condition in (filters or {}).items():
+            if isinstance(condition, dict):
+                operator = condition.get('op', 'contains')
+                value = condition.get('value')
+            else:
+                operator, value = 'contains', condition
+            if operator not in FILTER_OPERATORS:
+                raise ExcelQueryError(f"Invalid filter operator: {operator}")
+            if operator == 'in' and not isinstance(value, list):
+                raise ExcelQueryError("The 'in' filter needs a list value")
+            if operator not in ('is_null', 'not_null') and value is None:
+                raise ExcelQueryError(f"Filter on '{column}' needs a value")
+            query.filters.append((str(column), operator, value))
+
+        return query
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.sort or self.filters or self.search)
+
+    def to_params(self) -> Dict[str, Any]:
+        """Canonical form, used as a cache key and echoed back to clients."""
+        return {
+            'sort': [{'column': column, 'direction': 'DESC' if desc else 'ASC'} for column, desc in self.sort],
+            'filters': [{'column': column, 'op': op, 'value': value} for column, op, value in self.filters],
+            'search': self.search
+        }
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+class ExcelQueryEngine:
+    """Runs sheet queries on one in-process DuckDB connection."""
+
+    def __init__(self, max_views: int = None):
+        self.max_views = max_views or settings.EXCEL_QUERY_MAX_VIEWS
+        # Registered views are local to a connection, so queries share this one under a lock
+        self._connection = duckdb.connect(':memory:')
+        self._lock = threading.Lock()
+        self._views: OrderedDict = OrderedDict()  # (sidecar key, sheet name) -> view name
+        self._view_counter = 0
+        self._stats = {'queries': 0, 'views_registered': 0, 'views_evicted': 0}
+
+    def query(self, file_path: Path, sheet_name: str, query: SheetQuery,
+              offset: int = 0, limit: int = 1000) -> Tuple[SheetSidecar, List[int], int]:
+        """
+        Run a query against one sheet.
+
+        Returns (sheet, row_ids, total_matching): the __row_id__s of the
+        requested page of matching rows, in result order, and the total
+        number of matching rows.
+        """
+        sheet = excel_sidecar_cache.get(file_path).sheet(sheet_name)
+        columns = {column['key'] for column in sheet.columns}
+        for column, _ in query.sort:
+            if column not in columns:
+                raise ExcelQueryError(f"Unknown sort column: {column}")
+        for column, _, _ in query.filters:
+            if column not in columns:
+                raise ExcelQueryError(f"Unknown filter column: {column}")
+
+        where, params = self._where_clause(query)
+        order = ', '.join(
+            f"{_quote(column)} {'DESC' if desc else 'ASC'} NULLS LAST" for column, desc in query.sort
+        )
+        # __row_id__ last keeps pages stable when sort keys tie
+        order = f"{order}, __row_id__" if order else "__row_id__"
+
+        key = (sidecar_key(file_path), sheet_name)
+        with self._lock:
+            view = self._view(key, sheet)
+            try:
+                total = self._connection.execute(
+                    f"SELECT count(*) FROM {view} {where}", params
+                ).fetchone()[0]
+                row_ids = [row[0] for row in self._connection.execute(
+                    f"SELECT __row_id__ FROM {view} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                    params + [max(0, limit), max(0, offset)]
+                ).fetchall()]
+            except duckdb.Error as e:
+                # e.g. comparing a text column with a number
+                raise ExcelQueryError(f"Query failed: {e}") from e
+            self._stats['queries'] += 1
+
+        return sheet, row_ids, total
+
+    @staticmethod
+    def _where_clause(query: SheetQuery) -> Tuple[str, List[Any]]:
+        conditions, params = [], []
+        for column, operator, value in query.filters:
+            quoted = _quote(column)
+            if operator == 'contains':
+                conditions.append(f"contains(lower(CAST({quoted} AS VARCHAR)), ?)")
+                params.append(str(value).lower())
+            elif operator == 'in':
+                conditions.append(f"CAST({quoted} AS VARCHAR) IN ({', '.join('?' * len(value))})")
+                params.extend(str(item) for item in value)
+            elif operator == 'is_null':
+                conditions.append(f"{quoted} IS NULL")
+            elif operator == 'not_null':
+                conditions.append(f"{quoted} IS NOT NULL")
+            else:
+                conditions.append(f"{quoted} {_COMPARISONS[operator]} ?")
+                params.append(value)
+        if query.search:
+            conditions.append(f"contains({SEARCH_COLUMN}, ?)")
+            params.append(query.search.lower())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    def _view(self, key: Tuple[str, str], sheet: SheetSidecar) -> str:
+        """Get (registering on first use) the view over a sheet. Caller holds the lock."""
+        view = self._views.get(key)
+        if view is not None:
+            self._views.move_to_end(key)
+            return view
+
+        # Heavy import only needed when a sheet is first queried
+        import pandas as pd
+
+        rows = sheet.get_rows(0, sheet.data_rows)
+        frame = pd.DataFrame.from_records(rows, columns=[c['key'] for c in sheet.columns] + ['__row_id__'])
+        # Nullable dtypes keep integer columns integral; mixed columns become VARCHAR in DuckDB
+        frame = frame.convert_dtypes()
+        frame[SEARCH_COLUMN] = [
+            '\x1f'.join(str(value) for key, value in row.items() if key != '__row_id__' and value is not None).lower()
+            for row in rows
+        ]
+
+        self._view_counter += 1
+        view = f"sheet_{self._view_counter}"
+        self._connection.register(view, frame)
+        self._views[key] = view
+        self._stats['views_registered'] += 1
+        logger.info(f"Registered DuckDB view {view} for sheet '{sheet.name}' ({len(rows)} rows)")
+
+        while len(self._views) > self.max_views:
+            _, evicted = self._views.popitem(last=False)
+            self._connection.unregister(evicted)
+            self._stats['views_evicted'] += 1
+        return view
+
+    def reset(self) -> None:
+        """Open a fresh connection and forget registered views (e.g. in a forked worker)."""
+        # DuckDB connections are not fork-safe, so a worker must not reuse the master's
+        self._lock = threading.Lock()
+        self._connection = duckdb.connect(':memory:')
+        self._views.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'views': len(self._views), 'max_views': self.max_views}
+
+# Global query engine instance
+excel_query_engine = ExcelQueryEngine()
@@ -0,0 +1,305 @@
+"""
+Sidecar cache for the Excel viewer: parse each workbook once per file version.
+
+On first access a workbook is parsed with pandas/openpyxl and written next to
+the data directory as a sidecar keyed by path + mtime + size:
+
+- manifest.json: sheet names, column keys, row counts, column widths and
+  custom row heights
+- <n>.rows: every data row of sheet n, pre-encoded as a JSON object
+- <n>.idx: little-endian uint64 byte offsets of each row in <n>.rows
+
+Both row files are memory-mapped, so any page of any sheet is served by
+slicing the map at two offsets and decoding only that page, regardless of how
+deep into the sheet the page starts. Editing or replacing the workbook changes
+its key, which builds a new sidecar and removes the stale one.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+SIDECAR_FORMAT_VERSION = 1
+_OFFSET = struct.Struct('<Q')
+
+class SheetSidecar:
+    """Memory-mapped rows and dimensions of one sheet."""
+
+    def __init__(self, directory: Path, index: int, meta: Dict[str, Any]):
+        self.name = meta['name']
+        self.columns: List[Dict[str, Any]] = meta['columns']
+        self.total_rows: int = meta['total_rows']  # openpyxl max_row (includes header)
+        self.data_rows: int = meta['data_rows']
+        self.column_widths = {int(k): v for k, v in meta['column_widths'].items()}
+        self.row_heights = {int(k): v for k, v in meta['row_heights'].items()}
+        self._rows = self._map(directory / f"{index}.rows")
+        self._index = self._map(directory / f"{index}.idx")
+
+    @staticmethod
+    def _map(path: Path) -> Optional[mmap.mmap]:
+        if path.stat().st_size == 0:
+            return None  # mmap cannot map empty files
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _offset(self, row: int) -> int:
+        return _OFFSET.unpack_from(self._index, row * _OFFSET.size)[0]
+
+    def get_rows(self, offset: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Decode data rows [offset, offset + limit); each carries its __row_id__."""
+        start = max(0, min(offset, self.data_rows))
+        end = max(start, min(offset + limit, self.data_rows))
+        if start == end or self._rows is None:
+            return []
+        # Rows are stored as "{...}," so a page is one contiguous slice
+        page = self._rows[self._offset(start):self._offset(end)]
+        return json.loads(b'[' + page[:-1] + b']')
+
+    def get_rows_by_id(self, row_ids: List[int]) -> List[Dict[str, Any]]:
+        """Decode the data rows with the given __row_id__s, in the given order."""
+        if self._rows is None:
+            return []
+        # Each stored row ends with "," so the slices join into one JSON array
+        pieces = [
+            self._rows[self._offset(row_id):self._offset(row_id + 1)]
+            for row_id in row_ids if 0 <= row_id < self.data_rows
+        ]
+        if not pieces:
+            return []
+        return json.loads(b'[' + b''.join(pieces)[:-1] + b']')
+
+    def get_row_heights(self, offset: int = 0) -> Dict[int, int]:
+        """Custom row heights in pixels, keyed by DataGrid row relative to offset."""
+        # DataGrid row 0 of a page at offset is Excel row offset + 2 (row 1 is the header)
+        start_excel_row = offset + 2
+        return {
+            excel_row - start_excel_row: height
+            for excel_row, height in self.row_heights.items()
+            if excel_row >= start_excel_row
+        }
+
+class WorkbookSidecar:
+    """All sheets of one workbook version."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        with open(directory / "manifest.json", encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.source = manifest['source']
+        self.sheet_names: List[str] = [meta['name'] for meta in manifest['sheets']]
+        self.sheets: Dict[str, SheetSidecar] = {
+            meta['name']: SheetSidecar(directory, index, meta)
+            for index, meta in enumerate(manifest['sheets'])
+        }
+
+    def sheet(self, name: str) -> SheetSidecar:
+        return self.sheets[name]
+
+def sidecar_key(file_path: Path) -> str:
+    """Key identifying one version of a file: path hash + mtime + size."""
+    resolved = Path(file_path).resolve()
+    stat = resolved.stat()
+    path_hash = hashlib.sha1(str(resolved).encode('utf-8')).hexdigest()[:16]
+    return f"{path_hash}-{stat.st_mtime_ns}-{stat.st_size}-v{SIDECAR_FORMAT_VERSION}"
+
+def _extract_workbook(file_path: Path) -> List[Dict[str, Any]]:
+    """
+    Parse every sheet of a workbook in one pass.
+
+    Values go through pandas (same type handling as the viewer always used);
+    dimensions and row counts come from a single openpyxl load.
+    """
+    # Heavy imports are only needed when a sidecar is (re)built
+    import pandas as pd
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(str(file_path), read_only=False, data_only=True)
+    try:
+        dimensions = {}
+        for ws in workbook.worksheets:
+            column_widths = {
+                openpyxl.utils.column_index_from_string(letter): dim.width
+                for letter, dim in ws.column_dimensions.items() if dim.width
+            }
+            # Points to pixels at 96 DPI
+            row_heights = {
+                row: int(dim.height * 96 / 72)
+                for row, dim in ws.row_dimensions.items() if dim.height
+            }
+            dimensions[ws.title] = (ws.max_row or 0, column_widths, row_heights)
+    finally:
+        workbook.close()
+
+    frames = pd.read_excel(str(file_path), sheet_name=None)
+    sheets = []
+    for name, df in frames.items():
+        df.columns = [str(col).strip() for col in df.columns]
+        # Rows are emitted as JSON straight from the frame (one object per line) and
+        # get their __row_id__ spliced in, without a decode/re-encode round trip
+        # (to_json escapes control and non-ASCII characters, so rows never contain a raw newline)
+        lines = [line for line in df.to_json(orient='records', date_format='iso', lines=True).split('\n') if line]
+        records = [
+            (line[:-1] + (',' if line != '{}' else '') + f'"__row_id__":{idx}}}').encode('utf-8')
+            for idx, line in enumerate(lines)
+        ]
+
+        columns = []
+        for col in df.columns:
+            # Longest value in the first 100 rows, used to estimate widths of columns without one
+            sample = df[col].head(100)
+            valid = sample[pd.notna(sample)]
+            max_length = int(valid.astype(str).str.len().max()) if len(valid) > 0 else None
+            columns.append({'key': col, 'sample_max_length': max_length})
+
+        max_row, column_widths, row_heights = dimensions.get(name, (len(records) + 1, {}, {}))
+        sheets.append({
+            'name': name,
+            'columns': columns,
+            'records': records,
+            'total_rows': max_row,
+            'column_widths': column_widths,
+            'row_heights': row_heights
+        })
+    return sheets
+
+def write_sidecar(directory: Path, source: str, sheets: List[Dict[str, Any]]) -> None:
+    """Write extracted sheets into a sidecar directory."""
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest_sheets = []
+    for index, sheet in enumerate(sheets):
+        offset = 0
+        with open(directory / f"{index}.rows", 'wb') as rows_file, open(directory / f"{index}.idx", 'wb') as index_file:
+            for record in sheet['records']:
+                # Records are dicts or already-encoded JSON objects
+                if not isinstance(record, bytes):
+                    record = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                encoded = record + b','
+                index_file.write(_OFFSET.pack(offset))
+                rows_file.write(encoded)
+                offset += len(encoded)
+            index_file.write(_OFFSET.pack(offset))
+        manifest_sheets.append({
+            'name': sheet['name'],
+            'columns': sheet['columns'],
+            'total_rows': sheet['total_rows'],
+            'data_rows': len(sheet['records']),
+            'column_widths': sheet['column_widths'],
+            'row_heights': sheet['row_heights']
+        })
+    with open(directory / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'version': SIDECAR_FORMAT_VERSION, 'sheets': manifest_sheets}, f)
+
+class ExcelSidecarCache:
+    """
+    Builds sidecars on first access and keeps recently used ones mapped.
+
+    Subclasses persist other per-version artifacts by overriding _write and _load.
+    """
+
+    label = "sidecar"
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_open: int = None):
+        self.cache_dir = Path(cache_dir or settings.EXCEL_SIDECAR_DIR)
+        self.max_open = max_open or settings.EXCEL_SIDECAR_MAX_OPEN
+        self._open: OrderedDict = OrderedDict()  # key -> loaded sidecar
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._stats = {'hits': 0, 'disk_hits': 0, 'builds': 0, 'build_ms_total': 0.0}
+
+    def _write(self, directory: Path, file_path: Path) -> None:
+        """Parse the workbook and write its sidecar files into directory."""
+        write_sidecar(directory, str(file_path), _extract_workbook(file_path))
+
+    def _load(self, directory: Path) -> WorkbookSidecar:
+        return WorkbookSidecar(directory)
+
+    def get(self, file_path: Path) -> WorkbookSidecar:
+        """Get the sidecar for the current version of a workbook, building it if needed."""
+        key = sidecar_key(file_path)
+        with self._lock:
+            workbook = self._open.get(key)
+            if workbook is not None:
+                self._open.move_to_end(key)
+                self._stats['hits'] += 1
+                return workbook
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # One build per key; concurrent requests for the same file wait for it
+        with build_lock:
+            with self._lock:
+                workbook = self._open.get(key)
+                if workbook is not None:
+                    self._stats['hits'] += 1
+                    return workbook
+
+            directory = self.cache_dir / key
+            if (directory / "manifest.json").exists():
+                self._stats['disk_hits'] += 1
+            else:
+                self._build(file_path, key)
+            workbook = self._load(directory)
+
+            with self._lock:
+                self._open[key] = workbook
+                self._build_locks.pop(key, None)
+                # Evicted maps are released once in-flight requests drop their references
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+        return workbook
+
+    def _build(self, file_path: Path, key: str) -> None:
+        build_start = time.time()
+        tmp_dir = self.cache_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            self._write(tmp_dir, file_path)
+            try:
+                tmp_dir.rename(self.cache_dir / key)
+            except OSError:
+                # Another worker finished the same version first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._remove_stale_versions(key)
+        build_ms = (time.time() - build_start) * 1000
+        self._stats['builds'] += 1
+        self._stats['build_ms_total'] += build_ms
+        logger.info(f"Built Excel {self.label} for {Path(file_path).name} in {build_ms:.0f}ms")
+
+    def _remove_stale_versions(self, key: str) -> None:
+        """Delete sidecars of older versions of the same file."""
+        path_hash = key.split('-', 1)[0]
+        for directory in self.cache_dir.glob(f"{path_hash}-*"):
+            if directory.name == key:
+                continue
+            with self._lock:
+                self._open.pop(directory.name, None)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            builds = self._stats['builds']
+            return {
+                **self._stats,
+                'build_ms_avg': round(self._stats['build_ms_total'] / builds, 2) if builds else 0.0,
+                'open_workbooks': len(self._open),
+                'max_open': self.max_open,
+                'cache_dir': str(self.cache_dir)
+            }
+
+# Global sidecar cache instance
+excel_sidecar_cache = ExcelSidecarCache()
@@ -0,0 +1,317 @@
+"""
+Precomputed formatting index for the Excel viewer.
+
+Formatting is extracted once per file version (one openpyxl load for the whole
+workbook) into a compact representation persisted next to the values sidecar:
+
+- a deduplicated style table: every distinct viewer formatting dict, once
+- a per-cell style-id array (int32, rows x columns), memory-mapped from .npy
+- merged ranges sorted by first row, with a running max of last rows so the
+  ranges overlapping any row window are found by binary search
+- a hyperlink map (explicit hyperlinks and =HYPERLINK formulas)
+
+A formatting chunk for any row range is then an array slice plus dictionary
+lookups for the cells that carry formatting, independent of the offset.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+from .excel_sidecar import ExcelSidecarCache
+
+logger = get_logger(__name__)
+
+# Columns beyond this are never formatted by the viewer
+MAX_FORMAT_COLUMNS = 100
+
+# Fill colors that mean "no fill"
+_SKIP_FILL_COLORS = {
+    '00000000',  # Transparent
+    'FFFFFFFF',  # White (theme background)
+    'FFFFFF',    # White
+}
+# Only skip the "auto" font color indicator; explicit black is kept
+_SKIP_FONT_COLORS = {'00000000'}
+_TRANSPARENT_ALPHAS = ('00', '01', '02', '03', '04', '05')
+
+def _hex_color(rgb: Any, skip: set = None, check_alpha: bool = True) -> Optional[str]:
+    """Convert a resolved openpyxl ARGB/RGB value to #RRGGBB, or None to omit it."""
+    # Theme/indexed references that openpyxl could not resolve are not strings
+    if not isinstance(rgb, str) or len(rgb) < 6:
+        return None
+    if skip and rgb.upper() in skip:
+        return None
+    if len(rgb) == 8:  # ARGB format
+        if check_alpha and rgb[:2].upper() in _TRANSPARENT_ALPHAS:
+            return None
+        return f"#{rgb[2:]}"
+    return f"#{rgb}" if not rgb.startswith('#') else rgb
+
+def cell_style_format(cell) -> Dict[str, Any]:
+    """Viewer formatting derived from a cell's style (fill, font, borders, wrapping)."""
+    fmt = {}
+
+    # Background color - only solid fills with a resolved RGB value
+    if cell.fill and cell.fill.fill_type == 'solid':
+        start_color = cell.fill.start_color
+        if start_color and hasattr(start_color, 'rgb') and start_color.rgb:
+            color = _hex_color(start_color.rgb, _SKIP_FILL_COLORS)
+            if color:
+                fmt['bgColor'] = color
+
+    # Font formatting
+    if cell.font:
+        if cell.font.color and hasattr(cell.font.color, 'rgb') and cell.font.color.rgb:
+            color = _hex_color(cell.font.color.rgb, _SKIP_FONT_COLORS)
+            if color:
+                fmt['fontColor'] = color
+        if cell.font.bold:
+            fmt['bold'] = True
+        if cell.font.italic:
+            fmt['italic'] = True
+        if cell.font.underline:
+            fmt['underline'] = True
+        if cell.font.size:
+            fmt['fontSize'] = cell.font.size
+
+    # Border formatting
+    if cell.border:
+        borders = {}
+        for side_name in ('top', 'bottom', 'left', 'right'):
+            side = getattr(cell.border, side_name)
+            if side and side.style:
+                info = {'style': side.style}
+                if side.color and side.color.rgb:
+                    color = _hex_color(side.color.rgb, check_alpha=False)
+                    if color:
+                        info['color'] = color
+                borders[side_name] = info
+        if borders:
+            fmt['borders'] = borders
+
+    # Text wrapping
+    if cell.alignment and cell.alignment.wrap_text:
+        fmt['wrapText'] = True
+
+    return fmt
+
+def _formula_hyperlink(value: Any) -> Optional[str]:
+    """Extract the URL from a =HYPERLINK("url", "text") formula."""
+    if isinstance(value, str) and value.startswith('=HYPERLINK'):
+        match = re.search(r'=HYPERLINK\s*\(\s*"([^"]+)"', value)
+        if match:
+            return match.group(1)
+    return None
+
+def _extract_sheet_styles(sheet) -> Dict[str, Any]:
+    """Build the style table, style-id array, merged ranges and hyperlinks of one sheet."""
+    import openpyxl
+
+    n_rows = sheet.max_row or 0
+    n_cols = min(sheet.max_column or 0, MAX_FORMAT_COLUMNS)
+
+    styles: List[Dict[str, Any]] = [{}]  # id 0 = no formatting
+    style_ids_by_fmt = {json.dumps({}): 0}
+    style_ids_by_array = {}  # openpyxl StyleArray -> style id, so each distinct style is converted once
+    style_ids = np.zeros((n_rows, n_cols), dtype=np.int32)
+
+    hyperlinks: Dict[int, Dict[int, str]] = {}
+    for hyperlink in getattr(sheet, '_hyperlinks', None) or []:
+        if hyperlink.ref and hyperlink.target:
+            try:
+                row, col = openpyxl.utils.cell.coordinate_to_tuple(hyperlink.ref)
+                hyperlinks.setdefault(row, {})[col] = hyperlink.target
+            except Exception as e:
+                logger.warning(f"Failed to parse hyperlink ref {hyperlink.ref}: {e}")
+
+    if n_rows and n_cols:
+        for row in sheet.iter_rows(min_row=1, max_row=n_rows, max_col=n_cols):
+            row_ids = []
+            for cell in row:
+                # Cells covered by a merge may carry no style of their own
+                array_key = tuple(cell._style) if cell._style is not None else None
+                style_id = style_ids_by_array.get(array_key)
+                if style_id is None:
+                    try:
+                        fmt = cell_style_format(cell)
+                    except Exception:
+                        fmt = {}
+                    fmt_key = json.dumps(fmt, sort_keys=True)
+                    style_id = style_ids_by_fmt.get(fmt_key)
+                    if style_id is None:
+                        style_id = style_ids_by_fmt[fmt_key] = len(styles)
+                        styles.append(fmt)
+                    style_ids_by_array[array_key] = style_id
+                row_ids.append(style_id)
+
+                # Explicit hyperlinks win over HYPERLINK formulas
+                row_links = hyperlinks.get(cell.row, {})
+                if cell.column not in row_links:
+                    url = None
+                    if getattr(cell, 'hyperlink', None):
+                        url = cell.hyperlink.target if hasattr(cell.hyperlink, 'target') else str(cell.hyperlink)
+                    url = url or _formula_hyperlink(cell.value)
+                    if url:
+                        hyperlinks.setdefault(cell.row, {})[cell.column] = url
+            if row_ids:
+                style_ids[row[0].row - 1, :len(row_ids)] = row_ids
+
+    merged = sorted(
+        (r.min_row, r.min_col, r.max_row, r.max_col) for r in sheet.merged_cells.ranges
+    )
+    return {
+        'name': sheet.title,
+        'styles': styles,
+        'style_ids': style_ids,
+        'merged': np.array(merged, dtype=np.int32).reshape(-1, 4),
+        'hyperlinks': hyperlinks
+    }
+
+def _extract_workbook_styles(file_path: Path) -> List[Dict[str, Any]]:
+    """Extract formatting of every sheet in a single workbook load."""
+    import openpyxl
+
+    # Non-read-only mode is required for merged cells and hyperlinks
+    workbook = openpyxl.load_workbook(str(file_path), data_only=False, read_only=False)
+    try:
+        return [_extract_sheet_styles(sheet) for sheet in workbook.worksheets]
+    finally:
+        workbook.close()
+
+def write_style_index(directory: Path, sheets: List[Dict[str, Any]]) -> None:
+    """Persist extracted sheet styles into a style index directory."""
+    manifest = []
+    for index, sheet in enumerate(sheets):
+        np.save(directory / f"{index}.styles.npy", sheet['style_ids'])
+        np.save(directory / f"{index}.merged.npy", sheet['merged'])
+        manifest.append({
+            'name': sheet['name'],
+            'styles': sheet['styles'],
+            'hyperlinks': {
+                str(row): {str(col): url for col, url in cols.items()}
+                for row, cols in sheet['hyperlinks'].items()
+            }
+        })
+    with open(directory / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump({'sheets': manifest}, f)
+
+class SheetStyleIndex:
+    """Formatting of one sheet, answerable for any row range by slicing."""
+
+    def __init__(self, directory: Path, index: int, meta: Dict[str, Any]):
+        self.name = meta['name']
+        self.styles: List[Dict[str, Any]] = meta['styles']
+        self.hyperlinks = {
+            int(row): {int(col): url for col, url in cols.items()}
+            for row, cols in meta['hyperlinks'].items()
+        }
+        style_path = directory / f"{index}.styles.npy"
+        try:
+            self.style_ids = np.load(style_path, mmap_mode='r')
+        except ValueError:
+            # Empty sheets: zero-sized arrays cannot be memory-mapped
+            self.style_ids = np.load(style_path)
+        self.merged = np.load(directory / f"{index}.merged.npy")
+        # Running max of last rows: non-decreasing, so the first range that can reach a row is a bisect
+        self._merged_reach = np.maximum.accumulate(self.merged[:, 2])
+
+    @property
+    def n_rows(self) -> int:
+        return self.style_ids.shape[0]
+
+    @property
+    def n_cols(self) -> int:
+        return self.style_ids.shape[1]
+
+    def _cell_format(self, excel_row: int, excel_col: int) -> Dict[str, Any]:
+        """Style plus hyperlink of a single cell (1-indexed Excel coordinates)."""
+        fmt = {}
+        if 1 <= excel_row <= self.n_rows and 1 <= excel_col <= self.n_cols:
+            fmt = dict(self.styles[self.style_ids[excel_row - 1, excel_col - 1]])
+        url = self.hyperlinks.get(excel_row, {}).get(excel_col)
+        if url:
+            fmt['hyperlink'] = url
+        return fmt
+
+    def get_formatting(self, offset: int = 0, max_rows: int = 100) -> Dict[str, Dict[str, Any]]:
+        """
+        Formatting for DataGrid rows [offset, offset + max_rows).
+
+        Keys are "dataGridRow_excelCol". Excel row 1 is the header, so
+        DataGrid row r is Excel row r + 2.
+        """
+        start_row = offset + 2
+        end_row = min(start_row + max_rows, self.n_rows + 1)  # exclusive
+        formatting: Dict[str, Dict[str, Any]] = {}
+        if end_row <= start_row:
+            return formatting
+
+        # Cells with a style
+        block = self.style_ids[start_row - 1:end_row - 1]
+        rows, cols = np.nonzero(block)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            formatting[f"{start_row + r - 2}_{c + 1}"] = dict(self.styles[block[r, c]])
+
+        # Hyperlinks
+        for excel_row in range(start_row, end_row):
+            for excel_col, url in self.hyperlinks.get(excel_row, {}).items():
+                formatting.setdefault(f"{excel_row - 2}_{excel_col}", {})['hyperlink'] = url
+
+        # Merged ranges overlapping the window
+        lo = int(np.searchsorted(self._merged_reach, start_row, side='left'))
+        hi = int(np.searchsorted(self.merged[:, 0], end_row, side='left'))
+        for min_row, min_col, max_row, max_col in self.merged[lo:hi].tolist():
+            if max_row < start_row:
+                continue
+            anchor_key = f"{min_row - 2}_{min_col}"
+            anchor_fmt = self._cell_format(min_row, min_col)
+            for excel_row in range(max(min_row, start_row), min(max_row, end_row - 1) + 1):
+                for excel_col in range(min_col, min(max_col, self.n_cols) + 1):
+                    key = f"{excel_row - 2}_{excel_col}"
+                    if (excel_row, excel_col) == (min_row, min_col):
+                        # Anchor is always marked so the frontend can calculate the span
+                        formatting.setdefault(key, {})['isAnchor'] = True
+                    else:
+                        # Covered cells take the anchor's formatting
+                        fmt = dict(anchor_fmt)
+                        fmt['isMerged'] = True
+                        fmt['mergeAnchor'] = anchor_key
+                        formatting[key] = fmt
+
+        return formatting
+
+class WorkbookStyleIndex:
+    """Style indexes of all sheets of one workbook version."""
+
+    def __init__(self, directory: Path):
+        with open(directory / "manifest.json", encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.sheets: Dict[str, SheetStyleIndex] = {
+            meta['name']: SheetStyleIndex(directory, index, meta)
+            for index, meta in enumerate(manifest['sheets'])
+        }
+
+    def sheet(self, name: str) -> SheetStyleIndex:
+        return self.sheets[name]
+
+class ExcelStyleIndexCache(ExcelSidecarCache):
+    """Builds style indexes once per file version, stored beside the values sidecars."""
+
+    label = "style index"
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_open: int = None):
+        super().__init__(cache_dir or Path(settings.EXCEL_SIDECAR_DIR) / "styles", max_open)
+
+    def _write(self, directory: Path, file_path: Path) -> None:
+        write_style_index(directory, _extract_workbook_styles(file_path))
+
+    def _load(self, directory: Path) -> WorkbookStyleIndex:
+        return WorkbookStyleIndex(directory)
+
+# Global style index cache instance
+excel_style_index_cache = ExcelStyleIndexCache()
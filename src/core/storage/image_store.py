@@ -0,0 +1,79 @@
+"""
+Content-addressed store for images extracted from documents.
+
+Images are stored once under the SHA-256 of their bytes, so the same image
+shared by several documents or document versions is kept once, and its
+address never changes meaning: responses can be cached indefinitely and the
+digest doubles as the ETag.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+_DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Extensions mimetypes does not map consistently across platforms
+_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/svg+xml': '.svg',
+    'image/x-emf': '.emf',
+    'image/x-wmf': '.wmf',
+    'image/tiff': '.tiff',
+    'image/bmp': '.bmp',
+}
+
+class ImageStore:
+    """Stores image bytes by digest on local disk."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or settings.DOCUMENT_IMAGE_DIR)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _extension(content_type: str) -> str:
+        return _EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type or '') or '.bin'
+
+    def _path(self, digest: str, extension: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.root / digest[:2] / f"{digest}{extension}"
+
+    def put(self, data: bytes, content_type: str) -> str:
+        """Store image bytes and return their digest. Storing the same bytes again is a no-op."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, self._extension(content_type))
+        if path.exists():
+            return digest
+
+        with self._lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> Optional[Tuple[Path, str]]:
+        """Get (path, content_type) for a digest, or None if unknown."""
+        if not _DIGEST_PATTERN.match(digest or ''):
+            return None
+        for path in (self.root / digest[:2]).glob(f"{digest}.*"):
+            content_type = next(
+                (ct for ct, ext in _EXTENSIONS.items() if ext == path.suffix),
+                mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+            )
+            return path, content_type
+        return None
+
+# Global image store instance
+image_store = ImageStore()
@@ -144,12 +144,34 @@ class MetricsDatabase:
                 )
             """)
             
+            # Token usage per pipeline stage and model for each query
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS token_usage (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    metric_id INTEGER,
+                    session_id TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    cached_tokens INTEGER NOT NULL DEFAULT 0,
+                    calls INTEGER NOT NULL DEFAULT 1,
+                    latency_ms INTEGER NOT NULL DEFAULT 0,
+                    cost_estimate REAL NOT NULL,
+                    estimated INTEGER NOT NULL DEFAULT 0,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (metric_id) REFERENCES metrics(id)
+                )
+            """)
+            
             # Create indexes for better query performance
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_session ON metrics(session_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics(timestamp)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_session ON sessions(session_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_session ON feedback(session_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_gates_timestamp ON gates_history(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_token_usage_timestamp ON token_usage(timestamp)")
     
     def log_metric(self, metric: QueryMetric) -> int:
         """Log a single query metric to the database."""
@@ -169,6 +191,53 @@ class MetricsDatabase:
             ))
             return cursor.lastrowid
     
+    def log_token_usage(self, metric_id: Optional[int], session_id: str, timestamp: str,
+                        usage_rows: List[Dict[str, Any]]):
+        """Log per-stage/per-model token usage rows for a query."""
+        if not usage_rows:
+            return
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO token_usage (
+                    metric_id, session_id, timestamp, stage, model, prompt_tokens,
+                    output_tokens, cached_tokens, calls, latency_ms, cost_estimate, estimated
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    metric_id, session_id, timestamp, row['stage'], row['model'],
+                    row['prompt_tokens'], row['output_tokens'], row.get('cached_tokens', 0),
+                    row.get('calls', 1), row.get('latency_ms', 0), row['cost_estimate'],
+                    1 if row.get('estimated') else 0
+                )
+                for row in usage_rows
+            ])
+    
+    def get_token_usage_breakdown(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get token usage and cost grouped by pipeline stage and model."""
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT 
+                    stage,
+                    model,
+                    SUM(calls) as calls,
+                    SUM(prompt_tokens) as prompt_tokens,
+                    SUM(output_tokens) as output_tokens,
+                    SUM(cached_tokens) as cached_tokens,
+                    SUM(cost_estimate) as total_cost,
+                    AVG(latency_ms) as avg_latency_ms,
+                    SUM(estimated) as estimated_rows
+                FROM token_usage
+                WHERE timestamp > ?
+                GROUP BY stage, model
+                ORDER BY total_cost DESC
+            """, (cutoff,))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
     def update_session(self, session_id: str, user_hash: str, language: str = 'en'):
         """Create or update a session."""
         with self.get_connection() as conn:
@@ -0,0 +1,201 @@
+"""
+Shared render cache for document viewers.
+
+Rendered documents (Excel pages, Word HTML) depend only on the file contents
+and the render parameters, never on who is asking, so they are cached by
+content: path + mtime + size of the file, plus the render parameters. The
+session authorization check (snippet_db.get_snippet) stays in the routes and
+runs before the cache is consulted.
+
+Entries are bounded by their encoded size in bytes (LRU eviction) and can be
+persisted to disk as gzip-compressed JSON, so a restarted worker starts warm.
+Concurrent misses for the same key render once; other requests wait for it.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+# Bump when a renderer's output format changes, so persisted entries are not reused
+RENDER_FORMAT_VERSION = 2
+
+class DocumentRenderCache:
+    """Byte-bounded LRU of rendered documents with optional disk persistence."""
+
+    def __init__(self, max_bytes: int = None, persist: bool = None, disk_dir: Optional[Path] = None,
+                 max_disk_bytes: int = None):
+        """
+        Initialize the render cache.
+
+        Args:
+            max_bytes: Memory budget for cached renders (encoded JSON size)
+            persist: Also store renders on disk and read them back on memory misses
+            disk_dir: Directory for persisted renders
+            max_disk_bytes: Disk budget; oldest files are removed beyond it
+        """
+        self.max_bytes = max_bytes or settings.RENDER_CACHE_MAX_BYTES
+        self.persist = settings.RENDER_CACHE_PERSIST if persist is None else persist
+        self.disk_dir = Path(disk_dir or settings.RENDER_CACHE_DIR)
+        self.max_disk_bytes = max_disk_bytes or settings.RENDER_CACHE_MAX_DISK_BYTES
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._render_locks: Dict[str, threading.Lock] = {}
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'renders': 0}
+
+    @staticmethod
+    def make_key(kind: str, file_path: Path, params: Optional[Dict[str, Any]] = None) -> str:
+        """Content key: renderer kind, file version (path + mtime + size) and render params."""
+        resolved = Path(file_path).resolve()
+        stat = resolved.stat()
+        return json.dumps(
+            [RENDER_FORMAT_VERSION, kind, str(resolved), stat.st_mtime_ns, stat.st_size, params or {}],
+            sort_keys=True, default=str
+        )
+
+    def get_or_render(self, kind: str, file_path: Path, render: Callable[[], Any],
+                      params: Optional[Dict[str, Any]] = None) -> Tuple[Any, bool]:
+        """
+        Get a cached render, rendering it on a miss.
+
+        Returns (value, cached). The value is shared between requests and must
+        not be modified; copy it before adding per-request fields.
+        """
+        key = self.make_key(kind, file_path, params)
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                # Another request may have rendered it while we waited
+                value = self.get(key, count_miss=False)
+                if value is not None:
+                    return value, True
+                value = render()
+                self.put(key, value)
+                with self._lock:
+                    self._stats['renders'] += 1
+        finally:
+            with self._lock:
+                self._render_locks.pop(key, None)
+        return value, False
+
+    def get(self, key: str, count_miss: bool = True) -> Any:
+        """Get a cached value from memory, then disk, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+
+        value = self._read_disk(key) if self.persist else None
+        with self._lock:
+            if value is None:
+                if count_miss:
+                    self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+        self._store(key, value, json.dumps(value, default=str).encode('utf-8'))
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache a rendered value (must be JSON-serializable)."""
+        encoded = json.dumps(value, default=str).encode('utf-8')
+        self._store(key, value, encoded)
+        if self.persist:
+            self._write_disk(key, encoded)
+
+    def _store(self, key: str, value: Any, encoded: bytes) -> None:
+        size = len(encoded)
+        if size > self.max_bytes:
+            return  # Larger than the whole budget; only kept on disk
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats['evictions'] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json.gz"
+
+    def _read_disk(self, key: str) -> Any:
+        path = self._disk_path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                value = json.loads(f.read())
+            os.utime(path)  # Keep recently used files out of pruning
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable render cache file {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, encoded: bytes) -> None:
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            with gzip.open(tmp_path, 'wb', compresslevel=5) as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except Exception as e:
+            logger.warning(f"Failed to persist render cache entry: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def _prune_disk(self) -> None:
+        """Remove least recently used files beyond the disk budget."""
+        files = []
+        for path in self.disk_dir.glob("*.json.gz"):
+            try:
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (persisted files are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate_percent': round((self._stats['hits'] + self._stats['disk_hits']) / lookups * 100, 2) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'persist': self.persist
+            }
+
+# Global render cache instance
+render_cache = DocumentRenderCache()
@@ -0,0 +1,328 @@
+"""
+Pluggable session store for conversation and session state.
+
+Chat history, session languages, widget sessions and the query processor's
+reset-guard state all go through a SessionStore, so state can live outside the
+worker process and multiple workers can serve the same session behind a load
+balancer. Three backends are provided:
+
+- MemorySessionStore: in-process LRU with TTL (single worker / development)
+- SQLiteSessionStore: shared file on local disk (multiple workers on one host)
+- RedisSessionStore: any client speaking the Redis protocol (multiple hosts)
+
+Values must be JSON-serializable. Callers must write values back with set()
+after modifying them; in-place mutation is not persisted by the shared backends.
+"""
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+class SessionStore(ABC):
+    """Key-value store for session state, partitioned by namespace."""
+
+    def __init__(self, default_ttl: int = None):
+        self.default_ttl = default_ttl or settings.SESSION_TTL
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Get a value and refresh its TTL, or return default if missing/expired."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store a value with a TTL in seconds (default_ttl if not given)."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        """Delete a value. Returns True if it existed."""
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        """Number of live entries in a namespace."""
+
+    @abstractmethod
+    def cleanup(self) -> int:
+        """Remove expired entries. Returns the number removed."""
+
+    def exists(self, namespace: str, key: str) -> bool:
+        """Check whether a live value exists (refreshing its TTL)."""
+        return self.get(namespace, key) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "default_ttl": self.default_ttl}
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process LRU store with TTL expiry.
+
+    Expiry uses coarse time buckets: each entry is filed under the bucket its
+    expiry time falls into, and cleanup drops whole past buckets instead of
+    scanning every session. Reads also check expiry, so bucket granularity
+    never serves a stale entry.
+    """
+
+    def __init__(self, default_ttl: int = None, max_entries: int = None, bucket_seconds: int = 60):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries or settings.SESSION_MAX_ENTRIES
+        self.bucket_seconds = bucket_seconds
+        self._entries: Dict[str, OrderedDict] = {}  # namespace -> key -> (value, expires_at, ttl)
+        self._buckets: Dict[int, Set[Tuple[str, str]]] = {}  # bucket -> {(namespace, key)}
+        self._oldest_bucket = self._bucket_for(time.time())
+        self._lock = threading.RLock()
+        self._evictions = 0
+        self._expirations = 0
+
+    def _bucket_for(self, expires_at: float) -> int:
+        return int(expires_at // self.bucket_seconds)
+
+    def _unfile(self, namespace: str, key: str, expires_at: float) -> None:
+        bucket = self._buckets.get(self._bucket_for(expires_at))
+        if bucket is not None:
+            bucket.discard((namespace, key))
+            if not bucket:
+                del self._buckets[self._bucket_for(expires_at)]
+
+    def _file(self, namespace: str, key: str, expires_at: float) -> None:
+        self._buckets.setdefault(self._bucket_for(expires_at), set()).add((namespace, key))
+
+    def _remove_locked(self, namespace: str, key: str) -> bool:
+        entries = self._entries.get(namespace)
+        if not entries or key not in entries:
+            return False
+        _, expires_at, _ = entries.pop(key)
+        self._unfile(namespace, key, expires_at)
+        return True
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if not entries or key not in entries:
+                return default
+            value, expires_at, ttl = entries[key]
+            now = time.time()
+            if expires_at <= now:
+                self._remove_locked(namespace, key)
+                self._expirations += 1
+                return default
+            # Sliding expiry + LRU position
+            self._unfile(namespace, key, expires_at)
+            new_expiry = now + ttl
+            entries[key] = (value, new_expiry, ttl)
+            entries.move_to_end(key)
+            self._file(namespace, key, new_expiry)
+            return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        with self._lock:
+            # Cheap: only touches buckets that expired since the last call
+            self.cleanup()
+            self._remove_locked(namespace, key)
+            entries = self._entries.setdefault(namespace, OrderedDict())
+            expires_at = time.time() + ttl
+            entries[key] = (value, expires_at, ttl)
+            self._file(namespace, key, expires_at)
+
+            # LRU cap per namespace
+            while len(entries) > self.max_entries:
+                oldest_key = next(iter(entries))
+                self._remove_locked(namespace, oldest_key)
+                self._evictions += 1
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return self._remove_locked(namespace, key)
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return len(self._entries.get(namespace, ()))
+
+    def cleanup(self) -> int:
+        """Drop every bucket whose whole time range has passed."""
+        removed = 0
+        with self._lock:
+            current = self._bucket_for(time.time())
+            for bucket in range(self._oldest_bucket, current):
+                for namespace, key in self._buckets.pop(bucket, ()):
+                    entries = self._entries.get(namespace)
+                    if entries is not None and entries.pop(key, None) is not None:
+                        removed += 1
+            # Bucket indices are dense in time, so this stays proportional to elapsed buckets
+            self._oldest_bucket = max(self._oldest_bucket, current)
+            self._expirations += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **super().get_stats(),
+                "max_entries": self.max_entries,
+                "namespaces": {ns: len(entries) for ns, entries in self._entries.items()},
+                "buckets": len(self._buckets),
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file shared by all workers on a host."""
+
+    def __init__(self, db_path: Optional[Path] = None, default_ttl: int = None, max_entries: int = None):
+        super().__init__(default_ttl)
+        self.db_path = Path(db_path or settings.SESSION_DB_PATH)
+        self.max_entries = max_entries or settings.SESSION_MAX_ENTRIES
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _init_database(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    ttl INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            # Expiry sweeps and LRU trims both walk this index instead of the table
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_expiry ON session_state(namespace, expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_expires ON session_state(expires_at)")
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, ttl FROM session_state WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now)
+            ).fetchone()
+            if row is None:
+                return default
+            conn.execute(
+                "UPDATE session_state SET expires_at = ? WHERE namespace = ? AND key = ?",
+                (now + row[1], namespace, key)
+            )
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO session_state (namespace, key, value, ttl, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), ttl, time.time() + ttl)
+            )
+            # LRU cap: entries closest to expiry are the least recently used
+            overflow = conn.execute(
+                "SELECT COUNT(*) FROM session_state WHERE namespace = ?", (namespace,)
+            ).fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute("""
+                    DELETE FROM session_state WHERE rowid IN (
+                        SELECT rowid FROM session_state WHERE namespace = ?
+                        ORDER BY expires_at LIMIT ?
+                    )
+                """, (namespace, overflow))
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM session_state WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            return cursor.rowcount > 0
+
+    def count(self, namespace: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM session_state WHERE namespace = ? AND expires_at > ?",
+                (namespace, time.time())
+            ).fetchone()[0]
+
+    def cleanup(self) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM session_state WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "db_path": str(self.db_path), "max_entries": self.max_entries}
+
+class RedisSessionStore(SessionStore):
+    """
+    Session store backed by a Redis-protocol server.
+
+    Expiry is delegated to the server (SET EX / EXPIRE), so cleanup is a no-op.
+    Any client exposing get/set(ex=)/delete/expire/scan_iter works, which also
+    allows an in-process fake in tests.
+    """
+
+    def __init__(self, client=None, url: str = None, default_ttl: int = None, prefix: str = "airi:session"):
+        super().__init__(default_ttl)
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise ImportError("redis package is required for RedisSessionStore")
+            client = redis.Redis.from_url(url or settings.SESSION_REDIS_URL)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        full_key = self._key(namespace, key)
+        raw = self.client.get(full_key)
+        if raw is None:
+            return default
+        payload = json.loads(raw)
+        self.client.expire(full_key, payload.get("ttl", self.default_ttl))
+        return payload["value"]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        self.client.set(self._key(namespace, key), json.dumps({"value": value, "ttl": ttl}), ex=ttl)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        return bool(self.client.delete(self._key(namespace, key)))
+
+    def count(self, namespace: str) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}:{namespace}:*"))
+
+    def cleanup(self) -> int:
+        return 0
+
+def create_session_store(backend: str = None) -> SessionStore:
+    """Create the session store configured by SESSION_BACKEND (memory, sqlite or redis)."""
+    backend = (backend or settings.SESSION_BACKEND).lower()
+    try:
+        if backend == "redis":
+            return RedisSessionStore()
+        if backend == "sqlite":
+            return SQLiteSessionStore()
+    except Exception as e:
+        logger.error(f"Failed to initialize {backend} session store, using memory: {e}")
+    if backend not in ("memory", "redis", "sqlite"):
+        logger.warning(f"Unknown session backend '{backend}', using memory")
+    return MemorySessionStore()
+
+# Global session store instance
+session_store = create_session_store()
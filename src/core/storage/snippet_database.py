@@ -1,11 +1,26 @@
 """
 Database management for JSON snippet storage with session support.
+
+Snippets are content-addressed: each distinct snippet is stored once in
+`snippets`, keyed by a hash of its RID and content, and a session holds
+lightweight reference rows in `snippet_sessions`. A popular RID cited in
+thousands of sessions is therefore stored once, and the database grows
+with the corpus rather than with traffic.
+
+`snippet_records` maps each RID to the snippet precomputed for it at
+ingestion (see snippet_records.py), so citing it is a keyed lookup.
+
+The database is opened (and migrated to the current schema) on first use,
+not when the module is imported.
 """
+import hashlib
 import json
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import uuid
 
 from ...config.logging import get_logger
@@ -13,39 +28,75 @@ from ...config.settings import settings
 
 logger = get_logger(__name__)
 
+# Bumped whenever the tables change; stored in PRAGMA user_version
+SCHEMA_VERSION = 3
+
+# Snippet fields that differ per save of the same content. They are kept on the
+# session's reference row instead of in the shared snippet.
+VOLATILE_FIELDS = ('created_at',)
+
+def snippet_hash(rid: str, snippet_data: Dict[str, Any]) -> Tuple[str, str]:
+    """Content address of a snippet: (hash, canonical JSON without volatile fields)."""
+    content = {key: value for key, value in snippet_data.items() if key not in VOLATILE_FIELDS}
+    canonical = json.dumps(content, sort_keys=True)
+    return hashlib.sha256(f"{rid}\n{canonical}".encode('utf-8')).hexdigest(), canonical
+
+class StaleSnippetReference(Exception):
+    """Stored snippets a caller looked up were garbage-collected before it referenced them."""
+
+    def __init__(self, rids: List[str]):
+        super().__init__(f"Snippets no longer stored: {', '.join(rids)}")
+        self.rids = rids
+
 class SnippetDatabase:
     """Manages snippet storage in SQLite database with session support."""
     
     def __init__(self, db_path: Optional[Path] = None):
-        """Initialize the database connection."""
+        """Initialize the database; tables are created or migrated on first use."""
         self.db_path = db_path or settings.DATA_DIR / "snippets.db"
-        self._init_database()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection, creating or migrating the database on first use."""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_database()
+                    self._initialized = True
+        return sqlite3.connect(self.db_path, timeout=30.0)
+    
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Connection inside a BEGIN IMMEDIATE transaction, committed on success.
+        
+        The write lock is taken up front, so what the transaction reads cannot
+        be changed by another writer (e.g. garbage collection) before it commits.
+        """
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
     
     def _init_database(self):
-        """Create tables if they don't exist."""
+        """Create tables if they don't exist, migrating databases of an older schema."""
         # Use WAL mode and set timeout to prevent locking issues
         with sqlite3.connect(self.db_path, timeout=30.0) as conn:
             # Enable WAL mode for better concurrency
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA busy_timeout=30000")  # 30 seconds
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS snippet_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    rid TEXT NOT NULL,
-                    data JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(session_id, rid)
-                )
-            """)
-            
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_id ON snippet_sessions(session_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON snippet_sessions(created_at)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_rid ON snippet_sessions(rid)")
             
-            # Add composite index for faster (session_id, rid) lookups
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_rid ON snippet_sessions(session_id, rid)")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._migrate(conn)
             
             # Table for session management
             conn.execute("""
@@ -59,6 +110,103 @@ class SnippetDatabase:
             conn.commit()
             logger.info(f"Snippet database initialized at {self.db_path}")
     
+    def _create_tables(self, conn):
+        """Create the snippet and session reference tables."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS snippets (
+                content_hash TEXT PRIMARY KEY,
+                rid TEXT NOT NULL,
+                data JSON NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_snippets_rid ON snippets(rid)")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS snippet_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                rid TEXT NOT NULL,
+                content_hash TEXT NOT NULL REFERENCES snippets(content_hash),
+                snippet_created_at TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(session_id, rid)
+            )
+        """)
+
+        # UNIQUE(session_id, rid) already indexes the (session_id, rid) lookups
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON snippet_sessions(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_content_hash ON snippet_sessions(content_hash)")
+
+        # Snippet precomputed at ingestion for each RID
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS snippet_records (
+                rid TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                content_hash TEXT NOT NULL REFERENCES snippets(content_hash),
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_record_content_hash ON snippet_records(content_hash)")
+
+    def _migrate(self, conn):
+        """
+        Move a database to the current schema in one transaction.
+
+        Schema 1 kept a full JSON copy of the snippet in every snippet_sessions
+        row; each copy becomes a reference to the shared, deduplicated snippet.
+        Schema 3 adds snippet_records, which starts out empty.
+        """
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            # Another process may be migrating the same file: take the write
+            # lock first, then re-check the version under it
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                conn.execute("ROLLBACK")
+                return
+
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(snippet_sessions)")]
+            legacy = 'data' in columns
+            if legacy:
+                conn.execute("ALTER TABLE snippet_sessions RENAME TO snippet_sessions_v1")
+                for index in ('idx_session_id', 'idx_created_at', 'idx_rid', 'idx_session_rid'):
+                    conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+            self._create_tables(conn)
+
+            if legacy:
+                references = 0
+                rows = conn.execute("""
+                    SELECT session_id, rid, data, created_at, accessed_at FROM snippet_sessions_v1
+                """).fetchall()
+                for session_id, rid, data, created_at, accessed_at in rows:
+                    snippet_data = json.loads(data)
+                    content_hash, canonical = snippet_hash(rid, snippet_data)
+                    conn.execute("INSERT OR IGNORE INTO snippets (content_hash, rid, data) VALUES (?, ?, ?)",
+                                 (content_hash, rid, canonical))
+                    conn.execute("""
+                        INSERT INTO snippet_sessions
+                            (session_id, rid, content_hash, snippet_created_at, created_at, accessed_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (session_id, rid, content_hash, snippet_data.get('created_at'), created_at, accessed_at))
+                    references += 1
+                conn.execute("DROP TABLE snippet_sessions_v1")
+
+                stored = conn.execute("SELECT COUNT(*) FROM snippets").fetchone()[0]
+                logger.info(f"Migrated {references} session snippets to {stored} shared snippets")
+
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.isolation_level = isolation_level
+
     def save_snippet(self, session_id: str, rid: str, snippet_data: Dict[str, Any]) -> bool:
         """
         Save a snippet for a specific session.
@@ -71,24 +219,144 @@ class SnippetDatabase:
         Returns:
             True if saved successfully
         """
+        return self.save_snippets(session_id, {rid: snippet_data})
+
+    def save_snippets(self, session_id: str, snippets: Dict[str, Dict[str, Any]],
+                      stored: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Save the snippets of one response for a session in a single transaction.
+
+        Args:
+            session_id: User session identifier
+            snippets: Snippet data keyed by Repository ID
+            stored: Content hashes (by Repository ID) of snippets already in
+                the database, e.g. precomputed records; only referenced
+
+        Returns:
+            True if all snippets were saved. False (and nothing saved) on an
+            error, or if a stored snippet was garbage-collected after the
+            caller looked it up (its record was replaced by a re-ingestion);
+            looking the records up again gives the current hashes.
+        """
+        if not snippets and not stored:
+            return True
         try:
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
-                # Ensure session exists using the same connection
+            contents, references = [], []
+            for rid, data in snippets.items():
+                content_hash, canonical = snippet_hash(rid, data)
+                contents.append((content_hash, rid, canonical))
+                references.append((session_id, rid, content_hash, data.get('created_at')))
+            if stored:
+                created_at = datetime.now().isoformat()
+                references += [(session_id, rid, content_hash, created_at) for rid, content_hash in stored.items()]
+
+            with self._write_transaction() as conn:
+                if stored:
+                    # Checked under the write lock: garbage collection cannot run
+                    # between this check and the commit of the references
+                    hashes = list(set(stored.values()))
+                    placeholders = ','.join('?' * len(hashes))
+                    existing = {row[0] for row in conn.execute(
+                        f"SELECT content_hash FROM snippets WHERE content_hash IN ({placeholders})", hashes
+                    )}
+                    missing = [rid for rid, content_hash in stored.items() if content_hash not in existing]
+                    if missing:
+                        raise StaleSnippetReference(missing)
+
                 self._ensure_session(session_id, conn)
-                
-                conn.execute("""
-                    INSERT OR REPLACE INTO snippet_sessions (session_id, rid, data, accessed_at)
-                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                """, (session_id, rid, json.dumps(snippet_data)))
-                
-                conn.commit()
-                logger.info(f"Saved snippet {rid} for session {session_id}")
-                return True
-                
+
+                # Content already stored by another session is only referenced
+                conn.executemany("""
+                    INSERT OR IGNORE INTO snippets (content_hash, rid, data)
+                    VALUES (?, ?, ?)
+                """, contents)
+
+                # Upsert keeps created_at of snippets the session has already seen
+                conn.executemany("""
+                    INSERT INTO snippet_sessions (session_id, rid, content_hash, snippet_created_at, accessed_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(session_id, rid) DO UPDATE SET
+                        content_hash = excluded.content_hash,
+                        snippet_created_at = excluded.snippet_created_at,
+                        accessed_at = CURRENT_TIMESTAMP
+                """, references)
+
+            logger.info(f"Saved {len(references)} snippets for session {session_id}")
+            return True
+
+        except StaleSnippetReference as e:
+            logger.warning(f"Snippet records replaced while saving for session {session_id}: {', '.join(e.rids)}")
+            return False
         except Exception as e:
-            logger.error(f"Error saving snippet {rid}: {str(e)}")
+            logger.error(f"Error saving {len(snippets) + len(stored or {})} snippets for session {session_id}: {str(e)}")
             return False
-    
+
+    def save_records(self, records: Dict[str, Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Store precomputed snippet records.
+
+        Args:
+            records: (digest, snippet data) keyed by Repository ID, as built by
+                snippet_records.build_snippet_records
+
+        Returns:
+            Number of records saved
+        """
+        if not records:
+            return 0
+        try:
+            contents, rows = [], []
+            for rid, (digest, data) in records.items():
+                content_hash, canonical = snippet_hash(rid, data)
+                contents.append((content_hash, rid, canonical))
+                rows.append((rid, digest, content_hash))
+
+            with self._write_transaction() as conn:
+                conn.executemany("INSERT OR IGNORE INTO snippets (content_hash, rid, data) VALUES (?, ?, ?)", contents)
+                conn.executemany("""
+                    INSERT INTO snippet_records (rid, digest, content_hash)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(rid) DO UPDATE SET
+                        digest = excluded.digest,
+                        content_hash = excluded.content_hash,
+                        updated_at = CURRENT_TIMESTAMP
+                """, rows)
+                # Snippets of replaced records that no session references
+                self._delete_unreferenced_snippets(conn)
+            logger.info(f"Saved {len(rows)} snippet records")
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"Error saving snippet records: {str(e)}")
+            return 0
+
+    def get_records(self, rids: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Precomputed records of the given RIDs: rid -> (digest, content hash)."""
+        if not rids:
+            return {}
+        try:
+            with self._connect() as conn:
+                placeholders = ','.join('?' * len(rids))
+                cursor = conn.execute(f"""
+                    SELECT rid, digest, content_hash FROM snippet_records
+                    WHERE rid IN ({placeholders})
+                """, list(rids))
+                return {rid: (digest, content_hash) for rid, digest, content_hash in cursor}
+
+        except Exception as e:
+            logger.error(f"Error getting snippet records: {str(e)}")
+            return {}
+
+    def get_record_digests(self) -> Dict[str, str]:
+        """Digest of every precomputed record, by RID."""
+        try:
+            with self._connect() as conn:
+                return dict(conn.execute("SELECT rid, digest FROM snippet_records"))
+
+        except Exception as e:
+            logger.error(f"Error getting snippet record digests: {str(e)}")
+            return {}
+
     def get_snippet(self, session_id: str, rid: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a snippet for a specific session.
@@ -101,12 +369,14 @@ class SnippetDatabase:
             Snippet data or None if not found
         """
         try:
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 conn.execute("PRAGMA journal_mode=WAL")
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("""
-                    SELECT data FROM snippet_sessions 
-                    WHERE session_id = ? AND rid = ?
+                    SELECT s.data, r.snippet_created_at
+                    FROM snippet_sessions r
+                    JOIN snippets s ON s.content_hash = r.content_hash
+                    WHERE r.session_id = ? AND r.rid = ?
                 """, (session_id, rid))
                 
                 row = cursor.fetchone()
@@ -122,7 +392,7 @@ class SnippetDatabase:
                     self._update_session_activity(session_id, conn)
                     
                     conn.commit()
-                    return json.loads(row['data'])
+                    return self._snippet_from_row(row)
                     
         except Exception as e:
             logger.error(f"Error retrieving snippet {rid}: {str(e)}")
@@ -132,18 +402,19 @@ class SnippetDatabase:
     def get_session_snippets(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all snippets for a session."""
         try:
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.execute("""
-                    SELECT rid, data, created_at, accessed_at 
-                    FROM snippet_sessions 
-                    WHERE session_id = ?
-                    ORDER BY accessed_at DESC
+                    SELECT s.data, r.snippet_created_at, r.created_at, r.accessed_at
+                    FROM snippet_sessions r
+                    JOIN snippets s ON s.content_hash = r.content_hash
+                    WHERE r.session_id = ?
+                    ORDER BY r.accessed_at DESC
                 """, (session_id,))
                 
                 snippets = []
                 for row in cursor:
-                    snippet = json.loads(row['data'])
+                    snippet = self._snippet_from_row(row)
                     snippet['_metadata'] = {
                         'created_at': row['created_at'],
                         'accessed_at': row['accessed_at']
@@ -156,12 +427,20 @@ class SnippetDatabase:
             logger.error(f"Error getting session snippets: {str(e)}")
             return []
     
+    def _snippet_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Shared snippet data with the per-session fields of the reference restored."""
+        snippet = json.loads(row['data'])
+        if row['snippet_created_at'] is not None:
+            snippet['created_at'] = row['snippet_created_at']
+        return snippet
+
     def clear_session(self, session_id: str) -> bool:
         """Clear all snippets for a session."""
         try:
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 conn.execute("DELETE FROM snippet_sessions WHERE session_id = ?", (session_id,))
                 conn.execute("DELETE FROM user_sessions WHERE session_id = ?", (session_id,))
+                self._delete_unreferenced_snippets(conn)
                 conn.commit()
                 logger.info(f"Cleared all snippets for session {session_id}")
                 return True
@@ -183,7 +462,7 @@ class SnippetDatabase:
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 # Get sessions to delete
                 cursor = conn.execute("""
                     SELECT session_id FROM user_sessions 
@@ -193,7 +472,7 @@ class SnippetDatabase:
                 old_sessions = [row[0] for row in cursor]
                 
                 if old_sessions:
-                    # Delete snippets for old sessions
+                    # Delete snippet references of old sessions
                     placeholders = ','.join('?' * len(old_sessions))
                     conn.execute(f"""
                         DELETE FROM snippet_sessions 
@@ -206,6 +485,7 @@ class SnippetDatabase:
                         WHERE session_id IN ({placeholders})
                     """, old_sessions)
                     
+                    self._delete_unreferenced_snippets(conn)
                     conn.commit()
                     
                 logger.info(f"Cleaned up {len(old_sessions)} old sessions")
@@ -214,6 +494,28 @@ class SnippetDatabase:
         except Exception as e:
             logger.error(f"Error cleaning up sessions: {str(e)}")
             return 0
+
+    def _delete_unreferenced_snippets(self, conn) -> int:
+        """Delete shared snippets that no session or precomputed record references any more."""
+        cursor = conn.execute("""
+            DELETE FROM snippets
+            WHERE NOT EXISTS (
+                SELECT 1 FROM snippet_sessions r WHERE r.content_hash = snippets.content_hash
+            ) AND NOT EXISTS (
+                SELECT 1 FROM snippet_records p WHERE p.content_hash = snippets.content_hash
+            )
+        """)
+        return cursor.rowcount
+
+    def get_storage_stats(self) -> Dict[str, int]:
+        """Number of stored snippets, precomputed records, session references and sessions."""
+        with self._connect() as conn:
+            return {
+                'snippets': conn.execute("SELECT COUNT(*) FROM snippets").fetchone()[0],
+                'records': conn.execute("SELECT COUNT(*) FROM snippet_records").fetchone()[0],
+                'references': conn.execute("SELECT COUNT(*) FROM snippet_sessions").fetchone()[0],
+                'sessions': conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0]
+            }
     
     def _ensure_session(self, session_id: str, conn=None):
         """Ensure a session exists in the database."""
@@ -225,7 +527,7 @@ class SnippetDatabase:
             """, (session_id,))
         else:
             # Create new connection
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 conn.execute("""
                     INSERT OR IGNORE INTO user_sessions (session_id)
                     VALUES (?)
@@ -243,7 +545,7 @@ class SnippetDatabase:
             """, (session_id,))
         else:
             # Create new connection
-            with sqlite3.connect(self.db_path, timeout=30.0) as conn:
+            with self._connect() as conn:
                 conn.execute("""
                     UPDATE user_sessions 
                     SET last_activity = CURRENT_TIMESTAMP 
@@ -256,4 +558,4 @@ class SnippetDatabase:
         return str(uuid.uuid4())
 
 # Global instance
-snippet_db = SnippetDatabase()
\ No newline at end of file
+snippet_db = SnippetDatabase()
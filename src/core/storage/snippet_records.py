@@ -0,0 +1,168 @@
+"""
+Snippet records: the citation snippet and preview fields of a chunk.
+
+A record depends only on the chunk (its text and a few metadata fields), so
+it is built once at ingestion and stored in the snippet database keyed by
+RID. Citing a document then references the stored snippet instead of
+re-deriving the title, code labels and Excel location on every response.
+
+Each record carries a digest of exactly the inputs it was built from; a
+record whose digest does not match the cited chunk is ignored and the
+snippet is built on the spot.
+"""
+import hashlib
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Bump when the record layout changes, so stored records are rebuilt
+RECORD_FORMAT_VERSION = 1
+
+# The metadata a record is built from
+RECORD_FIELDS = ('title', 'domain', 'subdomain', 'specific_domain', 'risk_category', 'entity', 'intent',
+                 'timing', 'description', 'url', 'source_file', 'row', 'sheet', 'file_type', 'search_terms')
+
+ENTITY_LABELS = {'1': 'Human', '2': 'AI', '3': 'Human & AI'}
+INTENT_LABELS = {'1': 'Intentional', '2': 'Unintentional'}
+TIMING_LABELS = {'1': 'Pre-deployment', '2': 'Post-deployment'}
+
+# Content lines that hold metadata rather than a title
+METADATA_LINE_PREFIXES = ('Repository ID:', 'Source:', 'Domain:', 'Sub-domain:', 'Risk Category:',
+                          'Entity:', 'Intent:', 'Timing:', 'Description:')
+
+PREVIEW_EXTENSIONS = {
+    '.xlsx': 'excel', '.xls': 'excel', '.csv': 'excel',
+    '.docx': 'word', '.doc': 'word',
+    '.pdf': 'pdf',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image', '.svg': 'image'
+}
+
+def record_digest(doc: Any) -> str:
+    """Digest of the chunk text and the metadata its record is built from."""
+    metadata = doc.metadata or {}
+    # Absent and None fields build different records, so keep the keys
+    fields = [(key, metadata[key]) for key in RECORD_FIELDS if key in metadata]
+    key = f"{RECORD_FORMAT_VERSION}\x1f{metadata.get('rid')}\x1f{fields!r}\x1f{doc.page_content}"
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+def preview_type(metadata: Dict[str, Any]) -> str:
+    """Determine the preview type based on snippet metadata."""
+    # Check file extension from source_file
+    source_file = metadata.get('source_file', metadata.get('url', ''))
+    if source_file:
+        kind = PREVIEW_EXTENSIONS.get(os.path.splitext(source_file)[1].lower())
+        if kind:
+            return kind
+
+    # Metadata results are typically tabular
+    if metadata.get('type') == 'metadata_query_result':
+        return 'excel'
+
+    # Default to text
+    return 'text'
+
+def excel_source_location(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Extract Excel source location from metadata.
+
+    Returns:
+        Dictionary with sheet and row information or None
+    """
+    source_file = metadata.get('url', metadata.get('source_file', ''))
+
+    # Only process Excel files
+    if not source_file or not (source_file.endswith('.xlsx') or source_file.endswith('.xls')):
+        return None
+
+    sheet = metadata.get('sheet')
+    row = metadata.get('row')
+
+    # Need at least sheet and row for navigation
+    if not sheet or row is None:
+        return None
+
+    return {'sheet': sheet, 'row': int(row)}
+
+def _snippet_title(title: str, content: str, rid: str) -> str:
+    """Title from metadata, else the "Title:" line or first meaningful line of the content."""
+    # Clean up title - replace literal \n with space
+    if title and '\\n' in title:
+        title = title.replace('\\n', ' ').strip()
+
+    # Also fix if title is just the filename like "preprint_raw.txt"
+    if not title or title == rid or 'preprint_raw.txt' in title:
+        lines = content.split('\n') if content else []
+
+        # Look for "Title:" prefix first
+        for line in lines:
+            if line.startswith('Title:'):
+                title = line.replace('Title:', '').strip()
+                break
+
+        if not title or title == rid or 'preprint_raw.txt' in title:
+            for line in lines:
+                # Skip metadata lines and empty lines; take the first 100 chars
+                line = line.strip()
+                if line and not line.startswith(METADATA_LINE_PREFIXES):
+                    title = line[:100]
+                    break
+
+    # Final fallback
+    return title or f"Document {rid}"
+
+def build_snippet_record(doc: Any, rid: Optional[str] = None) -> Dict[str, Any]:
+    """Build the JSON snippet of a chunk, without the per-save created_at."""
+    metadata = doc.metadata or {}
+    rid = rid or metadata.get('rid')
+    content = doc.page_content
+
+    # Replace literal \n with actual newlines in content
+    if content and '\\n' in content:
+        content = content.replace('\\n', '\n')
+
+    record = {
+        "rid": rid,
+        "title": _snippet_title(metadata.get('title', ''), content, rid),
+        "content": content,
+        "metadata": {
+            "domain": metadata.get('domain', ''),
+            "subdomain": metadata.get('subdomain', metadata.get('specific_domain', '')),
+            "risk_category": metadata.get('risk_category', ''),
+            "entity": ENTITY_LABELS.get(str(metadata.get('entity', '')), metadata.get('entity', '')),
+            "intent": INTENT_LABELS.get(str(metadata.get('intent', '')), metadata.get('intent', '')),
+            "timing": TIMING_LABELS.get(str(metadata.get('timing', '')), metadata.get('timing', '')),
+            "description": metadata.get('description', ''),
+            "source_file": metadata.get('url', metadata.get('source_file', '')),
+            "row_number": metadata.get('row', None),
+            "sheet": metadata.get('sheet', None),
+            "file_type": metadata.get('file_type', '')
+        },
+        "highlights": metadata.get('search_terms', [])
+    }
+
+    # Add source_location to top-level if Excel file
+    source_location = excel_source_location(metadata)
+    if source_location:
+        record["source_location"] = source_location
+
+    record["preview_type"] = preview_type(record["metadata"])
+    return record
+
+def build_snippet_records(docs: Iterable[Any],
+                          known: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    Records of the chunks that have a RID: rid -> (digest, record).
+
+    Chunks split from one document share its RID; the first chunk keeps the
+    record. RIDs whose digest in `known` (rid -> digest) is current are skipped.
+    """
+    records = {}
+    for doc in docs:
+        rid = (doc.metadata or {}).get('rid')
+        if not rid or rid in records:
+            continue
+        digest = record_digest(doc)
+        if known is not None and known.get(rid) == digest:
+            records[rid] = None
+            continue
+        records[rid] = (digest, build_snippet_record(doc, rid))
+    return {rid: record for rid, record in records.items() if record is not None}
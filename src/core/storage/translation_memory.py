@@ -0,0 +1,218 @@
+"""
+Persistent translation memory for static response templates.
+
+Taxonomy responses, out-of-scope templates, error messages and refinement
+suggestions are fixed English text, so their translation depends only on the
+text, the target language and the prompt that produced it. Translations are
+stored in SQLite keyed by (sha256 of the source text, language code, prompt
+version) and kept in a bounded in-memory LRU in front of it, so every
+non-English session after the first (and every restarted worker) is served
+without a model call. Changing a translation prompt means bumping its version;
+entries of the old version are then simply never looked up again.
+
+Concurrent misses for the same key translate once; other requests wait for it.
+Failed translations are never stored.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ...config.logging import get_logger
+from ...config.settings import settings
+
+logger = get_logger(__name__)
+
+Key = Tuple[str, str, str]  # (source hash, language code, prompt version)
+
+def translation_key(text: str, language_code: str, prompt_version: str) -> Key:
+    """Memory key of a source text translated to language_code with a prompt version."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest(), language_code, prompt_version
+
+class TranslationMemory:
+    """SQLite-backed translation memory with an in-memory LRU in front."""
+
+    def __init__(self, db_path: Optional[Path] = None, persist: bool = None, max_entries: int = None):
+        """
+        Initialize the translation memory.
+
+        Args:
+            db_path: SQLite database of persisted translations
+            persist: Store translations in the database and read them back on memory misses
+            max_entries: Translations kept in memory
+        """
+        self.db_path = Path(db_path or settings.TRANSLATION_MEMORY_DB)
+        self.persist = settings.TRANSLATION_MEMORY_PERSIST if persist is None else persist
+        self.max_entries = max_entries or settings.TRANSLATION_MEMORY_MAX_ENTRIES
+        self._entries: OrderedDict = OrderedDict()  # key -> translation
+        self._lock = threading.Lock()
+        self._translate_locks: Dict[Key, threading.Lock] = {}
+        self._db_ready = False
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'translations': 0, 'failures': 0}
+        self._kind_stats: Dict[str, Dict[str, int]] = {}
+
+    def get_or_translate(self, kind: str, prompt_version: str, text: str, language_code: str,
+                         translate: Callable[[str], Optional[str]]) -> Optional[str]:
+        """
+        Get a stored translation, translating on a miss.
+
+        Args:
+            kind: Template kind, for per-kind statistics
+            prompt_version: Version of the prompt translate uses; part of the key
+            text: English source text
+            language_code: Target language
+            translate: Translates text; an empty result or an exception is a failure
+
+        Returns:
+            The translation, or None if translating failed
+        """
+        key = translation_key(text, language_code, prompt_version)
+        translation = self._lookup(key, kind)
+        if translation is not None:
+            return translation
+
+        with self._lock:
+            translate_lock = self._translate_locks.setdefault(key, threading.Lock())
+        try:
+            with translate_lock:
+                # Another request may have translated it while we waited
+                translation = self._lookup(key, kind, count_miss=False)
+                if translation is not None:
+                    return translation
+                try:
+                    translation = translate(text)
+                except Exception as e:
+                    logger.warning(f"Failed to translate {kind} template to {language_code}: {e}")
+                    translation = None
+                if not translation or not translation.strip():
+                    self._count(kind, 'failures')
+                    return None
+                translation = translation.strip()
+                self.put(key, kind, translation)
+                self._count(kind, 'translations')
+                return translation
+        finally:
+            with self._lock:
+                self._translate_locks.pop(key, None)
+
+    def get(self, kind: str, prompt_version: str, text: str, language_code: str) -> Optional[str]:
+        """Get a stored translation, or None."""
+        return self._lookup(translation_key(text, language_code, prompt_version), kind)
+
+    def contains(self, text: str, language_code: str, prompt_version: str) -> bool:
+        """Whether a translation is stored, without touching the statistics."""
+        key = translation_key(text, language_code, prompt_version)
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.persist and self._read_db(key) is not None
+
+    def _lookup(self, key: Key, kind: str, count_miss: bool = True) -> Optional[str]:
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is not None:
+                self._entries.move_to_end(key)
+        if translation is not None:
+            self._count(kind, 'hits')
+            return translation
+
+        translation = self._read_db(key) if self.persist else None
+        if translation is None:
+            if count_miss:
+                self._count(kind, 'misses')
+            return None
+        self._count(kind, 'disk_hits')
+        self._store(key, translation)
+        return translation
+
+    def put(self, key: Key, kind: str, translation: str) -> None:
+        """Store a translation in memory and, if persisting, in the database."""
+        self._store(key, translation)
+        if self.persist:
+            self._write_db(key, kind, translation)
+
+    def _store(self, key: Key, translation: str) -> None:
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, kind: str, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+            kind_stats = self._kind_stats.setdefault(kind, {'hits': 0, 'misses': 0, 'translations': 0, 'failures': 0})
+            kind_stats['hits' if stat == 'disk_hits' else stat] += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        if not self._db_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source_hash TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source_hash, language, prompt_version)
+                )
+            """)
+            conn.commit()
+            self._db_ready = True
+        return conn
+
+    def _read_db(self, key: Key) -> Optional[str]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT translation FROM translations WHERE source_hash = ? AND language = ? AND prompt_version = ?",
+                    key
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read translation memory: {e}")
+            return None
+
+    def _write_db(self, key: Key, kind: str, translation: str) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO translations (source_hash, language, prompt_version, kind, translation) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*key, kind, translation)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist translation: {e}")
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (persisted translations are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate_percent': round((self._stats['hits'] + self._stats['disk_hits']) / lookups * 100, 2) if lookups else 0.0,
+                'kinds': {
+                    kind: {
+                        **stats,
+                        'hit_rate_percent': round(stats['hits'] / (stats['hits'] + stats['misses']) * 100, 2)
+                        if stats['hits'] + stats['misses'] else 0.0
+                    }
+                    for kind, stats in self._kind_stats.items()
+                },
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'persist': self.persist
+            }
+
+# Global translation memory instance
+translation_memory = TranslationMemory()
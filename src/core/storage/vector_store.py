@@ -13,12 +13,15 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.docstore.document import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_community.retrievers import BM25Retriever
-from rank_bm25 import BM25Okapi
 import numpy as np
 from ..retrieval.multi_strategy_retriever import MultiStrategyRetriever
 
+from .bm25_index import CompactBM25
+from .document_store import DocumentStore
+from .score_fusion import CHUNK_ID_KEY, chunk_ids, fuse_scores, pick, rank_scores
 from .document_processor import DocumentProcessor
+from .snippet_database import snippet_db
+from .snippet_records import build_snippet_records
 from ..retrieval.advanced_retrieval import advanced_retriever
 from ..taxonomy.scqa_taxonomy import scqa_manager, SCQAComponent
 from ..metadata.fact_extractor import FactExtractor
@@ -28,13 +31,41 @@ from ...config.domains import domain_classifier
 
 logger = get_logger(__name__)
 
+def _legacy_doc_key(doc: Document) -> str:
+    """Identity of a document without a chunk_id (stores built before chunk ids existed)."""
+    source = doc.metadata.get("source", "unknown")
+    page = doc.metadata.get("page", "")
+    row = doc.metadata.get("row", "")
+    content_hash = hash(doc.page_content[:100]) % 10000
+    return f"{source}_{page}_{row}_{content_hash}"
+
+class StoreBM25Retriever(BaseRetriever):
+    """BM25 keyword retriever over the document store (replaces LangChain's BM25Retriever copy of the corpus)."""
+    
+    document_store: Any
+    index: Any
+    k: int = 4
+    
+    class Config:
+        """Pydantic config to allow arbitrary types."""
+        arbitrary_types_allowed = True
+    
+    @classmethod
+    def from_store(cls, document_store: DocumentStore, k: int = 4) -> 'StoreBM25Retriever':
+        # Whitespace tokens, as BM25Retriever's default preprocessing
+        index = CompactBM25([document_store.text(i).split() for i in range(len(document_store))])
+        return cls(document_store=document_store, index=index, k=k)
+    
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.document_store.documents(self.index.top_n(query.split(), self.k))
+
 class FieldAwareHybridRetriever(BaseRetriever):
     """Combines vector similarity and field-aware keyword search with metadata boosting."""
     
     # Declare fields for Pydantic validation
     vector_retriever: BaseRetriever
     keyword_retriever: BaseRetriever
-    documents: List[Document]
+    document_store: Any
     vector_weight: float
     keyword_weight: float
     rerank_top_k: int
@@ -52,7 +83,7 @@ class FieldAwareHybridRetriever(BaseRetriever):
         self,
         vector_retriever: BaseRetriever,
         keyword_retriever: BaseRetriever,
-        documents: List[Document],
+        document_store: DocumentStore,
         vector_weight: float = None,
         rerank_top_k: int = None,
         **kwargs
@@ -66,7 +97,7 @@ class FieldAwareHybridRetriever(BaseRetriever):
         super().__init__(
             vector_retriever=vector_retriever,
             keyword_retriever=keyword_retriever,
-            documents=documents,
+            document_store=document_store,
             vector_weight=calculated_vector_weight,
             keyword_weight=calculated_keyword_weight,
             rerank_top_k=calculated_rerank_top_k,
@@ -79,30 +110,18 @@ class FieldAwareHybridRetriever(BaseRetriever):
     def _create_field_aware_indices(self):
         """Create BM25 indices for different metadata fields."""
         try:
-            # Extract content for different priority fields
-            high_priority_corpus = []
-            medium_priority_corpus = []
-            all_fields_corpus = []
-            
-            for doc in self.documents:
-                # High priority fields (titles, domains, categories)
-                high_priority_text = doc.metadata.get('search_high_priority', '')
-                high_priority_corpus.append(high_priority_text.split() if high_priority_text else [])
-                
-                # Medium priority fields (subdomains, specific domains)
-                medium_priority_text = doc.metadata.get('search_medium_priority', '')
-                medium_priority_corpus.append(medium_priority_text.split() if medium_priority_text else [])
-                
-                # All searchable fields combined
-                all_fields_text = doc.metadata.get('search_all_fields', '')
-                all_fields_corpus.append(all_fields_text.split() if all_fields_text else [])
+            # Extract content for different priority fields:
+            # high (titles, domains, categories), medium (subdomains, specific domains), all searchable fields
+            high_priority_corpus = [text.split() if text else [] for text in self.document_store.column('search_high_priority')]
+            medium_priority_corpus = [text.split() if text else [] for text in self.document_store.column('search_medium_priority')]
+            all_fields_corpus = [text.split() if text else [] for text in self.document_store.column('search_all_fields')]
             
-            # Create BM25 indices
-            self.bm25_high_priority = BM25Okapi(high_priority_corpus) if any(high_priority_corpus) else None
-            self.bm25_medium_priority = BM25Okapi(medium_priority_corpus) if any(medium_priority_corpus) else None
-            self.bm25_all_fields = BM25Okapi(all_fields_corpus) if any(all_fields_corpus) else None
+            # Create BM25 indices (flat arrays, so forked workers keep sharing them)
+            self.bm25_high_priority = CompactBM25(high_priority_corpus) if any(high_priority_corpus) else None
+            self.bm25_medium_priority = CompactBM25(medium_priority_corpus) if any(medium_priority_corpus) else None
+            self.bm25_all_fields = CompactBM25(all_fields_corpus) if any(all_fields_corpus) else None
             
-            logger.info(f"Created field-aware BM25 indices for {len(self.documents)} documents")
+            logger.info(f"Created field-aware BM25 indices for {len(self.document_store)} documents")
             
         except Exception as e:
             logger.error(f"Error creating field-aware indices: {str(e)}")
@@ -129,41 +148,21 @@ class FieldAwareHybridRetriever(BaseRetriever):
             # Fallback to deprecated method if invoke not available
             standard_keyword_docs = self.keyword_retriever.get_relevant_documents(query)
         
-        # Track unique docs and scores
-        unique_docs = {}
-        
-        # Add vector docs with position-based scoring
-        for i, doc in enumerate(vector_docs):
-            doc_id = self._get_doc_id(doc)
-            score = self.vector_weight * (1.0 - (i / max(1, len(vector_docs))))
-            unique_docs[doc_id] = {"doc": doc, "score": score, "sources": ["vector"]}
-        
-        # Add field-aware keyword docs with boosted scores
-        for doc, field_score in field_aware_docs:
-            doc_id = self._get_doc_id(doc)
-            # Field-aware scores are higher priority
-            boosted_score = self.keyword_weight * field_score * settings.METADATA_BOOST_FACTOR
-            
-            if doc_id in unique_docs:
-                unique_docs[doc_id]["score"] += boosted_score
-                unique_docs[doc_id]["sources"].append("field_aware")
-            else:
-                unique_docs[doc_id] = {"doc": doc, "score": boosted_score, "sources": ["field_aware"]}
-        
-        # Add standard keyword docs with lower weight
-        for i, doc in enumerate(standard_keyword_docs):
-            doc_id = self._get_doc_id(doc)
-            score = self.keyword_weight * (1.0 - (i / max(1, len(standard_keyword_docs)))) * 0.8  # 20% penalty
-            
-            if doc_id in unique_docs:
-                unique_docs[doc_id]["score"] += score
-                unique_docs[doc_id]["sources"].append("standard_keyword")
-            else:
-                unique_docs[doc_id] = {"doc": doc, "score": score, "sources": ["standard_keyword"]}
-        
-        # Sort by score and return top results
-        sorted_docs = sorted(unique_docs.values(), key=lambda x: x["score"], reverse=True)
-        return [item["doc"] for item in sorted_docs[:self.rerank_top_k]]
+        # Fuse by chunk id: vector ranks, boosted field-aware scores, keyword ranks (20% penalty)
+        assigned = {}
+        field_docs = [doc for doc, _ in field_aware_docs]
+        field_scores = np.array([score for _, score in field_aware_docs], dtype=np.float64)
+        candidates = vector_docs + field_docs + standard_keyword_docs
+        _, _, positions = fuse_scores(
+            [chunk_ids(docs, _legacy_doc_key, assigned) for docs in (vector_docs, field_docs, standard_keyword_docs)],
+            [
+                rank_scores(len(vector_docs), self.vector_weight),
+                self.keyword_weight * field_scores * settings.METADATA_BOOST_FACTOR,
+                rank_scores(len(standard_keyword_docs), self.keyword_weight, 0.8)
+            ],
+            self.rerank_top_k
+        )
+        return pick(candidates, positions)
     
     def _get_field_aware_matches(self, query: str) -> List[Tuple[Document, float]]:
         """Get documents that match in specific metadata fields with boosted scores."""
@@ -171,52 +170,36 @@ class FieldAwareHybridRetriever(BaseRetriever):
             return []
         
         query_tokens = query.lower().split()
-        field_matches = []
+        indices = (
+            (self.bm25_high_priority, settings.HIGH_PRIORITY_FIELD_BOOST),
+            (self.bm25_medium_priority, settings.MEDIUM_PRIORITY_FIELD_BOOST),
+            (self.bm25_all_fields, 1.0)
+        )
         
         try:
-            # Search in high priority fields (configurable boost)
-            if self.bm25_high_priority:
-                scores = self.bm25_high_priority.get_scores(query_tokens)
-                for i, score in enumerate(scores):
-                    if score > 0 and i < len(self.documents):
-                        field_matches.append((self.documents[i], score * settings.HIGH_PRIORITY_FIELD_BOOST))
-            
-            # Search in medium priority fields (configurable boost)
-            if self.bm25_medium_priority:
-                scores = self.bm25_medium_priority.get_scores(query_tokens)
-                for i, score in enumerate(scores):
-                    if score > 0 and i < len(self.documents):
-                        field_matches.append((self.documents[i], score * settings.MEDIUM_PRIORITY_FIELD_BOOST))
-            
-            # Search in all fields (1x boost)
-            if self.bm25_all_fields:
-                scores = self.bm25_all_fields.get_scores(query_tokens)
-                for i, score in enumerate(scores):
-                    if score > 0 and i < len(self.documents):
-                        field_matches.append((self.documents[i], score))
-            
-            # Remove duplicates, keeping highest score
-            unique_matches = {}
-            for doc, score in field_matches:
-                doc_id = self._get_doc_id(doc)
-                if doc_id not in unique_matches or score > unique_matches[doc_id][1]:
-                    unique_matches[doc_id] = (doc, score)
-            
-            # Sort by score and return top matches
-            sorted_matches = sorted(unique_matches.values(), key=lambda x: x[1], reverse=True)
-            return sorted_matches[:self.rerank_top_k]
+            count = len(self.document_store)
+            best_scores = np.full(count, -np.inf)
+            first_index = np.full(count, len(indices))  # Which index matched a document first
+            for rank, (index, boost) in enumerate(indices):
+                if index is None:
+                    continue
+                scores = index.get_scores(query_tokens)[:count]
+                matched = scores > 0
+                # A document matched by several fields keeps its highest boosted score
+                best_scores = np.where(matched, np.maximum(best_scores, scores * boost), best_scores)
+                first_index[matched & (first_index == len(indices))] = rank
+            
+            # Order ties as matches were found (index by index, then document order), then by score
+            candidates = np.flatnonzero(first_index < len(indices))
+            candidates = candidates[np.lexsort((candidates, first_index[candidates]))]
+            top = candidates[np.argsort(-best_scores[candidates], kind='stable')][:self.rerank_top_k]
+            
+            # Only the top matches are materialized as Documents
+            return [(self.document_store.document(doc_id), best_scores[doc_id]) for doc_id in top]
             
         except Exception as e:
             logger.error(f"Error in field-aware matching: {str(e)}")
             return []
-    
-    def _get_doc_id(self, doc: Document) -> str:
-        """Generate unique ID for document."""
-        source = doc.metadata.get("source", "unknown")
-        page = doc.metadata.get("page", "")
-        row = doc.metadata.get("row", "")
-        content_hash = hash(doc.page_content[:100]) % 10000
-        return f"{source}_{page}_{row}_{content_hash}"
 
 class VectorStore:
     """Vector store for document embeddings and retrieval."""
@@ -268,6 +251,7 @@ class VectorStore:
         self.keyword_retriever = None
         self.hybrid_retriever = None
         self.multi_strategy_retriever = None  # New multi-strategy retriever
+        self.document_store = None  # Every chunk, shared by the retrievers by integer id
         self.structured_data = []
         self.all_documents = []
         
@@ -402,8 +386,18 @@ class VectorStore:
                     splits = self.default_text_splitter.split_documents([doc])
                 all_splits.extend(splits)
             
+            # Stable integer identity of each chunk, used to merge retriever results
+            for chunk_id, split in enumerate(all_splits):
+                split.metadata[CHUNK_ID_KEY] = chunk_id
+            
             logger.info(f"Split into {len(all_splits)} chunks")
             
+            # Citation snippets are a function of the chunk: build them once here
+            self._store_snippet_records(all_splits)
+            
+            # The chunks are kept in the document store from here on
+            self.all_documents = []
+            
             # Create vector store
             if os.path.exists(self.persist_directory):
                 # Load existing vector store
@@ -483,23 +477,24 @@ class VectorStore:
                         self.use_hybrid_search = False
                         return True
                     
-                    # Reconstruct Document objects for BM25
-                    documents = []
-                    for i, text in enumerate(all_docs['documents']):
-                        if text:  # Skip empty documents
-                            metadata = all_docs['metadatas'][i] if all_docs.get('metadatas') and i < len(all_docs['metadatas']) else {}
-                            doc = Document(page_content=text, metadata=metadata or {})
-                            documents.append(doc)
+                    if hasattr(self.vector_store, '_collection'):
+                        self._backfill_chunk_ids(all_docs)
+                    
+                    # One columnar copy of every chunk (empty ones skipped) for all keyword retrievers
+                    self.document_store = DocumentStore.from_chroma(all_docs)
+                    logger.info(f"Document store built: {self.document_store.get_stats()}")
                     
-                    logger.info(f"Building BM25 retriever with {len(documents)} documents")
-                    self.keyword_retriever = BM25Retriever.from_documents(documents)
-                    self.keyword_retriever.k = settings.BM25_TOP_K
+                    # Stores ingested before snippet records existed (or changed since) get them now
+                    self._store_snippet_records(self.document_store.views())
                     
-                    # Initialize multi-strategy retriever with all documents
+                    logger.info(f"Building BM25 retriever with {len(self.document_store)} documents")
+                    self.keyword_retriever = StoreBM25Retriever.from_store(self.document_store, k=settings.BM25_TOP_K)
+                    
+                    # Initialize multi-strategy retriever over the same store
                     try:
                         self.multi_strategy_retriever = MultiStrategyRetriever(
                             vector_store=self.vector_store,
-                            all_documents=documents
+                            document_store=self.document_store
                         )
                         logger.info("Multi-strategy retriever initialized successfully")
                     except Exception as e:
@@ -512,7 +507,7 @@ class VectorStore:
                         self.hybrid_retriever = FieldAwareHybridRetriever(
                             vector_retriever=self.vector_store.as_retriever(),
                             keyword_retriever=self.keyword_retriever,
-                            documents=documents
+                            document_store=self.document_store
                         )
                         logger.info("Field-aware hybrid retriever initialized successfully")
                     else:
@@ -533,6 +528,38 @@ class VectorStore:
             logger.error(f"Error ensuring complete initialization: {str(e)}")
             return False
     
+    def _store_snippet_records(self, documents) -> None:
+        """Precompute the citation snippet of every RID, skipping records that are current."""
+        try:
+            records = build_snippet_records(documents, known=snippet_db.get_record_digests())
+            if records:
+                snippet_db.save_records(records)
+                logger.info(f"Precomputed {len(records)} snippet records")
+        except Exception as e:
+            # Citations build snippets on the spot without them
+            logger.warning(f"Could not precompute snippet records: {str(e)}")
+    
+    def _backfill_chunk_ids(self, all_docs: Dict[str, Any]) -> None:
+        """Give chunks added without a chunk_id (older stores, snippets) the next free ids."""
+        metadatas = all_docs.get('metadatas') or []
+        missing = [i for i, metadata in enumerate(metadatas) if (metadata or {}).get(CHUNK_ID_KEY) is None]
+        if not missing:
+            return
+        
+        next_id = 1 + max((metadata[CHUNK_ID_KEY] for metadata in metadatas
+                           if metadata and metadata.get(CHUNK_ID_KEY) is not None), default=-1)
+        for offset, i in enumerate(missing):
+            metadatas[i] = {**(metadatas[i] or {}), CHUNK_ID_KEY: next_id + offset}
+        try:
+            self.vector_store._collection.update(
+                ids=[all_docs['ids'][i] for i in missing],
+                metadatas=[metadatas[i] for i in missing]
+            )
+            logger.info(f"Assigned chunk ids to {len(missing)} chunks")
+        except Exception as e:
+            # The ids still apply to this process's document store
+            logger.warning(f"Could not persist chunk ids: {str(e)}")
+    
     def load_existing_store(self) -> bool:
         """Load existing vector store and ensure complete initialization."""
         try:
@@ -592,6 +619,35 @@ class VectorStore:
             logger.error(f"Error loading existing vector store: {str(e)}")
             return False
     
+    def reopen_after_fork(self) -> None:
+        """
+        Give a forked worker its own Chroma client and query cache.
+        
+        The documents and BM25 indexes built by the master stay shared; the
+        Chroma client (SQLite connections, index threads) is not fork-safe and
+        the query cache is per-worker mutable state.
+        """
+        self.query_cache = {}
+        if not self.vector_store:
+            return
+        
+        try:
+            # Chroma caches one client system per path; the cached one belongs to the master
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception as e:
+            logger.warning(f"Could not clear Chroma client cache after fork: {str(e)}")
+        
+        self.vector_store = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings
+        )
+        if isinstance(self.hybrid_retriever, FieldAwareHybridRetriever):
+            self.hybrid_retriever.vector_retriever = self.vector_store.as_retriever()
+        if self.multi_strategy_retriever:
+            self.multi_strategy_retriever.vector_store = self.vector_store
+        logger.info(f"Vector store reopened in worker {os.getpid()}")
+    
     def _process_file(self, file_path: Path) -> List[Document]:
         """Process a single file."""
         file_extension = file_path.suffix.lower()
@@ -943,39 +999,24 @@ class VectorStore:
             else:
                 keyword_docs_with_scores = []
             
-            # Combine and deduplicate
-            combined_docs = {}
-            
-            # Add vector docs with vector weight
-            for doc, score in vector_docs_with_scores:
-                doc_id = self._generate_doc_id(doc)
-                combined_docs[doc_id] = (doc, score * settings.VECTOR_WEIGHT)
-            
-            # Add keyword docs with keyword weight (combining scores if duplicate)
-            for doc, score in keyword_docs_with_scores:
-                doc_id = self._generate_doc_id(doc)
-                if doc_id in combined_docs:
-                    existing_doc, existing_score = combined_docs[doc_id]
-                    combined_docs[doc_id] = (existing_doc, existing_score + (score * settings.KEYWORD_WEIGHT))
-                else:
-                    combined_docs[doc_id] = (doc, score * settings.KEYWORD_WEIGHT)
-            
-            # Sort by combined score and return
-            sorted_docs = sorted(combined_docs.values(), key=lambda x: x[1], reverse=True)
-            return sorted_docs[:k]
+            # Combine by chunk id, weighting each source (scores of duplicates add up)
+            assigned = {}
+            vector_docs = [doc for doc, _ in vector_docs_with_scores]
+            keyword_docs = [doc for doc, _ in keyword_docs_with_scores]
+            _, scores, positions = fuse_scores(
+                [chunk_ids(vector_docs, _legacy_doc_key, assigned), chunk_ids(keyword_docs, _legacy_doc_key, assigned)],
+                [
+                    np.array([score for _, score in vector_docs_with_scores], dtype=np.float64) * settings.VECTOR_WEIGHT,
+                    np.array([score for _, score in keyword_docs_with_scores], dtype=np.float64) * settings.KEYWORD_WEIGHT
+                ],
+                k
+            )
+            return list(zip(pick(vector_docs + keyword_docs, positions), scores.tolist()))
             
         except Exception as e:
             logger.error(f"Error getting basic hybrid docs with scores: {str(e)}")
             return []
     
-    def _generate_doc_id(self, doc: Document) -> str:
-        """Generate unique ID for document deduplication."""
-        source = doc.metadata.get("source", "unknown")
-        page = doc.metadata.get("page", "")
-        row = doc.metadata.get("row", "")
-        content_hash = hash(doc.page_content[:100]) % 10000
-        return f"{source}_{page}_{row}_{content_hash}"
-    
     def _get_domain_specific_docs(self, domain: str) -> List[Document]:
         """Get domain-specific documents using generic domain system."""
         if not self.vector_store:
@@ -1147,11 +1188,11 @@ class VectorStore:
     
     def get_taxonomy_statistics(self) -> Dict[str, Any]:
         """Get SCQA taxonomy statistics for all documents."""
-        if not self.all_documents:
+        if not self.document_store:
             return {}
         
         try:
-            return scqa_manager.get_taxonomy_statistics(self.all_documents)
+            return scqa_manager.get_taxonomy_statistics(self.document_store.documents(range(len(self.document_store))))
         except Exception as e:
             logger.error(f"Error getting taxonomy statistics: {str(e)}")
             return {}
\ No newline at end of file
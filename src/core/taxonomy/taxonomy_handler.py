@@ -3,9 +3,11 @@ Handler for taxonomy-specific queries about the AI Risk Repository.
 Provides structured, complete responses for taxonomy questions based on the preprint.
 """
 
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import threading
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, replace
 from ...config.logging import get_logger
+from ..models.base import MODEL_ERROR_PREFIX
 from ..query.query_intent_analyzer import QueryIntentAnalyzer, QueryIntent
 
 logger = get_logger(__name__)
@@ -17,6 +19,10 @@ class TaxonomyResponse:
     taxonomy_type: str  # 'causal', 'domain', or 'both'
     source: str = "AI Risk Repository Preprint (Slattery et al., 2024)"
     confidence: float = 1.0
+    language: str = "en"
+
+# (focus, domain_id) identifying one of the precomputed responses
+ResponseKey = Tuple[str, Optional[int]]
 
 
 class TaxonomyHandler:
@@ -27,6 +33,14 @@ class TaxonomyHandler:
         self._init_causal_taxonomy()
         self._init_domain_taxonomy()
         self.intent_analyzer = QueryIntentAnalyzer()
+        
+        # Responses depend only on the static taxonomy data, so render each once
+        self._responses = self._precompute_responses()
+        
+        # Translated variants per (focus, domain_id, language), filled on first request
+        self._translations: Dict[Tuple[str, Optional[int], str], TaxonomyResponse] = {}
+        self._lock = threading.Lock()  # Guards the translations and the statistics
+        self._stats = {"queries": 0, "translation_hits": 0, "translation_misses": 0, "translation_failures": 0}
     
     def _init_causal_taxonomy(self):
         """Initialize the Causal Taxonomy structure."""
@@ -161,8 +175,79 @@ class TaxonomyHandler:
             "documents_analyzed": 65
         }
     
-    def handle_taxonomy_query(self, query: str) -> TaxonomyResponse:
-        """Handle a taxonomy-specific query and return structured response."""
+    def _precompute_responses(self) -> Dict[ResponseKey, TaxonomyResponse]:
+        """Render every static taxonomy response once."""
+        responses = {
+            ("causal", None): self._get_causal_taxonomy_response(""),
+            ("domain", None): self._get_domain_taxonomy_response(""),
+            ("both", None): self._get_both_taxonomies_response(""),
+            ("both_detailed", None): self._get_both_detailed_response(""),
+            ("search_context", None): self._get_search_context_response(""),
+            ("search_pre_deployment", None): self._get_search_context_response("pre-deployment"),
+            ("timing_focused", None): self._get_timing_focused_response(""),
+            ("statistical", None): self._get_statistical_response(""),
+            ("comparison", None): self._get_intentionality_comparison_response(None),
+            ("enumeration", None): self._get_all_subdomains_response(None),
+        }
+        for domain in self.domain_taxonomy['domains']:
+            responses[("specific_domain", domain['id'])] = self._get_specific_domain_response("", domain['id'])
+        return responses
+    
+    def handle_taxonomy_query(self, query: str, language_code: str = "en",
+                              translator: Optional[Callable[[str], str]] = None) -> TaxonomyResponse:
+        """
+        Handle a taxonomy-specific query and return structured response.
+        
+        Args:
+            query: User query
+            language_code: Language to answer in
+            translator: Translates English content into language_code; called at most
+                once per response and language, after which the translation is cached
+            
+        Returns:
+            Precomputed (and, if requested, translated) taxonomy response
+        """
+        self._count("queries")
+        key = self.resolve_response_key(query)
+        response = self._responses.get(key) or self._responses[("domain", None)]
+        
+        if language_code and language_code != "en" and translator:
+            return self._get_translated_response(key, response, language_code, translator)
+        return response
+    
+    def _get_translated_response(self, key: ResponseKey, response: TaxonomyResponse,
+                                 language_code: str, translator: Callable[[str], str]) -> TaxonomyResponse:
+        """Get a cached translation, translating on first use. Falls back to English on failure."""
+        cache_key = (key[0], key[1], language_code)
+        with self._lock:
+            cached = self._translations.get(cache_key)
+            self._stats["translation_hits" if cached is not None else "translation_misses"] += 1
+        if cached is not None:
+            return cached
+        
+        try:
+            translated_content = translator(response.content)
+        except Exception as e:
+            self._count("translation_failures")
+            logger.warning(f"Failed to translate taxonomy response to {language_code}: {e}")
+            return response
+        
+        if not translated_content or translated_content.startswith(MODEL_ERROR_PREFIX):
+            # Don't cache model errors - retry on the next request
+            self._count("translation_failures")
+            return response
+        
+        translated = replace(response, content=translated_content, language=language_code)
+        with self._lock:
+            self._translations[cache_key] = translated
+        return translated
+    
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+    
+    def resolve_response_key(self, query: str) -> ResponseKey:
+        """Route a query to the precomputed response that answers it."""
         query_lower = query.lower()
         
         # Analyze query intent semantically
@@ -173,36 +258,51 @@ class TaxonomyHandler:
         
         # Route based on both intent and focus analysis
         if query_focus['is_search']:
-            return self._get_search_context_response(query_lower)
+            if 'pre-deployment' in query_lower or 'before deployment' in query_lower:
+                return ("search_pre_deployment", None)
+            return ("search_context", None)
         elif query_focus['is_specific_domain']:
-            return self._get_specific_domain_response(query_lower, query_focus['domain_id'])
+            return ("specific_domain", query_focus['domain_id'])
         elif intent.comparison_mode and self._is_intentionality_comparison(query_lower):
-            return self._get_intentionality_comparison_response(intent)
+            return ("comparison", None)
         elif intent.enumeration_mode and 'subdomain' in query_lower:
-            return self._get_all_subdomains_response(intent)
+            return ("enumeration", None)
         elif query_focus['is_timing_focused']:
-            return self._get_timing_focused_response(query_lower)
+            return ("timing_focused", None)
         elif query_focus['is_statistical']:
-            return self._get_statistical_response(query_lower)
+            return ("statistical", None)
         elif query_focus['is_causal']:
-            return self._get_adaptive_causal_response(query_lower, intent)
+            return self._adaptive_causal_key(query_lower, intent)
         elif query_focus['is_domain_list']:
-            return self._get_adaptive_domain_response(query_lower, intent)
+            return self._adaptive_domain_key(query_lower, intent)
         else:
             # Intelligent routing based on concepts mentioned
             if 'intentional' in intent.concepts_mentioned or 'unintentional' in intent.concepts_mentioned:
                 if intent.comparison_mode:
-                    return self._get_intentionality_comparison_response(intent)
+                    return ("comparison", None)
                 else:
-                    return self._get_adaptive_causal_response(query_lower, intent)
+                    return self._adaptive_causal_key(query_lower, intent)
             elif any(term in query_lower for term in ['organize', 'structure', 'framework', 'categorize', 'classify']):
-                return self._get_adaptive_both_response(query_lower, intent)
+                return self._adaptive_both_key(query_lower, intent)
             elif any(term in query_lower for term in ['entity', 'timing', 'when', 'who']):
-                return self._get_adaptive_causal_response(query_lower, intent)
+                return self._adaptive_causal_key(query_lower, intent)
             elif any(term in query_lower for term in ['domain', 'type', 'kind', 'category']):
-                return self._get_adaptive_domain_response(query_lower, intent)
+                return self._adaptive_domain_key(query_lower, intent)
             else:
-                return self._get_adaptive_both_response(query_lower, intent)
+                return self._adaptive_both_key(query_lower, intent)
+    
+    def get_precomputed_contents(self) -> List[str]:
+        """English content of every precomputed response (for translation pre-warming)."""
+        return [response.content for response in self._responses.values()]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get precomputed response and translation cache statistics."""
+        with self._lock:
+            return {
+                **self._stats,
+                "precomputed_responses": len(self._responses),
+                "cached_translations": len(self._translations)
+            }
     
     def _get_causal_taxonomy_response(self, query: str) -> TaxonomyResponse:
         """Generate response for causal taxonomy queries."""
@@ -641,52 +741,53 @@ This complete enumeration covers all risk categories identified in the repositor
             source="AI Risk Repository Preprint"
         )
     
-    def _get_adaptive_causal_response(self, query: str, intent: QueryIntent) -> TaxonomyResponse:
-        """Generate adaptive causal taxonomy response based on intent."""
-        detail_level = self.intent_analyzer.get_response_detail_level(intent)
-        
-        if detail_level == 'exhaustive' or intent.completeness_level >= 0.7:
-            # Provide complete causal taxonomy with all details
-            return self._get_causal_taxonomy_response(query)
-        else:
-            # Provide standard or summary based on completeness
-            return self._get_causal_taxonomy_response(query)
+    def _adaptive_causal_key(self, query: str, intent: QueryIntent) -> ResponseKey:
+        """Pick the causal taxonomy response based on intent."""
+        # Complete and summary requests currently share the full causal taxonomy
+        return ("causal", None)
     
-    def _get_adaptive_domain_response(self, query: str, intent: QueryIntent) -> TaxonomyResponse:
-        """Generate adaptive domain taxonomy response based on intent."""
+    def _adaptive_domain_key(self, query: str, intent: QueryIntent) -> ResponseKey:
+        """Pick the domain taxonomy response based on intent."""
         detail_level = self.intent_analyzer.get_response_detail_level(intent)
         
         # Check if asking for complete subdomain list
         if intent.enumeration_mode and ('subdomain' in query or '24' in query):
-            return self._get_all_subdomains_response(intent)
+            return ("enumeration", None)
         elif detail_level == 'exhaustive' or intent.completeness_level >= 0.7:
             # Provide complete domain taxonomy with all subdomains
-            return self._get_domain_taxonomy_response(query)
+            return ("domain", None)
         else:
             # Provide overview
-            return self._get_both_taxonomies_response(query)
+            return ("both", None)
     
-    def _get_adaptive_both_response(self, query: str, intent: QueryIntent) -> TaxonomyResponse:
-        """Generate adaptive response showing both taxonomies based on intent."""
+    def _adaptive_both_key(self, query: str, intent: QueryIntent) -> ResponseKey:
+        """Pick the combined taxonomy response based on intent."""
         detail_level = self.intent_analyzer.get_response_detail_level(intent)
         
         if detail_level == 'exhaustive':
             # Combine full details from both taxonomies
-            causal_response = self._get_causal_taxonomy_response(query)
-            domain_response = self._get_domain_taxonomy_response(query)
-            
-            content = f"""## Complete AI Risk Repository Taxonomy Structure
+            return ("both_detailed", None)
+        else:
+            return ("both", None)
+    
+    def _get_both_detailed_response(self, query: str) -> TaxonomyResponse:
+        """Generate response combining full details from both taxonomies."""
+        causal_response = self._get_causal_taxonomy_response(query)
+        domain_response = self._get_domain_taxonomy_response(query)
+        
+        content = f"""## Complete AI Risk Repository Taxonomy Structure
 
 {causal_response.content}
 
 ---
 
 {domain_response.content}"""
-            
-            return TaxonomyResponse(
-                content=content,
-                taxonomy_type="both_detailed",
-                source="AI Risk Repository Preprint"
-            )
-        else:
-            return self._get_both_taxonomies_response(query)
\ No newline at end of file
+        
+        return TaxonomyResponse(
+            content=content,
+            taxonomy_type="both_detailed",
+            source="AI Risk Repository Preprint"
+        )
+
+# Shared handler - taxonomy data and rendered responses are built once per process
+taxonomy_handler = TaxonomyHandler()
@@ -9,6 +9,8 @@ from .response_validator import (
     ResponseValidation,
     ResponseValidator,
     SelfValidationChain,
+    PendingValidation,
+    track_pending_validation,
     validation_chain
 )
 
@@ -19,5 +21,7 @@ __all__ = [
     'ResponseValidation',
     'ResponseValidator',
     'SelfValidationChain',
+    'PendingValidation',
+    'track_pending_validation',
     'validation_chain'
 ]
\ No newline at end of file
@@ -4,16 +4,70 @@ Ensures responses are accurate, relevant, and appropriate.
 """
 import re
 import json
-from typing import Dict, List, Optional, Tuple, Any
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Pattern, Tuple, Union, Any
 from dataclasses import dataclass
 from enum import Enum
 from langchain.docstore.document import Document
 
+from ..services.tracing_service import tracing_service
 from ...config.logging import get_logger
 from ...config.settings import settings
 
 logger = get_logger(__name__)
 
+try:
+    from rapidfuzz.distance import Levenshtein as _rapidfuzz_levenshtein
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+def levenshtein_distance(s1: str, s2: str) -> int:
+    """
+    Edit distance (unit-cost insertions, deletions, substitutions) of two strings.
+
+    Uses rapidfuzz when installed. Otherwise the bit-parallel algorithm of
+    Myers and Hyyrö: a DP column is held as two bit vectors (Python ints), so
+    each character of the shorter string costs a few big-integer operations
+    instead of one pure-Python cell update per character of the longer one.
+    """
+    if RAPIDFUZZ_AVAILABLE:
+        return _rapidfuzz_levenshtein.distance(s1, s2)
+    # The longer string is the bit vector; the loop runs over the shorter one
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    m = len(s2)
+    if not s1:
+        return m
+
+    match_masks: Dict[str, int] = {}
+    for i, char in enumerate(s2):
+        match_masks[char] = match_masks.get(char, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    vertical_pos, vertical_neg, distance = mask, 0, m
+    for char in s1:
+        eq = match_masks.get(char, 0)
+        xv = eq | vertical_neg
+        xh = ((((eq & vertical_pos) + vertical_pos) & mask) ^ vertical_pos) | eq
+        horizontal_pos = vertical_neg | (~(xh | vertical_pos) & mask)
+        horizontal_neg = vertical_pos & xh
+        if horizontal_pos & last:
+            distance += 1
+        elif horizontal_neg & last:
+            distance -= 1
+        horizontal_pos = ((horizontal_pos << 1) | 1) & mask
+        horizontal_neg = (horizontal_neg << 1) & mask
+        vertical_pos = horizontal_neg | (~(xv | horizontal_pos) & mask)
+        vertical_neg = horizontal_pos & xv
+    return distance
+
 class ValidationResult(Enum):
     """Results of validation checks."""
     PASS = "pass"
@@ -64,9 +118,95 @@ class ResponseValidation:
             "recommendations": self.recommendations
         }
 
+# Characters that make a validation pattern a regex rather than a plain phrase
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]|()\\')
+
+class _Regex(NamedTuple):
+    """A compiled validation pattern and the plain character every match ends with ('' if none)."""
+    regex: Pattern
+    last_char: str
+
+def _compile_pattern(pattern: str) -> Union[str, _Regex]:
+    """A pattern that is a plain phrase as its text (matched with `in`), any other compiled."""
+    literal = pattern.replace("\\'", "'")
+    if _REGEX_METACHARACTERS.isdisjoint(literal):
+        return literal
+    trailing_plain = ('|' not in pattern and pattern[-1] not in _REGEX_METACHARACTERS
+                      and not pattern.endswith('\\' + pattern[-1]))
+    return _Regex(re.compile(pattern), pattern[-1] if trailing_plain else '')
+
+def _occurs(pattern: Union[str, _Regex], text: str) -> bool:
+    """re.search(pattern, text) is not None."""
+    if isinstance(pattern, str):
+        return pattern in text
+    if pattern.last_char and pattern.last_char not in text:
+        return False
+    return pattern.regex.search(text) is not None
+
+def _find_all(pattern: Union[str, _Regex], text: str) -> List[str]:
+    """re.findall(pattern, text) for a pattern without groups."""
+    if isinstance(pattern, str):
+        return [pattern] * text.count(pattern)
+    if pattern.last_char and pattern.last_char not in text:
+        return []
+    return pattern.regex.findall(text)
+
+class ResponseFeatures:
+    """Text features of a response, computed once and shared by all checks."""
+
+    __slots__ = ('text', 'lower', 'words', 'word_set', 'stripped_length')
+
+    def __init__(self, response: str):
+        self.text = response
+        self.lower = response.lower()
+        self.words = self.lower.split()
+        self.word_set = set(self.words)
+        self.stripped_length = len(response.strip())
+
+class SourceIndex:
+    """
+    Lowercased source text of the retrieved documents, for claim-support lookups.
+
+    Built lazily (only a response that makes factual claims needs it) and
+    once per document set: validate_and_improve shares it across iterations.
+    Lookups are memoized per claim.
+    """
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self._text: Optional[str] = None
+        self._supported: Dict[str, bool] = {}
+
+    def supports(self, claim: str) -> bool:
+        """Whether the claim occurs in the source text."""
+        supported = self._supported.get(claim)
+        if supported is None:
+            if self._text is None:
+                self._text = " ".join(doc.page_content.lower() for doc in self.documents)
+            supported = self._supported[claim] = claim in self._text
+        return supported
+
 class ResponseValidator:
     """Validates response quality using multiple criteria."""
     
+    # Words ignored by the query/response overlap check
+    STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+    
+    DOMAIN_KEYWORDS = {
+        'socioeconomic': frozenset(['employment', 'job', 'work', 'economic', 'wage', 'labor']),
+        'safety': frozenset(['safety', 'risk', 'danger', 'harm', 'accident', 'failure']),
+        'privacy': frozenset(['privacy', 'data', 'personal', 'surveillance', 'information']),
+        'bias': frozenset(['bias', 'discrimination', 'fairness', 'equity', 'prejudice'])
+    }
+    
+    QUESTION_WORDS = ['how', 'what', 'why', 'when', 'where', 'which', 'who']
+    ANSWER_INDICATORS = ['by', 'through', 'because', 'since']
+    TRANSITION_WORDS = [
+        'however', 'therefore', 'furthermore', 'additionally', 'moreover',
+        'consequently', 'thus', 'meanwhile', 'similarly', 'in contrast'
+    ]
+    SOURCE_PHRASES = ['the repository documents', 'based on', 'according to']
+    
     def __init__(self):
         self._init_validation_patterns()
         self._init_quality_thresholds()
@@ -96,6 +236,14 @@ class ResponseValidator:
             r'uncertain'
         ]
         
+        # Excessive disclaimer patterns
+        self.disclaimer_patterns = [
+            r'i am not',
+            r'please consult',
+            r'seek professional',
+            r'this is not advice'
+        ]
+        
         # Citation patterns
         self.citation_patterns = [
             r'RID-\d{5}',  # RID citations
@@ -114,6 +262,14 @@ class ResponseValidator:
             r'data reveals',
             r'evidence suggests'
         ]
+        
+        # Compiled once: plain phrases become substring tests, the rest regexes
+        self._inappropriate = [_compile_pattern(p) for p in self.inappropriate_patterns]
+        self._low_confidence = [_compile_pattern(p) for p in self.low_confidence_patterns]
+        self._disclaimers = [_compile_pattern(p) for p in self.disclaimer_patterns]
+        self._factual_claims = [_compile_pattern(p) for p in self.factual_claim_patterns]
+        self._rid_citation = re.compile(r'RID-\d{5}')
+        self._legacy_citation = re.compile(r'\[Source \d+\]')
     
     def _init_quality_thresholds(self):
         """Initialize quality thresholds for validation."""
@@ -133,7 +289,8 @@ class ResponseValidator:
                          response: str, 
                          query: str,
                          retrieved_documents: List[Document],
-                         domain: str = "general") -> ResponseValidation:
+                         domain: str = "general",
+                         sources: Optional[SourceIndex] = None) -> ResponseValidation:
         """
         Perform comprehensive validation with three-signal scoring.
         
@@ -142,19 +299,23 @@ class ResponseValidator:
             query: Original user query
             retrieved_documents: Documents used for generation
             domain: Domain context
+            sources: Source index of retrieved_documents, if one is already built
             
         Returns:
             Complete validation results with three-signal analysis
         """
         checks = []
+        features = ResponseFeatures(response)
+        if sources is None:
+            sources = SourceIndex(retrieved_documents)
         
         # Run all validation checks
-        accuracy_check = self._check_factual_accuracy(response, retrieved_documents)
-        relevance_check = self._check_relevance(response, query, domain)
-        completeness_check = self._check_completeness(response, query)
-        appropriateness_check = self._check_appropriateness(response)
-        citation_check = self._check_citation_quality(response, retrieved_documents)
-        coherence_check = self._check_coherence(response)
+        accuracy_check = self._check_factual_accuracy(features, sources)
+        relevance_check = self._check_relevance(features, query, domain)
+        completeness_check = self._check_completeness(features, query)
+        appropriateness_check = self._check_appropriateness(features)
+        citation_check = self._check_citation_quality(features, retrieved_documents)
+        coherence_check = self._check_coherence(features)
         
         checks.extend([accuracy_check, relevance_check, completeness_check, 
                       appropriateness_check, citation_check, coherence_check])
@@ -193,7 +354,7 @@ class ResponseValidator:
             recommendations=recommendations
         )
     
-    def _check_factual_accuracy(self, response: str, documents: List[Document]) -> ValidationCheck:
+    def _check_factual_accuracy(self, features: ResponseFeatures, sources: SourceIndex) -> ValidationCheck:
         """Check if response appears factually accurate based on source documents."""
         
         score = 0.8  # Default good score
@@ -204,18 +365,12 @@ class ResponseValidator:
         try:
             # Check for unsupported factual claims
             factual_claims = []
-            for pattern in self.factual_claim_patterns:
-                matches = re.findall(pattern, response.lower())
-                factual_claims.extend(matches)
+            for pattern in self._factual_claims:
+                factual_claims.extend(_find_all(pattern, features.lower))
             
             if factual_claims:
                 # Verify claims against source documents
-                doc_text = " ".join([doc.page_content.lower() for doc in documents])
-                
-                unsupported_claims = 0
-                for claim in factual_claims:
-                    if claim not in doc_text:
-                        unsupported_claims += 1
+                unsupported_claims = sum(1 for claim in factual_claims if not sources.supports(claim))
                 
                 if unsupported_claims > 0:
                     accuracy_ratio = 1.0 - (unsupported_claims / len(factual_claims))
@@ -230,8 +385,7 @@ class ResponseValidator:
                         message = "Some factual claims may not be well-supported"
             
             # Check for hedging language that might indicate uncertainty
-            hedging_count = sum(1 for pattern in self.low_confidence_patterns 
-                              if re.search(pattern, response.lower()))
+            hedging_count = sum(1 for pattern in self._low_confidence if _occurs(pattern, features.lower))
             
             if hedging_count > 3:
                 score *= 0.9  # Slight penalty for excessive hedging
@@ -250,7 +404,7 @@ class ResponseValidator:
             details=details
         )
     
-    def _check_relevance(self, response: str, query: str, domain: str) -> ValidationCheck:
+    def _check_relevance(self, features: ResponseFeatures, query: str, domain: str) -> ValidationCheck:
         """Check if response is relevant to the user's query."""
         
         score = 0.8
@@ -258,14 +412,9 @@ class ResponseValidator:
         result = ValidationResult.PASS
         
         try:
-            # Check keyword overlap
-            query_words = set(query.lower().split())
-            response_words = set(response.lower().split())
-            
-            # Remove common stop words
-            stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-            query_words -= stop_words
-            response_words -= stop_words
+            # Check keyword overlap, ignoring common stop words
+            query_words = set(query.lower().split()) - self.STOP_WORDS
+            response_words = features.word_set - self.STOP_WORDS
             
             if query_words:
                 overlap_ratio = len(query_words.intersection(response_words)) / len(query_words)
@@ -279,21 +428,10 @@ class ResponseValidator:
                     message = "Response appears unrelated to query"
             
             # Domain relevance check
-            if domain != "general" and domain != "other":
-                domain_keywords = {
-                    'socioeconomic': ['employment', 'job', 'work', 'economic', 'wage', 'labor'],
-                    'safety': ['safety', 'risk', 'danger', 'harm', 'accident', 'failure'],
-                    'privacy': ['privacy', 'data', 'personal', 'surveillance', 'information'],
-                    'bias': ['bias', 'discrimination', 'fairness', 'equity', 'prejudice']
-                }
-                
-                if domain in domain_keywords:
-                    domain_words = set(domain_keywords[domain])
-                    domain_overlap = len(domain_words.intersection(response_words))
-                    
-                    if domain_overlap == 0:
-                        score *= 0.8  # Penalty for missing domain context
-                        message = f"Response may not address {domain} aspects"
+            domain_words = self.DOMAIN_KEYWORDS.get(domain)
+            if domain_words and not domain_words.intersection(response_words):
+                score *= 0.8  # Penalty for missing domain context
+                message = f"Response may not address {domain} aspects"
                 
         except Exception as e:
             logger.error(f"Error in relevance check: {str(e)}")
@@ -308,7 +446,7 @@ class ResponseValidator:
             message=message
         )
     
-    def _check_completeness(self, response: str, query: str) -> ValidationCheck:
+    def _check_completeness(self, features: ResponseFeatures, query: str) -> ValidationCheck:
         """Check if response adequately addresses the query."""
         
         score = 0.7
@@ -317,7 +455,7 @@ class ResponseValidator:
         
         try:
             # Check response length
-            response_length = len(response.strip())
+            response_length = features.stripped_length
             
             if response_length < 100:
                 score = 0.4
@@ -332,18 +470,17 @@ class ResponseValidator:
                 message = "Response is comprehensive but may be too long"
             
             # Check for question words in query that should be addressed
-            question_words = ['how', 'what', 'why', 'when', 'where', 'which', 'who']
-            query_questions = [word for word in question_words if word in query.lower()]
+            query_lower = query.lower()
+            query_questions = [word for word in self.QUESTION_WORDS if word in query_lower]
             
             if query_questions:
                 # Very basic check - could be enhanced with NLP
-                addressed_count = 0
-                for q_word in query_questions:
-                    if q_word in response.lower() or any(indicator in response.lower() 
-                                                       for indicator in ['by', 'through', 'because', 'since']):
-                        addressed_count += 1
+                if any(indicator in features.lower for indicator in self.ANSWER_INDICATORS):
+                    addressed_count = len(query_questions)
+                else:
+                    addressed_count = sum(1 for q_word in query_questions if q_word in features.lower)
                 
-                if addressed_count == 0 and len(query_questions) > 0:
+                if addressed_count == 0:
                     score *= 0.8
                     message = "Response may not fully answer the question"
                     
@@ -360,7 +497,7 @@ class ResponseValidator:
             message=message
         )
     
-    def _check_appropriateness(self, response: str) -> ValidationCheck:
+    def _check_appropriateness(self, features: ResponseFeatures) -> ValidationCheck:
         """Check if response is appropriate and professional."""
         
         score = 0.9
@@ -368,34 +505,23 @@ class ResponseValidator:
         result = ValidationResult.PASS
         
         try:
-            response_lower = response.lower()
+            response_lower = features.lower
             
             # Check for inappropriate deflection
-            inappropriate_count = sum(1 for pattern in self.inappropriate_patterns 
-                                    if re.search(pattern, response_lower))
-            
-            if inappropriate_count > 0:
+            if any(_occurs(pattern, response_lower) for pattern in self._inappropriate):
                 score = 0.3
                 result = ValidationResult.FAIL
                 message = "Response contains inappropriate deflection"
             
             # Check for excessive disclaimers
-            disclaimer_patterns = [
-                r'i am not',
-                r'please consult',
-                r'seek professional',
-                r'this is not advice'
-            ]
-            
-            disclaimer_count = sum(1 for pattern in disclaimer_patterns 
-                                 if re.search(pattern, response_lower))
+            disclaimer_count = sum(1 for pattern in self._disclaimers if _occurs(pattern, response_lower))
             
             if disclaimer_count > 2:
                 score *= 0.8
                 message = "Response contains excessive disclaimers"
             
             # Check for confident, helpful tone
-            if any(phrase in response_lower for phrase in ['the repository documents', 'based on', 'according to']):
+            if any(phrase in response_lower for phrase in self.SOURCE_PHRASES):
                 score = min(1.0, score + 0.1)  # Bonus for citing sources
                 
         except Exception as e:
@@ -411,7 +537,7 @@ class ResponseValidator:
             message=message
         )
     
-    def _check_citation_quality(self, response: str, documents: List[Document]) -> ValidationCheck:
+    def _check_citation_quality(self, features: ResponseFeatures, documents: List[Document]) -> ValidationCheck:
         """Check quality and appropriateness of citations."""
         
         score = 0.6
@@ -420,8 +546,8 @@ class ResponseValidator:
         
         try:
             # Count citations in response
-            rid_citations = len(re.findall(r'RID-\d{5}', response))
-            legacy_citations = len(re.findall(r'\[Source \d+\]', response))
+            rid_citations = len(self._rid_citation.findall(features.text)) if 'RID-' in features.text else 0
+            legacy_citations = len(self._legacy_citation.findall(features.text)) if '[Source ' in features.text else 0
             total_citations = rid_citations + legacy_citations
             
             # Check if response has documents but no citations
@@ -443,7 +569,7 @@ class ResponseValidator:
                     message = "Response has citations but no source documents provided"
             
             # Check for citation density (not too many, not too few)
-            response_length = len(response.split())
+            response_length = len(features.words)
             if response_length > 0 and total_citations > 0:
                 citation_density = total_citations / (response_length / 100)  # Per 100 words
                 
@@ -467,7 +593,7 @@ class ResponseValidator:
             message=message
         )
     
-    def _check_coherence(self, response: str) -> ValidationCheck:
+    def _check_coherence(self, features: ResponseFeatures) -> ValidationCheck:
         """Check if response is coherent and well-structured."""
         
         score = 0.8
@@ -476,34 +602,21 @@ class ResponseValidator:
         
         try:
             # Basic coherence checks
-            sentences = [s.strip() for s in response.split('.') if s.strip()]
+            sentence_count = sum(1 for s in features.text.split('.') if s.strip())
             
-            if len(sentences) < 2:
+            if sentence_count < 2:
                 score = 0.6
                 message = "Response may be too brief for coherence assessment"
             
             # Check for transition words (basic coherence indicator)
-            transition_words = [
-                'however', 'therefore', 'furthermore', 'additionally', 'moreover',
-                'consequently', 'thus', 'meanwhile', 'similarly', 'in contrast'
-            ]
-            
-            transition_count = sum(1 for word in transition_words 
-                                 if word in response.lower())
-            
-            if len(sentences) > 3 and transition_count == 0:
+            if sentence_count > 3 and not any(word in features.lower for word in self.TRANSITION_WORDS):
                 score *= 0.9
                 message = "Response could benefit from better transitions"
             
-            # Check for repetitive content
-            word_counts = {}
-            words = response.lower().split()
-            for word in words:
-                if len(word) > 4:  # Only count significant words
-                    word_counts[word] = word_counts.get(word, 0) + 1
-            
-            max_repetitions = max(word_counts.values()) if word_counts else 0
-            if max_repetitions > len(words) * 0.1:  # More than 10% repetition
+            # Check for repetitive content, counting only significant words
+            max_repetitions = max((count for word, count in Counter(features.words).items() if len(word) > 4),
+                                  default=0)
+            if max_repetitions > len(features.words) * 0.1:  # More than 10% repetition
                 score *= 0.8
                 message = "Response contains repetitive content"
                 
@@ -558,20 +671,125 @@ class ResponseValidator:
         
         return recommendations
 
+class PendingValidation:
+    """Background validation started while serving the current request."""
+
+    def __init__(self):
+        self.future: Optional[Future] = None
+        self.response: Optional[str] = None
+        self.revising = threading.Event()  # Set once the validator starts revising the response
+
+    def revision(self, timeout: float) -> Optional[Tuple[str, ResponseValidation]]:
+        """
+        The revised response and its validation, if background validation
+        changed the response.
+
+        Only waits (up to timeout) while a revision is being generated; a
+        validation that is still scoring the response does not hold up the
+        stream, and its result only reaches conversation history.
+        """
+        if self.future is None:
+            return None
+        if not self.future.done() and not self.revising.is_set():
+            return None
+        try:
+            revised_response, validation = self.future.result(timeout=timeout)
+        except Exception as e:
+            logger.debug(f"No revision available: {type(e).__name__}")
+            return None
+        if not revised_response or revised_response == self.response:
+            return None
+        return revised_response, validation
+
+_pending_validation: ContextVar[Optional[PendingValidation]] = ContextVar('pending_validation', default=None)
+
+@contextmanager
+def track_pending_validation() -> Iterator[PendingValidation]:
+    """Collect the background validation started for the response produced inside this block."""
+    pending = PendingValidation()
+    _pending_validation.set(pending)
+    try:
+        yield pending
+    finally:
+        # Plain set rather than token reset - streaming generators may finish in another context
+        _pending_validation.set(None)
+
 class SelfValidationChain:
     """Manages the self-validation process for responses."""
-    
-    def __init__(self, enable_validation: bool = True):
+
+    def __init__(self, enable_validation: bool = True, history_size: int = None, workers: int = None):
         self.enable_validation = enable_validation
         self.validator = ResponseValidator()
-        self.validation_history = []
-    
+        # Ring buffer: the chain is a process-wide singleton
+        self.validation_history = deque(maxlen=history_size or settings.VALIDATION_HISTORY_SIZE)
+        self._workers = workers or settings.VALIDATION_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._background_failures = 0
+
+    def validate_async(self,
+                       response: str,
+                       query: str,
+                       documents: List[Document],
+                       domain: str = "general") -> Future:
+        """
+        Validate (and possibly revise) a response on a background worker.
+
+        The caller returns the response without waiting. The Future resolves
+        to (final_response, validation); if the current request is collecting
+        a PendingValidation (see track_pending_validation), it is attached there
+        so a stream can send a revision as a follow-up event.
+
+        The worker runs in a copy of the caller's context, so model usage and
+        trace spans of a revision are attributed to the request.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="validation")
+            self._pending += 1
+        pending = _pending_validation.get()
+        on_revision = pending.revising.set if pending is not None else None
+        future = self._executor.submit(contextvars.copy_context().run, self._validate_in_background,
+                                       response, query, documents, domain, on_revision)
+        if pending is not None:
+            pending.future, pending.response = future, response
+        return future
+
+    def _validate_in_background(self, response: str, query: str, documents: List[Document],
+                                domain: str, on_revision: Optional[Callable[[], None]] = None
+                                ) -> Tuple[str, ResponseValidation]:
+        start_time = time.time()
+        try:
+            final_response, validation = self.validate_and_improve(response, query, documents, domain,
+                                                                   on_revision=on_revision)
+        except Exception as e:
+            with self._lock:
+                self._background_failures += 1
+            tracing_service.record("validation.background", start_time, error=f"{type(e).__name__}: {str(e)[:200]}")
+            logger.error(f"Background validation failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        tracing_service.record("validation.background", start_time,
+                               score=round(validation.overall_score, 3),
+                               result=validation.overall_result.value,
+                               revised=final_response != response)
+        logger.info(f"Background validation: {validation.overall_result.value} "
+                    f"(score: {validation.overall_score:.2f})")
+        if validation.overall_score < 0.6:
+            logger.warning(f"Low quality response detected. Recommendations: {validation.recommendations}")
+        return final_response, validation
+
     def validate_and_improve(self, 
                            response: str,
                            query: str, 
                            documents: List[Document],
                            domain: str = "general",
-                           max_iterations: int = 2) -> Tuple[str, ResponseValidation]:
+                           max_iterations: int = 2,
+                           on_revision: Optional[Callable[[], None]] = None) -> Tuple[str, ResponseValidation]:
         """
         Validate a response and suggest improvements.
         
@@ -581,6 +799,7 @@ class SelfValidationChain:
             documents: Source documents
             domain: Domain context
             max_iterations: Maximum improvement iterations
+            on_revision: Called before a revision is generated
             
         Returns:
             Tuple of (final_response, validation_results)
@@ -597,11 +816,12 @@ class SelfValidationChain:
         
         current_response = response
         response_history = [response]  # Track response history to detect cycles
+        sources = SourceIndex(documents)  # Shared by every iteration
         
         for iteration in range(max_iterations):
             # Validate current response
             validation = self.validator.validate_response(
-                current_response, query, documents, domain
+                current_response, query, documents, domain, sources
             )
             
             # Store validation history
@@ -623,6 +843,8 @@ class SelfValidationChain:
             
             if accuracy_score >= 0.75 and coverage_score < 0.5:
                 logger.info(f"Attempting revision: high accuracy ({accuracy_score:.2f}) but low coverage ({coverage_score:.2f})")
+                if on_revision:
+                    on_revision()
                 revised_response = self._generate_revision_suggestion(current_response, query, documents, validation)
                 if revised_response and revised_response != current_response:
                     # Check for cycles - compare with previous responses
@@ -730,32 +952,10 @@ class SelfValidationChain:
                 ngram_sim = ngram_intersection / ngram_union if ngram_union > 0 else 0.0
             
             # Method 3: Length-normalized Levenshtein distance
-            def levenshtein_similarity(s1, s2):
-                if len(s1) == 0 or len(s2) == 0:
-                    return 0.0
-                
-                # Simple Levenshtein distance calculation
-                matrix = [[0] * (len(s2) + 1) for _ in range(len(s1) + 1)]
-                
-                for i in range(len(s1) + 1):
-                    matrix[i][0] = i
-                for j in range(len(s2) + 1):
-                    matrix[0][j] = j
-                
-                for i in range(1, len(s1) + 1):
-                    for j in range(1, len(s2) + 1):
-                        cost = 0 if s1[i-1] == s2[j-1] else 1
-                        matrix[i][j] = min(
-                            matrix[i-1][j] + 1,      # deletion
-                            matrix[i][j-1] + 1,      # insertion
-                            matrix[i-1][j-1] + cost  # substitution
-                        )
-                
-                distance = matrix[len(s1)][len(s2)]
-                max_len = max(len(s1), len(s2))
-                return 1.0 - (distance / max_len) if max_len > 0 else 1.0
-            
-            levenshtein_sim = levenshtein_similarity(text1, text2)
+            if text1 and text2:
+                levenshtein_sim = 1.0 - levenshtein_distance(text1, text2) / max(len(text1), len(text2))
+            else:
+                levenshtein_sim = 0.0
             
             # Combine similarities with weights
             final_similarity = (
@@ -814,18 +1014,24 @@ Enhanced Response:"""
     
     def get_validation_statistics(self) -> Dict[str, Any]:
         """Get statistics about validation performance."""
-        if not self.validation_history:
+        # Snapshot: background workers append concurrently
+        history = list(self.validation_history)
+        if not history:
             return {}
-        
-        scores = [v['validation'].overall_score for v in self.validation_history]
-        
+
+        scores = [v['validation'].overall_score for v in history]
+
+        with self._lock:
+            pending, failures = self._pending, self._background_failures
         return {
-            'total_validations': len(self.validation_history),
+            'total_validations': len(history),
             'average_score': sum(scores) / len(scores),
             'min_score': min(scores),
             'max_score': max(scores),
-            'pass_rate': sum(1 for v in self.validation_history 
-                           if v['validation'].overall_result == ValidationResult.PASS) / len(self.validation_history)
+            'pass_rate': sum(1 for v in history
+                           if v['validation'].overall_result == ValidationResult.PASS) / len(history),
+            'pending_background': pending,
+            'background_failures': failures
         }
 
 # Global validation chain instance
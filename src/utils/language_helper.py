@@ -43,7 +43,8 @@ Your response must be ONLY the message (either the original English or the trans
     
     try:
         # Use Gemini to detect language and translate if needed
-        translated = gemini_model.generate(prompt, [])
+        from ..core.models.concurrency import RequestPriority
+        translated = gemini_model.generate(prompt, [], priority=RequestPriority.TRANSLATION)
         logger.debug(f"Successfully generated language-aware message for query: {user_query[:50]}...")
         return translated.strip()
     except Exception as e:
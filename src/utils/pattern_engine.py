@@ -0,0 +1,230 @@
+"""
+Precompiled multi-pattern matcher for the rule-based query checks.
+
+Intent, taxonomy, security, domain and query-type checks each used to run
+long lists of `keyword in text` / `re.search(...)` calls one after another
+on every query. A PatternEngine compiles all of one component's sets once:
+
+- keyword sets (plain substring or whole-word) into a single Aho-Corasick
+  automaton, so every keyword of every category is found in one pass over
+  the text, overlapping occurrences included
+- regex sets into one alternation per category, each pattern a named group,
+  so a category is one search instead of one per pattern
+
+scan() returns every category hit with its positions. Scans are memoized,
+so the several checks a component runs on the same query share one scan.
+
+Match semantics are those of the checks it replaces: a substring keyword
+hits wherever `keyword in text` would, a whole-word keyword wherever
+re.search(r'\\b' + re.escape(keyword) + r'\\b', text) would, and a regex
+category wherever any of its patterns' re.search would.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+class PatternHit(NamedTuple):
+    """One occurrence of a keyword or pattern in the scanned text."""
+    category: str
+    term: str  # the keyword, or the source of the regex that matched
+    start: int
+    end: int
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting every (overlapping) keyword occurrence."""
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        # Trie; state 0 is the root
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            if not keyword:
+                raise ValueError("Keywords must be non-empty")
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = next_state
+                state = next_state
+            outputs[state].append(index)
+
+        # Breadth-first: failure links, inherited outputs, and a full transition
+        # table per state (only non-root targets stored; missing means root)
+        fail = [0] * len(goto)
+        self._delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = list(goto[0].values())
+        for state in queue:
+            fail_delta = self._delta[fail[state]]
+            delta = dict(fail_delta)
+            for char, next_state in goto[state].items():
+                fail[next_state] = fail_delta.get(char, 0) if state else 0
+                delta[char] = next_state
+                queue.append(next_state)
+            self._delta[state] = delta
+        for state in queue:
+            outputs[state] = outputs[state] + outputs[fail[state]]
+        self._outputs = [tuple(output) for output in outputs]
+        self._lengths = [len(keyword) for keyword in self.keywords]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """(keyword index, start, end) of every occurrence, by end position."""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        ends = []
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                ends.append((state, position + 1))
+        lengths = self._lengths
+        return [(index, end - lengths[index], end) for state, end in ends for index in outputs[state]]
+
+def _is_word_char(char: str) -> bool:
+    # Same set as \w in a str pattern
+    return char.isalnum() or char == '_'
+
+def _is_word_boundary(text: str, position: int) -> bool:
+    """Whether \b matches at position."""
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+class PatternHits:
+    """
+    Result of one scan: hits per category.
+
+    Keyword hits are all collected by the single automaton pass. Regex
+    categories are searched when first asked about (a check that stops at
+    the first matching category never runs the others); their positions are
+    collected the first time they are requested.
+    """
+
+    __slots__ = ('_text', '_hits', '_counts', '_regexes', '_group_sources', '_found')
+
+    def __init__(self, text: str, hits: Dict[str, List[PatternHit]], counts: Dict[str, int],
+                 regexes: Dict[str, 're.Pattern'], group_sources: Dict[str, str]):
+        self._text = text
+        self._hits = hits
+        self._counts = counts
+        self._regexes = regexes
+        self._group_sources = group_sources
+        self._found: Dict[str, bool] = {}
+
+    def has(self, category: str) -> bool:
+        """Whether any keyword or pattern of the category occurs."""
+        regex = self._regexes.get(category)
+        if regex is None:
+            return category in self._hits
+        found = self._found.get(category)
+        if found is None:
+            found = self._found[category] = category in self._hits or regex.search(self._text) is not None
+        return found
+
+    def count(self, category: str) -> int:
+        """How many of the category's keywords occur (each counted once per listing; keyword categories only)."""
+        return self._counts.get(category, 0)
+
+    def terms(self, category: str) -> List[str]:
+        """Distinct keywords/patterns of the category that occur, in position order."""
+        return list(dict.fromkeys(hit.term for hit in self.positions(category)))
+
+    def positions(self, category: str) -> List[PatternHit]:
+        """Every hit of the category, ordered by position (non-overlapping for regex categories)."""
+        regex = self._regexes.get(category)
+        if regex is not None and category not in self._hits:
+            self._hits[category] = [
+                PatternHit(category, self._group_sources[match.lastgroup], match.start(), match.end())
+                for match in regex.finditer(self._text)
+            ]
+        return list(self._hits.get(category, ()))
+
+    def categories(self) -> List[str]:
+        """Every category with at least one hit."""
+        return [category for category in self._hits if self._hits[category]] + [
+            category for category in self._regexes if category not in self._hits and self.has(category)
+        ]
+
+class PatternEngine:
+    """
+    Keyword and regex categories compiled for single-pass scanning.
+
+    Args:
+        keywords: category -> keywords matched as substrings
+        word_keywords: category -> keywords matched as whole words
+        patterns: category -> regex sources (combined per category)
+        flags: re flags for the regex categories
+        cache_size: number of recent scans to memoize
+    """
+
+    def __init__(self, keywords: Optional[Dict[str, Iterable[str]]] = None,
+                 word_keywords: Optional[Dict[str, Iterable[str]]] = None,
+                 patterns: Optional[Dict[str, Iterable[str]]] = None,
+                 flags: int = 0, cache_size: int = 256):
+        # Each distinct keyword string once in the automaton, with the categories listing it
+        self._keyword_index: Dict[str, int] = {}
+        self._listings: List[List[Tuple[str, bool, int]]] = []  # (category, whole_word, times listed)
+        self._keyword_order: Dict[str, Dict[str, int]] = {}  # category -> keyword -> list position
+        for whole_word, sets in ((False, keywords or {}), (True, word_keywords or {})):
+            for category, category_keywords in sets.items():
+                if category in self._keyword_order:
+                    raise ValueError(f"Duplicate pattern category: {category}")
+                listed: Dict[str, int] = {}
+                order = self._keyword_order[category] = {}
+                for keyword in category_keywords:
+                    listed[keyword] = listed.get(keyword, 0) + 1
+                    order.setdefault(keyword, len(order))
+                for keyword, times in listed.items():
+                    index = self._keyword_index.setdefault(keyword, len(self._keyword_index))
+                    if index == len(self._listings):
+                        self._listings.append([])
+                    self._listings[index].append((category, whole_word, times))
+        self._automaton = KeywordAutomaton(list(self._keyword_index)) if self._keyword_index else None
+
+        # One alternation per regex category; group names map back to the source pattern
+        self._regexes: Dict[str, re.Pattern] = {}
+        self._group_sources: Dict[str, str] = {}
+        for category, sources in (patterns or {}).items():
+            if category in self._keyword_order or category in self._regexes:
+                raise ValueError(f"Duplicate pattern category: {category}")
+            alternatives = []
+            for source in sources:
+                group = f"p{len(self._group_sources)}"
+                self._group_sources[group] = source
+                alternatives.append(f"(?P<{group}>{source})")
+            if alternatives:
+                self._regexes[category] = re.compile('|'.join(alternatives), flags)
+
+        self.scan = lru_cache(maxsize=cache_size)(self._scan) if cache_size else self._scan
+
+    def clear_cache(self) -> None:
+        if hasattr(self.scan, 'cache_clear'):
+            self.scan.cache_clear()
+
+    def _scan(self, text: str) -> PatternHits:
+        hits: Dict[str, List[PatternHit]] = {}
+        counts: Dict[str, int] = {}
+        if self._automaton is not None:
+            counted = set()
+            keywords = self._automaton.keywords
+            for index, start, end in self._automaton.find_all(text):
+                for category, whole_word, times in self._listings[index]:
+                    if whole_word and not (_is_word_boundary(text, start) and _is_word_boundary(text, end)):
+                        continue
+                    hits.setdefault(category, []).append(PatternHit(category, keywords[index], start, end))
+                    if (category, index) not in counted:
+                        counted.add((category, index))
+                        counts[category] = counts.get(category, 0) + times
+            for category_hits in hits.values():
+                category_hits.sort(key=lambda hit: (hit.start, hit.end))
+
+        return PatternHits(text, hits, counts, self._regexes, self._group_sources)
+
+    def first_listed(self, hits: PatternHits, category: str) -> Optional[str]:
+        """The category keyword that occurs and comes first in its list (as a loop over the list finds)."""
+        order = self._keyword_order.get(category, {})
+        found = hits.terms(category)
+        return min(found, key=order.__getitem__) if found else None
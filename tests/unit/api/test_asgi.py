@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the native chat handlers of the ASGI serving mode.
+"""
+import sys
+import os
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.api import asgi
+from src.api.asgi import AsyncChatApp
+
+
+class FakeChatService:
+    def __init__(self, response="AI risks include bias."):
+        self.response = response
+
+    async def process_query_async(self, message, conversation_id, session_id, language_code):
+        if self.response is None:
+            raise RuntimeError("model unavailable")
+        return self.response, [], None
+
+
+def make_app(monkeypatch, chat_service):
+    logged = []
+
+    def log_query(self, info, start_time, usage, *args, error=None, **kwargs):
+        logged.append(error)
+        return 5, SimpleNamespace(citations_count=0)
+
+    monkeypatch.setattr(asgi, 'WsgiToAsgi', lambda app: app, raising=False)
+    monkeypatch.setattr(AsyncChatApp, '_log_query', log_query)
+    monkeypatch.setattr(AsyncChatApp, '_metrics_payload', lambda self, *args: {})
+    chat_routes = SimpleNamespace(chat_service=chat_service, language_payload=lambda info: info)
+    return AsyncChatApp(flask_app=None, chat_routes=chat_routes), logged
+
+
+def post(app, path, payload, headers):
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': path, 'client': ('127.0.0.1', 1234),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    }
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': json.dumps(payload).encode(), 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in sent[1:])
+
+
+def test_native_responses_carry_cors_headers(monkeypatch):
+    app, _ = make_app(monkeypatch, FakeChatService())
+    origin = 'https://futuretech.webflow.io'
+
+    status, headers, body = post(app, '/api/v1/sendMessage', {'message': 'What are AI risks?'}, {'Origin': origin})
+    assert status == 200
+    assert headers[b'access-control-allow-origin'] == origin.encode()
+    assert headers[b'access-control-allow-credentials'] == b'true'
+    assert json.loads(body)['response'] == "AI risks include bias."
+
+    # Errors are readable by the page too
+    status, headers, _ = post(app, '/api/v1/sendMessage', {}, {'Origin': origin})
+    assert status == 400 and headers[b'access-control-allow-origin'] == origin.encode()
+
+    # No Origin (same-origin or server-to-server): no CORS headers
+    _, headers, _ = post(app, '/api/v1/sendMessage', {'message': 'hi'}, {})
+    assert b'access-control-allow-origin' not in headers
+
+
+def test_cors_origins_follow_settings(monkeypatch):
+    monkeypatch.setattr(asgi.settings, 'CORS_ORIGINS', ['https://futuretech.mit.edu', 'https://*.github.io'])
+    scope = lambda origin: {'headers': [(b'origin', origin.encode())]}
+
+    assert asgi.cors_headers(scope('https://davidturturean.github.io'))
+    assert asgi.cors_headers(scope('https://futuretech.mit.edu'))
+    assert asgi.cors_headers(scope('https://evil.example.com')) == []
+
+
+def test_large_bodies_are_compressed_and_errors_logged(monkeypatch):
+    app, logged = make_app(monkeypatch, FakeChatService("risk " * 1000))
+    status, headers, body = post(app, '/api/v1/sendMessage', {'message': 'Tell me everything'},
+                                 {'Accept-Encoding': 'gzip'})
+    assert headers[b'content-encoding'] == b'gzip'
+    assert json.loads(gzip.decompress(body))['response'].startswith("risk risk")
+
+    app, logged = make_app(monkeypatch, FakeChatService(None))
+    status, _, _ = post(app, '/api/v1/sendMessage', {'message': 'What are AI risks?'}, {})
+    assert status == 500
+    assert isinstance(logged[0], RuntimeError)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the API response layer (fast JSON, ETag/304, compression, metrics).
+"""
+import sys
+import os
+import gzip
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from flask import Flask, jsonify
+
+from src.api.response_layer import init_response_layer, response_metrics
+
+
+def make_app():
+    app = Flask(__name__)
+    init_response_layer(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify({'rows': [{'id': i, 'text': 'risk ' * 10} for i in range(200)]})
+
+    @app.route('/unsorted')
+    def unsorted():
+        return jsonify({'b': 1, 'a': {'d': 2, 'c': 3}})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    return app
+
+
+def test_large_responses_are_compressed_and_conditional():
+    response_metrics.reset()
+    client = make_app().test_client()
+
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = json.loads(gzip.decompress(response.data))
+    assert len(body['rows']) == 200
+
+    etag = response.headers['ETag']
+    repeat = client.get('/big', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+
+    stats = response_metrics.get_stats()['/big']
+    assert stats['responses'] == 2 and stats['not_modified'] == 1
+    assert stats['sent_bytes'] < stats['raw_bytes'] / 2
+
+
+def test_small_or_unaccepted_responses_are_sent_as_is():
+    client = make_app().test_client()
+
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert small.get_json() == {'ok': True}
+
+    identity = client.get('/big')
+    assert 'Content-Encoding' not in identity.headers
+    assert len(identity.get_json()['rows']) == 200
+
+
+def test_keys_are_sorted_like_the_default_provider():
+    app = make_app()
+    assert app.test_client().get('/unsorted').data.replace(b' ', b'').strip() == b'{"a":{"c":3,"d":2},"b":1}'
+
+    app.json.sort_keys = False
+    assert app.test_client().get('/unsorted').data.replace(b' ', b'').strip() == b'{"b":1,"a":{"d":2,"c":3}}'
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive model concurrency limiter.
+"""
+import sys
+import os
+import asyncio
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+from src.core.models.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    RequestPriority,
+    RequestShedError
+)
+
+
+def make_limiter(**overrides):
+    params = dict(initial_limit=2, min_limit=1, max_limit=4, decrease_factor=0.5,
+                  queue_timeout=2.0, shed_threshold=2)
+    params.update(overrides)
+    return AdaptiveConcurrencyLimiter(**params)
+
+
+def test_rate_limit_halves_and_success_grows_limit():
+    limiter = make_limiter(initial_limit=4)
+    limiter.acquire()
+    limiter.release(rate_limited=True)
+    assert limiter.limit == 2
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 4  # capped at max_limit
+
+
+def test_concurrent_rate_limits_decrease_once():
+    limiter = make_limiter(initial_limit=4, max_limit=8)
+    started = []
+    for _ in range(4):
+        limiter.acquire()
+        started.append(time.time())
+    time.sleep(0.01)
+
+    # A burst of 429s from calls sent under the old limit halves it once, not 2^N
+    for started_at in started:
+        limiter.release(rate_limited=True, started_at=started_at)
+    assert limiter.limit == 2
+    stats = limiter.get_stats()
+    assert stats["rate_limited"] == 4 and stats["rate_limited_ignored"] == 3
+
+    # A call that started after the decrease may decrease it again
+    limiter.acquire()
+    limiter.release(rate_limited=True, started_at=time.time())
+    assert limiter.limit == 1
+
+
+def test_explicit_zero_is_not_replaced_by_settings():
+    limiter = make_limiter(initial_limit=1, queue_timeout=0, shed_threshold=0)
+    assert limiter.queue_timeout == 0 and limiter.shed_threshold == 0
+    assert limiter.should_shed(RequestPriority.CLASSIFICATION)
+
+    limiter.acquire()
+    with pytest.raises(RequestShedError):
+        limiter.acquire()  # no waiting with a zero queue timeout
+    limiter.release()
+
+
+def test_generation_is_served_before_classification():
+    limiter = make_limiter(initial_limit=1, max_limit=1, shed_threshold=10)
+    limiter.acquire(RequestPriority.GENERATION)
+    order = []
+
+    def worker(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+        limiter.release()
+
+    background = threading.Thread(target=worker, args=(RequestPriority.CLASSIFICATION,))
+    background.start()
+    time.sleep(0.05)
+    foreground = threading.Thread(target=worker, args=(RequestPriority.GENERATION,))
+    foreground.start()
+    time.sleep(0.05)
+
+    limiter.release()
+    background.join(timeout=2)
+    foreground.join(timeout=2)
+    assert order == [RequestPriority.GENERATION, RequestPriority.CLASSIFICATION]
+
+
+def test_classification_is_shed_when_queue_saturated():
+    limiter = make_limiter(initial_limit=1, shed_threshold=1)
+    limiter.acquire(RequestPriority.GENERATION)
+
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), limiter.release()))
+    waiter.start()
+    time.sleep(0.05)
+
+    assert limiter.should_shed(RequestPriority.CLASSIFICATION)
+    assert not limiter.should_shed(RequestPriority.GENERATION)
+    with pytest.raises(RequestShedError):
+        limiter.acquire(RequestPriority.CLASSIFICATION)
+
+    limiter.release()
+    waiter.join(timeout=2)
+    stats = limiter.get_stats()
+    assert stats["shed_by_priority"]["classification"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["wait_time_ms"]["count"] == 2
+
+
+def test_queue_timeout_raises():
+    limiter = make_limiter(initial_limit=1, queue_timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(RequestShedError):
+        limiter.acquire(RequestPriority.TRANSLATION)
+    assert limiter.get_stats()["timed_out"] == 1
+    limiter.release()
+    # Cancelled waiter must not consume the freed slot
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_async_waiters_share_slots_with_threads():
+    limiter = make_limiter(initial_limit=1, max_limit=1, shed_threshold=10)
+    limiter.acquire()  # held by a thread
+
+    async def scenario():
+        waiter = asyncio.ensure_future(limiter.acquire_async(RequestPriority.GENERATION))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        # Released from another thread: the event-loop waiter is woken
+        threading.Thread(target=limiter.release).start()
+        await asyncio.wait_for(waiter, timeout=2)
+        limiter.release()
+
+        # A timed-out async waiter gives up its place in the queue
+        limiter.acquire()
+        with pytest.raises(RequestShedError):
+            await limiter.acquire_async(RequestPriority.GENERATION, timeout=0.05)
+        limiter.release()
+
+    asyncio.run(scenario())
+    limiter.acquire(timeout=0.5)  # the slot was not leaked
+    limiter.release()
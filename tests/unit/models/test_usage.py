@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request token usage accounting.
+"""
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.models.concurrency import RequestPriority
+from src.core.models.usage import (
+    PipelineStage,
+    get_request_usage,
+    record_model_usage,
+    track_request_usage,
+    usage_stage
+)
+
+
+def make_response(prompt, output, cached=0):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt,
+        candidates_token_count=output,
+        cached_content_token_count=cached,
+        total_token_count=prompt + output
+    ))
+
+
+def test_nothing_recorded_outside_a_request():
+    assert get_request_usage() is None
+    assert record_model_usage("gemini-2.5-flash", make_response(10, 5)) is None
+
+
+def test_usage_is_attributed_to_stages():
+    with track_request_usage() as usage:
+        record_model_usage("gemini-2.5-flash", make_response(1000, 200, cached=400))
+        record_model_usage("gemini-2.0-flash", make_response(50, 10),
+                           priority=RequestPriority.TRANSLATION)
+        with usage_stage(PipelineStage.LANGUAGE_DETECTION):
+            record_model_usage("gemini-2.0-flash", make_response(30, 5),
+                               priority=RequestPriority.CLASSIFICATION)
+    assert get_request_usage() is None
+
+    totals = usage.totals()
+    assert totals["input"] == 1080
+    assert totals["output"] == 215
+    assert totals["cached"] == 400
+    assert totals["calls"] == 3
+
+    stages = {row["stage"]: row for row in usage.by_stage_and_model()}
+    assert set(stages) == {"generation", "translation", "language_detection"}
+    assert stages["generation"]["cached_tokens"] == 400
+
+
+def test_missing_metadata_falls_back_to_estimate():
+    with track_request_usage() as usage:
+        record = record_model_usage("gemini-2.5-flash", object(),
+                                    prompt="x" * 400, output_text="y" * 80)
+    assert record.estimated
+    assert record.prompt_tokens == 100
+    assert record.output_tokens == 20
+    assert usage.calls == [record]
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-centroid intent reference index.
+"""
+import sys
+import os
+import zlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+
+from src.config.settings import settings
+from src.core.query.intent_classifier import IntentCategory, IntentClassifier
+from src.core.query.reference_index import ReferenceIndex, reference_fingerprint
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words vectors; counts encode calls."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        vectors = np.zeros((len(texts), self.dim))
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.strip('?,.').encode()) % self.dim] += 1.0
+        return vectors
+
+
+def test_category_scores_are_top_k_means():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(20, 16))
+    codes = np.array([0] * 3 + [1] * 9 + [2] * 8)
+    index = ReferenceIndex(['a', 'b', 'c'], codes, matrix)
+    query = rng.normal(size=16)
+
+    sims = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    for k in (1, 3, 5):
+        scores = index.category_scores(query, k=k)
+        for code, category in enumerate(['a', 'b', 'c']):
+            expected = np.sort(sims[codes == code])[::-1][:k].mean()
+            assert np.isclose(scores[category], expected, atol=1e-5)
+    assert np.isclose(index.max_similarity(query, 'b'), sims[codes == 1].max(), atol=1e-5)
+
+
+def test_save_load_checks_fingerprint(tmp_path):
+    references = {'greeting': ['hello there', 'good morning'], 'weather': ['rain tomorrow']}
+    fingerprint = reference_fingerprint(references, 'model-a')
+    index = ReferenceIndex.build(references, FakeEmbeddings().encode, fingerprint)
+    path = tmp_path / "index.npz"
+    index.save(path)
+
+    loaded = ReferenceIndex.load(path, fingerprint)
+    assert loaded.categories == ['greeting', 'weather']
+    assert np.allclose(loaded.matrix, index.matrix)
+    assert ReferenceIndex.load(path, reference_fingerprint(references, 'model-b')) is None
+
+
+def test_classifier_uses_cached_index_without_embedding_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'INTENT_REFERENCE_INDEX_PATH', tmp_path / "intent_references.npz")
+    embeddings = FakeEmbeddings()
+
+    first = IntentClassifier(use_gemini=False)
+    first._reference_index = first._load_or_build_reference_index(embeddings)
+    assert embeddings.calls == 1
+
+    second = IntentClassifier(use_gemini=False)
+    second._reference_index = second._load_or_build_reference_index(embeddings)
+    assert embeddings.calls == 1  # loaded from the cache
+
+    scores = second._reference_index.category_scores(embeddings.encode(["Describe the domain taxonomy"])[0])
+    assert max(scores, key=scores.get) == IntentCategory.TAXONOMY_QUERY.value
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for request-scoped citation enhancement under concurrent requests.
+"""
+import sys
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.docstore.document import Document
+
+from src.core.services.citation_service import CitationService
+from src.core.storage.snippet_database import SnippetDatabase
+
+SENTENCES = ("AI hiring tools can discriminate against applicants in ways that are hard to detect and audit. "
+             "Developers rarely disclose the data their models were trained on, which hides the source of bias. ")
+
+
+def make_docs(request):
+    return [Document(page_content=f"Passage {i} of request {request}",
+                     metadata={'rid': f"RID-{request * 10 + i:05d}", 'title': f"Request {request} doc {i}",
+                               'file_type': 'ai_risk_entry'})
+            for i in range(3)]
+
+
+def test_legacy_references_and_uncited_paragraphs(tmp_path):
+    service = CitationService(snippet_store=SnippetDatabase(tmp_path / "snippets.db"))
+    docs = make_docs(1)
+    docs.insert(1, Document(page_content="No RID", metadata={}))
+
+    response = service.enhance_response_with_citations(
+        "Bias is documented (RID-00010). Source 1 and Entry 3 agree. See RID-99999. " + SENTENCES * 2, docs, "session-1")
+
+    assert "[Request 1 doc 0](/snippet/RID-00010)" in response
+    assert "[Request 1 doc 0](/snippet/RID-00010) and [Request 1 doc 1](/snippet/RID-00011) agree" in response
+    assert "[RID-99999](/snippet/RID-99999)" in response
+    # The long uncited paragraph gets the least used RID
+    assert "audit. [Request 1 doc 2](/snippet/RID-00012)" in response
+
+
+def test_concurrent_requests_do_not_share_citations(tmp_path):
+    store = SnippetDatabase(tmp_path / "snippets.db")
+    service = CitationService(snippet_store=store)
+    barrier = threading.Barrier(16)
+
+    def enhance(request):
+        barrier.wait()
+        responses = []
+        for round in range(10):
+            docs = make_docs(request)
+            text = f"Round {round}: bias is documented (RID-{request * 10:05d}). Source 2 agrees. " + SENTENCES * 3
+            responses.append(service.enhance_response_with_citations(text, docs, f"session-{request}"))
+        return responses
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(enhance, range(1, 49)))
+
+    for request, responses in enumerate(results, 1):
+        own = {f"RID-{request * 10 + i:05d}" for i in range(3)}
+        for response in responses:
+            assert set(re.findall(r'RID-\d{5}', response)) <= own
+            assert f"Request {request} doc 1" in response
+        snippets = store.get_session_snippets(f"session-{request}")
+        assert {snippet['rid'] for snippet in snippets} == own
+
+
+def test_precomputed_records_are_referenced(tmp_path, monkeypatch):
+    from src.core.services import citation_service
+    from src.core.storage.snippet_records import build_snippet_records
+
+    store = SnippetDatabase(tmp_path / "snippets.db")
+    docs = make_docs(1)
+    store.save_records(build_snippet_records(docs[:2]))
+    built = []
+    monkeypatch.setattr(citation_service, 'build_snippet_record',
+                        lambda doc, rid: built.append(rid) or {"rid": rid, "title": "built"})
+
+    CitationService(snippet_store=store).enhance_response_with_citations("See RID-00010.", docs, "session-1")
+
+    assert built == ["RID-00012"]
+    assert store.get_snippet("session-1", "RID-00011")['title'] == "Request 1 doc 1"
+
+
+def test_records_replaced_during_save_are_looked_up_again(tmp_path):
+    from src.core.storage.snippet_records import build_snippet_records
+
+    store = SnippetDatabase(tmp_path / "snippets.db")
+    docs = make_docs(1)
+    store.save_records(build_snippet_records(docs))
+    save_snippets = store.save_snippets
+    attempts = []
+
+    def replaced_once(session_id, snippets, stored=None):
+        if not attempts:
+            # A re-ingestion lands between the lookup and the save
+            store.save_records(build_snippet_records([Document(page_content="Re-ingested", metadata=docs[0].metadata)]))
+        attempts.append(dict(stored or {}))
+        return save_snippets(session_id, snippets, stored)
+
+    store.save_snippets = replaced_once
+    CitationService(snippet_store=store).enhance_response_with_citations("See RID-00010.", docs, "session-1")
+
+    assert len(attempts) == 2 and "RID-00010" not in attempts[1]
+    assert store.get_snippet("session-1", "RID-00010")['content'] == "Passage 0 of request 1"
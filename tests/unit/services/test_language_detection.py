@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the local language detector and its use in LanguageService.
+"""
+import sys
+import os
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+from src.config.settings import settings
+from src.core.services.language_service import LanguageService
+
+
+class FakeModel:
+    def __init__(self, code):
+        self.code = code
+        self.prompts = []
+
+    def generate(self, prompt, docs, priority=None):
+        self.prompts.append(prompt)
+        return json.dumps({"code": self.code, "confidence": 0.95})
+
+
+@pytest.fixture(scope="module")
+def service():
+    return LanguageService()
+
+
+@pytest.mark.parametrize("text, code", [
+    ("인공지능의 위험은 무엇입니까?", "ko"),
+    ("人工知能のリスクは何ですか？", "ja"),
+    ("人工智能的风险是什么？", "zh"),
+    ("人工智能係咪會搶走我哋嘅工作？", "zh-yue"),
+    ("ปัญญาประดิษฐ์จะแย่งงานของเราได้ไหม", "th"),
+    ("¿Cuáles son los riesgos de la inteligencia artificial?", "es"),
+    ("Quels sont les risques de l'intelligence artificielle ?", "fr"),
+    ("Was sind die Risiken der künstlichen Intelligenz?", "de"),
+    ("Может ли искусственный интеллект отнять у нас работу?", "ru"),
+    ("Чи може штучний інтелект забрати нашу роботу?", "uk"),
+    ("هل يمكن للذكاء الاصطناعي أن يأخذ وظائفنا؟", "ar"),
+    ("What are the risks of AI in healthcare?", "en"),
+])
+def test_detects_clear_text_confidently(service, text, code):
+    detection = service.detect_language_locally(text)
+    assert detection.code == code
+    assert detection.confidence >= settings.LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD
+
+
+def test_mixed_and_fun_text_is_left_to_the_model(service):
+    switched = service.detect_language_locally("What are the risks of AI? Por favor, responde en español.")
+    assert switched.confidence < settings.LANGUAGE_DETECTION_CONFIDENCE_THRESHOLD
+
+    pirate = service.detect_language_locally("Ahoy matey! What be the risks o' AI, arr?")
+    assert pirate.code == "pirate" and pirate.constructed
+    assert service.detect_language_locally("1234 !!") is None
+
+
+@pytest.mark.parametrize("text", [
+    "This seems very important.",
+    "Tell me about the risks, they are so many!",
+    "wow what are the risks of AI",
+    "What risks does GPT4o pose?",
+    "Is P2P AI safe?",
+    "Wow, many thanks. Such a great answer!",
+])
+def test_english_is_not_mistaken_for_doge_or_l33t(service, text):
+    detection = service.detect_language_locally(text)
+    assert detection.code == "en" and not detection.constructed
+
+
+@pytest.mark.parametrize("text, code", [
+    ("wow such risk much scare", "doge"),
+    ("Wh4t 4r3 th3 r1sk5 0f 41?", "l33t"),
+])
+def test_doge_and_l33t_are_flagged(service, text, code):
+    detection = service.detect_language_locally(text)
+    assert detection.code == code and detection.constructed
+
+
+def test_model_only_runs_when_local_detection_is_unsure(service):
+    service.gemini_model = FakeModel("pirate")
+    try:
+        confident = service.detect_language("Quali sono i rischi dell'intelligenza artificiale?")
+        assert confident['code'] == "it" and confident['detection_method'] == "local"
+        assert not service.gemini_model.prompts
+
+        constructed = service.detect_language("Ahoy matey! What be the risks o' AI, arr?")
+        assert constructed['code'] == "pirate" and constructed['detection_method'] == "model"
+        assert len(service.gemini_model.prompts) == 1
+    finally:
+        service.gemini_model = None
+
+    # Results are copies; the language database is not annotated
+    assert 'confidence' not in service.get_language_info("it")
+    assert service.detect_language("hmm")['code'] == "en"
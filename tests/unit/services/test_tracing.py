@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for pipeline span tracing.
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+from src.core.services.tracing_service import TracingService
+
+
+def test_nested_spans_form_one_trace():
+    tracer = TracingService(max_traces=10, enabled=True, otel_export=False)
+
+    with tracer.span("chat.process_query") as root:
+        with tracer.span("retrieval", domain="safety") as child:
+            time.sleep(0.01)
+        tracer.record("model.generate", time.time() - 0.02, model="gemini-2.5-flash")
+
+    traces = tracer.get_recent_traces()
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["name"] == "chat.process_query"
+    assert trace["span_count"] == 3
+
+    spans = {s["name"]: s for s in trace["spans"]}
+    assert spans["retrieval"]["parent_id"] == root.span_id
+    assert spans["model.generate"]["parent_id"] == root.span_id
+    assert spans["retrieval"]["attributes"] == {"domain": "safety"}
+    assert spans["retrieval"]["duration_ms"] >= 10
+    assert tracer.get_trace(trace["trace_id"])["trace_id"] == trace["trace_id"]
+
+
+def test_errors_and_histograms():
+    tracer = TracingService(max_traces=10, enabled=True, otel_export=False)
+
+    with pytest.raises(ValueError):
+        with tracer.span("generation"):
+            raise ValueError("boom")
+    with tracer.span("generation"):
+        pass
+
+    stats = tracer.get_stage_stats()["generation"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+    assert sum(stats["buckets"].values()) == 2
+    assert tracer.get_recent_traces()[-1]["error"].startswith("ValueError")
+
+
+def test_ring_buffer_and_disabled_tracer():
+    tracer = TracingService(max_traces=3, enabled=True, otel_export=False)
+    for i in range(5):
+        with tracer.span(f"request-{i}"):
+            pass
+    assert [t["name"] for t in tracer.get_recent_traces()] == ["request-4", "request-3", "request-2"]
+
+    disabled = TracingService(enabled=False)
+    with disabled.span("generation") as span:
+        assert span is None
+    assert disabled.get_stage_stats() == {}
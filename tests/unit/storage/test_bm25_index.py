@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the array-backed BM25 index.
+"""
+import sys
+import os
+import math
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+
+from src.core.storage.bm25_index import CompactBM25
+
+
+CORPUS = [
+    "ai systems may discriminate in hiring decisions".split(),
+    "privacy risks from ai surveillance and data collection".split(),
+    "ai safety failures in autonomous systems systems".split(),
+    "misinformation generated by ai at scale".split(),
+    [],
+]
+
+
+def reference_scores(corpus, query, k1=1.5, b=0.75, epsilon=0.25):
+    """Straightforward BM25Okapi (rank_bm25) scoring, one dict per document."""
+    doc_freqs = [{t: doc.count(t) for t in doc} for doc in corpus]
+    avgdl = sum(len(doc) for doc in corpus) / len(corpus)
+    df = {}
+    for freqs in doc_freqs:
+        for term in freqs:
+            df[term] = df.get(term, 0) + 1
+    idf = {t: math.log(len(corpus) - n + 0.5) - math.log(n + 0.5) for t, n in df.items()}
+    average_idf = sum(idf.values()) / len(idf)
+    idf = {t: (value if value >= 0 else epsilon * average_idf) for t, value in idf.items()}
+    doc_len = np.array([len(doc) for doc in corpus])
+    scores = np.zeros(len(corpus))
+    for q in query:
+        q_freq = np.array([freqs.get(q) or 0 for freqs in doc_freqs])
+        scores += (idf.get(q) or 0) * (q_freq * (k1 + 1) / (q_freq + k1 * (1 - b + b * doc_len / avgdl)))
+    return scores
+
+
+@pytest.mark.parametrize("query", [
+    ["ai"], ["systems", "safety"], ["privacy", "privacy"], ["unknown"], [],
+])
+def test_scores_match_bm25_okapi(query):
+    index = CompactBM25(CORPUS)
+    assert np.array_equal(index.get_scores(query), reference_scores(CORPUS, query))
+
+
+def test_scores_match_rank_bm25_when_installed():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    okapi = rank_bm25.BM25Okapi(CORPUS)
+    index = CompactBM25(CORPUS)
+    for query in (["ai", "systems"], ["hiring"], ["data", "scale", "ai"]):
+        assert np.array_equal(index.get_scores(query), okapi.get_scores(query))
+
+
+def test_index_is_flat_arrays():
+    index = CompactBM25(CORPUS)
+    assert index.postings.dtype == np.int32
+    assert len(index.postings) == index.indptr[-1] == sum(len(set(doc)) for doc in CORPUS)
+    assert index.nbytes > 0
+    with pytest.raises(ValueError):
+        CompactBM25([])
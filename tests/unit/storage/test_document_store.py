@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar document store.
+"""
+import sys
+import os
+import re
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+
+from src.core.storage.document_store import DocumentStore
+
+
+def make_corpus(count=200):
+    texts, metadatas = [], []
+    for i in range(count):
+        texts.append(f"Risk entry {i}: systems failed in {1990 + i % 30} (total: {i * 7})")
+        metadata = {
+            'rid': f"RID-{i:05d}",
+            'domain': ['Privacy', 'Safety', 'Bias'][i % 3],
+            'row': i,
+            'is_summary': i % 50 == 0,
+            'search_all_fields': f"risk {i} {['privacy', 'safety', 'bias'][i % 3]} entry",
+        }
+        if i % 10 == 0:
+            metadata['extracted_authors'] = 'Slattery, Saeri' if i % 20 == 0 else ''
+        texts_only_key = {'content_preview': texts[-1][:20]} if i % 2 else {}
+        metadata.update(texts_only_key)
+        metadatas.append(metadata)
+    return texts, metadatas
+
+
+def test_round_trip_preserves_text_values_types_and_key_order():
+    texts, metadatas = make_corpus()
+    texts.append("")
+    metadatas.append({'score': 1.0, 'flag': True, 'count': 1, 'nothing': None})
+    store = DocumentStore(texts, metadatas)
+
+    assert len(store) == len(texts)
+    for doc_id, (text, metadata) in enumerate(zip(texts, metadatas)):
+        assert store.text(doc_id) == text
+        restored = store.metadata(doc_id)
+        assert restored == metadata
+        assert list(restored) == list(metadata)
+        assert [type(v) for v in restored.values()] == [type(v) for v in metadata.values()]
+
+    # Present-but-None is distinct from missing
+    assert store.field(len(texts) - 1, 'nothing', 'default') is None
+    assert store.field(0, 'content_preview', 'default') == 'default'
+    # Materialized metadata is a fresh dict every time
+    store.metadata(0)['rid'] = 'changed'
+    assert store.field(0, 'rid') == 'RID-00000'
+
+
+def test_column_masks():
+    texts, metadatas = make_corpus()
+    store = DocumentStore(texts, metadatas)
+
+    authors = np.flatnonzero(store.truthy('extracted_authors'))
+    assert authors.tolist() == [i for i in range(200) if i % 20 == 0]
+    assert np.flatnonzero(store.has_field('extracted_authors')).tolist() == list(range(0, 200, 10))
+    assert np.flatnonzero(store.equals('domain', 'Bias')).tolist() == list(range(2, 200, 3))
+    assert not store.truthy('missing_field').any()
+
+
+def test_search_text_matches_per_document_search():
+    texts, metadatas = make_corpus()
+    store = DocumentStore(texts, metadatas)
+    for number in ('7', '777', '2001', '49'):
+        pattern = re.compile(rf'\b{number}\b|{number}(?=\D|$)|(?<!\d){number}')
+        expected = [i for i, text in enumerate(texts) if pattern.search(text)]
+        assert list(store.search_text(pattern)) == expected
+
+
+def test_views_read_fields_lazily():
+    texts, metadatas = make_corpus(10)
+    store = DocumentStore(texts, metadatas)
+    view = store.view(3)
+    assert view.page_content == texts[3]
+    assert view.get('domain') == 'Privacy'
+    assert view.metadata == metadatas[3]
+    assert [v.doc_id for v in store.views()] == list(range(10))
+    assert store.get_stats()['documents'] == 10
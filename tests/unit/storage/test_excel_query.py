@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side sort/filter/search over Excel sheets.
+"""
+import sys
+import os
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pandas")
+
+from src.core.storage import excel_sidecar, excel_query
+from src.core.storage.excel_sidecar import ExcelSidecarCache
+from src.core.storage.excel_query import ExcelQueryEngine, ExcelQueryError, SheetQuery
+
+
+def fake_sheets(path):
+    domains = ['Privacy', 'Safety', 'Bias']
+    records = [
+        {'Title': f'Risk {i}', 'Domain': domains[i % 3], 'Year': 2015 + i % 10,
+         'Note': 'deepfake misuse' if i % 50 == 0 else None, '__row_id__': i}
+        for i in range(7000)
+    ]
+    columns = [{'key': key, 'sample_max_length': 10} for key in ('Title', 'Domain', 'Year', 'Note')]
+    return [{'name': 'Risks', 'columns': columns, 'records': records, 'total_rows': 7001,
+             'column_widths': {}, 'row_heights': {}}]
+
+
+@pytest.fixture
+def workbook_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_sidecar, '_extract_workbook', fake_sheets)
+    monkeypatch.setattr(excel_query, 'excel_sidecar_cache', ExcelSidecarCache(cache_dir=tmp_path / "sidecar"))
+    path = tmp_path / "risks.xlsx"
+    path.write_bytes(b"workbook")
+    return path
+
+
+def test_filters_sort_and_search_return_paged_row_ids(workbook_path):
+    engine = ExcelQueryEngine(max_views=2)
+
+    query = SheetQuery.from_params(
+        sort=[{'column': 'Year', 'direction': 'DESC'}],
+        filters={'Domain': 'priv', 'Year': {'op': 'gte', 'value': 2020}}
+    )
+    sheet, row_ids, total = engine.query(workbook_path, 'Risks', query, offset=0, limit=5)
+    rows = sheet.get_rows_by_id(row_ids)
+    assert total == sum(1 for i in range(7000) if i % 3 == 0 and 2015 + i % 10 >= 2020)
+    assert len(rows) == 5
+    assert all(row['Domain'] == 'Privacy' and row['Year'] == 2024 for row in rows)
+    # Ties keep row order, so pages are stable
+    assert row_ids == sorted(row_ids)
+
+    search = SheetQuery.from_params(search='DEEPFAKE')
+    _, row_ids, total = engine.query(workbook_path, 'Risks', search, offset=10, limit=1000)
+    assert total == 140
+    assert row_ids[0] == 500 and len(row_ids) == 130
+
+    # The sheet was registered once and reused
+    assert engine.get_stats()['views_registered'] == 1
+
+
+def test_invalid_queries_are_rejected(workbook_path):
+    engine = ExcelQueryEngine()
+    with pytest.raises(ExcelQueryError):
+        SheetQuery.from_params(sort=[{'column': 'Year', 'direction': 'sideways'}])
+    with pytest.raises(ExcelQueryError):
+        SheetQuery.from_params(filters={'Year': {'op': 'like', 'value': 1}})
+    with pytest.raises(ExcelQueryError):
+        engine.query(workbook_path, 'Risks', SheetQuery.from_params(filters={'Missing': 'x'}))
+    # Column names are identifiers, never SQL
+    with pytest.raises(ExcelQueryError):
+        engine.query(workbook_path, 'Risks', SheetQuery.from_params(sort=[{'column': 'Year"; DROP TABLE x; --'}]))
+
+
+def test_reset_reregisters_views_on_a_fresh_connection(workbook_path):
+    engine = ExcelQueryEngine()
+    query = SheetQuery.from_params(search='deepfake')
+    _, before, _ = engine.query(workbook_path, 'Risks', query, limit=20)
+
+    engine.reset()  # as in a forked worker
+    _, after, _ = engine.query(workbook_path, 'Risks', query, limit=20)
+    assert after == before
+    assert engine.get_stats()['views_registered'] == 2
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the Excel viewer sidecar cache.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.storage import excel_sidecar
+from src.core.storage.excel_sidecar import ExcelSidecarCache
+
+
+def fake_sheets(rows=2500):
+    records = [{'Risk': f'risk {i}', 'Score': i * 0.5, 'Note': None, '__row_id__': i} for i in range(rows)]
+    return [
+        {
+            'name': 'Data',
+            'columns': [{'key': 'Risk', 'sample_max_length': 8}, {'key': 'Score', 'sample_max_length': 4},
+                        {'key': 'Note', 'sample_max_length': None}],
+            'records': records,
+            'total_rows': rows + 1,
+            'column_widths': {1: 30.5},
+            'row_heights': {2: 40, 5002: 20}
+        },
+        {'name': 'Empty', 'columns': [], 'records': [], 'total_rows': 0, 'column_widths': {}, 'row_heights': {}}
+    ]
+
+
+def test_pages_are_sliced_from_the_sidecar(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(excel_sidecar, '_extract_workbook', lambda path: calls.append(path) or fake_sheets())
+    source = tmp_path / "book.xlsx"
+    source.write_bytes(b"v1")
+
+    cache = ExcelSidecarCache(cache_dir=tmp_path / "sidecar", max_open=4)
+    workbook = cache.get(source)
+    assert workbook.sheet_names == ['Data', 'Empty']
+
+    sheet = workbook.sheet('Data')
+    page = sheet.get_rows(offset=2000, limit=3)
+    assert [row['__row_id__'] for row in page] == [2000, 2001, 2002]
+    assert page[0] == {'Risk': 'risk 2000', 'Score': 1000.0, 'Note': None, '__row_id__': 2000}
+    assert len(sheet.get_rows(offset=2490, limit=100)) == 10
+    assert sheet.get_rows(offset=5000) == []
+    assert sheet.column_widths == {1: 30.5}
+    assert sheet.get_row_heights(offset=5000) == {0: 20}
+    assert workbook.sheet('Empty').get_rows() == []
+
+    # Served from memory, then from disk by a fresh cache, without re-parsing
+    assert cache.get(source) is workbook
+    assert ExcelSidecarCache(cache_dir=tmp_path / "sidecar").get(source).sheet('Data').data_rows == 2500
+    assert len(calls) == 1
+
+
+def test_new_file_version_rebuilds_and_drops_stale_sidecar(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_sidecar, '_extract_workbook', lambda path: fake_sheets(rows=10))
+    source = tmp_path / "book.xlsx"
+    source.write_bytes(b"v1")
+    cache = ExcelSidecarCache(cache_dir=tmp_path / "sidecar")
+    cache.get(source)
+
+    source.write_bytes(b"version 2")
+    cache.get(source)
+    assert cache.get_stats()['builds'] == 2
+    assert len(list((tmp_path / "sidecar").iterdir())) == 1
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the precomputed Excel formatting index.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+pytest.importorskip("numpy")
+openpyxl = pytest.importorskip("openpyxl")
+from openpyxl.styles import Font, PatternFill
+
+from src.core.storage.excel_style_index import ExcelStyleIndexCache
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Risks"
+    sheet.append(["Title", "Domain", "Link"])
+    for i in range(1, 3001):
+        sheet.append([f"risk {i}", "safety", None])
+    sheet["A2"].font = Font(bold=True, size=11)
+    sheet["B2502"].fill = PatternFill(fill_type="solid", start_color="FFFF0000")
+    sheet["C2502"] = '=HYPERLINK("https://example.org/risk", "risk")'
+    sheet.merge_cells("A2500:A2503")
+    path = tmp_path / "risks.xlsx"
+    workbook.save(path)
+    return path
+
+
+def test_chunks_match_cell_formatting(tmp_path, workbook_path):
+    cache = ExcelStyleIndexCache(cache_dir=tmp_path / "styles")
+    index = cache.get(workbook_path).sheet("Risks")
+    assert len(index.styles) < 10  # deduplicated
+
+    first = index.get_formatting(offset=0, max_rows=100)
+    assert first["0_1"]["bold"] is True
+
+    # Excel row 2502 is DataGrid row 2500
+    chunk = index.get_formatting(offset=2500, max_rows=100)
+    assert chunk["2500_2"]["bgColor"] == "#FF0000"
+    assert chunk["2500_3"]["hyperlink"] == "https://example.org/risk"
+    # Merged range A2500:A2503 starts above the chunk: covered cells point at the anchor
+    assert chunk["2500_1"]["isMerged"] is True
+    assert chunk["2500_1"]["mergeAnchor"] == "2498_1"
+    assert chunk["2501_1"]["mergeAnchor"] == "2498_1"
+    assert "isMerged" not in chunk.get("2502_1", {})
+    assert index.get_formatting(offset=2498, max_rows=1)["2498_1"]["isAnchor"] is True
+    assert index.get_formatting(offset=5000, max_rows=100) == {}
+
+
+def test_index_is_persisted(tmp_path, workbook_path):
+    ExcelStyleIndexCache(cache_dir=tmp_path / "styles").get(workbook_path)
+    cache = ExcelStyleIndexCache(cache_dir=tmp_path / "styles")
+    cache.get(workbook_path)
+    assert cache.get_stats()["builds"] == 0
+    assert cache.get_stats()["disk_hits"] == 1
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed document image store.
+"""
+import sys
+import os
+import hashlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.storage.image_store import ImageStore
+
+
+def test_images_are_stored_once_by_digest(tmp_path):
+    store = ImageStore(root=tmp_path)
+    data = b"\x89PNG fake image bytes"
+
+    digest = store.put(data, "image/png")
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert store.put(data, "image/png") == digest
+    assert len(list(tmp_path.rglob("*.png"))) == 1
+
+    path, content_type = store.get(digest)
+    assert path.read_bytes() == data
+    assert content_type == "image/png"
+
+
+def test_unknown_or_malformed_digests_are_rejected(tmp_path):
+    store = ImageStore(root=tmp_path)
+    assert store.get("0" * 64) is None
+    assert store.get("../../etc/passwd") is None
+    assert store.get("") is None
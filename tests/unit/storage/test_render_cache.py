@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared document render cache.
+"""
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.storage.render_cache import DocumentRenderCache
+
+
+def make_file(tmp_path, content=b"workbook"):
+    path = tmp_path / "doc.xlsx"
+    path.write_bytes(content)
+    return path
+
+
+def test_renders_are_keyed_by_content_and_params(tmp_path):
+    cache = DocumentRenderCache(max_bytes=1024 * 1024, persist=False)
+    path = make_file(tmp_path)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return {"rows": [1, 2, 3]}
+
+    assert cache.get_or_render("excel", path, render, {"offset": 0}) == ({"rows": [1, 2, 3]}, False)
+    assert cache.get_or_render("excel", path, render, {"offset": 0}) == ({"rows": [1, 2, 3]}, True)
+    cache.get_or_render("excel", path, render, {"offset": 100})
+    assert len(renders) == 2
+
+    # A new file version is a different key
+    path.write_bytes(b"workbook v2")
+    assert cache.get_or_render("excel", path, render, {"offset": 0})[1] is False
+
+
+def test_eviction_is_bounded_by_bytes(tmp_path):
+    cache = DocumentRenderCache(max_bytes=250, persist=False)
+    path = make_file(tmp_path)
+    for offset in range(5):
+        cache.get_or_render("excel", path, lambda: {"html": "x" * 100}, {"offset": offset})
+    stats = cache.get_stats()
+    assert stats["bytes"] <= 250
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 3
+
+
+def test_persisted_renders_survive_restart(tmp_path):
+    path = make_file(tmp_path)
+    first = DocumentRenderCache(max_bytes=1024, persist=True, disk_dir=tmp_path / "renders")
+    first.get_or_render("word", path, lambda: {"html_content": "<p>hi</p>"})
+
+    second = DocumentRenderCache(max_bytes=1024, persist=True, disk_dir=tmp_path / "renders")
+    value, cached = second.get_or_render("word", path, lambda: {"html_content": "rendered again"})
+    assert cached and value == {"html_content": "<p>hi</p>"}
+    assert second.get_stats()["disk_hits"] == 1
+
+
+def test_concurrent_misses_render_once(tmp_path):
+    cache = DocumentRenderCache(max_bytes=1024, persist=False)
+    path = make_file(tmp_path)
+    renders = []
+
+    def slow_render():
+        renders.append(1)
+        time.sleep(0.1)
+        return {"html_content": "<p>doc</p>"}
+
+    threads = [threading.Thread(target=cache.get_or_render, args=("word", path, slow_render)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(renders) == 1
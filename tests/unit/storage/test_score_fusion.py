@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for chunk-id score fusion.
+"""
+import sys
+import os
+import random
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import numpy as np
+
+from src.core.storage.score_fusion import CHUNK_ID_KEY, chunk_ids, fuse_scores, pick, rank_scores
+
+
+class Doc:
+    def __init__(self, text, metadata):
+        self.page_content = text
+        self.metadata = metadata
+
+
+def reference_merge(ranked_lists, top_k):
+    """The dict-based merge the retrievers used: scores summed per key, stable sort."""
+    scores, objects = {}, {}
+    for docs, doc_scores in ranked_lists:
+        for doc, score in zip(docs, doc_scores):
+            key = f"{doc.metadata.get('source')}_{doc.metadata[CHUNK_ID_KEY]}"
+            if key not in scores:
+                scores[key] = 0
+                objects[key] = doc
+            scores[key] += score
+    ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(objects[key], score) for key, score in ordered[:top_k]]
+
+
+def test_matches_dict_merge_with_duplicates_and_ties():
+    rng = random.Random(7)
+    corpus = [Doc(f"chunk {i}", {'source': 'doc.txt', CHUNK_ID_KEY: i}) for i in range(30)]
+    for _ in range(200):
+        lists = []
+        for weight, factor in ((0.7, 1.0), (0.3, 0.8), (0.3, 1.0)):
+            docs = rng.sample(corpus, rng.randint(0, 12))
+            # Rank scores produce many exact ties between lists of the same length
+            lists.append((docs, rank_scores(len(docs), weight, factor)))
+        top_k = rng.randint(1, 15)
+
+        ids, totals, positions = fuse_scores(
+            [chunk_ids(docs, lambda d: d.page_content, {}) for docs, _ in lists],
+            [scores for _, scores in lists],
+            top_k
+        )
+        candidates = [doc for docs, _ in lists for doc in docs]
+        expected = reference_merge(lists, top_k)
+
+        assert pick(candidates, positions) == [doc for doc, _ in expected]
+        assert totals.tolist() == [score for _, score in expected]
+        assert ids.tolist() == [doc.metadata[CHUNK_ID_KEY] for doc, _ in expected]
+
+
+def test_fallback_key_for_documents_without_chunk_id():
+    legacy = [Doc("a", {}), Doc("b", {}), Doc("a", {})]
+    assigned = {}
+    first = chunk_ids(legacy, lambda d: d.page_content, assigned)
+    second = chunk_ids([Doc("b", {}), Doc("c", {CHUNK_ID_KEY: 0})], lambda d: d.page_content, assigned)
+
+    assert first.tolist() == [-1, -2, -1]
+    assert second.tolist() == [-2, 0]
+
+
+def test_rank_scores_and_empty_input():
+    assert np.allclose(rank_scores(4, 0.5, 0.8), [0.4, 0.3, 0.2, 0.1])
+    ids, totals, positions = fuse_scores([np.empty(0, dtype=np.int64)], [np.empty(0)], 5)
+    assert len(ids) == len(totals) == len(positions) == 0
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the pluggable session store backends.
+"""
+import sys
+import os
+import fnmatch
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+from src.core.storage.session_store import (
+    MemorySessionStore,
+    RedisSessionStore,
+    SQLiteSessionStore
+)
+
+
+class FakeRedis:
+    """Minimal in-process stand-in for a Redis-protocol client."""
+
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at)
+
+    def _live(self, key):
+        item = self.data.get(key)
+        if item and item[1] <= time.time():
+            del self.data[key]
+            return None
+        return item
+
+    def get(self, key):
+        item = self._live(key)
+        return item[0] if item else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.time() + ex)
+
+    def expire(self, key, seconds):
+        item = self._live(key)
+        if item:
+            self.data[key] = (item[0], time.time() + seconds)
+
+    def delete(self, key):
+        return 1 if self.data.pop(key, None) else 0
+
+    def scan_iter(self, match="*"):
+        return [k for k in list(self.data) if self._live(k) and fnmatch.fnmatch(k, match)]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(default_ttl=60, max_entries=3, bucket_seconds=1)
+    if request.param == "sqlite":
+        return SQLiteSessionStore(db_path=tmp_path / "sessions.db", default_ttl=60, max_entries=3)
+    return RedisSessionStore(client=FakeRedis(), default_ttl=60)
+
+
+def test_round_trip_and_delete(store):
+    store.set("conversation", "c1", [{"role": "user", "content": "hi"}])
+    assert store.get("conversation", "c1") == [{"role": "user", "content": "hi"}]
+    assert store.get("session_language", "c1") is None  # namespaces are isolated
+    assert store.exists("conversation", "c1")
+    assert store.delete("conversation", "c1")
+    assert store.get("conversation", "c1", default=[]) == []
+
+
+def test_entries_expire(store):
+    store.set("chat_session", "s1", {"messages": []}, ttl=1)
+    store.set("chat_session", "s2", {"messages": []}, ttl=60)
+    time.sleep(2.1)
+    assert store.get("chat_session", "s1") is None
+    store.cleanup()
+    assert store.count("chat_session") == 1
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(default_ttl=60, max_entries=2)
+    store.set("ns", "a", 1)
+    store.set("ns", "b", 2)
+    store.get("ns", "a")  # a becomes most recently used
+    store.set("ns", "c", 3)
+    assert store.get("ns", "b") is None
+    assert store.get("ns", "a") == 1
+    assert store.get_stats()["evictions"] == 1
+
+
+def test_memory_cleanup_only_drops_expired_buckets():
+    store = MemorySessionStore(default_ttl=60, bucket_seconds=1)
+    for i in range(50):
+        store.set("ns", f"short-{i}", i, ttl=1)
+    store.set("ns", "long", "kept", ttl=60)
+    time.sleep(2.1)
+    assert store.cleanup() == 50
+    assert store.count("ns") == 1
+    assert store.get("ns", "long") == "kept"
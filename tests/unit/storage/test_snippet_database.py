@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for content-addressed snippet storage, batched writes and the migration.
+"""
+import sys
+import os
+import json
+import sqlite3
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.storage.snippet_database import SCHEMA_VERSION, SnippetDatabase
+
+
+def test_save_snippets_upserts_in_one_batch(tmp_path):
+    db = SnippetDatabase(tmp_path / "snippets.db")
+    assert db.save_snippets("session-a", {"RID-00001": {"title": "one"}, "RID-00002": {"title": "two"}})
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE snippet_sessions SET created_at = '2000-01-01 00:00:00'")
+
+    assert db.save_snippets("session-a", {"RID-00001": {"title": "one, again"}})
+
+    assert db.get_snippet("session-a", "RID-00001") == {"title": "one, again"}
+    assert db.get_snippet("session-b", "RID-00001") is None
+    created = {s['title']: s['_metadata']['created_at'] for s in db.get_session_snippets("session-a")}
+    assert created == {"one, again": "2000-01-01 00:00:00", "two": "2000-01-01 00:00:00"}
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0] == 1
+    assert db.save_snippets("session-a", {})
+
+
+def test_sessions_share_one_stored_snippet(tmp_path):
+    db = SnippetDatabase(tmp_path / "snippets.db")
+    entry = {"rid": "RID-00073", "title": "Bias", "content": "Long risk entry"}
+    for session in range(5):
+        db.save_snippet(f"session-{session}", "RID-00073", dict(entry, created_at=f"2025-01-0{session + 1}"))
+    db.save_snippet("session-0", "RID-00074", dict(entry, rid="RID-00074"))
+
+    assert db.get_storage_stats() == {'snippets': 2, 'records': 0, 'references': 6, 'sessions': 5}
+    # The per-session created_at survives deduplication
+    assert db.get_snippet("session-3", "RID-00073") == dict(entry, created_at="2025-01-04")
+
+    # Changed content is a new snippet; the old one goes once unreferenced
+    db.save_snippet("session-4", "RID-00073", dict(entry, content="Revised entry"))
+    assert db.get_snippet("session-4", "RID-00073")['content'] == "Revised entry"
+    for session in range(4):
+        assert db.clear_session(f"session-{session}")
+    assert db.get_storage_stats() == {'snippets': 1, 'records': 0, 'references': 1, 'sessions': 1}
+
+
+def test_migrates_per_session_copies(tmp_path):
+    path = tmp_path / "snippets.db"
+    entry = {"rid": "RID-00001", "title": "One", "created_at": "2025-01-01T10:00:00"}
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE snippet_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, rid TEXT NOT NULL,
+                data JSON NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(session_id, rid)
+            )
+        """)
+        conn.execute("CREATE INDEX idx_session_rid ON snippet_sessions(session_id, rid)")
+        conn.execute("CREATE TABLE user_sessions (session_id TEXT PRIMARY KEY, created_at TIMESTAMP, last_activity TIMESTAMP)")
+        for session in ("a", "b", "c"):
+            conn.execute("INSERT INTO snippet_sessions (session_id, rid, data, created_at) VALUES (?, ?, ?, ?)",
+                         (session, "RID-00001", json.dumps(entry), "2025-01-01 10:00:00"))
+            conn.execute("INSERT INTO user_sessions VALUES (?, '2025-01-01', '2025-01-01')", (session,))
+
+    # Creating the store (or importing the module) leaves the file untouched
+    db = SnippetDatabase(path)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    assert db.get_storage_stats() == {'snippets': 1, 'records': 0, 'references': 3, 'sessions': 3}
+    assert db.get_snippet("b", "RID-00001") == entry
+    assert db.get_session_snippets("c")[0]['_metadata']['created_at'] == "2025-01-01 10:00:00"
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    # Opening again is a no-op; expired sessions take their snippets with them
+    assert SnippetDatabase(path).cleanup_old_sessions(days=1) == 2
+    assert db.get_storage_stats() == {'snippets': 1, 'records': 0, 'references': 1, 'sessions': 1}
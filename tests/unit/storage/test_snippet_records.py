@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for snippet records precomputed at ingestion.
+"""
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.storage.snippet_database import SnippetDatabase
+from src.core.storage.snippet_records import build_snippet_record, build_snippet_records, preview_type, record_digest
+
+
+def chunk(rid, content, **metadata):
+    return SimpleNamespace(page_content=content, metadata=dict(metadata, rid=rid))
+
+
+def test_record_is_built_from_the_chunk():
+    record = build_snippet_record(chunk("RID-00007", "Repository ID: RID-00007\n\nTitle: Biased hiring\nBody",
+                                        title="RID-00007", entity="2", timing=1, url="data/AI_Risk.xlsx",
+                                        sheet="AI Risk Database v3", row="12"))
+
+    assert record['title'] == "Biased hiring"
+    assert record['metadata']['entity'] == "AI" and record['metadata']['timing'] == "Pre-deployment"
+    assert record['source_location'] == {'sheet': "AI Risk Database v3", 'row': 12}
+    assert record['preview_type'] == "excel" and 'created_at' not in record
+    assert preview_type({'url': "paper.PDF"}) == "pdf"
+    assert preview_type({'type': "metadata_query_result"}) == "excel"
+
+
+def test_digest_covers_content_and_record_fields():
+    base = chunk("RID-00001", "text", domain="7. AI System Safety")
+    assert record_digest(base) == record_digest(chunk("RID-00001", "text", domain="7. AI System Safety", score=0.9))
+    assert record_digest(base) != record_digest(chunk("RID-00001", "text!", domain="7. AI System Safety"))
+    assert record_digest(chunk("RID-00001", "text")) != record_digest(chunk("RID-00001", "text", domain=None))
+
+
+def test_records_are_stored_once_and_referenced(tmp_path):
+    db = SnippetDatabase(tmp_path / "snippets.db")
+    docs = [chunk("RID-00001", "first chunk"), chunk("RID-00001", "second chunk"), chunk("RID-00002", "other")]
+    records = build_snippet_records(docs)
+    assert set(records) == {"RID-00001", "RID-00002"}
+    assert records["RID-00001"][1]['content'] == "first chunk"
+    assert db.save_records(records) == 2
+
+    # Current records are skipped on the next sync
+    assert build_snippet_records(docs, known=db.get_record_digests()) == {}
+
+    stored = {rid: content_hash for rid, (_, content_hash) in db.get_records(["RID-00001", "RID-00009"]).items()}
+    assert list(stored) == ["RID-00001"]
+    assert db.save_snippets("session-a", {}, stored)
+    snippet = db.get_snippet("session-a", "RID-00001")
+    assert snippet.pop('created_at') and snippet == records["RID-00001"][1]
+
+    # Shared snippets of records outlive the sessions citing them
+    db.clear_session("session-a")
+    assert db.get_storage_stats() == {'snippets': 2, 'records': 2, 'references': 0, 'sessions': 0}
+
+
+def test_records_replaced_after_lookup_are_not_referenced(tmp_path):
+    db = SnippetDatabase(tmp_path / "snippets.db")
+    db.save_records(build_snippet_records([chunk("RID-00001", "old text")]))
+    stored = {rid: content_hash for rid, (_, content_hash) in db.get_records(["RID-00001"]).items()}
+
+    # Re-ingestion replaces the record and collects the old snippet before the save
+    db.save_records(build_snippet_records([chunk("RID-00001", "new text")]))
+    assert not db.save_snippets("session-a", {}, stored)
+    assert db.get_storage_stats()['references'] == 0
+
+    stored = {rid: content_hash for rid, (_, content_hash) in db.get_records(["RID-00001"]).items()}
+    assert db.save_snippets("session-a", {}, stored)
+    assert db.get_snippet("session-a", "RID-00001")['content'] == "new text"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the translation memory and the template translator in front of it.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.query.refinement import QueryRefiner
+from src.core.services.template_translator import TemplateTranslator
+from src.core.storage.translation_memory import TranslationMemory
+
+SPANISH = {'code': 'es', 'english_name': 'Spanish'}
+
+
+class FakeModel:
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.prompts = []
+
+    def generate(self, prompt, docs, priority=None):
+        self.prompts.append(prompt)
+        if self.reply is not None:
+            return self.reply
+        return "ES: " + prompt.split("\n\n")[1]
+
+
+def test_translations_are_keyed_by_text_language_and_prompt_version(tmp_path):
+    memory = TranslationMemory(db_path=tmp_path / "tm.db", persist=False)
+    calls = []
+
+    def translate(text):
+        calls.append(text)
+        return f"[{len(calls)}] {text}"
+
+    assert memory.get_or_translate("error", "error-v1", "Sorry", "es", translate) == "[1] Sorry"
+    assert memory.get_or_translate("error", "error-v1", "Sorry", "es", translate) == "[1] Sorry"
+    memory.get_or_translate("error", "error-v1", "Sorry", "fr", translate)
+    memory.get_or_translate("error", "error-v2", "Sorry", "es", translate)
+    assert len(calls) == 3
+
+    stats = memory.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3 and stats["translations"] == 3
+    assert stats["kinds"]["error"]["hit_rate_percent"] == 25.0
+
+
+def test_failures_are_not_stored(tmp_path):
+    memory = TranslationMemory(db_path=tmp_path / "tm.db", persist=False)
+
+    def fail(text):
+        raise RuntimeError("quota")
+
+    assert memory.get_or_translate("taxonomy", "taxonomy-v1", "Domains", "es", fail) is None
+    assert memory.get_or_translate("taxonomy", "taxonomy-v1", "Domains", "es", lambda text: "") is None
+    assert memory.get_or_translate("taxonomy", "taxonomy-v1", "Domains", "es", lambda text: "Dominios") == "Dominios"
+    assert memory.get_stats()["failures"] == 2
+
+
+def test_persisted_translations_survive_restart(tmp_path):
+    first = TranslationMemory(db_path=tmp_path / "tm.db", persist=True)
+    first.get_or_translate("out_of_scope", "out_of_scope-v1", "Hello!", "es", lambda text: "¡Hola!")
+
+    second = TranslationMemory(db_path=tmp_path / "tm.db", persist=True)
+    assert second.contains("Hello!", "es", "out_of_scope-v1")
+    assert second.get_or_translate("out_of_scope", "out_of_scope-v1", "Hello!", "es", lambda text: "again") == "¡Hola!"
+    assert second.get_stats()["disk_hits"] == 1
+
+
+def test_template_translator_serves_and_prewarms_from_memory(tmp_path):
+    memory = TranslationMemory(db_path=tmp_path / "tm.db", persist=False)
+    model = FakeModel()
+    translator = TemplateTranslator(model, memory)
+
+    counts = translator.prewarm({'error': ["Sorry", "Sorry", "Try again"]}, [{'code': 'en'}, SPANISH])
+    assert counts == {'stored': 0, 'translated': 2, 'failed': 0}
+    assert translator.prewarm({'error': ["Sorry"]}, [SPANISH])['stored'] == 1
+
+    assert translator.translate('error', "Sorry", SPANISH) == "ES: Sorry"
+    assert translator.translate('error', "Sorry", {'code': 'en'}) == "Sorry"
+    assert len(model.prompts) == 2
+
+    # Per-request text is translated but not remembered
+    translator.translate('error', "Failed: timeout", SPANISH, remember=False)
+    assert not memory.contains("Failed: timeout", "es", "error-v1")
+
+    # Model error texts count as failures; without a model only stored translations are served
+    assert TemplateTranslator(FakeModel("I encountered an error: quota"), memory).translate('error', "New", SPANISH) is None
+    assert TemplateTranslator(None, memory).translate('error', "Sorry", SPANISH) == "ES: Sorry"
+
+
+def test_refinement_template_keeps_the_query_out_of_the_translation():
+    refiner = QueryRefiner()
+    templates = []
+
+    def translate(template):
+        templates.append(template)
+        return template.replace("Which aspect interests you most?", "¿Qué aspecto te interesa más?")
+
+    for query in ["is ai dangerous", "Will AI destroy the world?"]:
+        result = refiner.analyze_query(query)
+        response = refiner.format_suggestions_response(result, SPANISH, translate=translate)
+        assert f'"{query}"' in response and "¿Qué aspecto" in response
+    assert templates[0] == templates[1] and "{query}" in templates[0]
+
+    # A translation that drops the placeholder falls back to English
+    response = refiner.format_suggestions_response(result, SPANISH, translate=lambda template: "Sin marcador")
+    assert response.startswith('Your question "Will AI destroy the world?"')
+
+
+def test_refinement_entity_note_is_translated_without_remembering():
+    refiner = QueryRefiner()
+    calls = []
+
+    def translate(text, remember=True):
+        calls.append((text, remember))
+        return "ES: " + text
+
+    result = refiner.analyze_query("Will AI destroy the world?")
+    result.entity_issues = ["'GPT-7' may not be covered in the repository"]
+    response = refiner.format_suggestions_response(result, SPANISH, translate=translate)
+
+    (template, remembered), (note, note_remembered) = calls
+    assert "GPT-7" not in template and remembered
+    assert note == "Note: 'GPT-7' may not be covered in the repository" and not note_remembered
+    assert response.endswith("\n\nES: " + note)
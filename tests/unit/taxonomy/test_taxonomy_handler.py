@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the memoized taxonomy handler.
+"""
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from src.core.taxonomy.taxonomy_handler import TaxonomyHandler
+
+
+def test_responses_are_precomputed():
+    handler = TaxonomyHandler()
+    first = handler.handle_taxonomy_query("What are the 7 domains of AI risk?")
+    second = handler.handle_taxonomy_query("What are the 7 domains of AI risk?")
+    assert first is second
+    assert handler.resolve_response_key("Tell me about domain 3") == ("specific_domain", 3)
+    assert handler.handle_taxonomy_query("Tell me about domain 3").content
+
+
+def test_translation_is_cached_per_language():
+    handler = TaxonomyHandler()
+    calls = []
+
+    def translator(content):
+        calls.append(content)
+        return f"[es] {content}"
+
+    first = handler.handle_taxonomy_query("What is the causal taxonomy?", "es", translator)
+    second = handler.handle_taxonomy_query("What is the causal taxonomy?", "es", translator)
+    assert len(calls) == 1
+    assert first is second
+    assert first.language == "es"
+    assert first.content.startswith("[es] ")
+    # English stays untouched
+    assert handler.handle_taxonomy_query("What is the causal taxonomy?").language == "en"
+
+    stats = handler.get_cache_stats()
+    assert stats["translation_hits"] == 1
+    assert stats["translation_misses"] == 1
+
+
+def test_failed_translation_falls_back_to_english():
+    handler = TaxonomyHandler()
+
+    def translator(content):
+        raise RuntimeError("model unavailable")
+
+    response = handler.handle_taxonomy_query("What is the causal taxonomy?", "fr", translator)
+    assert response.language == "en"
+    assert handler.get_cache_stats()["cached_translations"] == 0
+
+
+def test_stats_are_consistent_under_concurrent_queries():
+    handler = TaxonomyHandler()
+
+    def worker():
+        for _ in range(25):
+            handler.handle_taxonomy_query("What is the causal taxonomy?", "es", lambda content: f"[es] {content}")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = handler.get_cache_stats()
+    assert stats["queries"] == 200
+    assert stats["translation_hits"] + stats["translation_misses"] == 200
+    assert stats["cached_translations"] == 1
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled response validator checks and edit distance.
+"""
+import sys
+import os
+import random
+import re
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.docstore.document import Document
+
+from src.core.validation.response_validator import (
+    ResponseValidator, SourceIndex, ValidationCategory, _compile_pattern, _find_all, _occurs, levenshtein_distance
+)
+
+
+def reference_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        previous = current
+    return previous[-1]
+
+
+def test_levenshtein_matches_dynamic_programming():
+    rng = random.Random(7)
+    for _ in range(500):
+        a = ''.join(rng.choice('abc d') for _ in range(rng.randint(0, 30)))
+        b = ''.join(rng.choice('abcde') for _ in range(rng.randint(0, 90)))
+        assert levenshtein_distance(a, b) == reference_distance(a, b)
+    assert levenshtein_distance("kitten", "sitting") == 3
+
+
+@pytest.mark.parametrize("pattern", [r'might', r'i don\'t know', r'\d+%', r'\d+\.\d+%', r'RID-\d{5}', r'\[Source \d+\]'])
+def test_compiled_patterns_match_like_re(pattern):
+    compiled = _compile_pattern(pattern)
+    for text in ["it might be 12.5% or 40%", "i don't know", "see rid-00001 and RID-00002 [Source 3]", ""]:
+        assert _occurs(compiled, text) == (re.search(pattern, text) is not None)
+        assert _find_all(compiled, text) == re.findall(pattern, text)
+
+
+def test_checks_share_one_source_index():
+    validator = ResponseValidator()
+    documents = [Document(page_content="Studies show 45% of hiring tools are biased.", metadata={'rid': 'RID-00001'})]
+    sources = SourceIndex(documents)
+    response = "Studies show 45% of tools are biased, and 90% fail audits (RID-00001)."
+
+    validation = validator.validate_response(response, "Are hiring tools biased?", documents, "bias", sources)
+    accuracy = next(c for c in validation.checks if c.category == ValidationCategory.FACTUAL_ACCURACY)
+    assert accuracy.score == pytest.approx(2 / 3)
+    assert sources.supports("45%") and not sources.supports("90%")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for background (async) response validation and the bounded history.
+"""
+import sys
+import os
+import time
+from contextvars import ContextVar
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.docstore.document import Document
+
+from src.core.validation.response_validator import (
+    ResponseValidation, SelfValidationChain, ValidationResult, track_pending_validation
+)
+
+RESPONSE = "According to the repository, AI systems may discriminate in hiring (RID-00001)."
+DOCUMENTS = [Document(page_content="AI hiring tools can discriminate.", metadata={'rid': 'RID-00001'})]
+
+
+def test_history_is_a_ring_buffer():
+    chain = SelfValidationChain(history_size=5)
+    for _ in range(12):
+        chain.validate_and_improve(RESPONSE, "AI hiring risks?", DOCUMENTS)
+
+    assert len(chain.validation_history) == 5
+    assert chain.get_validation_statistics()['total_validations'] == 5
+
+
+def test_async_validation_attaches_to_the_request():
+    chain = SelfValidationChain(history_size=10, workers=1)
+    with track_pending_validation() as pending:
+        future = chain.validate_async(RESPONSE, "AI hiring risks?", DOCUMENTS)
+
+    assert pending.future is future
+    final_response, validation = future.result(timeout=10)
+    assert final_response == RESPONSE
+    assert 0.0 <= validation.overall_score <= 1.0
+    # Unchanged response: nothing to send as a follow-up
+    assert pending.revision(timeout=1) is None
+    assert chain.get_validation_statistics()['pending_background'] == 0
+
+    # Outside a tracked request the future is only returned
+    assert chain.validate_async(RESPONSE, "AI hiring risks?", DOCUMENTS).result(timeout=10)
+
+
+def test_revision_is_reported(monkeypatch):
+    chain = SelfValidationChain(history_size=10, workers=1)
+    validation = ResponseValidation(0.9, ValidationResult.PASS, [], [])
+
+    def revise(response, query, documents, domain, on_revision=None):
+        on_revision()
+        time.sleep(0.05)
+        return "Revised answer", validation
+    monkeypatch.setattr(chain, 'validate_and_improve', revise)
+
+    with track_pending_validation() as pending:
+        chain.validate_async(RESPONSE, "AI hiring risks?", DOCUMENTS)
+
+    assert pending.revision(timeout=10) == ("Revised answer", validation)
+
+
+def test_stream_does_not_wait_for_validation_without_a_revision(monkeypatch):
+    chain = SelfValidationChain(history_size=10, workers=1)
+    validation = ResponseValidation(0.9, ValidationResult.PASS, [], [])
+
+    def score(response, query, documents, domain, on_revision=None):
+        time.sleep(0.5)
+        return response, validation
+    monkeypatch.setattr(chain, 'validate_and_improve', score)
+
+    with track_pending_validation() as pending:
+        future = chain.validate_async(RESPONSE, "AI hiring risks?", DOCUMENTS)
+
+    start = time.perf_counter()
+    assert pending.revision(timeout=10) is None
+    assert time.perf_counter() - start < 0.25
+    future.result(timeout=10)
+
+
+def test_background_validation_runs_in_the_request_context(monkeypatch):
+    chain = SelfValidationChain(history_size=10, workers=1)
+    request_id = ContextVar('request_id', default=None)
+    validation = ResponseValidation(0.9, ValidationResult.PASS, [], [])
+    monkeypatch.setattr(chain, 'validate_and_improve',
+                        lambda response, *args, **kwargs: (request_id.get(), validation))
+
+    request_id.set("request-1")
+    assert chain.validate_async(RESPONSE, "AI hiring risks?", DOCUMENTS).result(timeout=10)[0] == "request-1"